@@ -0,0 +1,129 @@
+"""
+转发循环延迟基准 - 混音线程入队 → 网络侧取出的延迟
+
+生产者是一个原生线程，按混音节拍（512 帧 @ 48kHz ≈ 10.7ms）向 mixed_queue 放入带时间戳的帧；
+对比三种消费方式:
+  - 旧: threading.Thread 中 get(timeout=0.05) + 每帧 time.sleep(0.01)
+  - Wakeup(threading): 线程中等待唤醒，取走全部可用帧
+  - Wakeup(gevent): gevent greenlet 中等待集线器 async 观察者唤醒（与 async_mode='gevent' 一致）
+统计每帧延迟的 p50/p95/p99/最大值，以及消费者看到的最大队列深度。
+分两种节拍: 均匀（每节拍一帧）和成组（设备回调块较大时，每两个节拍连续到达两帧）。
+
+使用方法:
+    python bench/bench_forward_latency.py
+"""
+import queue
+import sys
+import threading
+import time
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.server.runtime import Wakeup
+
+
+FRAME_SECONDS = 512 / 48000
+FRAMES = 300
+
+
+def produce(mixed: queue.Queue, notify=None, burst: int = 1):
+    """原生线程: 按混音节拍放入 (入队时间) 并唤醒，每 burst 个节拍连续放入 burst 帧"""
+    next_tick = time.perf_counter()
+    for _ in range(FRAMES // burst):
+        next_tick += FRAME_SECONDS * burst
+        delay = next_tick - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        for _ in range(burst):
+            mixed.put_nowait(time.perf_counter())
+            if notify is not None:
+                notify()
+    mixed.put_nowait(None)
+
+
+def legacy_consumer(mixed: queue.Queue, latencies: list, depths: list):
+    """旧转发循环"""
+    while True:
+        try:
+            stamp = mixed.get(timeout=0.05)
+        except queue.Empty:
+            continue
+        if stamp is None:
+            return
+        latencies.append(time.perf_counter() - stamp)
+        depths.append(mixed.qsize())
+        time.sleep(0.01)
+
+
+def wakeup_consumer(mixed: queue.Queue, wakeup: Wakeup, latencies: list, depths: list):
+    """新转发循环: 唤醒后取走全部可用帧"""
+    while True:
+        wakeup.wait(0.5)
+        depths.append(mixed.qsize())
+        while True:
+            try:
+                stamp = mixed.get_nowait()
+            except queue.Empty:
+                break
+            if stamp is None:
+                return
+            latencies.append(time.perf_counter() - stamp)
+
+
+def run_legacy(burst: int) -> tuple:
+    mixed, latencies, depths = queue.Queue(maxsize=200), [], []
+    consumer = threading.Thread(target=legacy_consumer, args=(mixed, latencies, depths))
+    consumer.start()
+    produce(mixed, burst=burst)
+    consumer.join()
+    return latencies, depths
+
+
+def run_wakeup_threading(burst: int) -> tuple:
+    mixed, latencies, depths = queue.Queue(maxsize=200), [], []
+    wakeup = Wakeup('threading')
+    consumer = threading.Thread(target=wakeup_consumer, args=(mixed, wakeup, latencies, depths))
+    consumer.start()
+    produce(mixed, wakeup.notify, burst)
+    consumer.join()
+    return latencies, depths
+
+
+def run_wakeup_gevent(burst: int) -> tuple:
+    import gevent
+    mixed, latencies, depths = queue.Queue(maxsize=200), [], []
+    wakeup = Wakeup('gevent')
+    producer = threading.Thread(target=produce, args=(mixed, wakeup.notify, burst))
+    consumer = gevent.spawn(wakeup_consumer, mixed, wakeup, latencies, depths)
+    producer.start()
+    consumer.join()
+    producer.join()
+    wakeup.close()
+    return latencies, depths
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main():
+    print(f"混音节拍 {FRAME_SECONDS * 1000:.2f}ms, {FRAMES} 帧")
+    print("-" * 84)
+    print(f"{'节拍':<6}{'消费方式':<20}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'最大 ms':>10}{'最大队列':>10}")
+    for burst, label in ((1, '均匀'), (2, '成组')):
+        for name, run in (('旧 get+sleep', run_legacy),
+                          ('Wakeup(threading)', run_wakeup_threading),
+                          ('Wakeup(gevent)', run_wakeup_gevent)):
+            latencies, depths = run(burst)
+            ms = [v * 1000 for v in latencies]
+            print(f"{label:<6}{name:<20}{percentile(ms, 50):>10.3f}{percentile(ms, 95):>10.3f}"
+                  f"{percentile(ms, 99):>10.3f}{max(ms):>10.3f}{max(depths):>10}")
+    print("-" * 84)
+    print("旧循环每帧之后固定休眠 10ms: 成组到达的第二帧至少多等 10ms；Wakeup 入队后立即取走全部帧")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+高通滤波基准测试 - 逐样本 Python 循环 vs 分块 IIR 引擎
+
+模拟 handle_audio_data 的单包负载: 2048 帧立体声 int16 (4096 samples)
+
+使用方法:
+    python bench/bench_highpass.py
+"""
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.audio.filters import IIRFilter
+
+
+SAMPLE_RATE = 48000
+CHANNELS = 2
+PACKET_FRAMES = 2048
+CUTOFF = 100.0
+
+
+def legacy_highpass(audio: np.ndarray, cutoff: float, sample_rate: int) -> np.ndarray:
+    """旧版实现（逐样本循环，每包从头开始）"""
+    audio_float = audio.astype(np.float32)
+    rc = 1.0 / (2.0 * np.pi * cutoff)
+    dt = 1.0 / sample_rate
+    alpha = rc / (rc + dt)
+    filtered = np.zeros_like(audio_float)
+    filtered[0] = audio_float[0]
+    for i in range(1, len(audio_float)):
+        filtered[i] = alpha * (filtered[i-1] + audio_float[i] - audio_float[i-1])
+    return np.clip(filtered, -32768, 32767).astype(np.int16)
+
+
+def bench(func, packet: np.ndarray, iterations: int) -> float:
+    """返回每包平均耗时 (微秒)"""
+    func(packet)  # 预热
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func(packet)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    rng = np.random.default_rng(0)
+    packet = (rng.standard_normal(PACKET_FRAMES * CHANNELS) * 3000).astype(np.int16)
+    packet_ms = PACKET_FRAMES / SAMPLE_RATE * 1000
+
+    print(f"包大小: {PACKET_FRAMES} 帧 x {CHANNELS} 声道 ({packet_ms:.1f} ms 音频)")
+    print("-" * 60)
+
+    legacy_us = bench(lambda p: legacy_highpass(p, CUTOFF, SAMPLE_RATE), packet, 50)
+    print(f"旧版逐样本循环:          {legacy_us:9.1f} µs/包  ({legacy_us / 1000 / packet_ms * 100:5.1f}% 实时)")
+
+    results = {}
+    for name, flt in [
+        ('一阶高通 (IIRFilter)', IIRFilter.highpass_first_order(CUTOFF, SAMPLE_RATE, CHANNELS)),
+        ('二阶高通 (IIRFilter)', IIRFilter.highpass_biquad(CUTOFF, SAMPLE_RATE, channels=CHANNELS)),
+    ]:
+        us = bench(flt.process_int16, packet, 1000)
+        results[name] = us
+        print(f"{name}:  {us:9.1f} µs/包  ({us / 1000 / packet_ms * 100:5.1f}% 实时, {legacy_us / us:5.1f}x)")
+
+    # 正确性: 分包连续处理应与整段一次处理一致
+    flt_a = IIRFilter.highpass_first_order(CUTOFF, SAMPLE_RATE, CHANNELS)
+    flt_b = IIRFilter.highpass_first_order(CUTOFF, SAMPLE_RATE, CHANNELS)
+    stream = np.tile(packet, 4)
+    whole = flt_a.process(stream)
+    pieces = np.concatenate([flt_b.process(p) for p in np.split(stream, 4)])
+    print("-" * 60)
+    print(f"分包/整段最大误差: {np.max(np.abs(whole - pieces)):.2e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,395 @@
+"""
+整条音频管线基准 - 合成音频以最快速度走一遍真实代码路径，输出 JSON 供部署前比对回归
+
+每个混音帧（512 帧 @ 48kHz ≈ 10.7ms）依次执行各阶段，与线上线程中调用的是同一批方法:
+  - capture:    MPV（48kHz 立体声）/ Clubdeck（44.1kHz 单声道）设备输入回调写入采集环
+  - ingest:     混音线程取出采集环、声道转换与重采样（其中 resample 单独计时）
+  - mix:        混音调度器节拍 + 混音图算出浏览器母线（含音量计算与状态行）
+  - vad:        Clubdeck 块的语音活动检测（MPV 闪避）
+  - mic_chain:  浏览器麦克风包经客户端处理链（高通 + 噪声门）写入抖动缓冲
+  - output:     CABLE-A 输出渲染（麦克风 + 输入源混音、重采样、限幅）+ 输出回调
+  - broadcast:  取出混音帧并发布给订阅者（真实 Socket.IO 报文编码，发送端总是空闲；
+                其中各线路格式的编码单独计时）
+
+先跑一遍计时（不开 tracemalloc），再用 tracemalloc 跑少量帧统计每阶段单帧峰值新增内存、
+每帧分配次数（快照差），以及整条管线运行后仍未释放的内存；最后给出进程峰值 RSS。
+设备与网络不参与: 只测 CPU 路径，frames_per_sec / realtime_factor 是单核能支撑的上限。
+
+使用方法:
+    python bench/bench_pipeline.py
+    python bench/bench_pipeline.py --json result.json
+    python bench/bench_pipeline.py --baseline result.json   # 任一阶段 µs/帧 变慢超过容差时退出码为 1
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from pathlib import Path
+
+import numpy as np
+import socketio
+
+try:
+    import resource
+except ImportError:   # Windows
+    resource = None
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.config.settings import config
+from src.audio.opus import OPUS_AVAILABLE
+from src.audio.processor import ClientAudioChain
+from src.audio.vb_cable_bridge import VBCableBridge
+from src.audio.voice_detector import VoiceActivityDetector
+from src.server.broadcast import Broadcaster
+from src.server.fanout import SocketIOTransport
+from src.server.protocol import TRANSPORT_BINARY, TRANSPORT_JSON
+
+
+SAMPLE_RATE = 48000
+CHUNK = 512
+CLUBDECK_RATE = 44100
+CYCLE_SECONDS = 4        # 合成音频循环长度: 4 秒正好是 375 个混音帧，44.1kHz 下也是整数帧
+STAGES = ['capture', 'ingest', 'mix', 'vad', 'mic_chain', 'output', 'broadcast']
+
+
+class BenchTransport(SocketIOTransport):
+    """真实的 Socket.IO 报文编码，发送端总是空闲（只统计报文数）"""
+
+    def __init__(self):
+        self.server = socketio.Server(async_mode='threading')
+        self.namespace = '/'
+        self.direct = True   # 始终测量直接交付路径的报文编码
+        self.packets = 0
+
+    def resolve(self, sid):
+        return sid
+
+    def send(self, eio_sid, packets):
+        self.packets += len(packets)
+
+    def backlog(self, eio_sid):
+        return 0
+
+    def disconnect(self, sid):
+        pass
+
+
+class TimedResampler:
+    """包装重采样器，累计 process() 耗时（重采样器使用 __slots__，不能直接替换方法）"""
+
+    def __init__(self, resampler):
+        self.resampler = resampler
+        self.seconds = 0.0
+
+    def process(self, audio, max_frames=None):
+        start = time.perf_counter()
+        result = self.resampler.process(audio, max_frames)
+        self.seconds += time.perf_counter() - start
+        return result
+
+    def __getattr__(self, name):
+        return getattr(self.resampler, name)
+
+
+def synth_blocks() -> dict:
+    """
+    一个循环的合成输入，按各自采样率切成与混音帧对齐的块
+
+    MPV 为双音和弦，Clubdeck 为每秒开关一次的调幅噪声（让 VAD 和闪避来回切换），
+    麦克风为带噪的 300 Hz 音（高于噪声门限）
+    """
+    rng = np.random.default_rng(1)
+    ticks = CYCLE_SECONDS * SAMPLE_RATE // CHUNK
+
+    t = np.arange(CYCLE_SECONDS * SAMPLE_RATE) / SAMPLE_RATE
+    music = 6000 * np.sin(2 * np.pi * 220 * t) + 4000 * np.sin(2 * np.pi * 277 * t)
+    mpv = np.column_stack([music, music * 0.8]).astype(np.int16)
+
+    t_cd = np.arange(CYCLE_SECONDS * CLUBDECK_RATE) / CLUBDECK_RATE
+    envelope = (np.floor(t_cd * 2) % 2) * (0.5 + 0.5 * np.sin(2 * np.pi * 4 * t_cd))
+    clubdeck = (rng.normal(0, 3000, len(t_cd)) * envelope).astype(np.int16)[:, None]
+
+    mic = (3000 * np.sin(2 * np.pi * 300 * t) + rng.normal(0, 200, len(t))).astype(np.int16)
+    mic = np.repeat(mic[:, None], 2, axis=1)
+
+    # 44.1kHz 的块长在 470/471 之间交替，累计起来与 48kHz 严格同速
+    bounds = [i * CHUNK * CLUBDECK_RATE // SAMPLE_RATE for i in range(ticks + 1)]
+    return {
+        'mpv': [mpv[i * CHUNK:(i + 1) * CHUNK] for i in range(ticks)],
+        'clubdeck': [clubdeck[bounds[i]:bounds[i + 1]] for i in range(ticks)],
+        'mic': [mic[i * CHUNK:(i + 1) * CHUNK].reshape(-1) for i in range(ticks)],
+    }
+
+
+class Pipeline:
+    """一座未打开设备流的桥接器 + 转发侧，按混音帧逐阶段驱动"""
+
+    def __init__(self, listeners: int, legacy_listeners: int):
+        enabled = config.audio.mpv_ducking_enabled
+        config.audio.mpv_ducking_enabled = False   # 不连接 MPV 管道；VAD 单独作为一个阶段
+        try:
+            self.bridge = VBCableBridge(
+                0, browser_sample_rate=SAMPLE_RATE, chunk_size=CHUNK, browser_output_device_id=2,
+                clubdeck_input_device_id=1, clubdeck_sample_rate=CLUBDECK_RATE, clubdeck_channels=1
+            )
+        finally:
+            config.audio.mpv_ducking_enabled = enabled
+        self.resampler = self.bridge.source_resamplers['clubdeck'] = \
+            TimedResampler(self.bridge.source_resamplers['clubdeck'])
+        self.vad = VoiceActivityDetector(SAMPLE_RATE)
+        self.mic_chain = ClientAudioChain('bench', SAMPLE_RATE, 2)
+
+        self.broadcaster = Broadcaster(
+            None, SAMPLE_RATE, 2, transport=BenchTransport(),
+            opus_bitrate=config.audio.bitrate if OPUS_AVAILABLE else None,
+            opus_frame_ms=config.audio.opus_frame_ms,
+            coalesce_frames=config.server.coalesce_max_frames,
+            coalesce_ms=config.server.coalesce_max_ms
+        )
+        binary_format = 'opus' if OPUS_AVAILABLE else 'pcm16'
+        for i in range(listeners):
+            self.broadcaster.subscribe(f'bin{i}', TRANSPORT_BINARY, binary_format)
+        for i in range(legacy_listeners):
+            self.broadcaster.subscribe(f'json{i}', TRANSPORT_JSON, 'pcm16')
+
+        self.callbacks = {name: self.bridge._make_input_callback(name) for name in ('mpv', 'clubdeck')}
+        self.outdata = np.empty((CHUNK, self.bridge.browser_output_channels), dtype=np.int16)
+        self.mix_blocks = None
+        self.frames_mixed = 0
+        self.frames_published = 0
+
+    def stages(self, blocks: dict, i: int) -> list:
+        """第 i 个混音帧的各阶段（按 STAGES 顺序的无参调用）"""
+        bridge = self.bridge
+
+        def capture():
+            for name, callback in self.callbacks.items():
+                block = blocks[name][i]
+                callback(block, len(block), None, None)
+
+        def mix():
+            while True:
+                mixed = bridge.mixer_scheduler.tick(timeout=0)
+                if mixed is None:
+                    break
+                bridge._mix_tick(mixed)
+                self.mix_blocks = mixed
+                self.frames_mixed += 1
+
+        def vad():
+            if self.mix_blocks is not None:
+                self.vad.detect(self.mix_blocks['clubdeck'].flatten())
+
+        def mic_chain():
+            bridge.send_to_clubdeck(self.mic_chain.process(blocks['mic'][i]), client_id='bench')
+
+        def output():
+            while bridge._output_ring.fill < CHUNK:
+                bridge._render_output(CHUNK)
+            bridge._output_callback(self.outdata, CHUNK, None, None)
+
+        def broadcast():
+            frames = bridge.drain_mixed()
+            if frames:
+                self.broadcaster.publish_batch([frame.audio for frame in frames],
+                                               [frame.captured for frame in frames])
+                self.frames_published += len(frames)
+
+        return [capture, bridge._ingest_captured, mix, vad, mic_chain, output, broadcast]
+
+
+def run_timing(frames: int, blocks: dict, listeners: int, legacy_listeners: int) -> dict:
+    """计时: 返回各阶段累计秒数、子阶段累计秒数和总耗时"""
+    ticks = len(blocks['mpv'])
+    pipeline = Pipeline(listeners, legacy_listeners)
+    totals = dict.fromkeys(STAGES, 0.0)
+    warmup = min(100, frames)
+    perf_counter = time.perf_counter
+    for i in range(warmup + frames):
+        if i == warmup:
+            totals = dict.fromkeys(STAGES, 0.0)
+            pipeline.resampler.seconds = 0.0
+            pipeline.broadcaster.encode_time.clear()
+            pipeline.frames_mixed = pipeline.frames_published = 0
+            wall = perf_counter()
+        for name, stage in zip(STAGES, pipeline.stages(blocks, i % ticks)):
+            start = perf_counter()
+            stage()
+            totals[name] += perf_counter() - start
+    wall = perf_counter() - wall
+
+    substages = {'ingest': {'resample': pipeline.resampler.seconds},
+                 'broadcast': {f'encode_{name}': seconds
+                               for name, seconds in pipeline.broadcaster.encode_time.items()}}
+    return {'totals': totals, 'substages': substages, 'wall': wall,
+            'frames_mixed': pipeline.frames_mixed, 'frames_published': pipeline.frames_published,
+            'packets': pipeline.broadcaster.transport.packets}
+
+
+def run_allocations(frames: int, blocks: dict, listeners: int, legacy_listeners: int) -> dict:
+    """
+    tracemalloc: 各阶段单帧调用期间的最大峰值新增内存、每帧分配次数，以及整条管线运行后仍未释放的内存
+
+    分配次数 = 阶段前后快照按分配位置 (lineno) 比较，count_diff 为正的块数之和，
+    即阶段内分配且阶段结束时仍存活的内存块（阶段内分配又释放的临时块只体现在峰值里）。
+    未释放内存按整段运行前后的快照统计一次，不再按阶段相减（上一阶段分配、下一阶段释放会出现负值）。
+    预热后才开始统计（首次调用时的惰性初始化、缓冲扩容不计入）
+    """
+    ticks = len(blocks['mpv'])
+    pipeline = Pipeline(listeners, legacy_listeners)
+    warmup = min(100, frames)
+    for i in range(warmup):
+        for stage in pipeline.stages(blocks, i % ticks):
+            stage()
+
+    # 快照本身的对象在 tracemalloc 模块内分配，不计入
+    exclude = (tracemalloc.Filter(False, tracemalloc.__file__),)
+
+    def snapshot():
+        return tracemalloc.take_snapshot().filter_traces(exclude)
+
+    peak = dict.fromkeys(STAGES, 0)
+    allocations = dict.fromkeys(STAGES, 0)
+    tracemalloc.start()
+    try:
+        start = snapshot()
+        for i in range(warmup, warmup + frames):
+            for name, stage in zip(STAGES, pipeline.stages(blocks, i % ticks)):
+                before = snapshot()
+                tracemalloc.reset_peak()
+                base = tracemalloc.get_traced_memory()[0]
+                stage()
+                highest = tracemalloc.get_traced_memory()[1]
+                peak[name] = max(peak[name], highest - base)
+                diff = snapshot().compare_to(before, 'lineno')
+                allocations[name] += sum(stat.count_diff for stat in diff if stat.count_diff > 0)
+        retained = snapshot().compare_to(start, 'lineno')
+    finally:
+        tracemalloc.stop()
+    return {
+        'peak': peak,
+        'allocations': allocations,
+        'retained_bytes': sum(stat.size_diff for stat in retained),
+        'retained_blocks': sum(stat.count_diff for stat in retained),
+    }
+
+
+def peak_rss_mb():
+    """进程峰值常驻内存（MB），平台不支持时返回 None"""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 为 KiB，macOS 为字节
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+def run(frames: int, alloc_frames: int, listeners: int, legacy_listeners: int) -> dict:
+    blocks = synth_blocks()
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        timing = run_timing(frames, blocks, listeners, legacy_listeners)
+        allocations = run_allocations(alloc_frames, blocks, listeners, legacy_listeners)
+
+    wall = timing['wall']
+    stages = {}
+    for name in STAGES:
+        seconds = timing['totals'][name]
+        stage = {
+            'us_per_frame': seconds / frames * 1e6,
+            'frames_per_sec': frames / seconds if seconds else None,
+            'share': seconds / wall,
+            'alloc_peak_bytes': allocations['peak'][name],
+            'allocs_per_frame': allocations['allocations'][name] / alloc_frames if alloc_frames else None,
+        }
+        sub = timing['substages'].get(name)
+        if sub:
+            stage['substages'] = {key: {'us_per_frame': value / frames * 1e6} for key, value in sub.items()}
+        stages[name] = stage
+
+    return {
+        'frames': frames,
+        'frame_samples': CHUNK,
+        'sample_rate': SAMPLE_RATE,
+        'listeners': {'binary': listeners, 'json': legacy_listeners,
+                      'binary_format': 'opus' if OPUS_AVAILABLE else 'pcm16'},
+        'frames_per_sec': frames / wall,
+        'us_per_frame': wall / frames * 1e6,
+        'realtime_factor': frames * CHUNK / SAMPLE_RATE / wall,
+        'frames_mixed': timing['frames_mixed'],
+        'frames_published': timing['frames_published'],
+        'packets_sent': timing['packets'],
+        'alloc_frames': alloc_frames,
+        'alloc_retained_bytes': allocations['retained_bytes'],
+        'alloc_retained_blocks': allocations['retained_blocks'],
+        'peak_rss_mb': peak_rss_mb(),
+        'stages': stages,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+    }
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> list:
+    """与基线比较各阶段及整体 µs/帧，返回 [(名称, 基线, 当前)]（变慢超过容差的）"""
+    pairs = [('total', baseline.get('us_per_frame'), result['us_per_frame'])]
+    for name, stage in result['stages'].items():
+        old = baseline.get('stages', {}).get(name, {}).get('us_per_frame')
+        pairs.append((name, old, stage['us_per_frame']))
+    return [(name, old, new) for name, old, new in pairs if old and new > old * (1 + tolerance)]
+
+
+def print_report(result: dict):
+    frames = result['frames']
+    print(f"{frames} 个混音帧（{frames * CHUNK / SAMPLE_RATE:.1f} 秒音频），"
+          f"听众 {result['listeners']['binary']} 个二进制 {result['listeners']['binary_format']}"
+          f" + {result['listeners']['json']} 个 JSON")
+    print("-" * 80)
+    print(f"{'阶段':<20}{'µs/帧':>10}{'帧/秒':>12}{'占比':>8}{'单帧峰值B':>14}{'分配次数/帧':>14}")
+    for name, stage in result['stages'].items():
+        fps = f"{stage['frames_per_sec']:.0f}" if stage['frames_per_sec'] else '-'
+        print(f"{name:<20}{stage['us_per_frame']:>10.1f}{fps:>12}{stage['share'] * 100:>7.1f}%"
+              f"{stage['alloc_peak_bytes']:>14}{stage['allocs_per_frame']:>14.1f}")
+        for sub, values in stage.get('substages', {}).items():
+            print(f"{'  └ ' + sub:<20}{values['us_per_frame']:>10.1f}")
+    print("-" * 80)
+    rss = f"{result['peak_rss_mb']:.1f} MB" if result['peak_rss_mb'] is not None else '不支持'
+    print(f"整条管线 {result['us_per_frame']:.1f} µs/帧, {result['frames_per_sec']:.0f} 帧/秒, "
+          f"{result['realtime_factor']:.1f}× 实时, 峰值 RSS {rss}")
+    print(f"tracemalloc {result['alloc_frames']} 帧后整条管线未释放 {result['alloc_retained_bytes']} B"
+          f"（{result['alloc_retained_blocks']} 块）")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='整条音频管线基准')
+    parser.add_argument('--frames', type=int, default=3000, help='计时的混音帧数（默认 3000 ≈ 32 秒音频）')
+    parser.add_argument('--alloc-frames', type=int, default=300, help='tracemalloc 统计的混音帧数')
+    parser.add_argument('--listeners', type=int, default=20, help='二进制协议订阅者数')
+    parser.add_argument('--legacy-listeners', type=int, default=2, help='base64 JSON 订阅者数')
+    parser.add_argument('--json', metavar='PATH', help='结果写入 JSON 文件')
+    parser.add_argument('--baseline', metavar='PATH', help='与之前的 JSON 结果比较')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='允许的 µs/帧 变慢比例（默认 0.25）')
+    args = parser.parse_args()
+
+    result = run(args.frames, args.alloc_frames, args.listeners, args.legacy_listeners)
+    print_report(result)
+    if args.json:
+        Path(args.json).write_text(json.dumps(result, indent=2, ensure_ascii=False), encoding='utf-8')
+        print(f"结果已写入 {args.json}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding='utf-8'))
+        regressions = compare(result, baseline, args.tolerance)
+        for name, old, new in regressions:
+            print(f"回归: {name} {old:.1f} → {new:.1f} µs/帧 (+{(new / old - 1) * 100:.0f}%)", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f"与基线相比各阶段均未变慢超过 {args.tolerance * 100:.0f}%", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+重采样基准测试 - 逐块线性插值 vs 流式多相重采样器
+
+质量: 按设备块大小分块处理正弦信号，与理想信号比较 SNR（含块边界误差）和 8 kHz 以上镜像/混叠能量
+吞吐: 每块耗时（512 帧立体声 int16，与 VBCableBridge 默认 chunk_size 一致）
+
+使用方法:
+    python bench/bench_resampler.py
+"""
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.audio.resampler import PolyphaseResampler
+
+
+CHANNELS = 2
+CHUNK_FRAMES = 512
+TONE_HZ = 997.0
+RATE_PAIRS = [(44100, 48000), (48000, 44100), (16000, 48000), (48000, 16000)]
+
+
+def legacy_resample_stereo(audio: np.ndarray, from_rate: int, to_rate: int, channels: int) -> np.ndarray:
+    """旧版 VBCableBridge._resample_stereo（每块独立 linspace + interp，逐声道循环）"""
+    frames = len(audio) // channels
+    reshaped = audio.reshape(frames, channels)
+    new_length = int(frames * to_rate / from_rate)
+    result = np.zeros((new_length, channels), dtype=np.int16)
+    for ch in range(channels):
+        old_indices = np.arange(frames)
+        new_indices = np.linspace(0, frames - 1, new_length)
+        result[:, ch] = np.interp(new_indices, old_indices, reshaped[:, ch].astype(np.float32)).astype(np.int16)
+    return result
+
+
+def tone(frames: int, rate: int) -> np.ndarray:
+    t = np.arange(frames) / rate
+    mono = np.sin(2 * np.pi * TONE_HZ * t) * 16000
+    return np.column_stack([mono, -mono])
+
+
+def quality(output: np.ndarray, to_rate: int, from_rate: int) -> tuple:
+    """(SNR dB, 与理想正弦之差中 >1.5 kHz 的误差能量占比 dB)"""
+    y = output[:, 0].astype(np.float64)
+    # 旧版每块独立缩放，输出时间轴与理想信号不严格对齐: 用最小二乘拟合幅度/相位后再比较
+    n = np.arange(len(y))
+    basis = np.column_stack([np.sin(2 * np.pi * TONE_HZ * n / to_rate), np.cos(2 * np.pi * TONE_HZ * n / to_rate)])
+    trim = slice(256, len(y) - 256)
+    coef, *_ = np.linalg.lstsq(basis[trim], y[trim], rcond=None)
+    ideal = basis @ coef
+    err = y[trim] - ideal[trim]
+    snr = 10 * np.log10(np.mean(ideal[trim] ** 2) / np.mean(err ** 2))
+    spectrum = np.abs(np.fft.rfft(err * np.hanning(len(err)))) ** 2
+    freqs = np.fft.rfftfreq(len(err), 1 / to_rate)
+    spur = 10 * np.log10(spectrum[freqs > 1500].sum() / (np.mean(ideal[trim] ** 2) * len(err) ** 2 / 4) + 1e-20)
+    return snr, spur
+
+
+def run_chunked(process, signal: np.ndarray) -> np.ndarray:
+    return np.concatenate([process(signal[i:i + CHUNK_FRAMES]) for i in range(0, len(signal), CHUNK_FRAMES)])
+
+
+def bench(func, chunk: np.ndarray, iterations: int) -> float:
+    """返回每块平均耗时 (微秒)"""
+    func(chunk)  # 预热
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func(chunk)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    print(f"块大小: {CHUNK_FRAMES} 帧 x {CHANNELS} 声道, 测试音 {TONE_HZ:.0f} Hz")
+    print("-" * 78)
+    print(f"{'采样率':<16}{'实现':<10}{'SNR':>10}{'杂散':>12}{'µs/块':>12}{'加速':>8}")
+
+    for from_rate, to_rate in RATE_PAIRS:
+        signal = tone(from_rate * 2, from_rate).astype(np.int16)
+        chunk = signal[:CHUNK_FRAMES].reshape(-1)
+
+        legacy_out = run_chunked(lambda c: legacy_resample_stereo(c.reshape(-1), from_rate, to_rate, CHANNELS), signal)
+        poly_out = run_chunked(PolyphaseResampler(from_rate, to_rate, CHANNELS).process, signal)
+
+        legacy_us = bench(lambda c: legacy_resample_stereo(c, from_rate, to_rate, CHANNELS), chunk, 2000)
+        resampler = PolyphaseResampler(from_rate, to_rate, CHANNELS)
+        poly_us = bench(resampler.process, chunk, 2000)
+
+        label = f"{from_rate / 1000:g}k→{to_rate / 1000:g}k"
+        for name, out, us in [('旧版线性', legacy_out, legacy_us), ('多相', poly_out, poly_us)]:
+            snr, spur = quality(out, to_rate, from_rate)
+            speedup = f"{legacy_us / us:5.2f}x" if name == '多相' else ''
+            print(f"{label:<16}{name:<10}{snr:8.1f}dB{spur:10.1f}dB{us:12.1f}{speedup:>8}")
+            label = ''
+
+    print("-" * 78)
+    print("SNR: 去除拟合正弦后的残差；杂散: 残差中 >1.5 kHz 的能量（块边界跳变、混叠）")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+环形缓冲微基准 - RingBuffer vs np.concatenate 缓冲 vs queue.Queue
+
+每轮写入一个块、读出一个块（立体声 int16），测量每轮平均耗时。
+缓冲中始终保留 BACKLOG_FRAMES 帧积压（模拟网络抖动下浏览器缓冲的常态）。
+
+使用方法:
+    python bench/bench_ringbuffer.py
+"""
+import queue
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.audio.ringbuffer import RingBuffer, DROP_NEWEST, DROP_OLDEST
+
+
+CHANNELS = 2
+CAPACITY_FRAMES = 24000
+BACKLOG_FRAMES = 9600   # 0.2 秒 @ 48kHz
+ITERATIONS = 20000
+
+
+def bench_concatenate(chunk: np.ndarray) -> float:
+    """旧版浏览器缓冲: 追加用 np.concatenate，读取用切片重新赋值"""
+    buffer = np.zeros(BACKLOG_FRAMES * CHANNELS, dtype=np.int16)
+    flat = chunk.reshape(-1)
+    n = len(flat)
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        buffer = np.concatenate([buffer, flat])
+        out = buffer[:n]
+        buffer = buffer[n:]
+    return (time.perf_counter() - start) / ITERATIONS * 1e6
+
+
+def bench_queue(chunk: np.ndarray) -> float:
+    """queue.Queue 传递块副本"""
+    q = queue.Queue(maxsize=200)
+    for _ in range(BACKLOG_FRAMES // len(chunk)):
+        q.put_nowait(chunk.copy())
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        q.put_nowait(chunk.copy())
+        out = q.get_nowait()
+    return (time.perf_counter() - start) / ITERATIONS * 1e6
+
+
+def bench_ring_read(chunk: np.ndarray, policy: str) -> float:
+    """RingBuffer write + read(out=预分配)"""
+    ring = RingBuffer(CAPACITY_FRAMES, CHANNELS, np.int16, policy=policy)
+    ring.write(np.zeros((BACKLOG_FRAMES, CHANNELS), dtype=np.int16))
+    out = np.empty_like(chunk)
+    frames = len(chunk)
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        ring.write(chunk)
+        ring.read(frames, out=out)
+    return (time.perf_counter() - start) / ITERATIONS * 1e6
+
+
+def bench_ring_peek(chunk: np.ndarray) -> float:
+    """RingBuffer write + peek/advance（零拷贝读取）"""
+    ring = RingBuffer(CAPACITY_FRAMES, CHANNELS, np.int16)
+    ring.write(np.zeros((BACKLOG_FRAMES, CHANNELS), dtype=np.int16))
+    frames = len(chunk)
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        ring.write(chunk)
+        head, tail = ring.peek(frames)
+        ring.advance(len(head) + len(tail))
+    return (time.perf_counter() - start) / ITERATIONS * 1e6
+
+
+def main():
+    print(f"积压: {BACKLOG_FRAMES} 帧, 每项 {ITERATIONS} 轮写入+读取")
+    header = f"{'块大小':>8} | {'concatenate':>12} | {'queue.Queue':>12} | {'ring/newest':>12} | {'ring/oldest':>12} | {'ring/peek':>12}"
+    for frames in (256, 512, 2048):
+        chunk = (np.random.default_rng(0).standard_normal((frames, CHANNELS)) * 3000).astype(np.int16)
+        cases = [
+            bench_concatenate,
+            bench_queue,
+            lambda c: bench_ring_read(c, DROP_NEWEST),
+            lambda c: bench_ring_read(c, DROP_OLDEST),
+            bench_ring_peek,
+        ]
+        if frames == 256:
+            print(header)
+            print("-" * len(header))
+        times = [case(chunk) for case in cases]
+        print(f"{frames:>8} | " + " | ".join(f"{us:9.2f} µs" for us in times))
+
+
+if __name__ == '__main__':
+    main()
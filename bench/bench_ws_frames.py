@@ -0,0 +1,148 @@
+"""
+WebSocket 音频帧基准测试 - base64 JSON vs 二进制帧 vs Opus
+
+带宽: 按 Socket.IO 实际编码后的报文大小（含事件名/JSON 字段/附件占位）计算每客户端字节率
+CPU: 服务器每包编码（下行广播）/ 解码（上行麦克风）耗时，以及每客户端占用的 CPU 比例
+Opus: 各码率/帧长下的实际字节率与编解码 CPU（需要 opuslib + libopus）；
+      下行编码在广播管线中每帧只做一次，与听众数量无关
+
+下行: 混音线程每块 512 帧立体声 48kHz（93.75 包/秒）
+上行: 浏览器 ScriptProcessor 每块 2048 帧立体声 48kHz（23.4 包/秒）
+
+使用方法:
+    python bench/bench_ws_frames.py
+"""
+import base64
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from socketio import packet
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.server.protocol import (
+    pack_frame, unpack_frame, decode_pcm16, pack_opus_packets, unpack_opus_packets,
+    EVENT_FRAME, FORMAT_OPUS
+)
+from src.audio.opus import OpusEncoder, OpusDecoder, OPUS_AVAILABLE
+
+
+SAMPLE_RATE = 48000
+CHANNELS = 2
+DIRECTIONS = [('下行', 512), ('上行', 2048)]
+OPUS_SETTINGS = [(32000, 20.0), (64000, 20.0), (96000, 20.0), (64000, 10.0)]
+
+
+def legacy_encode(audio: np.ndarray):
+    """旧版: numpy_to_base64 + JSON 事件"""
+    return packet.Packet(packet.EVENT, data=['audio_from_clubdeck', {
+        'audio': base64.b64encode(audio.astype(np.int16).tobytes()).decode('utf-8'),
+        'sample_rate': SAMPLE_RATE,
+        'channels': CHANNELS,
+    }]).encode()
+
+
+def binary_encode(audio: np.ndarray, seq: int = 0):
+    """新版: 20 字节帧头 + PCM16 二进制附件"""
+    return packet.Packet(packet.EVENT, data=[EVENT_FRAME, pack_frame(audio, seq, SAMPLE_RATE, CHANNELS)]).encode()
+
+
+def legacy_decode(encoded: str) -> np.ndarray:
+    event = json.loads(encoded[encoded.index('['):])
+    return np.frombuffer(base64.b64decode(event[1]['audio']), dtype=np.int16)
+
+
+def binary_decode(encoded: list) -> np.ndarray:
+    _, payload = unpack_frame(encoded[1])
+    return decode_pcm16(payload)
+
+
+def wire_bytes(encoded) -> int:
+    """Socket.IO 报文在 WebSocket 上的字节数（二进制附件为单独的消息）"""
+    if isinstance(encoded, list):
+        return sum(len(part.encode('utf-8') if isinstance(part, str) else part) for part in encoded)
+    return len(encoded.encode('utf-8'))
+
+
+def bench(func, arg, iterations: int = 5000) -> float:
+    """返回每次平均耗时 (微秒)"""
+    func(arg)  # 预热
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func(arg)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print(f"{SAMPLE_RATE} Hz x {CHANNELS} 声道 PCM16")
+    print("-" * 84)
+    print(f"{'方向':<8}{'实现':<10}{'字节/包':>10}{'KB/s/客户端':>14}{'编码µs':>10}{'解码µs':>10}{'CPU%/客户端':>14}")
+
+    for direction, frames in DIRECTIONS:
+        audio = rng.integers(-20000, 20000, size=frames * CHANNELS).astype(np.int16)
+        packets_per_sec = SAMPLE_RATE / frames
+        # 下行: 服务器编码（旧版每客户端各编一次）；上行: 服务器解码
+        for name, encode, decode in [('base64', legacy_encode, legacy_decode),
+                                     ('二进制', binary_encode, binary_decode)]:
+            encoded = encode(audio)
+            assert np.array_equal(decode(encoded), audio)
+            size = wire_bytes(encoded)
+            encode_us = bench(encode, audio)
+            decode_us = bench(decode, encoded)
+            server_us = encode_us if direction == '下行' else decode_us
+            cpu = server_us * packets_per_sec / 1e6 * 100
+            print(f"{direction:<8}{name:<10}{size:>10}{size * packets_per_sec / 1024:>14.1f}"
+                  f"{encode_us:>10.1f}{decode_us:>10.1f}{cpu:>13.3f}%")
+            direction = ''
+
+    print("-" * 84)
+    print("CPU%/客户端: 下行按服务器编码、上行按服务器解码计（单核，包速率 × 每包耗时）")
+    bench_opus()
+
+
+def bench_opus(seconds: int = 10):
+    """Opus: 下行按 512 帧节拍送入编码器，统计实际字节率和编解码耗时"""
+    print()
+    if not OPUS_AVAILABLE:
+        print("Opus: 跳过（需要 pip install opuslib 和系统 libopus）")
+        return
+    t = np.arange(SAMPLE_RATE * seconds) / SAMPLE_RATE
+    # 音乐近似: 多个谐波 + 噪声
+    mono = sum(np.sin(2 * np.pi * f * t) / (i + 1) for i, f in enumerate([220, 440, 660, 1320, 2640]))
+    mono = mono * 6000 + np.random.default_rng(0).normal(0, 300, len(t))
+    signal = np.column_stack([mono, mono * 0.8]).astype(np.int16)
+    ticks = [signal[i:i + 512] for i in range(0, len(signal) - 511, 512)]
+
+    print(f"Opus {CHANNELS} 声道, {seconds}s 合成音乐信号")
+    print("-" * 84)
+    print(f"{'码率':<10}{'帧长':>8}{'KB/s/客户端':>14}{'编码µs/帧':>12}{'解码µs/包':>12}{'编码CPU%':>12}{'解码CPU%':>12}")
+    for bitrate, frame_ms in OPUS_SETTINGS:
+        encoder = OpusEncoder(SAMPLE_RATE, CHANNELS, bitrate, frame_ms)
+        start = time.perf_counter()
+        payloads = [pack_opus_packets(encoder.encode(tick)) for tick in ticks]
+        encode_s = time.perf_counter() - start
+        frames = [packet.Packet(packet.EVENT, data=[EVENT_FRAME, pack_frame(p, i, SAMPLE_RATE, CHANNELS, FORMAT_OPUS)]).encode()
+                  for i, p in enumerate(payloads) if p]
+        total = sum(wire_bytes(f) for f in frames)
+
+        decoder = OpusDecoder(SAMPLE_RATE, CHANNELS)
+        opus_packets = [p for payload in payloads for p in unpack_opus_packets(payload)]
+        start = time.perf_counter()
+        for p in opus_packets:
+            decoder.decode(p)
+        decode_s = time.perf_counter() - start
+
+        print(f"{bitrate // 1000:>4} kbps{frame_ms:>8g}ms{total / seconds / 1024:>14.1f}"
+              f"{encode_s / len(ticks) * 1e6:>12.1f}{decode_s / len(opus_packets) * 1e6:>12.1f}"
+              f"{encode_s / seconds * 100:>11.2f}%{decode_s / seconds * 100:>11.2f}%")
+    print("-" * 84)
+    print("KB/s 含帧头与 Socket.IO 报文开销；编码 CPU 为整个广播（一次编码），解码 CPU 为每个上行客户端")
+
+
+if __name__ == '__main__':
+    main()
@@ -4,5 +4,7 @@
 from .processor import AudioProcessor
 from .device_manager import DeviceManager
 from .vb_cable_bridge import VBCableBridge
+from .backend import VirtualBackend, VirtualDevice, get_backend, set_backend
 
-__all__ = ['AudioProcessor', 'DeviceManager', 'VBCableBridge']
\ No newline at end of file
+__all__ = ['AudioProcessor', 'DeviceManager', 'VBCableBridge',
+           'VirtualBackend', 'VirtualDevice', 'get_backend', 'set_backend']
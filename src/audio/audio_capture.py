@@ -3,7 +3,7 @@
 ClubVoice Audio Capture Module
 
 音频捕获模块，提供共享音频捕获功能，支持多客户端连接。
-使用 sounddevice 进行音频捕获，支持实时音频处理和分发。
+通过设备后端（sounddevice 或虚拟设备）进行音频捕获，支持实时音频处理和分发。
 """
 
 import logging
@@ -12,7 +12,9 @@ import time
 from typing import Dict, Set, Optional
 
 import numpy as np
-import sounddevice as sd
+
+from .ringbuffer import RingBuffer, DROP_OLDEST
+from .backend import get_backend
 
 logger = logging.getLogger(__name__)
 
@@ -20,7 +22,9 @@ logger = logging.getLogger(__name__)
 class SharedAudioCapture:
     """共享音频捕获类 - 多客户端共享同一个音频源"""
     
-    def __init__(self, device_id: int, sample_rate: int = 48000, channels: int = 2, chunk_size: int = 960, auto_start: bool = False):
+    def __init__(self, device_id: int, sample_rate: int = 48000, channels: int = 2, chunk_size: int = 960, auto_start: bool = False,
+                 backend=None):
+        self.backend = backend or get_backend()
         self.device_id = device_id
         self.sample_rate = sample_rate
         self.channels = channels
@@ -28,12 +32,14 @@ class SharedAudioCapture:
         self.auto_start = auto_start
         
         # 音频流管理
-        self.stream: Optional[sd.InputStream] = None
+        self.stream = None   # 设备后端的 InputStream
         self.is_running = False
         
         # 客户端连接管理
-        self.frame_queues: Dict[str, list] = {}  # conn_id -> frame_queue
+        # conn_id -> 环形缓冲（约 10 个块，满时覆盖最旧数据）
+        self.frame_queues: Dict[str, RingBuffer] = {}
         self.connections: Set[str] = set()
+        self.max_queued_chunks = 10
         
         # 线程安全锁
         self.lock = threading.Lock()
@@ -49,7 +55,9 @@ class SharedAudioCapture:
         """添加新连接"""
         with self.lock:
             if conn_id not in self.connections:
-                self.frame_queues[conn_id] = []
+                self.frame_queues[conn_id] = RingBuffer(
+                    self.chunk_size * self.max_queued_chunks, self.channels, np.int16, policy=DROP_OLDEST
+                )
                 self.connections.add(conn_id)
                 logger.info(f"添加连接 {conn_id}, 当前连接数: {len(self.connections)}")
                 
@@ -71,11 +79,11 @@ class SharedAudioCapture:
                     self._stop_capture()
     
     def get_frame(self, conn_id: str) -> Optional[np.ndarray]:
-        """获取指定连接的音频帧"""
-        with self.lock:
-            if conn_id in self.frame_queues and self.frame_queues[conn_id]:
-                return self.frame_queues[conn_id].pop(0)
+        """获取指定连接的音频帧（chunk_size 帧）"""
+        ring = self.frame_queues.get(conn_id)
+        if ring is None or ring.fill < self.chunk_size:
             return None
+        return ring.read(self.chunk_size)
     
     def _audio_callback(self, indata, frames, time_info, status):
         """音频回调函数 - 在主线程中运行"""
@@ -97,21 +105,16 @@ class SharedAudioCapture:
             for i in range(0, len(audio_data) - self.chunk_size + 1, self.chunk_size):
                 chunk = audio_data[i:i + self.chunk_size]
                 
-                # 分发到所有连接的队列
-                with self.lock:
-                    for conn_id in list(self.connections):
-                        if conn_id in self.frame_queues:
-                            # 限制队列长度防止内存泄露
-                            if len(self.frame_queues[conn_id]) > 10:
-                                self.frame_queues[conn_id].pop(0)
-                            self.frame_queues[conn_id].append(chunk.copy())
+                # 分发到所有连接的环形缓冲（满时自动覆盖最旧数据）
+                for ring in list(self.frame_queues.values()):
+                    ring.write(chunk)
     
     def _start_capture(self):
         """启动音频捕获 - 必须在主线程中调用"""
         if not self.is_running:
             try:
                 print(f"启动音频捕获，设备ID: {self.device_id}")
-                self.stream = sd.InputStream(
+                self.stream = self.backend.InputStream(
                     device=self.device_id,
                     channels=self.channels,
                     samplerate=self.sample_rate,
@@ -160,7 +163,7 @@ class SharedAudioCapture:
     def get_device_info(self) -> dict:
         """获取音频设备信息"""
         try:
-            device_info = sd.query_devices(self.device_id)
+            device_info = self.backend.query_devices(self.device_id)
             return {
                 'device_id': self.device_id,
                 'name': device_info['name'],
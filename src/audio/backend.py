@@ -0,0 +1,586 @@
+"""
+音频设备后端
+VBCableBridge / SharedAudioCapture / DeviceManager 通过后端打开设备，不直接 import sounddevice:
+- SoundDeviceBackend: PortAudio 声卡与 VB-Cable（首次使用时才导入 sounddevice）
+- VirtualBackend: 确定性的虚拟设备（正弦/文件输入源、捕获输出、时钟漂移与 xrun 注入、可配置时钟），
+  不需要声卡，整条管线可以在 Linux CI 和压测中以实时或快于实时的速度运行
+
+后端提供与 sounddevice 模块同名的 query_devices / query_hostapis / InputStream / OutputStream，
+调用处把 sd.xxx 换成 backend.xxx 即可。
+"""
+import threading
+import time
+import wave
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+
+
+BACKEND_SOUNDDEVICE = 'sounddevice'
+BACKEND_VIRTUAL = 'virtual'
+
+BACKENDS = (BACKEND_SOUNDDEVICE, BACKEND_VIRTUAL)
+
+# PortAudio 回调状态标志（sounddevice.CallbackFlags 的属性名）
+CALLBACK_FLAGS = ('input_underflow', 'input_overflow', 'output_underflow', 'output_overflow', 'priming_output')
+
+
+class SoundDeviceBackend:
+    """PortAudio 设备（sounddevice 延迟导入，只有真正访问设备时才需要 PortAudio）"""
+
+    name = BACKEND_SOUNDDEVICE
+
+    def __init__(self):
+        self._sd = None
+
+    @property
+    def sd(self):
+        if self._sd is None:
+            import sounddevice
+            self._sd = sounddevice
+        return self._sd
+
+    def query_devices(self, device=None, kind=None):
+        return self.sd.query_devices(device, kind)
+
+    def query_hostapis(self, index=None):
+        return self.sd.query_hostapis(index)
+
+    def InputStream(self, **kwargs):
+        return self.sd.InputStream(**kwargs)
+
+    def OutputStream(self, **kwargs):
+        return self.sd.OutputStream(**kwargs)
+
+
+# ----------------------------------------------------------------------
+# 虚拟设备: 信号源与捕获
+# ----------------------------------------------------------------------
+
+def _map_channels(audio: np.ndarray, channels: int) -> np.ndarray:
+    """(frames, n) → (frames, channels): 单声道复制到所有声道，多出的声道丢弃，不足的补零"""
+    if audio.shape[1] == channels:
+        return audio
+    if audio.shape[1] == 1:
+        return np.repeat(audio, channels, axis=1)
+    out = np.zeros((len(audio), channels), dtype=audio.dtype)
+    count = min(channels, audio.shape[1])
+    out[:, :count] = audio[:, :count]
+    return out
+
+
+class SineSource:
+    """正弦输入源（按设备帧位置计算，结果与块大小无关）"""
+
+    def __init__(self, frequency: float = 440.0, amplitude: float = 0.25):
+        """
+        Args:
+            frequency: 频率 (Hz)
+            amplitude: 幅度（满幅比例, 0-1）
+        """
+        self.frequency = frequency
+        self.amplitude = amplitude
+
+    def render(self, out: np.ndarray, position: int, sample_rate: float):
+        """填充 float32 (frames, channels) 的 out，position 为第一帧的设备帧位置"""
+        t = (position + np.arange(len(out))) / sample_rate
+        out[:] = (self.amplitude * np.sin(2 * np.pi * self.frequency * t))[:, None]
+
+
+class BufferSource:
+    """数组输入源（可循环），采样率与设备不同时首次使用前重采样一次"""
+
+    def __init__(self, audio: np.ndarray, sample_rate: int, loop: bool = True):
+        """
+        Args:
+            audio: int16 或 float32 (frames,) / (frames, channels)
+            sample_rate: 音频采样率
+            loop: 播放到末尾后是否从头循环（否则输出静音）
+        """
+        audio = np.asarray(audio)
+        if audio.ndim == 1:
+            audio = audio[:, None]
+        if audio.dtype == np.int16:
+            audio = audio.astype(np.float32) / 32768.0
+        self.audio = audio.astype(np.float32, copy=False)
+        self.sample_rate = int(sample_rate)
+        self.loop = loop
+        self._by_rate: Dict[int, np.ndarray] = {self.sample_rate: self.audio}
+
+    def _at_rate(self, sample_rate: float) -> np.ndarray:
+        rate = int(round(sample_rate))
+        audio = self._by_rate.get(rate)
+        if audio is None:
+            from .resampler import PolyphaseResampler
+            resampler = PolyphaseResampler(self.sample_rate, rate, self.audio.shape[1])
+            pcm = np.clip(np.rint(self.audio * 32767.0), -32768, 32767).astype(np.int16)
+            audio = resampler.process(pcm).astype(np.float32) / 32768.0
+            self._by_rate[rate] = audio
+        return audio
+
+    def render(self, out: np.ndarray, position: int, sample_rate: float):
+        """填充 float32 (frames, channels) 的 out，position 为第一帧的设备帧位置"""
+        audio = self._at_rate(sample_rate)
+        total = len(audio)
+        frames = len(out)
+        if total == 0:
+            out[:] = 0
+            return
+        if self.loop:
+            index = (position + np.arange(frames)) % total
+            out[:] = _map_channels(audio[index], out.shape[1])
+        else:
+            out[:] = 0
+            count = max(0, min(frames, total - position))
+            if count:
+                out[:count] = _map_channels(audio[position:position + count], out.shape[1])
+
+
+class FileSource(BufferSource):
+    """WAV 文件输入源（16 位 PCM）"""
+
+    def __init__(self, path: Union[str, Path], loop: bool = True):
+        with wave.open(str(path), 'rb') as wav:
+            if wav.getsampwidth() != 2:
+                raise ValueError(f"只支持 16 位 PCM WAV: {path}")
+            channels = wav.getnchannels()
+            sample_rate = wav.getframerate()
+            pcm = np.frombuffer(wav.readframes(wav.getnframes()), dtype='<i2')
+        super().__init__(pcm.reshape(-1, channels), sample_rate, loop)
+        self.path = str(path)
+
+
+class CaptureSink:
+    """输出捕获: 记录写到虚拟输出设备的音频"""
+
+    def __init__(self, max_frames: Optional[int] = None):
+        """
+        Args:
+            max_frames: 最多保留的帧数（超出时丢弃最旧的块，None = 不限）
+        """
+        self.max_frames = max_frames
+        self.blocks: List[np.ndarray] = []
+        self.frames = 0      # 保留的帧数
+        self.total_frames = 0
+        self._lock = threading.Lock()
+
+    def write(self, block: np.ndarray):
+        with self._lock:
+            self.blocks.append(block.copy())
+            self.frames += len(block)
+            self.total_frames += len(block)
+            while self.max_frames is not None and self.frames - len(self.blocks[0]) >= self.max_frames:
+                self.frames -= len(self.blocks.pop(0))
+
+    def audio(self) -> Optional[np.ndarray]:
+        """捕获到的全部音频 (frames, channels)，没有数据时返回 None"""
+        with self._lock:
+            if not self.blocks:
+                return None
+            return np.concatenate(self.blocks)
+
+    def clear(self):
+        with self._lock:
+            self.blocks = []
+            self.frames = 0
+
+
+@dataclass
+class VirtualDevice:
+    """虚拟设备（输入/输出通道数决定可以打开哪种流）"""
+    name: str
+    max_input_channels: int = 0
+    max_output_channels: int = 0
+    default_samplerate: float = 48000.0
+    source: Optional[object] = None        # 输入信号源（render(out, position, sample_rate)；None = 静音）
+    sink: Optional[CaptureSink] = None     # 输出捕获（None = 丢弃）
+    drift_ppm: float = 0.0                 # 设备时钟相对虚拟时钟的偏差（+ = 偏快）
+    xrun_every: int = 0                    # 每 N 个块注入一次 xrun（0 = 不注入）
+    latency: float = 0.01                  # 报告的设备延迟（秒）
+
+    def info(self, index: int) -> dict:
+        """与 sounddevice.query_devices() 相同字段的设备信息"""
+        return {
+            'name': self.name,
+            'index': index,
+            'hostapi': 0,
+            'max_input_channels': self.max_input_channels,
+            'max_output_channels': self.max_output_channels,
+            'default_low_input_latency': self.latency,
+            'default_low_output_latency': self.latency,
+            'default_high_input_latency': self.latency,
+            'default_high_output_latency': self.latency,
+            'default_samplerate': float(self.default_samplerate),
+        }
+
+
+# ----------------------------------------------------------------------
+# 虚拟时钟与流
+# ----------------------------------------------------------------------
+
+class VirtualClock:
+    """
+    虚拟时钟
+
+    - speed > 0: 流启动后由驱动线程自动推进，虚拟时间 = 真实时间 × speed（1.0 = 实时，4.0 = 四倍速）
+    - speed = 0: 只由 VirtualBackend.advance() 推进，回调在调用者线程中按时间顺序执行（确定性，测试用）
+    """
+
+    def __init__(self, speed: float = 0.0, start: float = 0.0):
+        if speed < 0:
+            raise ValueError("时钟倍速不能为负")
+        self.speed = speed
+        self.time = start
+
+
+class VirtualCallbackFlags:
+    """与 sounddevice.CallbackFlags 相同属性的状态标志"""
+
+    __slots__ = CALLBACK_FLAGS
+
+    def __init__(self, **flags):
+        for flag in CALLBACK_FLAGS:
+            setattr(self, flag, bool(flags.get(flag, False)))
+
+    def __bool__(self):
+        return any(getattr(self, flag) for flag in CALLBACK_FLAGS)
+
+    def __str__(self):
+        return ', '.join(flag.replace('_', ' ') for flag in CALLBACK_FLAGS if getattr(self, flag))
+
+
+class VirtualTimeInfo:
+    """回调的 time_info（虚拟时钟秒）"""
+
+    __slots__ = ('currentTime', 'inputBufferAdcTime', 'outputBufferDacTime')
+
+    def __init__(self, current: float, adc: float, dac: float):
+        self.currentTime = current
+        self.inputBufferAdcTime = adc
+        self.outputBufferDacTime = dac
+
+
+class VirtualStream:
+    """
+    虚拟设备流（InputStream / OutputStream）
+
+    每个块: 输入流由信号源渲染后转换为流的 dtype 交给回调；输出流把回调写入的数据交给捕获。
+    注入 xrun 的块: 输入流的数据丢失（信号源照常前进），输出流播放静音；下一次回调带上溢出/欠载标志。
+    """
+
+    def __init__(self, backend: 'VirtualBackend', kind: str, device=None, samplerate=None, channels=None,
+                 dtype='float32', blocksize=0, callback=None, **kwargs):
+        self.backend = backend
+        self.kind = kind
+        self.index, self.device_info = backend.resolve(device, kind)
+        max_channels = (self.device_info.max_input_channels if kind == 'input'
+                        else self.device_info.max_output_channels)
+        self.channels = int(channels or max_channels)
+        if not 0 < self.channels <= max_channels:
+            raise ValueError(f"设备 {self.index} ({self.device_info.name}) 不支持 {self.channels} 声道{kind}")
+        self.samplerate = float(samplerate or self.device_info.default_samplerate)
+        self.blocksize = int(blocksize or 512)
+        self.dtype = np.dtype(dtype)
+        self.callback = callback
+        self.latency = self.device_info.latency
+
+        # 设备时钟偏快时块间隔略短
+        self.period = self.blocksize / (self.samplerate * (1.0 + self.device_info.drift_ppm * 1e-6))
+        self.next_due = 0.0
+        self.position = 0      # 设备帧位置
+        self.blocks = 0
+        self.xruns = 0
+        self.error: Optional[BaseException] = None
+        self.active = False
+        self.closed = False
+
+        self._buffer = np.zeros((self.blocksize, self.channels), dtype=self.dtype)
+        self._signal = np.zeros((self.blocksize, self.channels), dtype=np.float32)
+        self._pending = None
+
+    @property
+    def stopped(self) -> bool:
+        return not self.active
+
+    def start(self):
+        if self.closed:
+            raise RuntimeError("流已关闭")
+        if not self.active:
+            self.active = True
+            self.backend._start_stream(self)
+
+    def stop(self):
+        if self.active:
+            self.active = False
+            self.backend._stop_stream(self)
+
+    abort = stop
+
+    def close(self):
+        self.stop()
+        self.closed = True
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _to_dtype(self, signal: np.ndarray, out: np.ndarray):
+        if self.dtype == np.int16:
+            np.copyto(out, np.clip(np.rint(signal * 32767.0), -32768, 32767), casting='unsafe')
+        else:
+            np.copyto(out, signal, casting='unsafe')
+
+    def _run_block(self, now: float):
+        """执行一个块（由 VirtualBackend 按时间顺序调用）"""
+        device = self.device_info
+        self.blocks += 1
+        xrun = device.xrun_every and self.blocks % device.xrun_every == 0
+        frames = self.blocksize
+
+        if self.kind == 'input':
+            if device.source is not None:
+                device.source.render(self._signal, self.position, self.samplerate)
+                self._to_dtype(self._signal, self._buffer)
+            self.position += frames
+            if xrun:
+                self.xruns += 1
+                self._pending = VirtualCallbackFlags(input_overflow=True)
+                return
+            time_info = VirtualTimeInfo(now, now - frames / self.samplerate - self.latency, 0.0)
+        else:
+            self.position += frames
+            if xrun:
+                self.xruns += 1
+                self._pending = VirtualCallbackFlags(output_underflow=True)
+                if device.sink is not None:
+                    device.sink.write(np.zeros_like(self._buffer))
+                return
+            time_info = VirtualTimeInfo(now, 0.0, now + self.latency)
+
+        status = self._pending or VirtualCallbackFlags()
+        self._pending = None
+        try:
+            if self.callback is not None:
+                self.callback(self._buffer, frames, time_info, status)
+        except Exception as e:
+            # 与 PortAudio 一致: 回调抛出异常后流停止
+            self.error = e
+            self.stop()
+            return
+        if self.kind == 'output' and device.sink is not None:
+            device.sink.write(self._buffer)
+
+
+class VirtualBackend:
+    """
+    虚拟设备后端
+
+    设备按 ID 注册（ID 可以不连续，与 config.ini 中的 VB-Cable 设备 ID 对应），
+    所有流的块按虚拟时间先后执行，同一时刻按流的启动顺序执行。
+    """
+
+    name = BACKEND_VIRTUAL
+
+    def __init__(self, devices: Optional[Dict[int, VirtualDevice]] = None, clock: Optional[VirtualClock] = None):
+        self.devices: Dict[int, VirtualDevice] = dict(devices or {})
+        self.clock = clock or VirtualClock()
+        self._streams: List[VirtualStream] = []
+        self._lock = threading.RLock()
+        self._driver: Optional[threading.Thread] = None
+
+    # ------------------------------------------------------------------
+    # 设备
+    # ------------------------------------------------------------------
+
+    def add_device(self, device: VirtualDevice, device_id: Optional[int] = None) -> int:
+        """注册设备，返回设备 ID（默认取下一个空闲 ID）"""
+        if device_id is None:
+            device_id = max(self.devices, default=-1) + 1
+        self.devices[device_id] = device
+        return device_id
+
+    def resolve(self, device=None, kind: Optional[str] = None):
+        """设备 ID / 名称（子串）/ None（默认设备）→ (ID, VirtualDevice)"""
+        if device is None:
+            for index in sorted(self.devices):
+                candidate = self.devices[index]
+                if kind is None or (candidate.max_input_channels if kind == 'input' else candidate.max_output_channels):
+                    return index, candidate
+            raise ValueError(f"没有可用的{kind or ''}虚拟设备")
+        if isinstance(device, str):
+            for index in sorted(self.devices):
+                if device.lower() in self.devices[index].name.lower():
+                    return index, self.devices[index]
+            raise ValueError(f"找不到虚拟设备: {device}")
+        if device not in self.devices:
+            raise ValueError(f"无效的虚拟设备 ID: {device}")
+        return device, self.devices[device]
+
+    def query_devices(self, device=None, kind=None):
+        """
+        与 sounddevice.query_devices 相同: 不带参数时返回按 ID 索引的设备列表
+        （ID 不连续时中间补无通道的占位设备），否则返回单个设备信息
+        """
+        if device is None and kind is None:
+            count = max(self.devices, default=-1) + 1
+            return [
+                self.devices[index].info(index) if index in self.devices
+                else VirtualDevice('(unused)').info(index)
+                for index in range(count)
+            ]
+        index, found = self.resolve(device, kind)
+        return found.info(index)
+
+    def query_hostapis(self, index=None):
+        indices = sorted(self.devices)
+        inputs = [i for i in indices if self.devices[i].max_input_channels]
+        outputs = [i for i in indices if self.devices[i].max_output_channels]
+        hostapi = {
+            'name': 'Virtual',
+            'devices': indices,
+            'default_input_device': inputs[0] if inputs else -1,
+            'default_output_device': outputs[0] if outputs else -1,
+        }
+        return hostapi if index is not None else (hostapi,)
+
+    def InputStream(self, **kwargs) -> VirtualStream:
+        return VirtualStream(self, 'input', **kwargs)
+
+    def OutputStream(self, **kwargs) -> VirtualStream:
+        return VirtualStream(self, 'output', **kwargs)
+
+    # ------------------------------------------------------------------
+    # 时钟推进
+    # ------------------------------------------------------------------
+
+    def _start_stream(self, stream: VirtualStream):
+        with self._lock:
+            stream.next_due = self.clock.time + stream.period
+            self._streams.append(stream)
+            if self.clock.speed > 0 and self._driver is None:
+                self._driver = threading.Thread(target=self._drive, name='virtual-audio-clock', daemon=True)
+                self._driver.start()
+
+    def _stop_stream(self, stream: VirtualStream):
+        with self._lock:
+            if stream in self._streams:
+                self._streams.remove(stream)
+
+    def _run_until(self, target: float) -> int:
+        """按时间顺序执行所有到期（next_due <= target）的块，返回执行的块数"""
+        count = 0
+        while True:
+            with self._lock:
+                stream = None
+                for candidate in self._streams:
+                    if candidate.next_due <= target and (stream is None or candidate.next_due < stream.next_due):
+                        stream = candidate
+                if stream is None:
+                    self.clock.time = max(self.clock.time, target)
+                    return count
+                self.clock.time = stream.next_due
+                stream.next_due += stream.period
+                now = self.clock.time
+            # 回调在锁外执行（回调中可以停止流）
+            stream._run_block(now)
+            count += 1
+
+    def advance(self, seconds: float) -> int:
+        """手动推进虚拟时钟 seconds 秒，在调用者线程中执行期间到期的所有块"""
+        return self._run_until(self.clock.time + seconds)
+
+    def _drive(self):
+        """自动时钟: 按 speed 倍速把虚拟时间映射到真实时间，没有活动的流时退出"""
+        real_start = time.perf_counter()
+        virtual_start = self.clock.time
+        while True:
+            with self._lock:
+                if not self._streams:
+                    self._driver = None
+                    return
+                due = min(stream.next_due for stream in self._streams)
+            delay = real_start + (due - virtual_start) / self.clock.speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(min(delay, 0.05))
+                continue
+            self._run_until(due)
+
+    @classmethod
+    def from_config(cls, audio_config) -> 'VirtualBackend':
+        """
+        按 AudioConfig 建立 3-Cable 虚拟设备（设备 ID 与配置一致，未配置时依次为 0/1/2）:
+        MPV 输入 = 440Hz 正弦，Clubdeck 输入 = 220Hz 正弦，CABLE-A 与其他输出设备 = 捕获，
+        额外输入源 = 330Hz 正弦
+        """
+        backend = cls(clock=VirtualClock(speed=getattr(audio_config, 'virtual_speed', 1.0)))
+        mpv_id = audio_config.mpv_input_device_id
+        clubdeck_id = audio_config.clubdeck_input_device_id
+        output_id = audio_config.browser_output_device_id
+        backend.add_device(VirtualDevice(
+            'CABLE-B Output (Virtual MPV)', max_input_channels=audio_config.mpv_channels,
+            default_samplerate=audio_config.mpv_sample_rate, source=SineSource(440.0, 0.2)
+        ), 0 if mpv_id is None else mpv_id)
+        backend.add_device(VirtualDevice(
+            'CABLE-C Output (Virtual Clubdeck)', max_input_channels=audio_config.clubdeck_channels,
+            default_samplerate=audio_config.clubdeck_sample_rate, source=SineSource(220.0, 0.1)
+        ), 1 if clubdeck_id is None else clubdeck_id)
+        backend.add_device(VirtualDevice(
+            'CABLE-A Input (Virtual Browser Mic)', max_output_channels=audio_config.browser_output_channels,
+            default_samplerate=audio_config.browser_output_sample_rate, sink=CaptureSink(max_frames=48000 * 10)
+        ), 2 if output_id is None else output_id)
+        for source in audio_config.mix_sources:
+            backend.add_device(VirtualDevice(
+                f'{source.name} (Virtual)', max_input_channels=source.channels,
+                default_samplerate=source.sample_rate, source=SineSource(330.0, 0.1)
+            ), source.device_id)
+        for bus in audio_config.mix_buses:
+            if bus.sink.isdigit() and int(bus.sink) not in backend.devices:
+                backend.add_device(VirtualDevice(
+                    f'{bus.name} (Virtual)', max_output_channels=audio_config.browser_output_channels,
+                    default_samplerate=audio_config.browser_output_sample_rate, sink=CaptureSink(max_frames=48000 * 10)
+                ), int(bus.sink))
+        return backend
+
+
+# ----------------------------------------------------------------------
+# 进程内默认后端
+# ----------------------------------------------------------------------
+
+_backend = None
+
+
+def create_backend(name: str, audio_config=None):
+    """
+    按名称创建后端
+
+    Raises:
+        ValueError: 未知的后端名称
+    """
+    if name == BACKEND_SOUNDDEVICE:
+        return SoundDeviceBackend()
+    if name == BACKEND_VIRTUAL:
+        if audio_config is None:
+            return VirtualBackend(clock=VirtualClock(speed=1.0))
+        return VirtualBackend.from_config(audio_config)
+    raise ValueError(f"未知的音频后端: {name}（可选: {', '.join(BACKENDS)}）")
+
+
+def get_backend():
+    """进程内默认后端（首次调用时按 config.ini [audio] backend 创建）"""
+    global _backend
+    if _backend is None:
+        from ..config.settings import config
+        _backend = create_backend(config.audio.backend, config.audio)
+    return _backend
+
+
+def set_backend(backend):
+    """替换进程内默认后端（测试、压测），返回原来的后端"""
+    global _backend
+    previous, _backend = _backend, backend
+    return previous
@@ -1,7 +1,6 @@
 """
 Audio Device Manager - display grouped by Host API
 """
-import sounddevice as sd
 from typing import List, Dict, Tuple, Optional
 from rich.console import Console
 from rich.table import Table
@@ -9,6 +8,7 @@ from rich.prompt import IntPrompt, Confirm
 from rich.panel import Panel
 
 from ..config.settings import config
+from .backend import get_backend
 
 
 # Configure console to avoid Unicode issues on Windows
@@ -18,9 +18,10 @@ console = Console(no_color=True, force_terminal=False, legacy_windows=True)
 class DeviceManager:
     """音频设备管理器"""
     
-    def __init__(self):
-        self.devices = sd.query_devices()
-        self.hostapis = sd.query_hostapis()
+    def __init__(self, backend=None):
+        self.backend = backend or get_backend()
+        self.devices = self.backend.query_devices()
+        self.hostapis = self.backend.query_hostapis()
         self.all_devices: List[Dict] = []
         self._scan_devices()
     
@@ -0,0 +1,157 @@
+"""
+时钟漂移补偿
+三根 VB-Cable 各自运行在独立的 PortAudio 时钟上，长时间运行会出现 ±几百 ppm 的速率差。
+DriftCompensator 观察缓冲填充量，用 PI 控制器给出 ±0.1% 以内的重采样比率，
+VariableRateResampler 按该比率对输入流做连续的分数倍重采样，使缓冲保持在目标延迟。
+"""
+import numpy as np
+from typing import Optional
+
+
+class VariableRateResampler:
+    """
+    可变比率流式重采样器（线性插值）
+
+    比率可以每次调用都不同；相位和上一帧跨调用保持，块边界无跳变。
+    所有声道一次向量化处理。适用于比率接近 1 的漂移补偿。
+    """
+
+    __slots__ = ('channels', 'phase', 'last')
+
+    def __init__(self, channels: int = 2):
+        self.channels = channels
+        self.phase = 1.0   # 下一个输出点在 [last, x0, x1, ...] 坐标中的位置
+        self.last = np.zeros(channels, dtype=np.float64)
+
+    def process(self, audio: np.ndarray, ratio: float) -> np.ndarray:
+        """
+        重采样
+
+        Args:
+            audio: (frames, channels) 或交错一维 int16 数据
+            ratio: 输出帧数 / 输入帧数（>1 拉长，<1 压缩）
+
+        Returns:
+            int16 (out_frames, channels)
+        """
+        x = audio.reshape(-1, self.channels)
+        n = len(x)
+        if n == 0:
+            return np.zeros((0, self.channels), dtype=np.int16)
+
+        step = 1.0 / ratio
+        if self.phase > n:
+            # 输入太短，不足以产生输出点
+            self.phase -= n
+            self.last = x[-1].astype(np.float64)
+            return np.zeros((0, self.channels), dtype=np.int16)
+
+        count = int((n - self.phase) / step) + 1
+        positions = self.phase + step * np.arange(count)
+        idx = positions.astype(np.int64)
+        idx = np.minimum(idx, n - 1)
+        frac = (positions - idx)[:, None]
+
+        ext = np.empty((n + 1, self.channels), dtype=np.float64)
+        ext[0] = self.last
+        ext[1:] = x
+        out = ext[idx] * (1.0 - frac) + ext[idx + 1] * frac
+
+        self.phase = self.phase + step * count - n
+        self.last = ext[-1].copy()
+        return np.clip(np.rint(out), -32768, 32767).astype(np.int16)
+
+    def reset(self):
+        """重置状态"""
+        self.phase = 1.0
+        self.last[:] = 0
+
+
+class DriftCompensator:
+    """
+    漂移补偿控制器（PI）
+
+    输入为缓冲填充量（帧），输出为重采样比率：
+    - 填充量高于目标 → 生产端时钟偏快 → 比率 < 1（少产出）
+    - 填充量低于目标 → 生产端时钟偏慢 → 比率 > 1（多产出）
+    积分项收敛到两个时钟的实际速率差，即估计漂移（ppm）。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        sample_rate: int = 48000,
+        target_frames: int = 1024,
+        max_ppm: float = 1000.0,
+        kp_ppm: float = 500.0,
+        ki_ppm: float = 2.0,
+        smoothing: float = 0.05
+    ):
+        """
+        Args:
+            name: 名称（用于统计显示）
+            sample_rate: 缓冲内数据的采样率（用于换算延迟）
+            target_frames: 目标填充量（帧）
+            max_ppm: 最大修正量（ppm, 1000 = 0.1%）
+            kp_ppm: 比例系数（归一化误差为 1 时的修正 ppm）
+            ki_ppm: 积分系数（每次更新、归一化误差为 1 时积分增加的 ppm）
+            smoothing: 填充量指数平滑系数
+        """
+        self.name = name
+        self.sample_rate = sample_rate
+        self.target_frames = max(1, target_frames)
+        self.max_ppm = max_ppm
+        self.kp_ppm = kp_ppm
+        self.ki_ppm = ki_ppm
+        self.smoothing = smoothing
+
+        self.fill_avg: Optional[float] = None
+        self.integral_ppm = 0.0
+        self.correction_ppm = 0.0
+        self.ratio = 1.0
+        self.updates = 0
+
+    def update(self, fill_frames: int) -> float:
+        """
+        根据当前填充量更新比率
+
+        Returns:
+            重采样比率（输出/输入）
+        """
+        if self.fill_avg is None:
+            self.fill_avg = float(fill_frames)
+        else:
+            self.fill_avg += self.smoothing * (fill_frames - self.fill_avg)
+
+        error = (self.fill_avg - self.target_frames) / self.target_frames
+        self.integral_ppm = float(np.clip(self.integral_ppm + self.ki_ppm * error, -self.max_ppm, self.max_ppm))
+        self.correction_ppm = float(np.clip(self.kp_ppm * error + self.integral_ppm, -self.max_ppm, self.max_ppm))
+        self.ratio = 1.0 - self.correction_ppm * 1e-6
+        self.updates += 1
+        return self.ratio
+
+    @property
+    def latency_ms(self) -> float:
+        """平滑后的缓冲延迟（毫秒）"""
+        if self.fill_avg is None:
+            return 0.0
+        return self.fill_avg / self.sample_rate * 1000.0
+
+    def reset(self):
+        """重置控制器"""
+        self.fill_avg = None
+        self.integral_ppm = 0.0
+        self.correction_ppm = 0.0
+        self.ratio = 1.0
+
+    def get_stats(self) -> dict:
+        """获取漂移与延迟统计"""
+        return {
+            'name': self.name,
+            'drift_ppm': round(self.integral_ppm, 1),
+            'correction_ppm': round(self.correction_ppm, 1),
+            'ratio': self.ratio,
+            'latency_ms': round(self.latency_ms, 2),
+            'target_ms': round(self.target_frames / self.sample_rate * 1000.0, 2),
+            'updates': self.updates,
+        }
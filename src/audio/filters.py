@@ -0,0 +1,195 @@
+"""
+流式 IIR 滤波器引擎
+状态空间分块递推 (block-recursive) 实现，跨调用保持滤波器状态
+"""
+import numpy as np
+from typing import Dict, Optional, Sequence, Tuple
+
+
+# 分块矩阵全局缓存: (b, a, 块长度) -> (H, O, K, Aᴸ)
+# 相同设计的滤波器（如每个客户端一个的高通）共享同一组矩阵，实例只持有状态
+_block_cache: Dict[Tuple[tuple, tuple, int], Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]] = {}
+
+
+class IIRFilter:
+    """
+    流式 IIR 滤波器
+
+    传递函数 H(z) = (b0 + b1·z⁻¹ + ... + bN·z⁻ᴺ) / (1 + a1·z⁻¹ + ... + aN·z⁻ᴺ)
+    按 Direct Form II Transposed 转为状态空间 (A, B, C, D)，
+    再把信号切成长度 L 的块，用预先计算好的块矩阵一次性求出整块输出：
+
+        y_blk = H · u_blk + O · s        (H: L×L 冲激响应矩阵, O: L×N 观测矩阵)
+        s'    = Aᴸ · s + K · u_blk       (K: N×L 可控矩阵)
+
+    块间只剩 N×N 的状态递推，逐样本 Python 循环被矩阵乘法取代。
+    多声道数据按声道独立滤波，每个声道有自己的状态。
+    """
+
+    __slots__ = ('b', 'a', 'order', 'channels', 'block_size', '_key', '_A', '_B', '_C', '_D', 'state')
+
+    def __init__(self, b: Sequence[float], a: Sequence[float], channels: int = 1, block_size: int = 128):
+        """
+        Args:
+            b: 分子系数
+            a: 分母系数 (a[0] 不能为 0)
+            channels: 声道数（交错数据按声道拆分）
+            block_size: 分块长度
+        """
+        b = np.asarray(b, dtype=np.float64)
+        a = np.asarray(a, dtype=np.float64)
+        if a[0] == 0:
+            raise ValueError("a[0] 不能为 0")
+
+        # 归一化并补齐到相同阶数
+        b = b / a[0]
+        a = a / a[0]
+        order = max(len(a), len(b)) - 1
+        b = np.pad(b, (0, order + 1 - len(b)))
+        a = np.pad(a, (0, order + 1 - len(a)))
+
+        self.b = b
+        self.a = a
+        self.order = order
+        self.channels = channels
+        self.block_size = block_size
+
+        # 状态空间 (DF-II Transposed)
+        self._A = np.zeros((order, order))
+        if order > 0:
+            self._A[:, 0] = -a[1:]
+            self._A[:-1, 1:] = np.eye(order - 1)
+        self._B = b[1:] - a[1:] * b[0]
+        self._C = np.zeros(order)
+        if order > 0:
+            self._C[0] = 1.0
+        self._D = b[0]
+
+        # 分块矩阵缓存键
+        self._key = (tuple(b), tuple(a))
+        self._block_matrices(block_size)
+
+        # 每个声道的滤波器状态
+        self.state = np.zeros((order, channels), dtype=np.float64)
+
+    @classmethod
+    def highpass_first_order(cls, cutoff: float, sample_rate: int, channels: int = 1) -> 'IIRFilter':
+        """一阶 RC 高通: y[n] = α·(y[n-1] + x[n] - x[n-1])"""
+        rc = 1.0 / (2.0 * np.pi * cutoff)
+        dt = 1.0 / sample_rate
+        alpha = rc / (rc + dt)
+        return cls([alpha, -alpha], [1.0, -alpha], channels=channels)
+
+    @classmethod
+    def highpass_biquad(cls, cutoff: float, sample_rate: int, q: float = 0.7071, channels: int = 1) -> 'IIRFilter':
+        """二阶 (biquad) 高通 - RBJ Audio EQ Cookbook"""
+        w0 = 2.0 * np.pi * cutoff / sample_rate
+        cos_w0 = np.cos(w0)
+        alpha = np.sin(w0) / (2.0 * q)
+        b = [(1 + cos_w0) / 2, -(1 + cos_w0), (1 + cos_w0) / 2]
+        a = [1 + alpha, -2 * cos_w0, 1 - alpha]
+        return cls(b, a, channels=channels)
+
+    @classmethod
+    def lowpass_biquad(cls, cutoff: float, sample_rate: int, q: float = 0.7071, channels: int = 1) -> 'IIRFilter':
+        """二阶 (biquad) 低通 - RBJ Audio EQ Cookbook"""
+        w0 = 2.0 * np.pi * cutoff / sample_rate
+        cos_w0 = np.cos(w0)
+        alpha = np.sin(w0) / (2.0 * q)
+        b = [(1 - cos_w0) / 2, 1 - cos_w0, (1 - cos_w0) / 2]
+        a = [1 + alpha, -2 * cos_w0, 1 - alpha]
+        return cls(b, a, channels=channels)
+
+    def _block_matrices(self, length: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """计算 (H, O, K, Aᴸ) 块矩阵"""
+        cached = _block_cache.get(self._key + (length,))
+        if cached is not None:
+            return cached
+
+        n = self.order
+        # A 的各次幂作用后的结果: C·Aᵏ 与 Aᵏ·B
+        c_pows = np.zeros((length, n))   # 第 k 行 = C·Aᵏ
+        b_pows = np.zeros((length, n))   # 第 k 行 = Aᵏ·B
+        c_row = self._C.copy()
+        b_col = self._B.copy()
+        for k in range(length):
+            c_pows[k] = c_row
+            b_pows[k] = b_col
+            c_row = c_row @ self._A
+            b_col = self._A @ b_col
+
+        # 冲激响应 h[0] = D, h[k] = C·Aᵏ⁻¹·B
+        h = np.empty(length)
+        h[0] = self._D
+        if length > 1:
+            h[1:] = c_pows[:-1] @ self._B
+
+        # 下三角 Toeplitz 矩阵 H[i, j] = h[i - j]
+        idx = np.arange(length)
+        lag = idx[:, None] - idx[None, :]
+        H = np.where(lag >= 0, h[np.clip(lag, 0, None)], 0.0)
+
+        O = c_pows                                   # L×N
+        K = b_pows[::-1].T.copy()                    # N×L, 第 j 列 = Aᴸ⁻¹⁻ʲ·B
+        A_L = np.linalg.matrix_power(self._A, length) if n > 0 else np.zeros((0, 0))
+
+        matrices = (H, O, K, A_L)
+        _block_cache[self._key + (length,)] = matrices
+        return matrices
+
+    def process(self, audio: np.ndarray) -> np.ndarray:
+        """
+        滤波（保持状态，可连续调用）
+
+        Args:
+            audio: 一维交错数据或 (frames, channels) 数组
+
+        Returns:
+            float64 滤波结果，形状与输入相同
+        """
+        shape = audio.shape
+        x = np.asarray(audio, dtype=np.float64).reshape(-1, self.channels)
+        frames = x.shape[0]
+        out = np.empty_like(x)
+
+        L = self.block_size
+        full_blocks = frames // L
+        s = self.state
+
+        if full_blocks:
+            H, O, K, A_L = self._block_matrices(L)
+            u = x[:full_blocks * L].reshape(full_blocks, L, self.channels)
+            y = np.matmul(H, u)                       # 零状态响应
+            if self.order:
+                s_drive = np.matmul(K, u)             # 每块输入对块末状态的贡献
+                s_start = np.empty((full_blocks, self.order, self.channels))
+                for blk in range(full_blocks):
+                    s_start[blk] = s
+                    s = A_L @ s + s_drive[blk]
+                y += np.matmul(O, s_start)            # 零输入响应
+            out[:full_blocks * L] = y.reshape(-1, self.channels)
+
+        tail = frames - full_blocks * L
+        if tail:
+            H, O, K, A_L = self._block_matrices(tail)
+            u = x[full_blocks * L:]
+            y = H @ u
+            if self.order:
+                y += O @ s
+                s = A_L @ s + K @ u
+            out[full_blocks * L:] = y
+
+        self.state = s
+        return out.reshape(shape)
+
+    def process_int16(self, audio: np.ndarray) -> np.ndarray:
+        """滤波 int16 音频并限幅回 int16"""
+        filtered = self.process(audio)
+        return np.clip(filtered, -32768, 32767).astype(np.int16)
+
+    def reset(self, state: Optional[np.ndarray] = None):
+        """重置滤波器状态"""
+        if state is None:
+            self.state = np.zeros((self.order, self.channels), dtype=np.float64)
+        else:
+            self.state = np.asarray(state, dtype=np.float64).reshape(self.order, self.channels).copy()
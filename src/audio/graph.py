@@ -0,0 +1,109 @@
+"""
+混音图
+N 个输入源 × M 条母线的增益矩阵，每个节拍用一次矩阵乘法算出所有母线
+"""
+import numpy as np
+from typing import Dict, List, Sequence
+
+
+class MixGraph:
+    """
+    矩阵混音图
+
+    - 输入源按行载入预分配的 (N, frames·channels) float32 缓冲
+    - gains 为 (M, N) 增益矩阵，mix() = gains @ 输入，一次得到全部 M 条母线
+    - 增加一个输入只是增加一列，不需要新的线程/队列
+    """
+
+    def __init__(self, sources: Sequence[str], channels: int = 2, max_block_frames: int = 8192):
+        """
+        Args:
+            sources: 输入源名称（顺序即矩阵列顺序）
+            channels: 声道数
+            max_block_frames: 单次节拍最大帧数（预分配缓冲大小）
+        """
+        self.sources: List[str] = list(sources)
+        self.source_index: Dict[str, int] = {name: i for i, name in enumerate(self.sources)}
+        self.buses: List[str] = []
+        self.bus_index: Dict[str, int] = {}
+        self.channels = channels
+        self.max_block_frames = max_block_frames
+
+        self.gains = np.zeros((0, len(self.sources)), dtype=np.float32)
+        self._inputs = np.zeros((len(self.sources), max_block_frames * channels), dtype=np.float32)
+        self._outputs = np.zeros((0, max_block_frames * channels), dtype=np.float32)
+
+    def add_bus(self, name: str, gains: Dict[str, float]):
+        """
+        添加母线
+
+        Args:
+            name: 母线名称
+            gains: {输入源名称: 线性增益}，未列出的输入源增益为 0
+
+        Raises:
+            ValueError: 母线重名或引用了不存在的输入源
+        """
+        if name in self.bus_index:
+            raise ValueError(f"母线重复: {name}")
+        unknown = [source for source in gains if source not in self.source_index]
+        if unknown:
+            raise ValueError(f"母线 {name} 引用了未知输入源: {', '.join(unknown)}")
+
+        row = np.zeros((1, len(self.sources)), dtype=np.float32)
+        for source, gain in gains.items():
+            row[0, self.source_index[source]] = gain
+        self.gains = np.vstack([self.gains, row])
+        self.bus_index[name] = len(self.buses)
+        self.buses.append(name)
+        self._outputs = np.zeros((len(self.buses), self.max_block_frames * self.channels), dtype=np.float32)
+
+    def set_gain(self, bus: str, source: str, gain: float):
+        """设置某条母线上某个输入源的增益（线性）"""
+        self.gains[self.bus_index[bus], self.source_index[source]] = gain
+
+    def get_gain(self, bus: str, source: str) -> float:
+        """获取某条母线上某个输入源的增益"""
+        return float(self.gains[self.bus_index[bus], self.source_index[source]])
+
+    def _ensure_capacity(self, frames: int):
+        if frames > self.max_block_frames:
+            # 设备块大小超出预期时扩容（只发生一次）
+            self.max_block_frames = frames
+            self._inputs = np.zeros((len(self.sources), frames * self.channels), dtype=np.float32)
+            self._outputs = np.zeros((len(self.buses), frames * self.channels), dtype=np.float32)
+
+    def input_buffer(self, source: str, frames: int) -> np.ndarray:
+        """某个输入源的 (frames, channels) float32 输入缓冲视图（可直接写入，避免拷贝）"""
+        self._ensure_capacity(frames)
+        n = frames * self.channels
+        return self._inputs[self.source_index[source], :n].reshape(frames, self.channels)
+
+    def load(self, source: str, audio: np.ndarray):
+        """载入某个输入源本节拍的音频（int16 或 float32）"""
+        frames = len(audio.reshape(-1, self.channels))
+        np.copyto(self.input_buffer(source, frames), audio.reshape(frames, self.channels), casting='unsafe')
+
+    def mix(self, frames: int) -> np.ndarray:
+        """
+        计算所有母线
+
+        Returns:
+            float32 (buses, frames, channels) 视图（下次调用前有效），未限幅
+        """
+        self._ensure_capacity(frames)
+        n = frames * self.channels
+        out = self._outputs[:, :n]
+        np.matmul(self.gains, self._inputs[:, :n], out=out)
+        return out.reshape(len(self.buses), frames, self.channels)
+
+    def get_stats(self) -> dict:
+        """获取混音图结构（母线 → 非零增益的输入源）"""
+        return {
+            bus: {
+                source: round(float(self.gains[b, s]), 6)
+                for s, source in enumerate(self.sources)
+                if self.gains[b, s] != 0
+            }
+            for b, bus in enumerate(self.buses)
+        }
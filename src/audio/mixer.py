@@ -0,0 +1,227 @@
+"""
+浏览器麦克风多路混音器
+每个说话的浏览器客户端一个抖动缓冲，在 CABLE-A 输出回调中按样本对齐求和
+"""
+import threading
+import numpy as np
+from typing import Dict, Tuple
+
+from .ringbuffer import RingBuffer
+
+
+def soft_limit(mixed: np.ndarray, out: np.ndarray, threshold: float = 0.8) -> bool:
+    """
+    软限幅并转换为 int16
+
+    |x| ≤ 拐点时线性；超过拐点后用 tanh 平滑压缩到满幅以内。
+
+    Args:
+        mixed: float32 混音结果（会被就地修改）
+        out: int16 输出缓冲（与 mixed 同形状）
+        threshold: 拐点（满幅比例, 0-1）
+
+    Returns:
+        是否触发了限幅
+    """
+    knee = threshold * 32767.0
+    limited = bool(mixed.size) and (mixed.max() > knee or mixed.min() < -knee)
+    if limited:
+        headroom = 32767.0 - knee
+        magnitude = np.abs(mixed)
+        over = magnitude > knee
+        compressed = knee + headroom * np.tanh((magnitude[over] - knee) / headroom)
+        mixed[over] = np.copysign(compressed, mixed[over])
+    np.rint(mixed, out=mixed)
+    np.clip(mixed, -32768, 32767, out=mixed)
+    out[:] = mixed
+    return limited
+
+
+class JitterBuffer(RingBuffer):
+    """
+    单个浏览器客户端的抖动缓冲
+
+    基于 RingBuffer（生产者: Socket.IO 事件, 消费者: 输出回调），
+    缓冲量达到 prebuffer_frames 才开始输出；读空后重新进入预缓冲状态。
+    """
+
+    __slots__ = ('prebuffer', 'buffering')
+
+    def __init__(self, capacity_frames: int, channels: int = 2, prebuffer_frames: int = 0):
+        super().__init__(capacity_frames, channels, np.int16)
+        self.prebuffer = min(prebuffer_frames, capacity_frames)
+        self.buffering = self.prebuffer > 0
+
+    def mix_into(self, out: np.ndarray, frames: int, gain: float, scratch: np.ndarray) -> int:
+        """
+        读取 frames 帧并按增益累加到 out（消费者）
+
+        Args:
+            out: float32 (>=frames, channels) 混音累加缓冲
+            frames: 需要的帧数
+            gain: 线性增益
+            scratch: float32 临时缓冲（与 out 同形状），避免分配
+
+        Returns:
+            实际混入的帧数
+        """
+        available = self.fill
+        if self.buffering:
+            if available < self.prebuffer:
+                return 0
+            self.buffering = False
+
+        count = min(frames, available)
+        if count < frames:
+            self.underruns += frames - count
+            if self.prebuffer:
+                self.buffering = True
+        if count <= 0:
+            return 0
+
+        head, tail = self._segments(self.read_pos, count)
+        np.multiply(head, gain, out=scratch[:len(head)], casting='unsafe')
+        if len(tail):
+            np.multiply(tail, gain, out=scratch[len(head):count], casting='unsafe')
+        np.add(out[:count], scratch[:count], out=out[:count])
+        self.read_pos += count
+        return count
+
+    def clear(self):
+        """清空缓冲"""
+        super().clear()
+        self.buffering = self.prebuffer > 0
+
+
+class BrowserMixer:
+    """
+    浏览器麦克风混音器
+
+    - 每个客户端一个 JitterBuffer，按 client_id 管理
+    - mix() 在输出回调中调用：所有活跃流按样本对齐求和到预分配的 float32 缓冲
+    - 客户端增益 + 软限幅（tanh 拐点），多人同时说话不会硬削波
+    - 客户端增删采用写时复制的快照元组，回调遍历时无需加锁
+    """
+
+    def __init__(
+        self,
+        channels: int = 2,
+        sample_rate: int = 48000,
+        buffer_seconds: float = 0.3,
+        prebuffer_seconds: float = 0.04,
+        max_block_frames: int = 8192,
+        limiter_threshold: float = 0.8
+    ):
+        """
+        Args:
+            channels: 声道数
+            sample_rate: 采样率
+            buffer_seconds: 每个客户端抖动缓冲容量（秒）
+            prebuffer_seconds: 开始输出前的预缓冲量（秒）
+            max_block_frames: 单次 mix() 的最大帧数（预分配缓冲大小）
+            limiter_threshold: 软限幅拐点（满幅比例, 0-1）
+        """
+        self.channels = channels
+        self.capacity_frames = int(sample_rate * buffer_seconds)
+        self.prebuffer_frames = int(sample_rate * prebuffer_seconds)
+        self.limiter_threshold = limiter_threshold
+
+        self._streams: Dict[str, JitterBuffer] = {}
+        self._gains: Dict[str, float] = {}
+        # 回调遍历用的快照: ((client_id, JitterBuffer), ...)
+        self._active: Tuple[Tuple[str, JitterBuffer], ...] = ()
+        self._lock = threading.Lock()  # 仅保护客户端增删，不在回调路径上
+
+        self._mix_buf = np.zeros((max_block_frames, channels), dtype=np.float32)
+        self._scratch = np.zeros((max_block_frames, channels), dtype=np.float32)
+        self._out_buf = np.zeros((max_block_frames, channels), dtype=np.int16)
+
+        self.active_talkers = 0   # 上一次 mix() 中实际有声音的客户端数
+        self.limited_blocks = 0   # 触发软限幅的块数
+
+    def _get_stream(self, client_id: str) -> JitterBuffer:
+        stream = self._streams.get(client_id)
+        if stream is None:
+            with self._lock:
+                stream = self._streams.get(client_id)
+                if stream is None:
+                    stream = JitterBuffer(self.capacity_frames, self.channels, self.prebuffer_frames)
+                    self._streams[client_id] = stream
+                    self._active = tuple(self._streams.items())
+        return stream
+
+    def push(self, client_id: str, audio: np.ndarray) -> int:
+        """写入某个客户端的麦克风音频"""
+        return self._get_stream(client_id).write(audio)
+
+    def remove(self, client_id: str):
+        """移除客户端（断开连接时调用）"""
+        with self._lock:
+            self._streams.pop(client_id, None)
+            self._gains.pop(client_id, None)
+            self._active = tuple(self._streams.items())
+
+    def set_gain(self, client_id: str, gain: float):
+        """设置客户端增益（线性, 1.0 = 原始音量）"""
+        self._gains[client_id] = max(0.0, float(gain))
+
+    def get_gain(self, client_id: str) -> float:
+        """获取客户端增益"""
+        return self._gains.get(client_id, 1.0)
+
+    def mix(self, frames: int) -> np.ndarray:
+        """
+        混合所有客户端的 frames 帧音频
+
+        Returns:
+            float32 (frames, channels) 视图（指向内部缓冲，下次调用前有效），未限幅
+        """
+        if frames > len(self._mix_buf):
+            # 设备块大小超出预期时扩容（只发生一次）
+            self._mix_buf = np.zeros((frames, self.channels), dtype=np.float32)
+            self._scratch = np.zeros((frames, self.channels), dtype=np.float32)
+            self._out_buf = np.zeros((frames, self.channels), dtype=np.int16)
+
+        out = self._mix_buf[:frames]
+        out.fill(0.0)
+        talkers = 0
+        gains = self._gains
+        for client_id, stream in self._active:
+            if stream.mix_into(out, frames, gains.get(client_id, 1.0), self._scratch):
+                talkers += 1
+        self.active_talkers = talkers
+        return out
+
+    def limit(self, mixed: np.ndarray) -> np.ndarray:
+        """
+        软限幅并转换为 int16（见 soft_limit）
+
+        Returns:
+            int16 (frames, channels) 视图（指向内部缓冲，下次调用前有效）
+        """
+        out = self._out_buf[:len(mixed)]
+        if soft_limit(mixed, out, self.limiter_threshold):
+            self.limited_blocks += 1
+        return out
+
+    def get_stats(self) -> dict:
+        """获取混音器状态"""
+        return {
+            'clients': len(self._active),
+            'active_talkers': self.active_talkers,
+            'limited_blocks': self.limited_blocks,
+            'streams': {
+                client_id: {
+                    'fill_frames': stream.fill,
+                    'gain': self._gains.get(client_id, 1.0),
+                    'overruns': stream.overruns,
+                    'underruns': stream.underruns,
+                }
+                for client_id, stream in self._active
+            }
+        }
+
+    def clear(self):
+        """清空所有客户端缓冲"""
+        for _, stream in self._active:
+            stream.clear()
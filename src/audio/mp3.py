@@ -0,0 +1,47 @@
+"""
+MP3 编码（可选依赖 lameenc，自带 LAME）
+未安装时 MP3_AVAILABLE 为 False，/stream.mp3 不可用。
+"""
+import numpy as np
+
+try:
+    import lameenc
+    MP3_AVAILABLE = True
+except Exception:  # ImportError
+    lameenc = None
+    MP3_AVAILABLE = False
+
+
+MP3_SAMPLE_RATES = (32000, 44100, 48000)
+
+
+class MP3Encoder:
+    """
+    流式 MP3 编码器
+
+    输入任意长度的 int16 交错块，LAME 内部攒满 1152 帧才输出，所以每次可能返回空字节串。
+    MP3 帧自带同步字，听众可以从任意帧开始解码。
+    """
+
+    def __init__(self, sample_rate: int = 48000, channels: int = 2, bitrate: int = 128000, quality: int = 5):
+        """
+        Args:
+            bitrate: 码率（bit/s）
+            quality: LAME 质量 2（最好/最慢）~ 7（最快）
+        """
+        if not MP3_AVAILABLE:
+            raise RuntimeError("MP3 不可用: 请安装 lameenc")
+        if sample_rate not in MP3_SAMPLE_RATES:
+            raise ValueError(f"MP3 不支持采样率 {sample_rate}")
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.bitrate = bitrate
+        self._encoder = lameenc.Encoder()
+        self._encoder.set_bit_rate(bitrate // 1000)
+        self._encoder.set_in_sample_rate(sample_rate)
+        self._encoder.set_channels(channels)
+        self._encoder.set_quality(quality)
+
+    def encode(self, audio: np.ndarray) -> bytes:
+        """编码一块音频，返回本次输出的 MP3 帧"""
+        return bytes(self._encoder.encode(audio.astype('<i2', copy=False).tobytes()))
@@ -1,14 +1,14 @@
 """
 MPV 音乐播放器控制器
-通过 named pipe 控制 MPV 音量，实现 Audio Ducking
+通过常驻的 MPV JSON IPC 连接（named pipe / Unix socket）控制 MPV 音量，实现 Audio Ducking
 """
-import os
-import time
 import threading
-from pathlib import Path
 from typing import Optional
 from dataclasses import dataclass
 
+from .mpv_ipc import MPVError, MPVIPCClient
+from ..utils.metrics import Counter, Gauge, Histogram, DURATION_BUCKETS
+
 
 @dataclass
 class MPVConfig:
@@ -18,12 +18,14 @@ class MPVConfig:
     normal_volume: int = 100
     ducking_volume: int = 15
     transition_time: float = 0.1
+    ipc_timeout: float = 0.5            # 等待 MPV 回复的超时（秒）
+    reconnect_max_delay: float = 5.0    # 断线重连的最大退避间隔（秒）
 
 
 class MPVController:
     """
     MPV 控制器
-    通过 Windows Named Pipe 控制 MPV 音量
+    通过一条常驻 IPC 连接控制 MPV 音量（MPV 未运行或重启时在后台自动重连）
     """
     
     def __init__(self, config: MPVConfig):
@@ -41,56 +43,56 @@ class MPVController:
         self.current_volume = self.normal_volume
         self.target_volume = self.normal_volume
         self.is_ducking = False
-        self.pipe_handle = None
-        self.pipe_lock = threading.Lock()
+        self.reported_volume: Optional[float] = None   # MPV 上报的实际音量（属性观察，含用户手动调节）
         
-        # 音量平滑过渡线程
-        self.transition_thread = None
+        # 音量平滑过渡: 一个常驻线程，空闲时阻塞在 _wake 上，目标变化时被唤醒
+        # （混音线程调用 set_ducking 只设置目标并唤醒，不创建线程也不等待管道写入）
+        self.transition_thread: Optional[threading.Thread] = None
         self.transition_active = False
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        
+        # IPC 指标: 每条命令的往返耗时（发出 → 收到回复）与失败数（错误回复、超时、未连接）
+        self.ipc_latency = Histogram('clubvoice_mpv_ipc_seconds', 'MPV IPC 命令耗时', DURATION_BUCKETS)
+        self.ipc_errors = Counter('clubvoice_mpv_ipc_errors_total', 'MPV IPC 命令失败次数')
         
+        self.ipc = MPVIPCClient(
+            self.pipe_path,
+            timeout=config.ipc_timeout,
+            reconnect_max_delay=config.reconnect_max_delay,
+            latency=self.ipc_latency,
+            errors=self.ipc_errors
+        )
         if config.enabled:
+            self.ipc.on_connect(self._on_connected)
+            self.ipc.observe_property('volume', self._on_volume)
+            self.ipc.start()
             self._test_connection()
     
     def _test_connection(self):
-        """Test MPV pipe connection"""
-        try:
-            self._send_command('{ "command": ["get_property", "volume"] }')
-            print(f"[MPV] * Connected to MPV pipe: {self.pipe_path}")
-        except Exception as e:
-            print(f"[MPV] ! Cannot connect to MPV: {e}")
+        """Test MPV IPC connection (reads the actual volume)"""
+        if not self.ipc.wait_connected(self.ipc.timeout):
+            print(f"[MPV] ! Cannot connect to MPV: {self.ipc.last_error} (will keep retrying in background)")
             print(f"[MPV] Hint: Enable IPC in MPV: --input-ipc-server={self.pipe_path}")
+            return
+        try:
+            volume = self.ipc.get_property('volume')
+            print(f"[MPV] * Connected to MPV IPC: {self.pipe_path} (volume {volume:.0f}%)")
+        except (ConnectionError, TimeoutError, MPVError) as e:
+            print(f"[MPV] ! MPV IPC connected but not responding: {e}")
     
-    def _send_command(self, command: str, retry: int = 3) -> bool:
-        """
-        发送命令到 MPV
-        
-        Args:
-            command: JSON 格式的命令
-            retry: 重试次数
-            
-        Returns:
-            是否成功
-        """
-        for attempt in range(retry):
+    def _on_connected(self):
+        """（重新）连接后: MPV 重启时音量回到默认值，闪避中则重新应用目标音量（IPC 读线程中调用）"""
+        if self.target_volume != self.normal_volume:
             try:
-                # Windows Named Pipe 使用文件方式打开
-                with open(self.pipe_path, 'w', encoding='utf-8') as pipe:
-                    pipe.write(command + '\n')
-                    pipe.flush()
-                return True
-                
-            except FileNotFoundError:
-                if attempt == 0:
-                    # 只在第一次失败时提示
-                    pass
-                return False
-                
-            except Exception as e:
-                if attempt == retry - 1:
-                    print(f"[MPV] Command failed: {e}")
-                time.sleep(0.1)
-        
-        return False
+                self.ipc.command_async('set_property', 'volume', self.target_volume)
+                self.current_volume = self.target_volume
+            except ConnectionError:
+                pass
+    
+    def _on_volume(self, volume):
+        """MPV 音量属性变化（IPC 读线程中调用）"""
+        self.reported_volume = volume
     
     def set_volume(self, volume: int) -> bool:
         """
@@ -103,12 +105,12 @@ class MPVController:
             是否成功
         """
         volume = max(0, min(100, volume))
-        command = f'{{"command": ["set_property", "volume", {volume}]}}'
-        
-        if self._send_command(command):
-            self.current_volume = volume
-            return True
-        return False
+        try:
+            self.ipc.set_property('volume', volume)
+        except (ConnectionError, TimeoutError, MPVError):
+            return False   # 已计入 ipc_errors
+        self.current_volume = volume
+        return True
     
     def set_ducking(self, should_duck: bool):
         """
@@ -130,56 +132,79 @@ class MPVController:
             self._start_volume_transition()
     
     def _start_volume_transition(self):
-        """启动音量平滑过渡线程"""
-        if self.transition_thread and self.transition_thread.is_alive():
-            # 已有过渡在进行，更新目标即可
-            return
-        
-        self.transition_active = True
-        self.transition_thread = threading.Thread(
-            target=self._volume_transition_worker,
-            daemon=True
-        )
-        self.transition_thread.start()
+        """唤醒音量过渡线程（首次调用时启动）"""
+        if self.transition_thread is None:
+            self._stopping.clear()
+            self.transition_thread = threading.Thread(
+                target=self._volume_transition_worker,
+                daemon=True
+            )
+            self.transition_thread.start()
+        self._wake.set()
     
     def _volume_transition_worker(self):
-        """音量过渡工作线程"""
+        """音量过渡工作线程（常驻）"""
         step_interval = 0.02  # 20ms 一步
         steps = int(self.transition_time / step_interval)
         
-        while self.transition_active:
-            if abs(self.current_volume - self.target_volume) < 1:
-                # 已到达目标
-                if self.current_volume != self.target_volume:
-                    self.set_volume(self.target_volume)
-                break
+        while not self._stopping.is_set():
+            # 空闲: 阻塞直到目标变化或停止
+            self._wake.wait()
+            self._wake.clear()
+            self.transition_active = True
             
-            # 计算步进
-            diff = self.target_volume - self.current_volume
-            step = diff / max(steps, 1)
-            new_volume = int(self.current_volume + step)
+            while not self._stopping.is_set():
+                if abs(self.current_volume - self.target_volume) < 1:
+                    # 已到达目标
+                    if self.current_volume != self.target_volume:
+                        self.set_volume(self.target_volume)
+                    break
+                
+                # 计算步进（每步重新读取目标，过渡中目标变化时直接转向）
+                diff = self.target_volume - self.current_volume
+                step = diff / max(steps, 1)
+                # 每步至少 1%（截断取整时小于 1 的上行步进会原地不动）
+                if abs(step) < 1:
+                    step = 1 if diff > 0 else -1
+                new_volume = int(self.current_volume + step)
+                
+                # 更新音量（MPV 不可达时放弃本次过渡，等下一次目标变化再试）
+                if not self.set_volume(new_volume):
+                    break
+                # 步间隔由停止事件计时，stop() 可立即打断
+                self._stopping.wait(step_interval)
             
-            # 更新音量
-            self.set_volume(new_volume)
-            time.sleep(step_interval)
-        
-        self.transition_active = False
+            self.transition_active = False
     
     def get_current_volume(self) -> int:
         """获取当前音量"""
         return self.current_volume
     
+    def collect_metrics(self) -> list:
+        """MPV 指标（/metrics 采集器）"""
+        return [
+            self.ipc_latency,
+            self.ipc_errors,
+            Gauge('clubvoice_mpv_volume', 'MPV 当前音量（%）', value=self.current_volume),
+            Gauge('clubvoice_mpv_ducking', 'MPV 是否处于闪避状态', value=int(self.is_ducking)),
+            Gauge('clubvoice_mpv_ipc_connected', 'MPV IPC 是否已连接', value=int(self.ipc.connected)),
+            Counter('clubvoice_mpv_ipc_reconnects_total', 'MPV IPC 断线次数', value=self.ipc.disconnects),
+        ]
+    
     def is_enabled(self) -> bool:
         """是否启用 MPV 控制"""
         return self.config.enabled
     
     def stop(self):
         """停止控制器"""
-        self.transition_active = False
+        self._stopping.set()
+        self._wake.set()
         if self.transition_thread:
             self.transition_thread.join(timeout=1.0)
+            self.transition_thread = None
         
         # Restore normal volume
         if self.config.enabled and self.current_volume != self.normal_volume:
-            self.set_volume(self.normal_volume)
-            print("[MPV] Volume restored")
+            if self.set_volume(self.normal_volume):
+                print("[MPV] Volume restored")
+        self.ipc.close()
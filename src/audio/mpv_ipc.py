@@ -0,0 +1,403 @@
+"""
+MPV JSON IPC 客户端
+一条常驻连接（Windows 命名管道 / Unix 域套接字），请求带 request_id，读线程按 id 把回复交给等待者，
+无 id 的消息作为事件分发给订阅者；连接断开后按指数退避自动重连，并重新注册属性观察。
+
+协议见 mpv 文档 "JSON IPC": 每行一个 JSON，
+    请求  {"command": [...], "request_id": n}
+    回复  {"request_id": n, "error": "success", "data": ...}
+    事件  {"event": "property-change", "id": k, "name": "volume", "data": 50}
+"""
+import itertools
+import json
+import socket
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from ..utils.metrics import Counter, Histogram
+
+
+def is_named_pipe(path: str) -> bool:
+    """是否为 Windows 命名管道路径（\\\\.\\pipe\\name）"""
+    return path.replace('/', '\\').lower().startswith('\\\\.\\pipe\\')
+
+
+class MPVError(Exception):
+    """MPV 返回了非 success 的错误"""
+
+
+class _SocketTransport:
+    """Unix 域套接字（mpv --input-ipc-server=/tmp/mpv.sock）"""
+
+    def __init__(self, path: str, timeout: float):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        try:
+            self.sock.connect(path)
+        except OSError:
+            self.sock.close()
+            raise
+        self.sock.settimeout(None)
+
+    def recv(self) -> bytes:
+        return self.sock.recv(65536)
+
+    def send(self, data: bytes):
+        self.sock.sendall(data)
+
+    def close(self):
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+
+class _PipeTransport:
+    """
+    Windows 命名管道（mpv --input-ipc-server=\\\\.\\pipe\\mpv-pipe）
+
+    以 FILE_FLAG_OVERLAPPED 打开: 同步句柄上读线程阻塞的 ReadFile 会挡住其他线程的 WriteFile，
+    重叠 I/O 句柄则可以一边等待读一边写（multiprocessing.connection.PipeConnection 封装了重叠读写）
+    """
+
+    def __init__(self, path: str, timeout: float):
+        import _winapi
+        from multiprocessing.connection import PipeConnection
+        try:
+            handle = _winapi.CreateFile(
+                path, _winapi.GENERIC_READ | _winapi.GENERIC_WRITE, 0, _winapi.NULL,
+                _winapi.OPEN_EXISTING, _winapi.FILE_FLAG_OVERLAPPED, _winapi.NULL
+            )
+        except OSError as e:
+            if getattr(e, 'winerror', None) == _winapi.ERROR_PIPE_BUSY:
+                _winapi.WaitNamedPipe(path, int(timeout * 1000))
+            raise
+        self.conn = PipeConnection(handle)
+
+    def recv(self) -> bytes:
+        try:
+            return self.conn.recv_bytes()
+        except EOFError:
+            return b''
+
+    def send(self, data: bytes):
+        self.conn.send_bytes(data)
+
+    def close(self):
+        self.conn.close()
+
+
+def _open_transport(path: str, timeout: float):
+    if is_named_pipe(path):
+        if sys.platform != 'win32':
+            raise OSError(f"命名管道只在 Windows 上可用: {path}")
+        return _PipeTransport(path, timeout)
+    if getattr(socket, 'AF_UNIX', None) is None:
+        raise OSError(f"当前平台不支持 Unix 域套接字: {path}")
+    return _SocketTransport(path, timeout)
+
+
+class MPVRequest:
+    """一个已发送的请求（wait() 等待回复，或在读线程中回调 callback(request)）"""
+
+    __slots__ = ('request_id', 'command', 'sent', 'callback', 'data', 'error', '_done')
+
+    def __init__(self, request_id: int, command: list, callback: Optional[Callable] = None):
+        self.request_id = request_id
+        self.command = command
+        self.sent = time.perf_counter()
+        self.callback = callback
+        self.data = None
+        self.error: Optional[Exception] = None
+        self._done = threading.Event()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def _finish(self, data=None, error: Optional[Exception] = None):
+        self.data = data
+        self.error = error
+        self._done.set()
+        if self.callback is not None:
+            self.callback(self)
+
+    def wait(self, timeout: Optional[float] = None):
+        """
+        等待回复并返回 data
+
+        Raises:
+            TimeoutError: 超时未收到回复
+            MPVError: MPV 返回错误
+            ConnectionError: 等待期间连接断开
+        """
+        if not self._done.wait(timeout):
+            raise TimeoutError(f"MPV 未在 {timeout}s 内回复: {self.command}")
+        if self.error is not None:
+            raise self.error
+        return self.data
+
+
+class MPVIPCClient:
+    """
+    持久 MPV IPC 连接
+
+    - start(): 启动读线程（负责连接、读取与重连），立即返回；MPV 未运行时在后台按退避重试
+    - command(): 发送并等待回复；command_async(): 只发送，回复到达时在读线程中回调
+    - on_event() / observe_property(): 订阅事件与属性变化（重连后自动重新观察）
+    - on_connect(): 每次（重新）连接成功后在读线程中回调，回调中只能用 command_async
+    - 未连接时发送立即抛出 ConnectionError，不阻塞调用者
+    """
+
+    def __init__(self, path: str, timeout: float = 0.5, reconnect_min_delay: float = 0.1,
+                 reconnect_max_delay: float = 5.0, latency: Optional[Histogram] = None,
+                 errors: Optional[Counter] = None):
+        """
+        Args:
+            timeout: command() 的默认回复超时（秒），也是连接超时
+            latency: 请求往返耗时直方图（在读线程中 observe，单写者）
+            errors: 失败计数（错误回复、超时、连接失败）
+        """
+        self.path = path
+        self.timeout = timeout
+        self.reconnect_min_delay = reconnect_min_delay
+        self.reconnect_max_delay = reconnect_max_delay
+        self.latency = latency
+        self.errors = errors
+
+        self._transport = None
+        self._write_lock = threading.Lock()
+        self._pending: Dict[int, MPVRequest] = {}
+        self._pending_lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._observer_ids = itertools.count(1)
+        self._observers: Dict[int, tuple] = {}                     # 观察 id → (属性名, 回调)
+        self._event_handlers: Dict[str, List[Callable]] = {}
+        self._connect_handlers: List[Callable] = []
+
+        self._thread: Optional[threading.Thread] = None
+        self._closing = threading.Event()
+        self._connected = threading.Event()
+        self.connects = 0
+        self.disconnects = 0
+        self.last_error: Optional[str] = None
+
+    # ------------------------------------------------------------------
+    # 订阅
+    # ------------------------------------------------------------------
+
+    def on_event(self, name: str, callback: Callable[[dict], None]):
+        """订阅事件（如 'shutdown'、'file-loaded'），回调在读线程中执行"""
+        self._event_handlers.setdefault(name, []).append(callback)
+
+    def on_connect(self, callback: Callable[[], None]):
+        """每次连接建立后回调（读线程中执行）"""
+        self._connect_handlers.append(callback)
+
+    def observe_property(self, name: str, callback: Callable[[object], None]) -> int:
+        """观察属性变化（mpv 会立即推送一次当前值），返回观察 id"""
+        observer_id = next(self._observer_ids)
+        self._observers[observer_id] = (name, callback)
+        if self.connected:
+            self._observe(observer_id, name)
+        return observer_id
+
+    def _observe(self, observer_id: int, name: str):
+        try:
+            self.command_async('observe_property', observer_id, name)
+        except ConnectionError:
+            pass  # 重连后统一重新观察
+
+    # ------------------------------------------------------------------
+    # 连接
+    # ------------------------------------------------------------------
+
+    @property
+    def connected(self) -> bool:
+        return self._connected.is_set()
+
+    def start(self):
+        """启动读线程（后台连接）"""
+        if self._thread is not None:
+            return
+        self._closing.clear()
+        self._thread = threading.Thread(target=self._run, name='mpv-ipc', daemon=True)
+        self._thread.start()
+
+    def wait_connected(self, timeout: float) -> bool:
+        """等待连接建立"""
+        return self._connected.wait(timeout)
+
+    def close(self):
+        """关闭连接并停止重连"""
+        self._closing.set()
+        transport = self._transport
+        if transport is not None:
+            transport.close()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def _run(self):
+        failures = 0
+        while not self._closing.is_set():
+            try:
+                transport = _open_transport(self.path, self.timeout)
+            except OSError as e:
+                self.last_error = str(e)
+                delay = min(self.reconnect_max_delay, self.reconnect_min_delay * (2 ** failures))
+                failures += 1
+                self._closing.wait(delay)
+                continue
+
+            failures = 0
+            self._transport = transport
+            self._connected.set()
+            self.connects += 1
+            for observer_id, (name, _) in list(self._observers.items()):
+                self._observe(observer_id, name)
+            for handler in self._connect_handlers:
+                self._safe_call(handler)
+
+            self._read_loop(transport)
+
+            self._connected.clear()
+            self._transport = None
+            transport.close()
+            self._fail_pending(ConnectionError("MPV IPC 连接已断开"))
+            if not self._closing.is_set():
+                self.disconnects += 1
+                self._closing.wait(self.reconnect_min_delay)
+
+    def _read_loop(self, transport):
+        buffer = b''
+        while not self._closing.is_set():
+            try:
+                chunk = transport.recv()
+            except OSError as e:
+                self.last_error = str(e)
+                return
+            if not chunk:
+                return
+            buffer += chunk
+            *lines, buffer = buffer.split(b'\n')
+            for line in lines:
+                if line.strip():
+                    self._dispatch(line)
+
+    def _dispatch(self, line: bytes):
+        try:
+            message = json.loads(line)
+        except ValueError:
+            return
+        request_id = message.get('request_id')
+        if request_id is not None and 'error' in message:
+            with self._pending_lock:
+                request = self._pending.pop(request_id, None)
+            if request is None:
+                return  # 调用者已超时放弃
+            if self.latency is not None:
+                self.latency.observe(time.perf_counter() - request.sent)
+            if message['error'] == 'success':
+                self._safe_call(request._finish, message.get('data'))
+            else:
+                if self.errors is not None:
+                    self.errors.inc()
+                self._safe_call(request._finish, None, MPVError(f"{request.command}: {message['error']}"))
+            return
+
+        event = message.get('event')
+        if event is None:
+            return
+        if event == 'property-change':
+            observer = self._observers.get(message.get('id'))
+            if observer is not None:
+                self._safe_call(observer[1], message.get('data'))
+        for handler in self._event_handlers.get(event, ()):
+            self._safe_call(handler, message)
+
+    def _fail_pending(self, error: Exception):
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        for request in pending.values():
+            if self.errors is not None:
+                self.errors.inc()
+            self._safe_call(request._finish, None, error)
+
+    def _safe_call(self, func, *args):
+        # 订阅者的异常不能终止读线程
+        try:
+            func(*args)
+        except Exception as e:
+            self.last_error = f"callback error: {e}"
+
+    # ------------------------------------------------------------------
+    # 请求
+    # ------------------------------------------------------------------
+
+    def command_async(self, *args, callback: Optional[Callable[[MPVRequest], None]] = None) -> MPVRequest:
+        """
+        发送命令，不等待回复
+
+        Raises:
+            ConnectionError: 当前未连接（或写入失败）
+        """
+        request = MPVRequest(next(self._ids), list(args), callback)
+        payload = json.dumps({'command': request.command, 'request_id': request.request_id}).encode('utf-8') + b'\n'
+        with self._pending_lock:
+            self._pending[request.request_id] = request
+        try:
+            with self._write_lock:
+                transport = self._transport
+                if transport is None or not self.connected:
+                    raise ConnectionError(f"MPV IPC 未连接: {self.last_error or self.path}")
+                request.sent = time.perf_counter()
+                transport.send(payload)
+        except (OSError, ConnectionError) as e:
+            with self._pending_lock:
+                self._pending.pop(request.request_id, None)
+            if self.errors is not None:
+                self.errors.inc()
+            if isinstance(e, ConnectionError):
+                raise
+            raise ConnectionError(f"MPV IPC 写入失败: {e}") from e
+        return request
+
+    def command(self, *args, timeout: Optional[float] = None):
+        """
+        发送命令并等待回复，返回 data
+
+        Raises:
+            ConnectionError / TimeoutError / MPVError
+        """
+        request = self.command_async(*args)
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            return request.wait(timeout)
+        except TimeoutError:
+            with self._pending_lock:
+                self._pending.pop(request.request_id, None)
+            if self.errors is not None:
+                self.errors.inc()
+            raise
+
+    def get_property(self, name: str, timeout: Optional[float] = None):
+        return self.command('get_property', name, timeout=timeout)
+
+    def set_property(self, name: str, value, timeout: Optional[float] = None):
+        return self.command('set_property', name, value, timeout=timeout)
+
+    def get_stats(self) -> dict:
+        with self._pending_lock:
+            pending = len(self._pending)
+        return {
+            'path': self.path,
+            'connected': self.connected,
+            'connects': self.connects,
+            'disconnects': self.disconnects,
+            'pending': pending,
+            'last_error': self.last_error,
+        }
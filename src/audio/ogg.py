@@ -0,0 +1,133 @@
+"""
+Ogg 容器（RFC 3533）与 Ogg Opus 封装（RFC 7845）
+纯 Python 实现，只负责分页和 CRC；Opus 编码见 opus.py。
+"""
+import random
+import struct
+from typing import Iterable, List
+
+import numpy as np
+
+from .opus import OpusEncoder, OPUS_SAMPLE_RATE
+
+
+# 页头: 'OggS', 版本, 标志, granule, 流序列号, 页序号, CRC, 段数
+PAGE_HEADER = struct.Struct('<4sBBqIIIB')
+FLAG_CONTINUED = 0x01
+FLAG_BOS = 0x02
+FLAG_EOS = 0x04
+
+# Opus 编码器前瞻延迟（48kHz 样本），解码端丢弃
+OPUS_PRE_SKIP = 312
+
+
+def _crc_table() -> List[int]:
+    table = []
+    for i in range(256):
+        crc = i << 24
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x04C11DB7) if crc & 0x80000000 else (crc << 1)
+        table.append(crc & 0xFFFFFFFF)
+    return table
+
+
+_CRC_TABLE = _crc_table()
+
+
+def ogg_crc(data: bytes) -> int:
+    """Ogg CRC32（多项式 0x04C11DB7，不反转，初值 0）"""
+    crc = 0
+    table = _CRC_TABLE
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFFFFFF) ^ table[(crc >> 24) ^ byte]
+    return crc
+
+
+class OggPageWriter:
+    """单个逻辑流的分页器"""
+
+    def __init__(self, serial: int):
+        self.serial = serial
+        self.sequence = 0
+
+    def page(self, packets: Iterable[bytes], granule: int, flags: int = 0) -> bytes:
+        """
+        把若干完整的包写成一页（单页最多 255 个段，约 64KB）
+
+        Raises:
+            ValueError: 包太多/太大，单页放不下
+        """
+        lacing = bytearray()
+        body = []
+        for packet in packets:
+            length = len(packet)
+            lacing.extend(b'\xff' * (length // 255))
+            lacing.append(length % 255)
+            body.append(bytes(packet))
+        if len(lacing) > 255:
+            raise ValueError("Ogg 页超过 255 个段")
+        header = PAGE_HEADER.pack(b'OggS', 0, flags, granule, self.serial, self.sequence, 0, len(lacing))
+        page = bytearray(header + lacing + b''.join(body))
+        struct.pack_into('<I', page, 22, ogg_crc(page))
+        self.sequence += 1
+        return bytes(page)
+
+
+def opus_head(channels: int, input_sample_rate: int = OPUS_SAMPLE_RATE, pre_skip: int = OPUS_PRE_SKIP) -> bytes:
+    """OpusHead 标识头（映射族 0: 单声道/立体声）"""
+    return struct.pack('<8sBBHIhB', b'OpusHead', 1, channels, pre_skip, input_sample_rate, 0, 0)
+
+
+def opus_tags(vendor: str = 'ClubVoice') -> bytes:
+    """OpusTags 注释头（无用户注释）"""
+    vendor = vendor.encode('utf-8')
+    return b'OpusTags' + struct.pack('<I', len(vendor)) + vendor + struct.pack('<I', 0)
+
+
+class OggOpusMuxer:
+    """
+    Ogg Opus 封装
+
+    preamble: 两个头页（听众连接时先发送）；add(): 加入一个 Opus 包，
+    攒够 page_ms 的音频输出一页（返回页字节，否则返回空字节串）
+    """
+
+    def __init__(self, channels: int, frame_ms: float = 20.0, page_ms: float = 100.0,
+                 serial: int = None):
+        self.writer = OggPageWriter(random.getrandbits(32) if serial is None else serial)
+        self.frame_samples = int(OPUS_SAMPLE_RATE * frame_ms / 1000)
+        self.packets_per_page = max(1, int(round(page_ms / frame_ms)))
+        self.granule = 0
+        self._pending: List[bytes] = []
+        self.preamble = (self.writer.page([opus_head(channels)], 0, FLAG_BOS)
+                         + self.writer.page([opus_tags()], 0))
+
+    def add(self, packet: bytes) -> bytes:
+        """加入一个 Opus 包"""
+        self._pending.append(packet)
+        self.granule += self.frame_samples
+        if len(self._pending) < self.packets_per_page:
+            return b''
+        return self.flush()
+
+    def flush(self) -> bytes:
+        """把未输出的包写成一页"""
+        if not self._pending:
+            return b''
+        page = self.writer.page(self._pending, self.granule)
+        self._pending = []
+        return page
+
+
+class OggOpusEncoder:
+    """PCM → Ogg Opus 页（48kHz 输入）"""
+
+    def __init__(self, channels: int = 2, bitrate: int = 64000, frame_ms: float = 20.0, page_ms: float = 100.0):
+        self.encoder = OpusEncoder(OPUS_SAMPLE_RATE, channels, bitrate, frame_ms)
+        self.muxer = OggOpusMuxer(channels, frame_ms, page_ms)
+        self.preamble = self.muxer.preamble
+
+    def encode(self, audio: np.ndarray) -> bytes:
+        """编码一块音频，返回本次完成的 Ogg 页"""
+        pages = [self.muxer.add(packet) for packet in self.encoder.encode(audio)]
+        return b''.join(pages)
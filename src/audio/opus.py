@@ -0,0 +1,88 @@
+"""
+Opus 编解码（可选依赖 opuslib + 系统 libopus）
+未安装时 OPUS_AVAILABLE 为 False，协商自动回退到 PCM16。
+"""
+from typing import List
+
+import numpy as np
+
+try:
+    import opuslib
+    OPUS_AVAILABLE = True
+except Exception:  # ImportError，或找不到 libopus 动态库
+    opuslib = None
+    OPUS_AVAILABLE = False
+
+
+# Opus 只接受这些帧长（毫秒）
+OPUS_FRAME_MS = (2.5, 5.0, 10.0, 20.0, 40.0, 60.0)
+OPUS_SAMPLE_RATE = 48000
+
+
+def _check(sample_rate: int, frame_ms: float = 20.0):
+    if not OPUS_AVAILABLE:
+        raise RuntimeError("Opus 不可用: 请安装 opuslib 和 libopus")
+    if sample_rate not in (8000, 12000, 16000, 24000, 48000):
+        raise ValueError(f"Opus 不支持采样率 {sample_rate}")
+    if frame_ms not in OPUS_FRAME_MS:
+        raise ValueError(f"Opus 帧长必须是 {OPUS_FRAME_MS} 毫秒之一")
+
+
+class OpusEncoder:
+    """
+    流式 Opus 编码器
+
+    输入任意长度的 int16 交错块，内部攒满一个 Opus 帧就编码一包；
+    不足一帧的余量留到下一次调用，所以每次可能输出 0 或多包。
+    """
+
+    def __init__(self, sample_rate: int = OPUS_SAMPLE_RATE, channels: int = 2,
+                 bitrate: int = 64000, frame_ms: float = 20.0):
+        _check(sample_rate, frame_ms)
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.bitrate = bitrate
+        self.frame_ms = frame_ms
+        self.frame_size = int(sample_rate * frame_ms / 1000)
+        self._encoder = opuslib.Encoder(sample_rate, channels, opuslib.APPLICATION_AUDIO)
+        self._encoder.bitrate = bitrate
+        self._pending = np.zeros((self.frame_size, channels), dtype=np.int16)
+        self._fill = 0
+
+    def encode(self, audio: np.ndarray) -> List[bytes]:
+        """编码一块音频，返回本次攒满的 Opus 包"""
+        frames = audio.reshape(-1, self.channels)
+        packets = []
+        pos = 0
+        while pos < len(frames):
+            count = min(self.frame_size - self._fill, len(frames) - pos)
+            self._pending[self._fill:self._fill + count] = frames[pos:pos + count]
+            self._fill += count
+            pos += count
+            if self._fill == self.frame_size:
+                packets.append(self._encoder.encode(self._pending.tobytes(), self.frame_size))
+                self._fill = 0
+        return packets
+
+    def reset(self):
+        """丢弃未编码的余量"""
+        self._fill = 0
+
+
+class OpusDecoder:
+    """Opus 解码器（每个上行客户端一个，保持解码状态）"""
+
+    # 单包最长 120 ms
+    MAX_FRAME_MS = 120
+
+    def __init__(self, sample_rate: int = OPUS_SAMPLE_RATE, channels: int = 2):
+        _check(sample_rate)
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.max_frame_size = sample_rate * self.MAX_FRAME_MS // 1000
+        self._decoder = opuslib.Decoder(sample_rate, channels)
+
+    def decode(self, packet: bytes) -> np.ndarray:
+        """解码一包，返回 int16 交错数组"""
+        pcm = self._decoder.decode(bytes(packet), self.max_frame_size)
+        return np.frombuffer(pcm, dtype=np.int16)
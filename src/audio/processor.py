@@ -2,9 +2,11 @@
 音频处理器
 """
 import numpy as np
-from typing import Optional
+from typing import Dict, Optional
 import base64
 
+from .filters import IIRFilter
+
 
 class AudioProcessor:
     """音频处理器"""
@@ -16,6 +18,8 @@ class AudioProcessor:
         self.noise_threshold = 150  # 噪声门限
         self.noise_floor = np.zeros(512, dtype=np.float32)  # 噪声底噪估计
         self.noise_alpha = 0.98  # 噪声估计平滑系数
+        # 高通滤波器（按截止频率缓存，跨调用保持状态）
+        self._highpass_filters: Dict[float, IIRFilter] = {}
     
     def denoise(self, audio: np.ndarray) -> np.ndarray:
         """简单降噪 - 噪声门限"""
@@ -31,24 +35,25 @@ class AudioProcessor:
         return np.clip(audio_float, -32768, 32767).astype(np.int16)
     
     def highpass_filter(self, audio: np.ndarray, cutoff: float = 80.0) -> np.ndarray:
-        """简单高通滤波 - 去除低频噪声"""
+        """简单高通滤波 - 去除低频噪声（一阶 RC，交错多声道按声道独立滤波）"""
         if len(audio) < 3:
             return audio
         
-        audio_float = audio.astype(np.float32)
-        
-        # 一阶高通滤波器
-        rc = 1.0 / (2.0 * np.pi * cutoff)
-        dt = 1.0 / self.sample_rate
-        alpha = rc / (rc + dt)
+        hp = self._highpass_filters.get(cutoff)
+        if hp is None:
+            hp = IIRFilter.highpass_first_order(cutoff, self.sample_rate, self.channels)
+            self._highpass_filters[cutoff] = hp
         
-        filtered = np.zeros_like(audio_float)
-        filtered[0] = audio_float[0]
-        
-        for i in range(1, len(audio_float)):
-            filtered[i] = alpha * (filtered[i-1] + audio_float[i] - audio_float[i-1])
+        if audio.size % self.channels:
+            # 不完整的交错帧无法按声道拆分，原样返回
+            return audio
         
-        return np.clip(filtered, -32768, 32767).astype(np.int16)
+        return hp.process_int16(audio)
+    
+    def reset_filters(self):
+        """重置所有滤波器状态"""
+        for hp in self._highpass_filters.values():
+            hp.reset()
     
     def process_audio(self, audio: np.ndarray) -> np.ndarray:
         """完整的音频处理流水线"""
@@ -114,4 +119,65 @@ class AudioProcessor:
         ratio = target_rate / orig_rate
         new_length = int(len(audio) * ratio)
         indices = np.linspace(0, len(audio) - 1, new_length)
-        return np.interp(indices, np.arange(len(audio)), audio).astype(np.int16)
\ No newline at end of file
+        return np.interp(indices, np.arange(len(audio)), audio).astype(np.int16)
+
+
+class ClientAudioChain:
+    """
+    单个浏览器客户端的麦克风处理链（高通滤波 + 噪声门）
+    
+    每个连接一份，滤波器状态、噪声底噪估计和门增益跨包保持，
+    避免包边界跳变以及多个客户端的包交错时互相污染状态。
+    使用 __slots__ 保持单个会话的内存占用很小。
+    """
+    
+    __slots__ = ('client_id', 'channels', 'highpass', 'noise_threshold',
+                 'noise_floor', 'noise_alpha', 'gate_gain', 'gate_floor', 'packets')
+    
+    def __init__(self, client_id: str, sample_rate: int = 48000, channels: int = 2,
+                 cutoff: float = 100.0, noise_threshold: float = 150.0):
+        self.client_id = client_id
+        self.channels = channels
+        self.highpass = IIRFilter.highpass_first_order(cutoff, sample_rate, channels)
+        self.noise_threshold = noise_threshold  # 噪声门限 (int16 RMS)
+        self.noise_floor = 0.0                  # 底噪 RMS 估计（仅在静音包上更新）
+        self.noise_alpha = 0.98                 # 底噪估计平滑系数
+        self.gate_gain = 1.0                    # 上一包结束时的门增益
+        self.gate_floor = 0.1                   # 门关闭时的增益（衰减 90%）
+        self.packets = 0
+    
+    def process(self, audio: np.ndarray) -> np.ndarray:
+        """处理一个 int16 交错音频包"""
+        if audio.size < 3 or audio.size % self.channels:
+            return audio
+        
+        filtered = self.highpass.process(audio)
+        
+        # 噪声门: 门限取固定门限与底噪 2 倍中的较大者
+        rms = float(np.sqrt(np.mean(filtered ** 2)))
+        threshold = max(self.noise_threshold, self.noise_floor * 2.0)
+        if rms < threshold:
+            self.noise_floor = self.noise_alpha * self.noise_floor + (1.0 - self.noise_alpha) * rms
+            target_gain = self.gate_floor
+        else:
+            target_gain = 1.0
+        
+        # 增益在包内线性过渡，避免门开关时的咔哒声
+        if target_gain != self.gate_gain:
+            frames = audio.size // self.channels
+            ramp = np.linspace(self.gate_gain, target_gain, frames, endpoint=True)
+            filtered = filtered.reshape(frames, self.channels) * ramp[:, None]
+            filtered = filtered.reshape(audio.shape)
+        elif target_gain != 1.0:
+            filtered *= target_gain
+        self.gate_gain = target_gain
+        
+        self.packets += 1
+        return np.clip(filtered, -32768, 32767).astype(np.int16)
+    
+    def reset(self):
+        """重置处理链状态"""
+        self.highpass.reset()
+        self.noise_floor = 0.0
+        self.gate_gain = 1.0
+        self.packets = 0
@@ -0,0 +1,261 @@
+"""
+预分配环形缓冲区
+单生产者 / 单消费者 (SPSC)，用于音频回调、工作线程和网络端之间传递采样流
+"""
+import threading
+import numpy as np
+from typing import Optional, Tuple
+
+
+# 溢出策略
+DROP_NEWEST = 'drop_newest'   # 缓冲满时丢弃新写入的多余数据（默认，音频回调中使用）
+DROP_OLDEST = 'drop_oldest'   # 覆盖最旧的数据，保持最低延迟（read_into 检测并丢弃拷贝期间被覆盖的部分）
+BLOCK = 'block'               # 写端等待空间（超时后按 DROP_NEWEST 处理，不可在音频回调中使用）
+
+OVERRUN_POLICIES = (DROP_NEWEST, DROP_OLDEST, BLOCK)
+
+
+def next_power_of_two(n: int) -> int:
+    """不小于 n 的最小 2 的幂"""
+    return 1 << max(0, int(n) - 1).bit_length()
+
+
+class RingBuffer:
+    """
+    预分配的 SPSC 环形缓冲
+
+    - 容量向上取整为 2 的幂，位置用掩码取模
+    - 写入/读取位置都是单调递增的帧计数，fill = write_pos - read_pos，“满”和“空”不会混淆
+    - 生产者只修改 write_pos / write_end，消费者只修改 read_pos，拷贝完成后才移动位置，两端无需加锁
+    - DROP_OLDEST 下写端可能覆盖读端正在拷贝的槽位: 写端在拷贝前先发布 write_end（本次写入的上界），
+      读端拷贝后用 write_end 判断哪些帧已被（或正被）覆盖并丢弃，类似 seqlock
+    - peek() 返回环内存储的零拷贝视图，配合 advance() 消费
+    - 可选 wait_for_data() / BLOCK 策略用于非实时线程间的等待
+    """
+
+    __slots__ = ('capacity', 'mask', 'channels', 'policy', 'buffer', 'write_pos', 'write_end', 'read_pos',
+                 'overruns', 'underruns', '_data_ready', '_space_ready')
+
+    def __init__(self, capacity_frames: int, channels: int = 1, dtype=np.int16, policy: str = DROP_NEWEST):
+        """
+        Args:
+            capacity_frames: 最小容量（帧），实际容量向上取整为 2 的幂
+            channels: 声道数
+            dtype: 采样类型
+            policy: 溢出策略 (DROP_NEWEST / DROP_OLDEST / BLOCK)
+        """
+        if policy not in OVERRUN_POLICIES:
+            raise ValueError(f"未知的溢出策略: {policy}")
+        self.capacity = next_power_of_two(capacity_frames)
+        self.mask = self.capacity - 1
+        self.channels = channels
+        self.policy = policy
+        self.buffer = np.zeros((self.capacity, channels), dtype=dtype)
+        self.write_pos = 0
+        self.write_end = 0  # 正在写入的区间上界: 拷贝前发布，拷贝后 write_pos 追上
+        self.read_pos = 0
+        self.overruns = 0   # 丢弃/被覆盖的帧数
+        self.underruns = 0  # 读取时缺少的帧数
+        self._data_ready = threading.Event()
+        self._space_ready = threading.Event()
+
+    @property
+    def fill(self) -> int:
+        """当前可读帧数"""
+        return min(self.write_pos - self.read_pos, self.capacity)
+
+    @property
+    def free(self) -> int:
+        """剩余可写帧数（不覆盖旧数据的前提下）"""
+        return self.capacity - (self.write_pos - self.read_pos)
+
+    def _segments(self, pos: int, count: int) -> Tuple[np.ndarray, np.ndarray]:
+        """从帧计数 pos 开始的 count 帧对应的（最多两段）存储视图"""
+        start = pos & self.mask
+        first = min(count, self.capacity - start)
+        return self.buffer[start:start + first], self.buffer[:count - first]
+
+    # ------------------------------------------------------------------
+    # 生产者
+    # ------------------------------------------------------------------
+
+    def write(self, audio: np.ndarray, timeout: Optional[float] = None) -> int:
+        """
+        写入音频（生产者）
+
+        Args:
+            audio: 交错一维数据或 (frames, channels) 数组
+            timeout: BLOCK 策略下等待空间的最长时间（秒，None = 一直等）
+
+        Returns:
+            实际写入的帧数
+        """
+        frames_in = audio.reshape(-1, self.channels)
+        count = len(frames_in)
+        capacity = self.capacity
+        write_pos = self.write_pos
+
+        if self.policy == DROP_OLDEST:
+            pending = min(write_pos - self.read_pos, capacity)
+            if count > capacity:
+                # 只保留最新的 capacity 帧
+                self.overruns += count - capacity
+                write_pos += count - capacity
+                frames_in = frames_in[-capacity:]
+                count = capacity
+            lost = pending + count - capacity
+            if lost > 0:
+                self.overruns += lost
+        else:
+            if self.policy == BLOCK and count > self.free:
+                self._wait_for_space(min(count, capacity), timeout)
+            free = capacity - (write_pos - self.read_pos)
+            if count > free:
+                self.overruns += count - free
+                count = free
+            if count <= 0:
+                return 0
+
+        # 先发布写入上界再动槽位，读端据此识别正在被覆盖的帧
+        self.write_end = write_pos + count
+        start = write_pos & self.mask
+        first = capacity - start
+        if count <= first:
+            self.buffer[start:start + count] = frames_in[:count]
+        else:
+            self.buffer[start:] = frames_in[:first]
+            self.buffer[:count - first] = frames_in[first:count]
+        self.write_pos = write_pos + count
+
+        if not self._data_ready.is_set():
+            self._data_ready.set()
+        return count
+
+    def _wait_for_space(self, frames: int, timeout: Optional[float]):
+        """BLOCK 策略: 等待消费者腾出 frames 帧空间"""
+        while self.free < frames:
+            self._space_ready.clear()
+            if self.free >= frames:
+                break
+            if not self._space_ready.wait(timeout):
+                break
+
+    # ------------------------------------------------------------------
+    # 消费者
+    # ------------------------------------------------------------------
+
+    def _catch_up(self) -> int:
+        """DROP_OLDEST: 读位置落后超过一个容量时跳到最旧的有效数据"""
+        behind = self.write_pos - self.read_pos - self.capacity
+        if behind > 0:
+            self.read_pos += behind
+        return self.read_pos
+
+    def peek(self, frames: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        零拷贝查看最多 frames 帧（不消费）
+
+        Returns:
+            (head, tail) 两段环内存储视图，总帧数 = len(head) + len(tail)
+            视图在 advance() 之后、生产者再次写入之前有效；
+            DROP_OLDEST 下生产者可能随时覆盖视图内容，需要完整性时用 read_into()
+        """
+        pos = self._catch_up()
+        count = self.write_pos - pos
+        if frames is not None:
+            count = min(count, frames)
+        return self._segments(pos, max(count, 0))
+
+    def advance(self, frames: int) -> int:
+        """消费 frames 帧（配合 peek 使用）"""
+        count = min(frames, self.fill)
+        self.read_pos += count
+        if self.policy == BLOCK:
+            self._space_ready.set()
+        return count
+
+    def read_into(self, out: np.ndarray) -> int:
+        """
+        读取最多 len(out) 帧到 out（消费者），不足部分不填充
+
+        Returns:
+            实际读取的帧数
+        """
+        head, tail = self.peek(len(out))
+        count = len(head) + len(tail)
+        if count <= 0:
+            return 0
+        start = self.read_pos
+        out[:len(head)] = head
+        if len(tail):
+            out[len(head):count] = tail
+
+        if self.policy == DROP_OLDEST:
+            # 拷贝期间生产者可能已覆盖（或正在覆盖）开头的部分，丢弃这些帧；
+            # 用拷贝前发布的 write_end 而不是 write_pos，未完成的写入也能被发现
+            torn = self.write_end - self.capacity - start
+            if torn > 0:
+                torn = min(torn, count)
+                out[:count - torn] = out[torn:count]
+                count -= torn
+                self.read_pos = start + torn
+        self.read_pos += count
+        if self.policy == BLOCK:
+            self._space_ready.set()
+        return count
+
+    def read(self, frames: int, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        读取 frames 帧（消费者），数据不足时用静音补齐并计入 underruns
+
+        Args:
+            frames: 帧数
+            out: 可选的预分配输出 (>=frames, channels)，避免分配
+
+        Returns:
+            (frames, channels) 数组
+        """
+        if out is None:
+            out = np.empty((frames, self.channels), dtype=self.buffer.dtype)
+        else:
+            out = out[:frames]
+        count = self.read_into(out)
+        if count < frames:
+            self.underruns += frames - count
+            out[count:] = 0
+        return out
+
+    def wait_for_data(self, frames: int = 1, timeout: Optional[float] = None) -> bool:
+        """
+        等待至少 frames 帧可读（消费者，非实时线程使用）
+
+        Returns:
+            是否有足够数据
+        """
+        while self.fill < frames:
+            self._data_ready.clear()
+            if self.fill >= frames:
+                break
+            if not self._data_ready.wait(timeout):
+                return self.fill >= frames
+        return True
+
+    def skip(self, frames: int) -> int:
+        """丢弃最多 frames 帧（消费者）"""
+        self._catch_up()
+        return self.advance(frames)
+
+    def clear(self):
+        """清空缓冲（消费者侧调用）"""
+        self.read_pos = self.write_pos
+        if self.policy == BLOCK:
+            self._space_ready.set()
+
+    def get_stats(self) -> dict:
+        """获取缓冲状态"""
+        return {
+            'capacity_frames': self.capacity,
+            'fill_frames': self.fill,
+            'overruns': self.overruns,
+            'underruns': self.underruns,
+        }
@@ -0,0 +1,278 @@
+"""
+主时钟混音调度器
+选定一个输入流作为主时钟：每当主时钟送来一块数据就触发一次混音节拍，
+其他输入按同样的帧数取出（经漂移补偿），缺数据时用静音或淡出补齐并计数。
+"""
+import time
+import numpy as np
+from typing import Dict, Optional
+
+from .ringbuffer import RingBuffer
+from .drift import DriftCompensator, VariableRateResampler
+
+
+# 缺数据时的补齐方式
+CONCEAL_SILENCE = 'silence'   # 直接补静音
+CONCEAL_FADE = 'fade'         # 从最后一帧线性淡出到静音，避免“咔哒”声
+
+CONCEALMENT_MODES = (CONCEAL_SILENCE, CONCEAL_FADE)
+
+
+class MixerSource:
+    """
+    调度器的一路输入
+
+    - 生产者（设备回调）调用 push()，消费者（混音线程）调用 pull()
+    - 非主时钟输入在 push() 时按缓冲填充量做漂移补偿，缓冲保持在预缓冲目标附近
+    - 预缓冲未满或读空后重新预缓冲，期间按 concealment 补齐
+    """
+
+    __slots__ = ('name', 'channels', 'ring', 'prebuffer', 'buffering', 'concealment',
+                 'drift', 'resampler', 'last_frame', '_steps', '_ramp', '_column', 'underruns', 'underrun_frames', 'pulls')
+
+    def __init__(
+        self,
+        name: str,
+        channels: int = 2,
+        sample_rate: int = 48000,
+        buffer_seconds: float = 0.5,
+        prebuffer_frames: int = 0,
+        drift_compensation: bool = False,
+        concealment: str = CONCEAL_FADE
+    ):
+        """
+        Args:
+            name: 输入名称
+            channels: 声道数
+            sample_rate: 采样率（与调度器一致）
+            buffer_seconds: 缓冲容量（秒）
+            prebuffer_frames: 开始输出前的预缓冲量（帧），同时作为漂移补偿目标
+            drift_compensation: 是否做漂移补偿（与主时钟不同源的设备）
+            concealment: 缺数据时的补齐方式
+        """
+        if concealment not in CONCEALMENT_MODES:
+            raise ValueError(f"未知的补齐方式: {concealment}")
+        self.name = name
+        self.channels = channels
+        self.ring = RingBuffer(int(sample_rate * buffer_seconds), channels, np.int16)
+        self.prebuffer = prebuffer_frames
+        self.buffering = prebuffer_frames > 0
+        self.concealment = concealment
+        self.drift: Optional[DriftCompensator] = None
+        self.resampler: Optional[VariableRateResampler] = None
+        if drift_compensation:
+            self.drift = DriftCompensator(name, sample_rate, max(prebuffer_frames, 1))
+            self.resampler = VariableRateResampler(channels)
+        self.last_frame = np.zeros(channels, dtype=np.float32)
+        # 淡出补齐的预分配缓冲（pull 可能在设备回调中调用，补齐时不能分配）
+        self._steps = self._ramp = self._column = np.zeros(0, dtype=np.float32)
+        self._ensure_fade_capacity(8192)
+        self.underruns = 0        # 发生缺数据的节拍数
+        self.underrun_frames = 0  # 补齐的帧数
+        self.pulls = 0
+
+    def push(self, audio: np.ndarray) -> int:
+        """写入音频（生产者）"""
+        if self.drift is not None:
+            audio = self.resampler.process(audio, self.drift.update(self.ring.fill))
+        return self.ring.write(audio)
+
+    def pull(self, out: np.ndarray) -> int:
+        """
+        取出 len(out) 帧到 out（消费者），不足部分按补齐方式填充
+
+        Returns:
+            实际取到的帧数
+        """
+        frames = len(out)
+        self.pulls += 1
+        count = 0
+        if self.buffering and self.ring.fill >= self.prebuffer:
+            self.buffering = False
+        if not self.buffering:
+            count = self.ring.read_into(out)
+            if count < frames and self.prebuffer:
+                self.buffering = True
+
+        if count:
+            self.last_frame[:] = out[count - 1]
+        if count < frames:
+            self.underruns += 1
+            self.underrun_frames += frames - count
+            self._conceal(out, count)
+        return count
+
+    def _ensure_fade_capacity(self, frames: int):
+        """淡出缓冲至少容纳 frames 帧（只在块大小超过预分配时扩容）"""
+        if len(self._steps) < frames:
+            self._steps = np.arange(1, frames + 1, dtype=np.float32)
+            self._ramp = np.zeros(frames, dtype=np.float32)
+            self._column = np.zeros(frames, dtype=np.float32)
+
+    def _conceal(self, out: np.ndarray, start: int):
+        """补齐 out[start:]（在预分配缓冲中原地计算，不分配）"""
+        missing = len(out) - start
+        if self.concealment == CONCEAL_FADE and self.last_frame.any():
+            self._ensure_fade_capacity(missing)
+            ramp = self._ramp[:missing]
+            column = self._column[:missing]
+            # 第 i 帧增益 1 - (i + 1) / missing，从最后一帧线性淡出到 0
+            np.multiply(self._steps[:missing], -1.0 / missing, out=ramp)
+            np.add(ramp, 1.0, out=ramp)
+            # 逐声道一维计算: 广播或带类型转换的 ufunc 会分配迭代缓冲
+            for channel in range(self.channels):
+                np.multiply(ramp, self.last_frame[channel], out=column)
+                np.copyto(out[start:, channel], column, casting='unsafe')
+            self.last_frame[:] = 0
+        else:
+            out[start:] = 0
+
+    def clear(self):
+        """清空缓冲"""
+        self.ring.clear()
+        self.buffering = self.prebuffer > 0
+        self.last_frame[:] = 0
+        if self.drift is not None:
+            self.drift.reset()
+            self.resampler.reset()
+
+    def get_stats(self) -> dict:
+        """获取输入状态"""
+        stats = {
+            'fill_frames': self.ring.fill,
+            'overruns': self.ring.overruns,
+            'underruns': self.underruns,
+            'underrun_frames': self.underrun_frames,
+            'pulls': self.pulls,
+        }
+        if self.drift is not None:
+            stats['drift'] = self.drift.get_stats()
+        return stats
+
+
+class MixerScheduler:
+    """
+    主时钟混音调度器
+
+    tick() 等待主时钟输入的数据，按到达的帧数为所有输入各取一块：
+    - 主时钟输入正常时，节拍完全跟随它的设备时钟
+    - 主时钟停顿超过 stall_timeout 时改用系统时钟补出静音节拍，其他输入不受影响
+    - 任何一路缺数据都不会丢掉其他输入已经取出的数据
+    """
+
+    def __init__(
+        self,
+        channels: int = 2,
+        sample_rate: int = 48000,
+        block_frames: int = 512,
+        max_block_frames: int = 8192,
+        stall_timeout: float = 0.05
+    ):
+        """
+        Args:
+            channels: 声道数
+            sample_rate: 采样率
+            block_frames: 标称块大小（帧）
+            max_block_frames: 单次节拍最大帧数（预分配缓冲大小）
+            stall_timeout: 主时钟停顿判定时间（秒）
+        """
+        self.channels = channels
+        self.sample_rate = sample_rate
+        self.block_frames = block_frames
+        self.max_block_frames = max_block_frames
+        self.stall_timeout = stall_timeout
+
+        self.sources: Dict[str, MixerSource] = {}
+        self._blocks: Dict[str, np.ndarray] = {}
+        self.master: Optional[str] = None
+
+        self.ticks = 0
+        self.stalled_ticks = 0    # 主时钟停顿时由系统时钟补出的节拍数
+        self._last_tick = time.monotonic()
+
+    def add_source(
+        self,
+        name: str,
+        master: bool = False,
+        prebuffer_frames: Optional[int] = None,
+        drift_compensation: Optional[bool] = None,
+        concealment: str = CONCEAL_FADE,
+        buffer_seconds: float = 0.5
+    ) -> MixerSource:
+        """
+        添加输入
+
+        Args:
+            name: 输入名称
+            master: 是否作为主时钟（第一个添加的输入默认为主时钟）
+            prebuffer_frames: 预缓冲量，默认主时钟 0、其他输入 2 个标称块
+            drift_compensation: 是否做漂移补偿，默认主时钟关闭、其他输入开启
+            concealment: 缺数据时的补齐方式
+            buffer_seconds: 缓冲容量（秒）
+        """
+        master = master or self.master is None
+        if prebuffer_frames is None:
+            prebuffer_frames = 0 if master else 2 * self.block_frames
+        if drift_compensation is None:
+            drift_compensation = not master
+
+        source = MixerSource(name, self.channels, self.sample_rate, buffer_seconds,
+                             prebuffer_frames, drift_compensation, concealment)
+        self.sources[name] = source
+        self._blocks[name] = np.zeros((self.max_block_frames, self.channels), dtype=np.int16)
+        if master:
+            self.master = name
+        return source
+
+    def push(self, name: str, audio: np.ndarray) -> int:
+        """写入某一路输入（设备回调中调用）"""
+        return self.sources[name].push(audio)
+
+    def tick(self, timeout: Optional[float] = None) -> Optional[Dict[str, np.ndarray]]:
+        """
+        执行一次混音节拍（混音线程中调用）
+
+        Args:
+            timeout: 最长等待时间（秒），默认 stall_timeout
+
+        Returns:
+            {输入名称: int16 (frames, channels) 视图}（下次 tick 前有效）；
+            主时钟未停顿且没有新数据时返回 None
+        """
+        if self.master is None:
+            return None
+        timeout = self.stall_timeout if timeout is None else timeout
+        master = self.sources[self.master]
+
+        if master.ring.wait_for_data(1, timeout):
+            frames = min(master.ring.fill, self.max_block_frames)
+        else:
+            # 主时钟停顿：按流逝的系统时间补出节拍，其他输入继续输出
+            elapsed = time.monotonic() - self._last_tick
+            if elapsed < self.stall_timeout:
+                return None
+            frames = min(int(elapsed * self.sample_rate), self.max_block_frames)
+            self.stalled_ticks += 1
+
+        self._last_tick = time.monotonic()
+        self.ticks += 1
+        blocks = {}
+        for name, source in self.sources.items():
+            block = self._blocks[name][:frames]
+            source.pull(block)
+            blocks[name] = block
+        return blocks
+
+    def clear(self):
+        """清空所有输入缓冲"""
+        for source in self.sources.values():
+            source.clear()
+
+    def get_stats(self) -> dict:
+        """获取调度器状态（每路输入的缓冲/欠载计数）"""
+        return {
+            'master': self.master,
+            'ticks': self.ticks,
+            'stalled_ticks': self.stalled_ticks,
+            'sources': {name: source.get_stats() for name, source in self.sources.items()},
+        }
@@ -7,18 +7,100 @@ import time
 import threading
 import queue
 import numpy as np
-import sounddevice as sd
-from typing import Optional, Callable
+from typing import Optional, Callable, Dict, List
 from rich.console import Console
 
 from .processor import AudioProcessor
+from .mixer import BrowserMixer, soft_limit
+from .scheduler import MixerScheduler, MixerSource
+from .resampler import PolyphaseResampler
+from .ringbuffer import RingBuffer
+from .backend import CALLBACK_FLAGS, get_backend
+from .graph import MixGraph
 from .voice_detector import VoiceActivityDetector, VoiceDetectionConfig
 from .mpv_controller import MPVController
+from ..utils.metrics import Counter, Gauge, Histogram, DURATION_BUCKETS
+from ..config.settings import (
+    MixSourceConfig, MixBusConfig, default_mix_buses,
+    SINK_BROWSER, SINK_CABLE_A, SOURCE_BROWSER_MIC
+)
 
 
 console = Console()
 
 
+class DeviceSink:
+    """
+    额外输出设备（如第二个 Clubdeck 房间的麦克风 Cable）
+
+    由输出渲染线程在渲染 CABLE-A 的同一块里算出它的母线，限幅、重采样、转换声道后写入漂移补偿缓冲，
+    再由该设备自己的输出回调取出。设备格式与 CABLE-A 相同。
+    """
+
+    __slots__ = ('name', 'device_id', 'sample_rate', 'channels', 'resampler', 'buffer', 'limited', 'stream')
+
+    def __init__(self, name: str, device_id: int, internal_rate: int, internal_channels: int,
+                 sample_rate: int, channels: int, prebuffer_frames: int):
+        self.name = name
+        self.device_id = device_id
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.resampler = PolyphaseResampler(internal_rate, sample_rate, internal_channels)
+        self.buffer = MixerSource(name, channels, sample_rate, 0.5, prebuffer_frames, drift_compensation=True)
+        self.limited = np.zeros((8192, internal_channels), dtype=np.int16)
+        self.stream = None   # 设备后端的 OutputStream
+
+
+def capture_time(time_info, frames: int, sample_rate: int) -> float:
+    """
+    PortAudio 回调的 time_info → 本块第一个样本的采集时刻（time.monotonic 时钟）
+
+    PortAudio 的流时钟与 monotonic 不同源，只用两者之差（ADC 到回调的时间）；
+    主机 API 不提供 ADC 时间时按一个块的时长估算
+    """
+    now = time.monotonic()
+    try:
+        age = time_info.currentTime - time_info.inputBufferAdcTime
+    except AttributeError:
+        age = 0.0
+    if not 0.0 < age < 1.0:
+        age = frames / sample_rate
+    return now - age
+
+
+class StreamMetrics:
+    """一个设备流回调的指标（只在该流的回调线程中写入）"""
+
+    __slots__ = ('duration', 'flags')
+
+    def __init__(self, stream: str):
+        self.duration = Histogram('clubvoice_callback_seconds', '设备回调执行时间',
+                                  DURATION_BUCKETS, labels={'stream': stream})
+        self.flags = [(flag, Counter('clubvoice_callback_status_total', '设备回调状态标志（溢出/欠载）计数',
+                                     {'stream': stream, 'flag': flag}))
+                      for flag in CALLBACK_FLAGS]
+
+    def record_status(self, status):
+        for flag, counter in self.flags:
+            if getattr(status, flag, False):
+                counter.inc()
+
+    def metrics(self) -> list:
+        return [self.duration] + [counter for _, counter in self.flags]
+
+
+class MixedFrame:
+    """送往浏览器的一帧混音及其时间戳（monotonic 秒）"""
+
+    __slots__ = ('audio', 'seq', 'captured', 'mixed')
+
+    def __init__(self, audio: np.ndarray, seq: int, captured: float, mixed: float):
+        self.audio = audio
+        self.seq = seq             # 混音帧序号
+        self.captured = captured   # 帧中最早样本的采集时刻
+        self.mixed = mixed         # 入队时刻
+
+
 class VBCableBridge:
     """VB-Cable 音频桥接器 - 3-Cable架构 (Clubdeck + MPV + Browser)"""
     
@@ -37,7 +119,12 @@ class VBCableBridge:
         clubdeck_input_device_id: Optional[int] = None,  # CABLE-C Output: Clubdeck房间输入
         clubdeck_sample_rate: Optional[int] = None,      # Clubdeck设备采样率
         clubdeck_channels: Optional[int] = None,         # Clubdeck设备声道数
-        mix_mode: bool = True                            # 3-Cable架构默认开启混音
+        mix_mode: bool = True,                           # 3-Cable架构默认开启混音
+        drift_target_ms: float = 20.0,                   # 漂移补偿目标缓冲延迟（毫秒）
+        mix_sources: Optional[List[MixSourceConfig]] = None,  # 额外输入源
+        mix_buses: Optional[List[MixBusConfig]] = None,       # 混音母线（None = 3-Cable 默认拓扑）
+        output_prebuffer_blocks: int = 2,                     # CABLE-A 输出环预渲染的块数
+        backend=None                                          # 设备后端（None = 进程默认后端，见 backend.py）
     ):
         """
         初始化VB-Cable桥接器
@@ -48,8 +135,12 @@ class VBCableBridge:
         - CABLE-C: Clubdeck房间 → Python (clubdeck_input_device_id)
         
         Python混音: CABLE-B (MPV) + CABLE-C (Clubdeck) → 浏览器
+        
+        mix_sources / mix_buses 描述混音图: 额外输入设备作为新的列加入，
+        母线按增益求和后送往浏览器、CABLE-A 或其他输出设备。
         """
         # === 3-Cable架构设备配置 ===
+        self.backend = backend or get_backend()
         self.mpv_input_device_id = mpv_input_device_id
         self.clubdeck_input_device_id = clubdeck_input_device_id
         self.browser_output_device_id = browser_output_device_id
@@ -71,37 +162,102 @@ class VBCableBridge:
         self.processor = AudioProcessor(browser_sample_rate, browser_channels)
         
         # 音频队列
-        self.input_queue: queue.Queue = queue.Queue(maxsize=200)   # CABLE-B: MPV音乐 → mixer
-        self.input_queue_2: queue.Queue = queue.Queue(maxsize=200) if mix_mode else None  # CABLE-C: Clubdeck房间
         self.mixed_queue: queue.Queue = queue.Queue(maxsize=200)   # 混音后→浏览器
-        self.output_queue: queue.Queue = queue.Queue(maxsize=200)  # 浏览器麦克风→Clubdeck
-        self.mpv_for_clubdeck_queue: queue.Queue = queue.Queue(maxsize=200)  # MPV音乐副本 → Clubdeck
-        self.browser_audio_cache: queue.Queue = queue.Queue(maxsize=200)  # 浏览器麦克风缓存 → clubdeck混音线程
-        
-        # === MPV 环形缓冲区（0.5秒缓冲，用于 Clubdeck 混音）===
-        # 48000Hz * 0.5s * 2ch = 48000 samples
-        self.mpv_ring_buffer_size = int(browser_sample_rate * 0.5 * 2)
-        self.mpv_ring_buffer = np.zeros(self.mpv_ring_buffer_size, dtype=np.int16)
-        self.mpv_ring_write_pos = 0
-        self.mpv_ring_read_pos = 0
-        self.mpv_ring_lock = threading.Lock()
-        
-        # === 浏览器音频缓冲区（平滑处理大包）===
-        self.browser_audio_buffer = np.array([], dtype=np.int16)
-        self.browser_buffer_lock = threading.Lock()
+        # 混音帧入队后的唤醒（原生线程中调用，必须线程安全且不阻塞，如 Wakeup.notify）
+        self.on_mixed: Optional[Callable[[], None]] = None
+        # 端到端延迟: 每个输入源最近一块的末尾样本采集时刻（输入回调写入），混音帧据此推算自己的采集时刻
+        self._captured_end: Dict[str, float] = {}
+        self._mixed_seq = 0
+        self.latency_capture_to_mix = Histogram(
+            'clubvoice_capture_to_mix_seconds', '输入设备采集到混音帧入队的延迟（含设备缓冲与漂移补偿缓冲）'
+        )
+        self.mixed_dropped = Counter('clubvoice_queue_dropped_total', '队列满时丢弃的帧数', {'queue': 'mixed'})
+        # 每个设备流的回调耗时与状态标志（流在 start() 中创建）
+        self.stream_metrics: Dict[str, StreamMetrics] = {}
+        self._output_metrics = self._stream_metrics('output')
+        
+        # === 输入源（mpv 为主时钟；clubdeck 与额外输入源仅在混音模式下启用）===
+        self.sources: Dict[str, MixSourceConfig] = {
+            'mpv': MixSourceConfig('mpv', mpv_input_device_id, self.mpv_sample_rate, self.mpv_channels)
+        }
+        if mix_mode:
+            if clubdeck_input_device_id is not None:
+                self.sources['clubdeck'] = MixSourceConfig(
+                    'clubdeck', clubdeck_input_device_id, self.clubdeck_sample_rate, self.clubdeck_channels
+                )
+            for source in mix_sources or []:
+                if source.name in self.sources or source.name == SOURCE_BROWSER_MIC:
+                    console.print(f"[yellow]! 忽略重名的输入源: {source.name}[/yellow]")
+                    continue
+                self.sources[source.name] = source
+        
+        # === 设备采样率 ↔ 浏览器采样率的流式重采样器（跨回调保持历史，采样率相同时直通）===
+        self.source_resamplers: Dict[str, PolyphaseResampler] = {
+            name: PolyphaseResampler(source.sample_rate, browser_sample_rate, browser_channels)
+            for name, source in self.sources.items()
+        }
+        self.output_resampler = PolyphaseResampler(browser_sample_rate, self.browser_output_sample_rate, browser_channels)
+
+        # === 实时安全的设备回调 ===
+        # 输入回调只把设备原始数据拷进采集环并唤醒混音线程，声道转换/重采样/分发都在混音线程中完成；
+        # CABLE-A 的音频由输出渲染线程预先混好写入输出环，输出回调只从环中拷出。
+        # 回调里没有控制台输出和数组分配，状态标志只计数；唯一的同步是环由空变非空（被读走）时置位一次事件
+        self.capture_rings: Dict[str, RingBuffer] = {
+            name: RingBuffer(int(source.sample_rate * 0.5), source.channels, np.int16)
+            for name, source in self.sources.items()
+        }
+        self._capture_scratch: Dict[str, np.ndarray] = {
+            name: np.zeros((8192, source.channels), dtype=np.int16)
+            for name, source in self.sources.items()
+        }
+        self._capture_ready = threading.Event()
+        self.output_prebuffer_frames = max(1, output_prebuffer_blocks) * chunk_size
+        self._output_ring = RingBuffer(4 * self.output_prebuffer_frames, self.browser_output_channels, np.int16)
+        self._output_demand = threading.Event()
+
+        # === 时钟漂移补偿 ===
+        # 各根 Cable 的时钟略有差异：对跨时钟域的流做 ±0.1% 以内的分数倍重采样，
+        # 使中间缓冲保持在目标延迟，而不是慢慢涨满后丢帧
+        self.drift_target_frames = int(browser_sample_rate * drift_target_ms / 1000.0)
+        
+        # === 混音调度器（CABLE-B MPV 为主时钟，其他输入漂移补偿后跟随）===
+        # 任何一路缺数据都用淡出/静音补齐，不会丢掉另一路已到达的数据
+        self.mixer_scheduler = MixerScheduler(
+            channels=browser_channels,
+            sample_rate=browser_sample_rate,
+            block_frames=chunk_size
+        )
+        for name in self.sources:
+            if name == 'mpv':
+                self.mixer_scheduler.add_source(name, master=True)
+            else:
+                self.mixer_scheduler.add_source(name, prebuffer_frames=self.drift_target_frames)
+        
+        # === 混音图 ===
+        # 输入域: 主时钟节拍中算出发往浏览器的母线
+        # 输出域: CABLE-A 输出回调中算出所有设备母线（浏览器麦克风 + 经漂移补偿缓冲的输入源）
+        self.output_sources: Dict[str, MixerSource] = {}
+        self.device_sinks: List[DeviceSink] = []
+        self._build_mix_graph(mix_buses if mix_buses is not None else default_mix_buses())
+        
+        # === 浏览器麦克风混音器（每个客户端一个抖动缓冲，多人同时说话时求和）===
+        self.browser_mixer = BrowserMixer(
+            channels=browser_channels,
+            sample_rate=browser_sample_rate,
+            buffer_seconds=0.3
+        )
         
         # 状态
         self.running = False
-        self.input_stream: Optional[sd.InputStream] = None          # MPV音乐流
-        self.input_stream_2: Optional[sd.InputStream] = None        # Clubdeck房间流
-        self.output_stream: Optional[sd.OutputStream] = None        # 浏览器→Clubdeck流
-        
-        # 输出缓冲区
-        self.output_buffer = np.zeros(0, dtype=np.int16)
+        self.input_streams: Dict[str, object] = {}                  # 每个输入源一个输入流
+        self.output_stream = None                                   # 浏览器→Clubdeck流
         
-        # 混音线程
+        # 输出渲染的预分配缓冲
+        self._output_pull = np.zeros((8192, browser_channels), dtype=np.int16)
+
+        # 混音线程（采集环 → 混音调度器 → 浏览器）与输出渲染线程（→ CABLE-A 输出环）
         self.mixer_thread: Optional[threading.Thread] = None
-        self.clubdeck_output_thread: Optional[threading.Thread] = None  # 持续输出到 Clubdeck
+        self.output_thread: Optional[threading.Thread] = None
         
         # 回调
         self.on_audio_received: Optional[Callable[[np.ndarray], None]] = None
@@ -146,54 +302,100 @@ class VBCableBridge:
         console.print(f"[dim]  CABLE-B (MPV):    {self.mpv_channels}ch @ {self.mpv_sample_rate}Hz (device {self.mpv_input_device_id})[/dim]")
         if mix_mode and self.clubdeck_input_device_id is not None:
             console.print(f"[dim]  CABLE-C (Clubdeck): {self.clubdeck_channels}ch @ {self.clubdeck_sample_rate}Hz (device {self.clubdeck_input_device_id})[/dim]")
+        for name, source in self.sources.items():
+            if name not in ('mpv', 'clubdeck'):
+                console.print(f"[dim]  Source {name}: {source.channels}ch @ {source.sample_rate}Hz (device {source.device_id})[/dim]")
         if self.browser_output_device_id is not None:
             console.print(f"[dim]  CABLE-A (Browser):  {self.browser_output_channels}ch @ {self.browser_output_sample_rate}Hz (device {self.browser_output_device_id})[/dim]")
         console.print(f"[dim]  Internal: {browser_channels}ch @ {browser_sample_rate}Hz[/dim]")
         console.print(f"[dim]  Chunk Size: {chunk_size} frames[/dim]")
         if mix_mode:
             console.print(f"[yellow]* Mode: Dual-input mixing + MPV broadcast (3-Cable)[/yellow]")
-            console.print(f"[dim]  → Browser: Clubdeck + MPV | Clubdeck: Browser mic + MPV[/dim]")
+            for graph in (self.browser_graph, self.output_graph):
+                for bus, gains in graph.get_stats().items():
+                    terms = ' + '.join(f"{source}×{gain:g}" for source, gain in gains.items()) or '(silence)'
+                    console.print(f"[dim]  → {bus}: {terms}[/dim]")
         else:
             console.print(f"[yellow]* Mode: Single-direction receive (listen-only)[/yellow]")
     
-    def _resample(self, audio_data: np.ndarray, from_rate: int, to_rate: int) -> np.ndarray:
-        """简单的线性插值重采样"""
-        if from_rate == to_rate:
-            return audio_data
+    def _build_mix_graph(self, buses: List[MixBusConfig]) -> None:
+        """
+        按母线配置建立输入域/输出域两个混音图
         
-        # 计算新长度
-        ratio = to_rate / from_rate
-        old_length = len(audio_data)
-        new_length = int(old_length * ratio)
+        - 输出目标为 browser 的母线在主时钟节拍中计算（只能有一条）
+        - 输出目标为 cable_a 或设备ID 的母线在 CABLE-A 输出回调中计算；
+          它们引用的输入源额外写一份到输出域的漂移补偿缓冲
+        """
+        browser_bus: Optional[MixBusConfig] = None
+        cable_a_bus: Optional[MixBusConfig] = None
+        extra_buses: List[MixBusConfig] = []
+        
+        for bus in buses:
+            gains = {}
+            for source, gain in bus.gains.items():
+                known = source in self.sources or (source == SOURCE_BROWSER_MIC and bus.sink != SINK_BROWSER)
+                if known:
+                    gains[source] = gain
+                else:
+                    console.print(f"[yellow]! 母线 {bus.name}: 忽略不可用的输入源 {source}[/yellow]")
+            bus = MixBusConfig(bus.name, bus.sink, gains)
+            
+            if bus.sink == SINK_BROWSER:
+                if browser_bus is not None:
+                    console.print(f"[yellow]! 只能有一条母线发往浏览器，忽略 {bus.name}[/yellow]")
+                    continue
+                browser_bus = bus
+            elif self.browser_output_device_id is None:
+                console.print(f"[yellow]! 半双工模式没有 CABLE-A 输出，忽略母线 {bus.name}[/yellow]")
+            elif bus.sink == SINK_CABLE_A or bus.sink == str(self.browser_output_device_id):
+                if cable_a_bus is not None:
+                    console.print(f"[yellow]! 只能有一条母线发往 CABLE-A，忽略 {bus.name}[/yellow]")
+                    continue
+                cable_a_bus = bus
+            elif bus.sink.isdigit():
+                extra_buses.append(bus)
+            else:
+                console.print(f"[yellow]! 母线 {bus.name}: 未知的输出目标 {bus.sink}[/yellow]")
         
-        # 线性插值
-        old_indices = np.arange(old_length)
-        new_indices = np.linspace(0, old_length - 1, new_length)
-        resampled = np.interp(new_indices, old_indices, audio_data.astype(np.float32))
+        # 输入域
+        self.browser_graph = MixGraph(list(self.sources), self.browser_channels)
+        if browser_bus is not None:
+            self.browser_graph.add_bus(browser_bus.name, browser_bus.gains)
         
-        return resampled.astype(np.int16)
+        # 输出域: 第 0 条母线固定为 CABLE-A
+        device_buses = []
+        if self.browser_output_device_id is not None:
+            if cable_a_bus is None:
+                console.print(f"[yellow]! 没有发往 CABLE-A 的母线，CABLE-A 将输出静音[/yellow]")
+                cable_a_bus = MixBusConfig(SINK_CABLE_A, SINK_CABLE_A, {})
+            device_buses = [cable_a_bus] + extra_buses
+        
+        for bus in device_buses:
+            for source, gain in bus.gains.items():
+                if source != SOURCE_BROWSER_MIC and gain and source not in self.output_sources:
+                    self.output_sources[source] = MixerSource(
+                        source, self.browser_channels, self.browser_sample_rate, 0.5,
+                        self.drift_target_frames, drift_compensation=True
+                    )
+        
+        self.output_graph = MixGraph([SOURCE_BROWSER_MIC] + list(self.output_sources), self.browser_channels)
+        for bus in device_buses:
+            self.output_graph.add_bus(bus.name, {k: v for k, v in bus.gains.items() if v})
+        
+        for bus in extra_buses:
+            sink_rate = self.browser_output_sample_rate
+            self.device_sinks.append(DeviceSink(
+                bus.name, int(bus.sink), self.browser_sample_rate, self.browser_channels,
+                sink_rate, self.browser_output_channels, int(sink_rate * self.drift_target_frames / self.browser_sample_rate)
+            ))
     
-    def _resample_stereo(self, audio_data: np.ndarray, from_rate: int, to_rate: int, channels: int) -> np.ndarray:
-        """重采样立体声数据"""
-        if from_rate == to_rate:
-            return audio_data
-        
-        frames = len(audio_data) // channels
-        reshaped = audio_data.reshape(frames, channels)
-        
-        # 分别重采样每个声道
-        resampled_channels = []
-        for ch in range(channels):
-            resampled = self._resample(reshaped[:, ch], from_rate, to_rate)
-            resampled_channels.append(resampled)
-        
-        # 合并声道
-        new_frames = len(resampled_channels[0])
-        result = np.zeros((new_frames, channels), dtype=np.int16)
-        for ch in range(channels):
-            result[:, ch] = resampled_channels[ch]
-        
-        return result
+    def set_mix_gain(self, bus: str, source: str, gain: float) -> None:
+        """运行时调整某条母线上某个输入源的增益（线性）"""
+        for graph in (self.browser_graph, self.output_graph):
+            if bus in graph.bus_index:
+                graph.set_gain(bus, source, gain)
+                return
+        raise KeyError(f"未知的母线: {bus}")
     
     def _convert_to_stereo(self, audio_data: np.ndarray, source_channels: int) -> np.ndarray:
         """将多声道音频转换为立体声"""
@@ -229,66 +431,6 @@ class VBCableBridge:
             reshaped = audio_data.reshape(frames, source_channels)
             return reshaped[:, :2].copy()
     
-    def _write_to_mpv_ring_buffer(self, data: np.ndarray) -> None:
-        """写入 MPV 环形缓冲区"""
-        with self.mpv_ring_lock:
-            data_len = len(data)
-            buf_size = self.mpv_ring_buffer_size
-            
-            # 写入位置
-            write_pos = self.mpv_ring_write_pos
-            
-            if write_pos + data_len <= buf_size:
-                # 不需要回绕
-                self.mpv_ring_buffer[write_pos:write_pos + data_len] = data
-            else:
-                # 需要回绕
-                first_part = buf_size - write_pos
-                self.mpv_ring_buffer[write_pos:] = data[:first_part]
-                self.mpv_ring_buffer[:data_len - first_part] = data[first_part:]
-            
-            self.mpv_ring_write_pos = (write_pos + data_len) % buf_size
-    
-    def _read_from_mpv_ring_buffer(self, length: int) -> np.ndarray:
-        """从 MPV 环形缓冲区读取指定长度的数据"""
-        with self.mpv_ring_lock:
-            buf_size = self.mpv_ring_buffer_size
-            read_pos = self.mpv_ring_read_pos
-            
-            # 计算可用数据量
-            write_pos = self.mpv_ring_write_pos
-            if write_pos >= read_pos:
-                available = write_pos - read_pos
-            else:
-                available = buf_size - read_pos + write_pos
-            
-            # 如果请求的长度超过可用数据，返回静音+可用数据
-            if available < length:
-                # 返回可用数据 + 静音填充
-                result = np.zeros(length, dtype=np.int16)
-                if available > 0:
-                    if read_pos + available <= buf_size:
-                        result[:available] = self.mpv_ring_buffer[read_pos:read_pos + available]
-                    else:
-                        first_part = buf_size - read_pos
-                        result[:first_part] = self.mpv_ring_buffer[read_pos:]
-                        result[first_part:available] = self.mpv_ring_buffer[:available - first_part]
-                    self.mpv_ring_read_pos = (read_pos + available) % buf_size
-                return result
-            
-            # 正常读取
-            if read_pos + length <= buf_size:
-                result = self.mpv_ring_buffer[read_pos:read_pos + length].copy()
-            else:
-                first_part = buf_size - read_pos
-                result = np.concatenate([
-                    self.mpv_ring_buffer[read_pos:],
-                    self.mpv_ring_buffer[:length - first_part]
-                ])
-            
-            self.mpv_ring_read_pos = (read_pos + length) % buf_size
-            return result
-    
     def _convert_from_stereo(self, audio_data: np.ndarray, target_channels: int) -> np.ndarray:
         """将立体声转换为目标声道数"""
         if target_channels == self.browser_channels:
@@ -308,64 +450,72 @@ class VBCableBridge:
             multi[:, 1] = stereo[:, 1]
             return multi
     
-    def _input_callback(self, indata: np.ndarray, frames: int, time_info, status):
-        """输入流1回调 - 接收第一个设备音频"""
-        if status:
-            console.print(f"[yellow]输入1状态: {status}[/yellow]")
-        
-        # 正确处理数据类型 - indata 是 int16 格式
-        audio_data = indata.copy().astype(np.int16)
-        
-        # 1. 先转换为立体声（浏览器端格式）
-        stereo_data = self._convert_to_stereo(audio_data, self.mpv_channels)
-        
-        # 2. 如果采样率不同，进行重采样
-        if self.mpv_sample_rate != self.browser_sample_rate:
-            stereo_data = self._resample_stereo(
-                stereo_data.flatten(), 
-                self.mpv_sample_rate, 
-                self.browser_sample_rate,
-                self.browser_channels
-            )
-        
-        # 3. 放入对应队列（双路分发：mixer + send_to_clubdeck）
-        try:
-            if self.mix_mode:
-                # 副本1：给mixer用（Clubdeck + MPV → 浏览器）
-                self.input_queue.put_nowait(stereo_data)
-                # 副本2：写入环形缓冲区（给 output_callback 混音用）
-                self._write_to_mpv_ring_buffer(stereo_data.flatten())
-            else:
-                # 单输入模式：直接放入混音队列
-                self.mixed_queue.put_nowait(stereo_data)
-        except queue.Full:
-            pass  # 队列满时丢弃
+    def _make_input_callback(self, name: str) -> Callable:
+        """
+        创建某个输入源的设备回调（实时安全）
+
+        只做: 状态标志计数 → 原始数据拷进采集环 → 记录采集时刻 → 唤醒混音线程
+        """
+        metrics = self._stream_metrics(f'input_{name}')
+        ring = self.capture_rings[name]
+        ready = self._capture_ready
+        captured_end = self._captured_end
+        sample_rate = self.sources[name].sample_rate
+        def callback(indata: np.ndarray, frames: int, time_info, status):
+            start = time.perf_counter()
+            if status:
+                metrics.record_status(status)
+            ring.write(indata)
+            captured_end[name] = capture_time(time_info, frames, sample_rate) + frames / sample_rate
+            if not ready.is_set():
+                ready.set()
+            metrics.duration.observe(time.perf_counter() - start)
+        return callback
     
-    def _input_callback_2(self, indata: np.ndarray, frames: int, time_info, status):
-        """输入流2回调 - 接收第二个设备音频"""
-        if status:
-            console.print(f"[yellow]输入2状态: {status}[/yellow]")
-        
-        # 正确处理数据类型 - indata 是 int16 格式
-        audio_data = indata.copy().astype(np.int16)
-        
+    def _stream_metrics(self, stream: str) -> StreamMetrics:
+        metrics = self.stream_metrics.get(stream)
+        if metrics is None:
+            metrics = self.stream_metrics[stream] = StreamMetrics(stream)
+        return metrics
+    
+    def _ingest_captured(self) -> None:
+        """混音线程: 取出各采集环中的原始数据，逐段转换格式后分发"""
+        for name, ring in self.capture_rings.items():
+            scratch = self._capture_scratch[name]
+            sample_rate = self.sources[name].sample_rate
+            while True:
+                pending = ring.fill
+                count = ring.read_into(scratch)
+                if not count:
+                    break
+                end = self._captured_end.get(name, time.monotonic())
+                self._on_source_audio(name, scratch[:count], end - pending / sample_rate)
+
+    def _on_source_audio(self, name: str, audio_data: np.ndarray, captured: Optional[float] = None) -> None:
+        """输入源音频（混音线程中调用）- 转换格式后分发到混音调度器（输入域）和输出域缓冲"""
+        source = self.sources[name]
+        if captured is None:
+            captured = time.monotonic() - len(audio_data) / source.sample_rate
+
         # 1. 先转换为立体声（浏览器端格式）
-        stereo_data = self._convert_to_stereo(audio_data, self.clubdeck_channels)
-        
+        stereo_data = self._convert_to_stereo(audio_data, source.channels)
+
         # 2. 如果采样率不同，进行重采样
-        if self.clubdeck_sample_rate != self.browser_sample_rate:
-            stereo_data = self._resample_stereo(
-                stereo_data.flatten(), 
-                self.clubdeck_sample_rate, 
-                self.browser_sample_rate,
-                self.browser_channels
-            )
-        
-        # 3. 放入第二个输入队列
-        try:
-            self.input_queue_2.put_nowait(stereo_data)
-        except queue.Full:
-            pass  # 队列满时丢弃
+        if source.sample_rate != self.browser_sample_rate:
+            stereo_data = self.source_resamplers[name].process(stereo_data)
+
+        # 3. 分发
+        if not self.mix_mode:
+            # 单输入模式：直接放入混音队列（可能是采集环暂存区的视图，入队前复制）
+            self._push_mixed(stereo_data.copy(), captured)
+            return
+
+        # 副本1：输出域缓冲（给 CABLE-A 输出渲染混音用），按填充量做漂移补偿
+        output_source = self.output_sources.get(name)
+        if output_source is not None:
+            output_source.push(stereo_data)
+        # 副本2：混音调度器（主时钟输入同时驱动混音节拍）
+        self.mixer_scheduler.push(name, stereo_data)
     
     def _calculate_volume(self, audio_data: np.ndarray) -> float:
         """
@@ -402,85 +552,25 @@ class VBCableBridge:
         return '█' * filled + '░' * empty
     
     def _mixer_worker(self):
-        """Mixing worker thread - combines audio from two input queues"""
+        """混音工作线程 - 转换采集环中的输入，并按主时钟节拍计算浏览器母线"""
         console.print(f"[dim]* Mixing thread started[/dim]")
         
-        import sys
-        
         while self.running:
             try:
-                # 从两个输入队列获取数据
-                # audio1 = input_queue = MPV 音乐 (device 35, CABLE-B Output)
-                # audio2 = input_queue_2 = Clubdeck 房间 (device 34, CABLE Output)
-                audio1 = self.input_queue.get(timeout=0.05)
-                audio2 = self.input_queue_2.get(timeout=0.05)
-                
-                # === 计算音量 ===
-                volume1 = self._calculate_volume(audio1.flatten())
-                volume2 = self._calculate_volume(audio2.flatten())
+                # 等待输入回调写入采集环（主时钟停顿时按 stall_timeout 醒来补出节拍）
+                self._capture_ready.wait(self.mixer_scheduler.stall_timeout)
+                self._capture_ready.clear()
+                self._ingest_captured()
+                if not self.mix_mode:
+                    continue
                 
-                # === 语音活动检测（针对 Clubdeck 房间语音）===
-                has_voice = False
-                if self.ducking_enabled and self.voice_detector:
-                    # 检测 Clubdeck 房间中是否有人说话 (audio2 = Clubdeck)
-                    has_voice = self.voice_detector.detect(audio2.flatten())
-                    
-                    # 根据检测结果控制 MPV 音量
-                    if self.mpv_controller and self.mpv_controller.is_enabled():
-                        self.mpv_controller.set_ducking(has_voice)
-                
-                # 确保形状一致
-                if audio1.shape != audio2.shape:
-                    # 调整到相同长度（取较短的）
-                    min_len = min(len(audio1.flatten()), len(audio2.flatten()))
-                    audio1 = audio1.flatten()[:min_len].reshape(-1, self.browser_channels)
-                    audio2 = audio2.flatten()[:min_len].reshape(-1, self.browser_channels)
-                
-                # 混音：简单相加（MPV 音量由 MPV Controller 控制）
-                # 使用 int32 避免溢出，然后限制到 int16 范围
-                mixed_int32 = audio1.astype(np.int32) + audio2.astype(np.int32)
-                mixed = np.clip(mixed_int32, -32768, 32767).astype(np.int16)
-                
-                # 放入混音队列
-                try:
-                    self.mixed_queue.put_nowait(mixed)
-                except queue.Full:
-                    pass
-                
-                # === 实时显示音量（每帧刷新）===
-                self._frame_count += 1
-                if self._frame_count % 5 == 0:  # 每5帧刷新一次显示
-                    bar1 = self._create_volume_bar(volume1, 20)
-                    bar2 = self._create_volume_bar(volume2, 20)
-                    
-                    # 语音状态指示
-                    voice_icon = "🔊" if has_voice else "  "
-                    
-                    # 获取 MPV 当前音量
-                    mpv_vol = self.mpv_controller.get_current_volume() if self.mpv_controller else 100
+                # 主时钟的数据已全部进入调度器，不再等待
+                while self.running:
+                    blocks = self.mixer_scheduler.tick(timeout=0)
+                    if blocks is None:
+                        break
+                    self._mix_tick(blocks)
                     
-                    # 获取客户端连接数、麦克风音量和 ducking 状态
-                    from src.server.websocket_handler import get_connection_count, get_mic_volume, get_ducking_info
-                    clients = get_connection_count()
-                    mic_vol = get_mic_volume()
-                    is_ducking, ducking_amp = get_ducking_info()
-                    
-                    # 麦克风音量条 (缩短显示宽度)
-                    mic_bar = self._create_volume_bar(mic_vol, 10)
-                    mic_display = f"🎤[{mic_bar}]{mic_vol:4.0f}%" if clients > 0 else ""
-                    
-                    # Ducking 状态显示
-                    ducking_display = f"🔇{ducking_amp:.0f}" if is_ducking else ""
-                    
-                    # 单行显示（使用 \r 回到行首）- 精简版避免截断
-                    # bar1=MPV音乐, bar2=Clubdeck房间 (缩短 bar 宽度)
-                    bar1_short = self._create_volume_bar(volume1, 10)
-                    bar2_short = self._create_volume_bar(volume2, 10)
-                    sys.stdout.write(f"\r👤{clients}|MPV{mpv_vol:3d}%|音乐[{bar1_short}]{volume1:4.0f}%|CD[{bar2_short}]{volume2:4.0f}%{voice_icon}{mic_display}{ducking_display}    ")
-                    sys.stdout.flush()
-                    
-            except queue.Empty:
-                continue
             except Exception as e:
                 if self.running:
                     console.print(f"[red]Mixing error: {e}[/red]")
@@ -488,80 +578,191 @@ class VBCableBridge:
                     traceback.print_exc()
         
         # 退出时换行
-        sys.stdout.write("\n")
-        sys.stdout.flush()
+        if self.mix_mode:
+            sys.stdout.write("\n")
+            sys.stdout.flush()
         console.print(f"[dim]* Mixing thread stopped[/dim]")
     
-    def _mpv_callback(self, indata: np.ndarray, frames: int, time_info, status):
-        """MPV 输入流回调 - 接收 MPV 音乐，缓存以供混音使用"""
-        if status:
-            console.print(f"[yellow]MPV 输入状态: {status}[/yellow]")
-        
+    def _mix_tick(self, blocks: Dict[str, np.ndarray]) -> None:
+        """一个混音节拍: 音量/VAD → 浏览器母线入队 → 状态行"""
+        # 各输入取同样帧数（缺数据的已补齐）
+        # audio1 = MPV 音乐 (device 35, CABLE-B Output)，主时钟
+        # audio2 = Clubdeck 房间 (device 34, CABLE Output)，漂移补偿后跟随
+        audio1 = blocks['mpv']
+        audio2 = blocks.get('clubdeck')
+        
+        # === 计算音量 ===
+        volume1 = self._calculate_volume(audio1.flatten())
+        volume2 = self._calculate_volume(audio2.flatten()) if audio2 is not None else 0.0
+        
+        # === 语音活动检测（针对 Clubdeck 房间语音）===
+        has_voice = False
+        if self.ducking_enabled and self.voice_detector and audio2 is not None:
+            # 检测 Clubdeck 房间中是否有人说话 (audio2 = Clubdeck)
+            has_voice = self.voice_detector.detect(audio2.flatten())
+            
+            # 根据检测结果控制 MPV 音量
+            if self.mpv_controller and self.mpv_controller.is_enabled():
+                self.mpv_controller.set_ducking(has_voice)
+        
+        # 混音：按混音图增益矩阵一次算出浏览器母线（MPV 音量由 MPV Controller 控制）
+        if self.browser_graph.buses:
+            for name, block in blocks.items():
+                self.browser_graph.load(name, block)
+            bus = self.browser_graph.mix(len(audio1))[0]
+            mixed = np.clip(bus, -32768, 32767).astype(np.int16)
+            
+            # 放入混音队列（采集时刻取各输入中最早的样本）
+            self._push_mixed(mixed, self._block_captured(blocks))
+        
+        # === 实时显示音量（每帧刷新）===
+        self._frame_count += 1
+        if self._frame_count % 5 == 0:  # 每5帧刷新一次显示
+            # 语音状态指示
+            voice_icon = "🔊" if has_voice else "  "
+            
+            # 获取 MPV 当前音量
+            mpv_vol = self.mpv_controller.get_current_volume() if self.mpv_controller else 100
+            
+            # 获取客户端连接数、麦克风音量和 ducking 状态
+            from src.server.websocket_handler import get_connection_count, get_mic_volume, get_ducking_info, get_latency_ms
+            clients = get_connection_count()
+            mic_vol = get_mic_volume()
+            is_ducking, ducking_amp = get_ducking_info()
+            latency_ms = get_latency_ms()
+            
+            # 麦克风音量条 (缩短显示宽度)
+            mic_bar = self._create_volume_bar(mic_vol, 10)
+            mic_display = f"🎤[{mic_bar}]{mic_vol:4.0f}%" if clients > 0 else ""
+            
+            # Ducking 状态显示
+            ducking_display = f"🔇{ducking_amp:.0f}" if is_ducking else ""
+            
+            # 延迟（有客户端回报时为端到端，否则为服务端采集→发送）
+            latency_display = f"|⏱{latency_ms:.0f}ms" if latency_ms is not None else ""
+            
+            # 设备回调报告的溢出/欠载（回调里只计数，在这里汇总显示）
+            xruns = self.get_xrun_count()
+            xrun_display = f"|xrun{xruns}" if xruns else ""
+            
+            # 单行显示（使用 \r 回到行首）- 精简版避免截断
+            # bar1=MPV音乐, bar2=Clubdeck房间 (缩短 bar 宽度)
+            bar1_short = self._create_volume_bar(volume1, 10)
+            bar2_short = self._create_volume_bar(volume2, 10)
+            sys.stdout.write(f"\r👤{clients}|MPV{mpv_vol:3d}%|音乐[{bar1_short}]{volume1:4.0f}%|CD[{bar2_short}]{volume2:4.0f}%{voice_icon}{mic_display}{ducking_display}{latency_display}{xrun_display}    ")
+            sys.stdout.flush()
+    
     def _output_callback(self, outdata: np.ndarray, frames: int, time_info, status):
-        """输出流回调 - 发送浏览器音频+MPV音乐到 Clubdeck"""
+        """
+        CABLE-A 输出流回调（实时安全）- 从输出环拷出渲染线程预先混好的音频，不足部分补静音
+
+        读走数据后唤醒渲染线程补足输出环
+        """
+        start = time.perf_counter()
         if status:
-            console.print(f"[yellow]输出状态: {status}[/yellow]")
-        
-        # 计算需要的输出设备采样数
-        ratio = self.browser_sample_rate / self.browser_output_sample_rate
-        needed_browser_frames = int(frames * ratio)
-        needed_stereo_samples = needed_browser_frames * self.browser_channels
-        
-        # 1. 从浏览器缓冲区读取音频
-        browser_buffer = np.array([], dtype=np.int16)
-        with self.browser_buffer_lock:
-            if len(self.browser_audio_buffer) >= needed_stereo_samples:
-                browser_buffer = self.browser_audio_buffer[:needed_stereo_samples]
-                self.browser_audio_buffer = self.browser_audio_buffer[needed_stereo_samples:]
-            elif len(self.browser_audio_buffer) > 0:
-                browser_buffer = self.browser_audio_buffer.copy()
-                self.browser_audio_buffer = np.array([], dtype=np.int16)
-        
-        # 2. 从环形缓冲区读取MPV音频
-        mpv_buffer = self._read_from_mpv_ring_buffer(needed_stereo_samples)
-        
-        # 3. 混音：浏览器 100% + MPV 30%
-        if len(browser_buffer) > 0:
-            # 有浏览器音频，进行混音
-            min_len = min(len(browser_buffer), len(mpv_buffer))
-            mixed = browser_buffer[:min_len].astype(np.int32) + (mpv_buffer[:min_len].astype(np.int32) * 3 // 10)
-            stereo_data = np.clip(mixed, -32768, 32767).astype(np.int16)
-            # 补齐长度
-            if len(stereo_data) < needed_stereo_samples:
-                # 用剩余的MPV填充
-                remaining = needed_stereo_samples - len(stereo_data)
-                if len(mpv_buffer) > min_len:
-                    stereo_data = np.concatenate([stereo_data, mpv_buffer[min_len:min_len + remaining]])
-                else:
-                    stereo_data = np.concatenate([stereo_data, np.zeros(remaining, dtype=np.int16)])
-        else:
-            # 没有浏览器音频，只播放MPV
-            stereo_data = mpv_buffer
+            self._output_metrics.record_status(status)
+        count = self._output_ring.read_into(outdata)
+        if count < frames:
+            self._output_ring.underruns += frames - count
+            outdata[count:] = 0
+        if not self._output_demand.is_set():
+            self._output_demand.set()
+        self._output_metrics.duration.observe(time.perf_counter() - start)
+    
+    def _output_worker(self):
+        """输出渲染线程 - 输出环低于预渲染量时按混音图渲染，输出回调读走数据后被唤醒"""
+        console.print(f"[dim]* Output render thread started[/dim]")
+        ring = self._output_ring
+        period = self.chunk_size / self.browser_output_sample_rate
+        
+        while self.running:
+            try:
+                self._output_demand.clear()
+                while self.running and ring.fill < self.output_prebuffer_frames:
+                    if not self._render_output(self.chunk_size):
+                        break
+                self._output_demand.wait(period)
+            except Exception as e:
+                if self.running:
+                    console.print(f"[red]Output render error: {e}[/red]")
+                    import traceback
+                    traceback.print_exc()
+        
+        console.print(f"[dim]* Output render thread stopped[/dim]")
+    
+    def _render_output(self, frames: int) -> int:
+        """
+        渲染 frames 帧 CABLE-A 设备格式的音频写入输出环: 浏览器麦克风 + 输入源按混音图混音（及其他输出设备）
+        
+        Returns:
+            写入输出环的帧数
+        """
+        # 计算需要的浏览器采样率帧数（由重采样器按当前相位精确给出）
+        needed_browser_frames = self.output_resampler.input_frames_needed(frames)
         
-        # 确保长度正确
-        if len(stereo_data) < needed_stereo_samples:
-            stereo_data = np.concatenate([stereo_data, np.zeros(needed_stereo_samples - len(stereo_data), dtype=np.int16)])
-        elif len(stereo_data) > needed_stereo_samples:
-            stereo_data = stereo_data[:needed_stereo_samples]
+        graph = self.output_graph
+        
+        # 1. 混合所有浏览器客户端的麦克风（按样本对齐求和）
+        graph.load(SOURCE_BROWSER_MIC, self.browser_mixer.mix(needed_browser_frames))
+        
+        # 2. 从输出域缓冲读取各输入源（不足部分淡出/静音补齐）
+        if needed_browser_frames > len(self._output_pull):
+            self._output_pull = np.zeros((needed_browser_frames, self.browser_channels), dtype=np.int16)
+        pulled = self._output_pull[:needed_browser_frames]
+        for name, source in self.output_sources.items():
+            source.pull(pulled)
+            graph.load(name, pulled)
+        
+        # 3. 混音：增益矩阵一次算出所有设备母线（默认 浏览器 100% + MPV 30%），软限幅
+        buses = graph.mix(needed_browser_frames)
+        stereo_data = self.browser_mixer.limit(buses[0])
+        for sink, bus in zip(self.device_sinks, buses[1:]):
+            self._push_device_sink(sink, bus)
         
         # 4. 重采样和声道转换
         if self.browser_sample_rate != self.browser_output_sample_rate:
-            stereo_data = self._resample_stereo(
-                stereo_data, 
-                self.browser_sample_rate, 
-                self.browser_output_sample_rate,
-                self.browser_channels
-            )
+            stereo_data = self.output_resampler.process(stereo_data, max_frames=frames)
         
-        output_data = self._convert_from_stereo(stereo_data.flatten(), self.browser_output_channels)
+        output_data = self._convert_from_stereo(stereo_data.reshape(-1), self.browser_output_channels)
         
-        # 5. 输出
-        expected_samples = frames * self.browser_output_channels
-        if len(output_data.flatten()) >= expected_samples:
-            outdata[:] = output_data.flatten()[:expected_samples].reshape(frames, self.browser_output_channels)
-        else:
-            outdata[:len(output_data)] = output_data
-            outdata[len(output_data):] = 0
+        # 5. 写入输出环
+        return self._output_ring.write(output_data)
+    
+    def _push_device_sink(self, sink: DeviceSink, bus: np.ndarray) -> None:
+        """限幅、重采样、转换声道后写入额外输出设备的缓冲"""
+        if len(bus) > len(sink.limited):
+            sink.limited = np.zeros((len(bus), self.browser_channels), dtype=np.int16)
+        limited = sink.limited[:len(bus)]
+        soft_limit(bus, limited, self.browser_mixer.limiter_threshold)
+        data = sink.resampler.process(limited)
+        sink.buffer.push(self._convert_from_stereo(data.reshape(-1), sink.channels))
+    
+    def _make_sink_callback(self, sink: DeviceSink) -> Callable:
+        """创建额外输出设备的回调（实时安全，直接从渲染线程写好的缓冲取到 outdata）"""
+        metrics = self._stream_metrics(f'output_{sink.name}')
+        def callback(outdata: np.ndarray, frames: int, time_info, status):
+            start = time.perf_counter()
+            if status:
+                metrics.record_status(status)
+            sink.buffer.pull(outdata)
+            metrics.duration.observe(time.perf_counter() - start)
+        return callback
+    
+    def _close_streams(self) -> None:
+        """停止并关闭所有设备流"""
+        streams = list(self.input_streams.values()) + [self.output_stream] + [sink.stream for sink in self.device_sinks]
+        for stream in streams:
+            if stream is None:
+                continue
+            try:
+                stream.stop()
+                stream.close()
+            except Exception:
+                pass
+        self.input_streams = {}
+        self.output_stream = None
+        for sink in self.device_sinks:
+            sink.stream = None
     
     def start(self) -> None:
         """启动音频桥接"""
@@ -572,9 +773,13 @@ class VBCableBridge:
         
         # 验证设备是否存在
         try:
-            devices = sd.query_devices()
-            if self.mpv_input_device_id < 0 or self.mpv_input_device_id >= len(devices):
-                raise ValueError(f"MPV输入设备 ID {self.mpv_input_device_id} 无效（总设备数: {len(devices)}）")
+            devices = self.backend.query_devices()
+            for name, source in self.sources.items():
+                if source.device_id < 0 or source.device_id >= len(devices):
+                    raise ValueError(f"输入源 {name} 设备 ID {source.device_id} 无效（总设备数: {len(devices)}）")
+            for sink in self.device_sinks:
+                if sink.device_id < 0 or sink.device_id >= len(devices):
+                    raise ValueError(f"输出 {sink.name} 设备 ID {sink.device_id} 无效（总设备数: {len(devices)}）")
             
             # 只在有输出设备时验证输出设备
             if self.browser_output_device_id is not None:
@@ -586,41 +791,31 @@ class VBCableBridge:
             raise
         
         try:
-            # 启动输入流1 (MPV音乐)
-            self.input_stream = sd.InputStream(
-                device=self.mpv_input_device_id,
-                samplerate=self.mpv_sample_rate,
-                channels=self.mpv_channels,
-                dtype='int16',
-                blocksize=self.chunk_size,
-                callback=self._input_callback
-            )
-            self.input_stream.start()
-            console.print(f"[dim]* MPV input stream started: device {self.mpv_input_device_id}, {self.mpv_sample_rate}Hz, {self.mpv_channels}ch[/dim]")
+            # 启动混音线程（采集环 → 格式转换 → 按混音图混合所有输入 → 浏览器）
+            self.mixer_thread = threading.Thread(target=self._mixer_worker, daemon=True)
+            self.mixer_thread.start()
             
-            # 如果启用混音模式，启动第二个输入流 (Clubdeck房间)
-            if self.mix_mode and self.clubdeck_input_device_id is not None:
-                self.input_stream_2 = sd.InputStream(
-                    device=self.clubdeck_input_device_id,
-                    samplerate=self.clubdeck_sample_rate,
-                    channels=self.clubdeck_channels,
+            # 启动所有输入流（MPV音乐 / Clubdeck房间 / 额外输入源）
+            for name, source in self.sources.items():
+                stream = self.backend.InputStream(
+                    device=source.device_id,
+                    samplerate=source.sample_rate,
+                    channels=source.channels,
                     dtype='int16',
                     blocksize=self.chunk_size,
-                    callback=self._input_callback_2
+                    callback=self._make_input_callback(name)
                 )
-                self.input_stream_2.start()
-                console.print(f"[dim]* Clubdeck input stream started: device {self.clubdeck_input_device_id}, {self.clubdeck_sample_rate}Hz, {self.clubdeck_channels}ch[/dim]")
-                
-                # 启动混音线程（Clubdeck + MPV → 浏览器）
-                self.mixer_thread = threading.Thread(target=self._mixer_worker, daemon=True)
-                self.mixer_thread.start()
-                
-                # 注意：浏览器麦克风 + MPV → Clubdeck 的混音现在直接在 _output_callback 中完成
-                # 不再需要独立的 clubdeck_output_thread
+                stream.start()
+                self.input_streams[name] = stream
+                console.print(f"[dim]* Input stream '{name}' started: device {source.device_id}, {source.sample_rate}Hz, {source.channels}ch[/dim]")
             
             # 只在双向模式时启动输出流
             if self.browser_output_device_id is not None:
-                self.output_stream = sd.OutputStream(
+                # 浏览器麦克风 + MPV → Clubdeck 的混音在输出渲染线程中完成，先预渲染再启动输出流
+                self.output_thread = threading.Thread(target=self._output_worker, daemon=True)
+                self.output_thread.start()
+                
+                self.output_stream = self.backend.OutputStream(
                     device=self.browser_output_device_id,
                     samplerate=self.browser_output_sample_rate,
                     channels=self.browser_output_channels,
@@ -630,6 +825,19 @@ class VBCableBridge:
                 )
                 self.output_stream.start()
                 console.print(f"[green]* Browser output stream started: device {self.browser_output_device_id}, {self.browser_output_sample_rate}Hz, {self.browser_output_channels}ch[/green]")
+                
+                # 额外输出设备（由 CABLE-A 输出回调驱动）
+                for sink in self.device_sinks:
+                    sink.stream = self.backend.OutputStream(
+                        device=sink.device_id,
+                        samplerate=sink.sample_rate,
+                        channels=sink.channels,
+                        dtype='int16',
+                        blocksize=self.chunk_size,
+                        callback=self._make_sink_callback(sink)
+                    )
+                    sink.stream.start()
+                    console.print(f"[green]* Output '{sink.name}' started: device {sink.device_id}, {sink.sample_rate}Hz, {sink.channels}ch[/green]")
             else:
                 console.print(f"[dim]! Half-duplex mode: output stream not started[/dim]")
             
@@ -637,39 +845,7 @@ class VBCableBridge:
         except Exception as e:
             console.print(f"[red]启动音频流失败: {e}[/red]")
             # 清理已启动的流
-            if self.input_stream:
-                try:
-                    self.input_stream.stop()
-                    self.input_stream.close()
-                except:
-                    pass
-            if self.output_stream:
-                try:
-                    self.output_stream.stop()
-                    self.output_stream.close()
-                except:
-                    pass
-            self.input_stream = None
-            self.output_stream = None
-            self.running = False
-            raise
-        except Exception as e:
-            console.print(f"[red]启动音频流失败: {e}[/red]")
-            # 清理已启动的流
-            if self.input_stream:
-                try:
-                    self.input_stream.stop()
-                    self.input_stream.close()
-                except:
-                    pass
-            if self.output_stream:
-                try:
-                    self.output_stream.stop()
-                    self.output_stream.close()
-                except:
-                    pass
-            self.input_stream = None
-            self.output_stream = None
+            self._close_streams()
             self.running = False
             raise
     
@@ -681,157 +857,174 @@ class VBCableBridge:
         if self.mpv_controller:
             self.mpv_controller.stop()
         
-        # 等待混音线程结束
-        if self.mixer_thread and self.mixer_thread.is_alive():
-            self.mixer_thread.join(timeout=1.0)
-        
-        if self.input_stream:
-            self.input_stream.stop()
-            self.input_stream.close()
-            self.input_stream = None
-        
-        if self.input_stream_2:
-            self.input_stream_2.stop()
-            self.input_stream_2.close()
-            self.input_stream_2 = None
+        # 唤醒并等待混音线程、输出渲染线程结束
+        self._capture_ready.set()
+        self._output_demand.set()
+        for thread in (self.mixer_thread, self.output_thread):
+            if thread and thread.is_alive():
+                thread.join(timeout=1.0)
         
-        if self.output_stream:
-            self.output_stream.stop()
-            self.output_stream.close()
-            self.output_stream = None
+        self._close_streams()
         
-        # 清理音频队列
+        # 清理音频队列和缓冲区
         self.clear_queues()
         
-        # 清空缓冲区
-        self.output_buffer = np.zeros(0, dtype=np.int16)
-        
         console.print("[yellow]音频桥接已停止[/yellow]")
     
-    def send_to_clubdeck(self, audio_data: np.ndarray) -> None:
-        """发送浏览器麦克风到 Clubdeck（写入缓冲区，由 _output_callback 消费）"""
+    def send_to_clubdeck(self, audio_data: np.ndarray, client_id: str = 'default') -> None:
+        """发送浏览器麦克风到 Clubdeck（写入该客户端的抖动缓冲，由 _output_callback 混音消费）"""
         try:
-            browser_audio = audio_data.astype(np.int16).flatten()
-            
-            with self.browser_buffer_lock:
-                # 追加到缓冲区
-                self.browser_audio_buffer = np.concatenate([self.browser_audio_buffer, browser_audio])
-                
-                # 限制缓冲区大小（最多0.3秒 = 48000*0.3*2 = 28800 samples）
-                max_size = 28800
-                if len(self.browser_audio_buffer) > max_size:
-                    # 丢弃旧数据，保留最新的
-                    self.browser_audio_buffer = self.browser_audio_buffer[-max_size:]
-                    
+            self.browser_mixer.push(client_id, audio_data.astype(np.int16, copy=False))
         except Exception as e:
             console.print(f"[dim red]send_to_clubdeck error: {e}[/dim red]")
     
-    def _clubdeck_output_worker(self):
-        """持续输出线程：混合浏览器麦克风+MPV音乐 → Clubdeck"""
-        console.print(f"[dim]* Clubdeck output thread started[/dim]")
-        
-        silence = np.zeros((512, 2), dtype=np.int16)  # 静音帧
-        
-        while self.running:
+    def remove_browser_client(self, client_id: str) -> None:
+        """移除浏览器客户端的抖动缓冲（断开连接时调用）"""
+        self.browser_mixer.remove(client_id)
+    
+    def set_browser_gain(self, client_id: str, gain: float) -> None:
+        """设置浏览器客户端麦克风增益（线性）"""
+        self.browser_mixer.set_gain(client_id, gain)
+    
+    def get_buffer_stats(self) -> dict:
+        """获取采样缓冲区状态（填充量、溢出/欠载计数）"""
+        return {
+            'capture': {name: ring.get_stats() for name, ring in self.capture_rings.items()},
+            'output': self._output_ring.get_stats(),
+            'mixer': self.mixer_scheduler.get_stats(),
+            'output_sources': {name: source.get_stats() for name, source in self.output_sources.items()},
+            'device_sinks': {sink.name: sink.buffer.get_stats() for sink in self.device_sinks},
+            'browser_mixer': self.browser_mixer.get_stats(),
+        }
+    
+    def collect_metrics(self) -> list:
+        """
+        音频侧指标（/metrics 采集器）: 回调耗时与状态标志、队列深度/丢弃、各缓冲填充与溢出/欠载、
+        混音节拍、VAD 与 MPV 状态
+        """
+        metrics = [self.latency_capture_to_mix, self.mixed_dropped]
+        for stream in list(self.stream_metrics.values()):
+            metrics.extend(stream.metrics())
+        metrics.append(Gauge('clubvoice_queue_depth', '队列当前长度', {'queue': 'mixed'}, self.mixed_queue.qsize()))
+        
+        def buffer_metrics(buffer: str, stats: dict):
+            labels = {'buffer': buffer}
+            metrics.append(Gauge('clubvoice_buffer_fill_frames', '采样缓冲当前填充（帧）', labels, stats['fill_frames']))
+            metrics.append(Counter('clubvoice_buffer_overruns_total', '采样缓冲溢出次数', labels, stats['overruns']))
+            metrics.append(Counter('clubvoice_buffer_underruns_total', '采样缓冲欠载次数', labels, stats['underruns']))
+        
+        scheduler = self.mixer_scheduler
+        for name, ring in self.capture_rings.items():
+            buffer_metrics(f'capture_{name}', ring.get_stats())
+        if self.browser_output_device_id is not None:
+            buffer_metrics('cable_a', self._output_ring.get_stats())
+        for name, source in list(scheduler.sources.items()):
+            buffer_metrics(f'mixer_{name}', source.get_stats())
+        for name, source in list(self.output_sources.items()):
+            buffer_metrics(f'output_{name}', source.get_stats())
+        for sink in self.device_sinks:
+            buffer_metrics(f'sink_{sink.name}', sink.buffer.get_stats())
+        for client_id, stats in self.browser_mixer.get_stats()['streams'].items():
+            buffer_metrics(f'browser_{client_id}', stats)
+        
+        metrics.append(Counter('clubvoice_mixer_ticks_total', '混音节拍数', value=scheduler.ticks))
+        metrics.append(Counter('clubvoice_mixer_stalled_ticks_total', '主时钟停顿时按系统时钟补出的节拍数',
+                               value=scheduler.stalled_ticks))
+        
+        if self.voice_detector is not None:
+            metrics.append(Gauge('clubvoice_vad_active', 'Clubdeck 房间语音活动（1 = 有人说话）',
+                                 value=int(self.voice_detector.is_voice_active)))
+        if self.mpv_controller is not None:
+            metrics.extend(self.mpv_controller.collect_metrics())
+        return metrics
+    
+    def get_xrun_count(self) -> int:
+        """所有设备流回调报告的溢出/欠载次数（不含 priming_output）"""
+        return int(sum(counter.value for stream in list(self.stream_metrics.values())
+                       for flag, counter in stream.flags if flag != 'priming_output'))
+    
+    def get_drift_stats(self) -> dict:
+        """获取时钟漂移补偿统计（估计漂移 ppm、当前修正量、缓冲延迟）"""
+        stats = {}
+        for name, source in self.mixer_scheduler.sources.items():
+            if source.drift is not None:
+                stats[name] = source.drift.get_stats()
+        for name, source in self.output_sources.items():
+            stats[f'{name}_to_output'] = source.drift.get_stats()
+        for sink in self.device_sinks:
+            stats[f'output_{sink.name}'] = sink.buffer.drift.get_stats()
+        return stats
+    
+    def get_mix_graph(self) -> dict:
+        """获取混音图（母线 → 输入源增益）"""
+        return {**self.browser_graph.get_stats(), **self.output_graph.get_stats()}
+    
+    def _block_captured(self, blocks: Dict[str, np.ndarray]) -> float:
+        """
+        推算本节拍混音块的采集时刻: 各输入源块首样本 = 最近一块末尾采集时刻
+        - 采集环中未转换的时长 - (调度器环中剩余 + 块长) / 采样率，取最早者
+        """
+        now = time.monotonic()
+        captured = now
+        for name, block in blocks.items():
+            end = self._captured_end.get(name)
+            if end is None:
+                continue
+            source = self.mixer_scheduler.sources[name]
+            pending = self.capture_rings[name].fill / self.sources[name].sample_rate
+            start = end - pending - (source.ring.fill + len(block)) / self.browser_sample_rate
+            if start < captured:
+                captured = start
+        return captured
+    
+    def _push_mixed(self, audio: np.ndarray, captured: Optional[float] = None) -> None:
+        """混音帧入队并唤醒网络侧（队列满时丢弃）"""
+        mixed = time.monotonic()
+        if captured is None:
+            captured = mixed
+        frame = MixedFrame(audio, self._mixed_seq, captured, mixed)
+        self._mixed_seq += 1
+        self.latency_capture_to_mix.observe(mixed - captured)
+        try:
+            self.mixed_queue.put_nowait(frame)
+        except queue.Full:
+            self.mixed_dropped.inc()
+            return
+        notify = self.on_mixed
+        if notify is not None:
+            notify()
+    
+    def drain_mixed(self) -> List[MixedFrame]:
+        """取出队列中所有混音帧（不阻塞，配合 on_mixed 唤醒使用）"""
+        frames = []
+        while True:
             try:
-                # 1. 获取浏览器音频（按顺序，不丢弃）
-                browser_audio = None
-                try:
-                    # 非阻塞获取，但不清空队列
-                    browser_audio = self.browser_audio_cache.get(timeout=0.01)
-                except queue.Empty:
-                    pass
-                
-                # 如果没有浏览器音频，使用静音
-                if browser_audio is None:
-                    browser_audio = silence
-                
-                # 2. 获取 MPV 音频（非阻塞）
-                try:
-                    mpv_audio = self.mpv_for_clubdeck_queue.get(timeout=0.01)
-                except queue.Empty:
-                    # MPV 队列为空，只发送浏览器音频
-                    mpv_audio = silence
-                
-                # 3. 混音：浏览器麦克风 + MPV 音乐
-                # 统一为立体声格式 (frames, 2)
-                if browser_audio.ndim == 1:
-                    frames = len(browser_audio) // 2
-                    browser_stereo = browser_audio.reshape(frames, 2)
-                else:
-                    browser_stereo = browser_audio
-                
-                if mpv_audio.ndim == 1:
-                    frames = len(mpv_audio) // 2
-                    mpv_stereo = mpv_audio.reshape(frames, 2)
-                else:
-                    mpv_stereo = mpv_audio
-                
-                # 确保帧数一致
-                min_frames = min(len(browser_stereo), len(mpv_stereo))
-                browser_stereo = browser_stereo[:min_frames]
-                mpv_stereo = mpv_stereo[:min_frames]
-                
-                # 立体声混音：浏览器麦克风100%，MPV音乐30%（保持人声清晰）
-                mixed = browser_stereo.astype(np.int32) + (mpv_stereo.astype(np.int32) * 3 // 10)
-                output_audio = np.clip(mixed, -32768, 32767).astype(np.int16)
-                
-                # 4. 放入输出队列
-                try:
-                    self.output_queue.put(output_audio.flatten(), timeout=0.01)
-                except queue.Full:
-                    # 队列满时，移除最旧的一帧再放入（避免积压）
-                    try:
-                        self.output_queue.get_nowait()
-                        self.output_queue.put_nowait(output_audio.flatten())
-                    except:
-                        pass
-                    
-            except Exception as e:
-                if self.running:
-                    console.print(f"[red]Clubdeck output worker error: {e}[/red]")
-                    import traceback
-                    traceback.print_exc()
-                time.sleep(0.01)
+                frames.append(self.mixed_queue.get_nowait())
+            except queue.Empty:
+                return frames
     
     def receive_from_clubdeck(self, timeout: float = 0.1) -> Optional[np.ndarray]:
         """从 Clubdeck 接收音频 (混音后或单输入)"""
         try:
-            return self.mixed_queue.get(timeout=timeout)
+            return self.mixed_queue.get(timeout=timeout).audio
         except queue.Empty:
             return None
     
     def clear_queues(self) -> None:
         """清空音频队列"""
-        while not self.input_queue.empty():
-            try:
-                self.input_queue.get_nowait()
-            except queue.Empty:
-                break
-        
-        if self.input_queue_2 is not None:
-            while not self.input_queue_2.empty():
-                try:
-                    self.input_queue_2.get_nowait()
-                except queue.Empty:
-                    break
-        
         while not self.mixed_queue.empty():
             try:
                 self.mixed_queue.get_nowait()
             except queue.Empty:
                 break
         
-        # 清理MPV副本队列
-        while not self.mpv_for_clubdeck_queue.empty():
-            try:
-                self.mpv_for_clubdeck_queue.get_nowait()
-            except queue.Empty:
-                break
-        
-        # 清理浏览器音频缓存队列
-        while not self.browser_audio_cache.empty():
-            try:
-                self.browser_audio_cache.get_nowait()
-            except queue.Empty:
-                break
+        # 清空采样环形缓冲
+        for ring in self.capture_rings.values():
+            ring.clear()
+        self._output_ring.clear()
+        for source in self.output_sources.values():
+            source.clear()
+        for sink in self.device_sinks:
+            sink.buffer.clear()
+        self.mixer_scheduler.clear()
+        self.browser_mixer.clear()
@@ -1,13 +1,13 @@
 """
 Bootstrap wizard
 """
-import sounddevice as sd
 from rich.console import Console
 from rich.panel import Panel
 from rich.text import Text
 from rich.prompt import Prompt, Confirm
 
 from .audio.device_manager import DeviceManager
+from .audio.backend import get_backend
 from .config.settings import config, AudioConfig, AppConfig, get_config_path
 
 
@@ -19,7 +19,8 @@ class Bootstrap:
     """启动引导器"""
     
     def __init__(self):
-        self.device_manager = DeviceManager()
+        self.backend = get_backend()
+        self.device_manager = DeviceManager(self.backend)
         self.selected_audio_config = None  # 保存选择的配置用于退出时保存
         self.config_changed = False  # 标记配置是否被修改
     
@@ -62,7 +63,7 @@ class Bootstrap:
         console.print("[dim]   从 MPV 读取背景音乐[/dim]")
         if mpv_id is not None:
             try:
-                dev = sd.query_devices(mpv_id)
+                dev = self.backend.query_devices(mpv_id)
                 console.print(f"   当前: [green]ID {mpv_id} - {dev['name']}[/green]")
             except:
                 console.print(f"   当前: [red]ID {mpv_id} (无效)[/red]")
@@ -76,7 +77,7 @@ class Bootstrap:
         if mpv_input.strip():
             try:
                 new_mpv_id = int(mpv_input.strip())
-                dev = sd.query_devices(new_mpv_id)
+                dev = self.backend.query_devices(new_mpv_id)
                 if dev['max_input_channels'] > 0:
                     mpv_id = new_mpv_id
                     self.config_changed = True
@@ -91,7 +92,7 @@ class Bootstrap:
         console.print("[dim]   从 Clubdeck 读取房间音频[/dim]")
         if clubdeck_id is not None:
             try:
-                dev = sd.query_devices(clubdeck_id)
+                dev = self.backend.query_devices(clubdeck_id)
                 console.print(f"   当前: [green]ID {clubdeck_id} - {dev['name']}[/green]")
             except:
                 console.print(f"   当前: [red]ID {clubdeck_id} (无效)[/red]")
@@ -105,7 +106,7 @@ class Bootstrap:
         if clubdeck_input.strip():
             try:
                 new_clubdeck_id = int(clubdeck_input.strip())
-                dev = sd.query_devices(new_clubdeck_id)
+                dev = self.backend.query_devices(new_clubdeck_id)
                 if dev['max_input_channels'] > 0:
                     clubdeck_id = new_clubdeck_id
                     self.config_changed = True
@@ -120,7 +121,7 @@ class Bootstrap:
         console.print("[dim]   发送浏览器麦克风+MPV混音到 Clubdeck[/dim]")
         if browser_out_id is not None:
             try:
-                dev = sd.query_devices(browser_out_id)
+                dev = self.backend.query_devices(browser_out_id)
                 console.print(f"   当前: [green]ID {browser_out_id} - {dev['name']}[/green]")
             except:
                 console.print(f"   当前: [red]ID {browser_out_id} (无效)[/red]")
@@ -134,7 +135,7 @@ class Bootstrap:
         if browser_input.strip():
             try:
                 new_browser_id = int(browser_input.strip())
-                dev = sd.query_devices(new_browser_id)
+                dev = self.backend.query_devices(new_browser_id)
                 if dev['max_output_channels'] > 0:
                     browser_out_id = new_browser_id
                     self.config_changed = True
@@ -150,9 +151,9 @@ class Bootstrap:
             raise SystemExit(1)
         
         # 获取设备参数
-        mpv_device = sd.query_devices(mpv_id)
-        browser_out_device = sd.query_devices(browser_out_id)
-        clubdeck_device = sd.query_devices(clubdeck_id) if clubdeck_id else None
+        mpv_device = self.backend.query_devices(mpv_id)
+        browser_out_device = self.backend.query_devices(browser_out_id)
+        clubdeck_device = self.backend.query_devices(clubdeck_id) if clubdeck_id else None
         
         # 创建音频配置
         audio_config = AudioConfig(
@@ -166,25 +167,37 @@ class Bootstrap:
             mpv_channels=min(mpv_device['max_input_channels'], 2),
             clubdeck_channels=min(clubdeck_device['max_input_channels'], 2) if clubdeck_device else 2,
             browser_output_channels=min(browser_out_device['max_output_channels'], 2),
-            # 通用字段
-            sample_rate=app_config.audio.sample_rate,
-            channels=app_config.audio.channels,
-            chunk_size=app_config.audio.chunk_size,
-            bitrate=app_config.audio.bitrate,
-            dtype=app_config.audio.dtype,
-            duplex_mode=app_config.audio.duplex_mode,
-            mix_mode=app_config.audio.mix_mode,
-            mpv_ducking_enabled=app_config.audio.mpv_ducking_enabled,
-            browser_ducking_enabled=app_config.audio.browser_ducking_enabled,
-            ducking_threshold=app_config.audio.ducking_threshold,
-            ducking_gain=app_config.audio.ducking_gain,
-            ducking_min_duration=app_config.audio.ducking_min_duration,
-            ducking_release_time=app_config.audio.ducking_release_time,
-            ducking_transition_time=app_config.audio.ducking_transition_time
+            # 通用字段与混音图
+            **self._shared_audio_fields(app_config)
         )
         
         return audio_config
     
+    @staticmethod
+    def _shared_audio_fields(app_config: AppConfig) -> dict:
+        """与设备选择无关、直接沿用配置文件的音频字段（含 [Mix Sources] / [Mix Buses] 混音图）"""
+        audio = app_config.audio
+        return dict(
+            sample_rate=audio.sample_rate,
+            channels=audio.channels,
+            chunk_size=audio.chunk_size,
+            bitrate=audio.bitrate,
+            opus_enabled=audio.opus_enabled,
+            opus_frame_ms=audio.opus_frame_ms,
+            dtype=audio.dtype,
+            duplex_mode=audio.duplex_mode,
+            mix_mode=audio.mix_mode,
+            mpv_ducking_enabled=audio.mpv_ducking_enabled,
+            browser_ducking_enabled=audio.browser_ducking_enabled,
+            ducking_threshold=audio.ducking_threshold,
+            ducking_gain=audio.ducking_gain,
+            ducking_min_duration=audio.ducking_min_duration,
+            ducking_release_time=audio.ducking_release_time,
+            ducking_transition_time=audio.ducking_transition_time,
+            mix_sources=audio.mix_sources,
+            mix_buses=audio.mix_buses
+        )
+    
     def _select_devices(self) -> AudioConfig:
         """Select audio devices"""
         console.print("[bold]Step 1/2: Configure Audio Devices[/bold]\n")
@@ -210,7 +223,9 @@ class Bootstrap:
             browser_output_channels=config.audio.browser_output_channels,
             mix_mode=mix_mode,
             clubdeck_input_device_id=config.audio.clubdeck_input_device_id,
-            duplex_mode=config.audio.duplex_mode  # 保持原有的双工模式设置
+            duplex_mode=config.audio.duplex_mode,  # 保持原有的双工模式设置
+            mix_sources=config.audio.mix_sources,
+            mix_buses=config.audio.mix_buses
         )
         
         # 如果启用混音模式，获取 Clubdeck 设备的参数
@@ -228,7 +243,10 @@ class Bootstrap:
         console.print()
         console.print("[bold]Step 2/2: Launch Server[/bold]\n")
         
-        bitrate_str = f"{audio_config.bitrate // 1000}kbps" if audio_config.bitrate else "N/A"
+        if audio_config.opus_enabled and audio_config.bitrate:
+            bitrate_str = f"Opus {audio_config.bitrate // 1000}kbps / {audio_config.opus_frame_ms:g}ms (PCM16 fallback)"
+        else:
+            bitrate_str = f"PCM16 {audio_config.sample_rate * audio_config.channels * 16 // 1000}kbps"
         
         # Display mix mode
         if audio_config.mix_mode and audio_config.input_device_id_2:
@@ -286,8 +304,8 @@ class Bootstrap:
         devices_valid = False
         if (mpv_id is not None and browser_out_id is not None):
             try:
-                mpv_device = sd.query_devices(mpv_id)
-                browser_out_device = sd.query_devices(browser_out_id)
+                mpv_device = self.backend.query_devices(mpv_id)
+                browser_out_device = self.backend.query_devices(browser_out_id)
                 
                 # 验证设备是否支持所需功能
                 if (mpv_device['max_input_channels'] > 0 and 
@@ -306,7 +324,7 @@ class Bootstrap:
                     # 处理Clubdeck输入设备（3-Cable混音模式）
                     if app_config.audio.mix_mode and clubdeck_id is not None:
                         try:
-                            clubdeck_device = sd.query_devices(clubdeck_id)
+                            clubdeck_device = self.backend.query_devices(clubdeck_id)
                             if clubdeck_device['max_input_channels'] > 0:
                                 console.print(f"\n  [cyan]CABLE-C (Clubdeck→浏览器) 设备 {clubdeck_id}:[/cyan]")
                                 console.print(f"    {clubdeck_device['name']}")
@@ -343,26 +361,13 @@ class Bootstrap:
                         clubdeck_input_device_id=clubdeck_id,
                         browser_output_device_id=browser_out_id,
                         mpv_sample_rate=int(mpv_device['default_samplerate']),
-                        clubdeck_sample_rate=int(sd.query_devices(clubdeck_id)['default_samplerate']) if clubdeck_id else 48000,
+                        clubdeck_sample_rate=int(self.backend.query_devices(clubdeck_id)['default_samplerate']) if clubdeck_id else 48000,
                         browser_output_sample_rate=int(browser_out_device['default_samplerate']),
                         mpv_channels=min(mpv_device['max_input_channels'], 2),
-                        clubdeck_channels=min(sd.query_devices(clubdeck_id)['max_input_channels'], 2) if clubdeck_id else 2,
+                        clubdeck_channels=min(self.backend.query_devices(clubdeck_id)['max_input_channels'], 2) if clubdeck_id else 2,
                         browser_output_channels=min(browser_out_device['max_output_channels'], 2),
-                        # 通用字段
-                        sample_rate=app_config.audio.sample_rate,
-                        channels=app_config.audio.channels,
-                        chunk_size=app_config.audio.chunk_size,
-                        bitrate=app_config.audio.bitrate,
-                        dtype=app_config.audio.dtype,
-                        duplex_mode=app_config.audio.duplex_mode,
-                        mix_mode=app_config.audio.mix_mode,
-                        mpv_ducking_enabled=app_config.audio.mpv_ducking_enabled,
-                        browser_ducking_enabled=app_config.audio.browser_ducking_enabled,
-                        ducking_threshold=app_config.audio.ducking_threshold,
-                        ducking_gain=app_config.audio.ducking_gain,
-                        ducking_min_duration=app_config.audio.ducking_min_duration,
-                        ducking_release_time=app_config.audio.ducking_release_time,
-                        ducking_transition_time=app_config.audio.ducking_transition_time
+                        # 通用字段与混音图
+                        **self._shared_audio_fields(app_config)
                     )
         else:
             # 设备无效，必须进入交互式选择
@@ -5,7 +5,7 @@ import configparser
 import os
 import sys
 from dataclasses import dataclass, field
-from typing import Optional, List
+from typing import Optional, List, Dict
 from pathlib import Path
 
 
@@ -20,6 +20,79 @@ def get_config_path() -> Path:
     return base_path / 'config.ini'
 
 
+# 混音图中的特殊名称
+SINK_BROWSER = 'browser'        # 母线输出目标: 发送给浏览器
+SINK_CABLE_A = 'cable_a'        # 母线输出目标: CABLE-A (browser_output_device_id)
+SOURCE_BROWSER_MIC = 'browser_mic'  # 输入源: 所有浏览器麦克风混音
+
+
+@dataclass
+class MixSourceConfig:
+    """混音图输入源（额外的输入设备，mpv / clubdeck 由 [VB Cable] 配置）"""
+    name: str
+    device_id: int
+    sample_rate: int = 48000
+    channels: int = 2
+
+
+@dataclass
+class MixBusConfig:
+    """混音图母线: 若干输入源按增益求和后送往一个输出目标"""
+    name: str
+    sink: str                                   # 'browser' / 'cable_a' / 输出设备ID
+    gains: Dict[str, float] = field(default_factory=dict)
+
+
+def default_mix_buses() -> List[MixBusConfig]:
+    """默认混音图（3-Cable 架构）"""
+    return [
+        MixBusConfig('browser', SINK_BROWSER, {'mpv': 1.0, 'clubdeck': 1.0}),
+        MixBusConfig('clubdeck_mic', SINK_CABLE_A, {SOURCE_BROWSER_MIC: 1.0, 'mpv': 0.3}),
+    ]
+
+
+def parse_mix_source(name: str, value: str) -> MixSourceConfig:
+    """解析输入源: 设备ID[, 采样率[, 声道数]]"""
+    parts = [p.strip() for p in value.split(',') if p.strip()]
+    if not parts:
+        raise ValueError(f"输入源 {name} 缺少设备ID")
+    source = MixSourceConfig(name, int(parts[0]))
+    if len(parts) > 1:
+        source.sample_rate = int(parts[1])
+    if len(parts) > 2:
+        source.channels = int(parts[2])
+    return source
+
+
+def parse_mix_bus(name: str, value: str) -> MixBusConfig:
+    """解析母线: 来源[*增益] + 来源[*增益] ... -> 输出目标"""
+    if '->' not in value:
+        raise ValueError(f"母线 {name} 缺少输出目标 (-> browser / cable_a / 设备ID)")
+    expr, sink = value.rsplit('->', 1)
+    gains: Dict[str, float] = {}
+    for term in expr.split('+'):
+        term = term.strip()
+        if not term:
+            continue
+        if '*' in term:
+            source, gain = term.split('*', 1)
+            gains[source.strip()] = float(gain)
+        else:
+            gains[term] = 1.0
+    return MixBusConfig(name, sink.strip(), gains)
+
+
+def format_mix_source(source: MixSourceConfig) -> str:
+    """输入源写回配置: parse_mix_source 的逆操作"""
+    return f"{source.device_id}, {source.sample_rate}, {source.channels}"
+
+
+def format_mix_bus(bus: MixBusConfig) -> str:
+    """母线写回配置: parse_mix_bus 的逆操作"""
+    terms = [source if gain == 1.0 else f"{source}*{gain}" for source, gain in bus.gains.items()]
+    return f"{' + '.join(terms)} -> {bus.sink}"
+
+
 @dataclass
 class AudioConfig:
     """音频配置 - 3-Cable VB-Cable 架构"""
@@ -40,14 +113,24 @@ class AudioConfig:
     browser_output_channels: int = 2
     
     # === 通用配置 ===
+    backend: str = 'sounddevice'            # 设备后端: 'sounddevice' = 声卡/VB-Cable, 'virtual' = 虚拟设备
+    virtual_speed: float = 1.0              # virtual 后端的时钟倍速（1.0 = 实时）
     sample_rate: int = 48000                # Python 内部处理采样率
     channels: int = 2                       # Python 内部处理声道数
     chunk_size: int = 512                   # 缓冲区大小
-    bitrate: int = 128000                   # 128kbps
+    bitrate: int = 64000                    # Opus 目标码率（bit/s）
+    opus_enabled: bool = True               # 允许客户端协商 Opus（需要 opuslib + libopus）
+    opus_frame_ms: float = 20.0             # Opus 帧长（毫秒）: 2.5/5/10/20/40/60
+    mp3_bitrate: int = 128000               # /stream.mp3 和 HLS 码率（bit/s，需要 lameenc）
+    hls_segment_seconds: float = 1.0        # HLS 分片时长（秒），越短延迟越低、请求越多
     dtype: str = 'int16'                    # 数据类型
     duplex_mode: str = 'full'               # 通信模式: 'half' = 半双工, 'full' = 全双工
     mix_mode: bool = True                   # 是否启用混音模式 (3-Cable 架构默认开启)
     
+    # 混音图: 额外输入源 + 母线（未配置 [Mix Buses] 时使用 3-Cable 默认拓扑）
+    mix_sources: List[MixSourceConfig] = field(default_factory=list)
+    mix_buses: List[MixBusConfig] = field(default_factory=default_mix_buses)
+    
     # 音频闪避配置
     mpv_ducking_enabled: bool = True        # Clubdeck 房间语音降低 MPV 音乐音量
     browser_ducking_enabled: bool = True    # 浏览器麦克风降低 Clubdeck 接收音量
@@ -64,6 +147,10 @@ class ServerConfig:
     host: str = '0.0.0.0'
     port: int = 5000
     debug: bool = False
+    client_queue_frames: int = 25           # 每客户端下行发送队列长度（帧，满时丢最旧）
+    slow_client_drop_ratio: float = 0.1     # 判定为慢客户端的丢帧比例（先降级，再断开）
+    coalesce_max_frames: int = 4            # 转发落后时一个下行报文最多合并的帧数（1 = 不合并）
+    coalesce_max_ms: float = 50.0           # 一个下行报文最多合并的音频时长（毫秒）
 
 
 @dataclass
@@ -83,6 +170,8 @@ class MPVConfig:
     normal_volume: int = 100
     ducking_volume: int = 15
     transition_time: float = 0.1
+    ipc_timeout: float = 0.5            # 等待 MPV 回复的超时（秒）
+    reconnect_max_delay: float = 5.0    # 断线重连的最大退避间隔（秒）
 
 
 @dataclass
@@ -111,11 +200,22 @@ class AppConfig:
                 self.server.host = parser.get('server', 'host', fallback=self.server.host)
                 self.server.port = parser.getint('server', 'port', fallback=self.server.port)
                 self.server.debug = parser.getboolean('server', 'debug', fallback=self.server.debug)
+                self.server.client_queue_frames = parser.getint('server', 'client_queue_frames', fallback=self.server.client_queue_frames)
+                self.server.slow_client_drop_ratio = parser.getfloat('server', 'slow_client_drop_ratio', fallback=self.server.slow_client_drop_ratio)
+                self.server.coalesce_max_frames = parser.getint('server', 'coalesce_max_frames', fallback=self.server.coalesce_max_frames)
+                self.server.coalesce_max_ms = parser.getfloat('server', 'coalesce_max_ms', fallback=self.server.coalesce_max_ms)
             
             # 加载音频通信模式
             if 'audio' in parser:
                 self.audio.duplex_mode = parser.get('audio', 'duplex_mode', fallback='full')
+                self.audio.backend = parser.get('audio', 'backend', fallback=self.audio.backend)
+                self.audio.virtual_speed = parser.getfloat('audio', 'virtual_speed', fallback=self.audio.virtual_speed)
                 self.audio.mix_mode = parser.getboolean('audio', 'mix_mode', fallback=True)
+                self.audio.opus_enabled = parser.getboolean('audio', 'opus', fallback=True)
+                self.audio.bitrate = parser.getint('audio', 'opus_bitrate', fallback=64000)
+                self.audio.opus_frame_ms = parser.getfloat('audio', 'opus_frame_ms', fallback=20.0)
+                self.audio.mp3_bitrate = parser.getint('audio', 'mp3_bitrate', fallback=128000)
+                self.audio.hls_segment_seconds = parser.getfloat('audio', 'hls_segment_seconds', fallback=1.0)
             
             # 从 VAD Browser 节读取浏览器闪避配置
             if 'VAD Browser' in parser:
@@ -153,6 +253,27 @@ class AppConfig:
                     except ValueError:
                         pass
             
+            # 加载混音图 (额外输入源 + 母线)，格式错误的条目逐条跳过，不影响后续配置节
+            if 'Mix Sources' in parser:
+                mix_sources = []
+                for name, value in parser.items('Mix Sources'):
+                    try:
+                        mix_sources.append(parse_mix_source(name, value))
+                    except ValueError as e:
+                        print(f"[WARNING] Ignoring [Mix Sources] {name} = {value}: {e}")
+                self.audio.mix_sources = mix_sources
+            if 'Mix Buses' in parser:
+                mix_buses = []
+                for name, value in parser.items('Mix Buses'):
+                    try:
+                        mix_buses.append(parse_mix_bus(name, value))
+                    except ValueError as e:
+                        print(f"[WARNING] Ignoring [Mix Buses] {name} = {value}: {e}")
+                if mix_buses:
+                    self.audio.mix_buses = mix_buses
+                else:
+                    print("[WARNING] No valid [Mix Buses] entry, using default mix graph")
+            
             # 加载 CORS 配置
             if 'cors' in parser:
                 self.cors.enabled = parser.getboolean('cors', 'enabled', fallback=True)
@@ -168,6 +289,8 @@ class AppConfig:
             if 'mpv' in parser:
                 self.mpv.enabled = parser.getboolean('mpv', 'enabled', fallback=True)
                 self.mpv.pipe_path = parser.get('mpv', 'default_pipe', fallback=r'\\.\pipe\mpv-pipe')
+                self.mpv.ipc_timeout = parser.getfloat('mpv', 'ipc_timeout', fallback=0.5)
+                self.mpv.reconnect_max_delay = parser.getfloat('mpv', 'reconnect_max_delay', fallback=5.0)
             
             # 从 VAD MPV 节读取 ducking 音量配置
             if 'VAD MPV' in parser:
@@ -184,7 +307,7 @@ class AppConfig:
         return self
     
     def save_to_file(self, config_path: Optional[Path] = None) -> None:
-        """保存配置到文件（仅保存服务器配置）"""
+        """保存配置到文件（服务器、音频、混音图 [Mix Sources]/[Mix Buses]、CORS 与 MPV 配置）"""
         if config_path is None:
             config_path = get_config_path()
         
@@ -194,13 +317,24 @@ class AppConfig:
         parser['server'] = {
             'host': self.server.host,
             'port': str(self.server.port),
-            'debug': str(self.server.debug).lower()
+            'debug': str(self.server.debug).lower(),
+            'client_queue_frames': str(self.server.client_queue_frames),
+            'slow_client_drop_ratio': str(self.server.slow_client_drop_ratio),
+            'coalesce_max_frames': str(self.server.coalesce_max_frames),
+            'coalesce_max_ms': str(self.server.coalesce_max_ms)
         }
         
         # 音频配置
         audio_section = {
             'duplex_mode': self.audio.duplex_mode,
+            'backend': self.audio.backend,
+            'virtual_speed': str(self.audio.virtual_speed),
             'mix_mode': str(self.audio.mix_mode).lower(),
+            'opus': str(self.audio.opus_enabled).lower(),
+            'opus_bitrate': str(self.audio.bitrate),
+            'opus_frame_ms': str(self.audio.opus_frame_ms),
+            'mp3_bitrate': str(self.audio.mp3_bitrate),
+            'hls_segment_seconds': str(self.audio.hls_segment_seconds),
             'mpv_ducking_enabled': str(self.audio.mpv_ducking_enabled).lower(),
             'browser_ducking_enabled': str(self.audio.browser_ducking_enabled).lower(),
             'ducking_threshold': str(self.audio.ducking_threshold),
@@ -220,6 +354,16 @@ class AppConfig:
         
         parser['audio'] = audio_section
         
+        # 混音图（母线仅在与默认拓扑不同时写出）
+        if self.audio.mix_sources:
+            parser['Mix Sources'] = {
+                source.name: format_mix_source(source) for source in self.audio.mix_sources
+            }
+        if self.audio.mix_buses != default_mix_buses():
+            parser['Mix Buses'] = {
+                bus.name: format_mix_bus(bus) for bus in self.audio.mix_buses
+            }
+        
         # CORS配置 - 使用多行格式
         cors_origins = self.cors.allowed_origins
         if len(cors_origins) > 4:  # 如果域名较多，使用多行格式
@@ -239,7 +383,9 @@ class AppConfig:
             'enabled': 'true',
             'default_pipe': '\\\\.\\pipe\\mpv-pipe',
             'ducking_volume': '15',
-            'normal_volume': '100'
+            'normal_volume': '100',
+            'ipc_timeout': str(self.mpv.ipc_timeout),
+            'reconnect_max_delay': str(self.mpv.reconnect_max_delay)
         }
         
         try:
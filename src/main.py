@@ -57,6 +57,27 @@ def signal_handler(sig, frame):
     os._exit(0)
 
 
+def create_bridge(audio_config) -> VBCableBridge:
+    """按音频配置创建 3-Cable 桥接器（设备来自进程默认后端）"""
+    return VBCableBridge(
+        mpv_input_device_id=audio_config.mpv_input_device_id,
+        clubdeck_input_device_id=audio_config.clubdeck_input_device_id,
+        browser_output_device_id=audio_config.browser_output_device_id,
+        browser_sample_rate=audio_config.sample_rate,
+        mpv_sample_rate=audio_config.mpv_sample_rate,
+        clubdeck_sample_rate=audio_config.clubdeck_sample_rate,
+        browser_output_sample_rate=audio_config.browser_output_sample_rate,
+        mpv_channels=audio_config.mpv_channels,
+        clubdeck_channels=audio_config.clubdeck_channels,
+        browser_output_channels=audio_config.browser_output_channels,
+        browser_channels=audio_config.channels,
+        chunk_size=audio_config.chunk_size,
+        mix_mode=audio_config.mix_mode,
+        mix_sources=audio_config.mix_sources,
+        mix_buses=audio_config.mix_buses
+    )
+
+
 def main():
     """主函数"""
     global bridge, ws_handler, bootstrap
@@ -71,21 +92,7 @@ def main():
         audio_config = bootstrap.run()
         
         # 创建音频桥接器 - 3-Cable架构: Clubdeck + MPV + Browser
-        bridge = VBCableBridge(
-            mpv_input_device_id=audio_config.mpv_input_device_id,
-            clubdeck_input_device_id=audio_config.clubdeck_input_device_id,
-            browser_output_device_id=audio_config.browser_output_device_id,
-            browser_sample_rate=audio_config.sample_rate,
-            mpv_sample_rate=audio_config.mpv_sample_rate,
-            clubdeck_sample_rate=audio_config.clubdeck_sample_rate,
-            browser_output_sample_rate=audio_config.browser_output_sample_rate,
-            mpv_channels=audio_config.mpv_channels,
-            clubdeck_channels=audio_config.clubdeck_channels,
-            browser_output_channels=audio_config.browser_output_channels,
-            browser_channels=audio_config.channels,
-            chunk_size=audio_config.chunk_size,
-            mix_mode=audio_config.mix_mode
-        )
+        bridge = create_bridge(audio_config)
         
         # 创建 Flask 应用
         app, socketio = create_app()
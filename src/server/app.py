@@ -3,8 +3,6 @@ Flask 应用
 """
 import os
 import sys
-import queue
-import struct
 from flask import Flask, send_from_directory, Response, request, redirect
 from flask_socketio import SocketIO, disconnect
 from flask_cors import CORS
@@ -28,6 +26,9 @@ app.config['WERKZEUG_RUN_MAIN'] = False
 
 # 加载配置
 from ..config.settings import config
+from .http_stream import HttpStreams, default_stream_formats
+from .hls import HlsStream
+from ..utils.metrics import REGISTRY
 
 
 # 添加 CORS 支持 - 从配置文件读取
@@ -75,21 +76,38 @@ def after_request(response):
         response.headers['Content-Type'] = 'application/json'
     return response
 
-# 音频流队列 - 供 HTTP 流端点使用
-audio_stream_queue = queue.Queue(maxsize=100)
+# HTTP 音频流 - 每种格式一个共享编码器，每个连接有自己的读游标
+# （128 块 ≈ 1.4 秒；落后超过一半时跳到最新位置）
+STREAM_SAMPLE_RATE = 48000
+STREAM_CHANNELS = 2
+http_streams = HttpStreams(
+    STREAM_SAMPLE_RATE, STREAM_CHANNELS,
+    formats=default_stream_formats(
+        STREAM_SAMPLE_RATE, STREAM_CHANNELS,
+        opus_bitrate=config.audio.bitrate,
+        opus_frame_ms=config.audio.opus_frame_ms,
+        mp3_bitrate=config.audio.mp3_bitrate
+    ),
+    # 听众在 Socket.IO 的异步模式中等待（gevent 下 threading.Event.wait 会阻塞整个集线器）
+    event_factory=socketio.server.eio.create_event
+)
+
+REGISTRY.add_collector('http_streams', http_streams.collect_metrics)
+
+
+# HLS: 复用共享 MP3 编码器切片，有请求时才切片
+hls_stream = HlsStream(http_streams, 'mp3', segment_seconds=config.audio.hls_segment_seconds,
+                       event_factory=socketio.server.eio.create_event)
 
 
 def add_audio_to_stream(audio_data):
-    """添加音频数据到流队列"""
-    try:
-        audio_stream_queue.put_nowait(audio_data)
-    except queue.Full:
-        # 队列满了，丢弃最旧的数据
-        try:
-            audio_stream_queue.get_nowait()
-            audio_stream_queue.put_nowait(audio_data)
-        except:
-            pass
+    """添加音频数据到流（每种有听众的格式每帧只编码一次，与听众数量无关）"""
+    http_streams.publish(audio_data)
+
+
+def get_stream_stats() -> dict:
+    """获取 HTTP 流每格式的听众与编码统计"""
+    return {**http_streams.get_stats(), 'hls': hls_stream.get_stats()}
 
 
 @app.route('/')
@@ -148,12 +166,27 @@ def status():
     except:
         peers = 0
     
+    # 音频缓冲与时钟漂移统计
+    try:
+        from .websocket_handler import get_audio_stats
+        audio = get_audio_stats()
+    except:
+        audio = {}
+    
     return {
         'status': 'running',
-        'peers': peers
+        'peers': peers,
+        'audio': audio,
+        'stream': get_stream_stats()
     }
 
 
+@app.route('/metrics')
+def metrics():
+    """音频管线指标（Prometheus 文本格式）"""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+
 @app.route('/sdk/clubvoice.js')
 def serve_sdk():
     """提供 ClubVoice SDK"""
@@ -166,18 +199,34 @@ def sdk_info():
     """SDK 信息接口"""
     from ..config.settings import config
     
+    # 可协商的线路格式（按服务器注册顺序）；处理器未启动时只报告 PCM16
+    try:
+        from .websocket_handler import get_wire_formats
+        formats = get_wire_formats()
+    except:
+        formats = {}
+    if not formats:
+        formats = {'pcm16': {'sample_rate': 48000, 'channels': 2, 'bitrate': 48000 * 2 * 16}}
+    
     return {
         'name': 'ClubVoice SDK',
-        'version': '1.0.0',
+        'version': '1.1.0',
         'server_url': request.url_root.rstrip('/'),
         'websocket_url': f"ws://{request.host}/socket.io/",
         'duplex_mode': config.audio.duplex_mode,
         'audio_format': {
-            'sample_rate': 48000,
-            'channels': 2,
-            'encoding': 'int16_base64'
+            'transport': 'binary',          # Socket.IO 二进制帧（未协商的旧客户端为 base64 JSON）
+            'formats': formats,
+            'legacy_encoding': 'int16_base64'
         },
-        'features': ['listen_only', 'volume_control', 'real_time_audio']
+        'http_streams': {
+            name: {'url': '/stream' if name == 'wav' else f'/stream.{name}',
+                   'mimetype': fmt.mimetype, 'bitrate': fmt.bitrate}
+            for name, fmt in http_streams.formats.items() if fmt.available
+        },
+        'hls': '/hls/live.m3u8' if hls_stream.available else None,
+        'features': ['listen_only', 'volume_control', 'real_time_audio', 'binary_frames', 'format_negotiation',
+                     'http_stream']
     }
 
 
@@ -193,65 +242,36 @@ def not_found_error(error):
     if request.path.startswith('/api/') or request.path.endswith('.json'):
         return {"error": "Resource not found"}, 404
     
-    # 如果是音频流请求，提供说明
+    # 如果是音频流请求，提供可用的流地址
     if request.path.endswith(('.m3u8', '.ts', '.aac', '.mp3')):
-        return "ClubVoice uses WebSocket for real-time audio communication, not file streaming", 404
+        return "Audio streams: /hls/live.m3u8 (HLS), /stream.mp3, /stream.ogg, /stream (WAV)", 404
     
     # 其他情况重定向到主页
     return redirect('/')
 
 
-@app.route('/stream')
-def audio_stream():
-    """HTTP 音频流端点 - 用于 iOS Safari 后台播放
-    
-    使用 chunked transfer 的原始 PCM 音频流
-    iOS Safari 需要特殊处理
-    """
-    sample_rate = 48000
-    channels = 2
-    bits_per_sample = 16
+def _stream_response(name: str):
+    """按格式生成 HTTP 音频流响应（每个连接独立的读游标，客户端断开时注销）"""
+    try:
+        preamble, listener = http_streams.listen(name)
+    except RuntimeError as e:
+        return {'error': str(e)}, 503
     
     def generate_audio_stream():
-        # 生成一个完整的 WAV 文件头
-        # 使用一个很大但不是无限的大小
-        data_size = 0x7FFFFFFF  # 约 2GB
-        file_size = data_size + 36
-        
-        # RIFF header
-        header = b'RIFF'
-        header += struct.pack('<I', file_size)
-        header += b'WAVE'
-        
-        # fmt chunk
-        header += b'fmt '
-        header += struct.pack('<I', 16)  # fmt chunk size
-        header += struct.pack('<H', 1)   # PCM format
-        header += struct.pack('<H', channels)
-        header += struct.pack('<I', sample_rate)
-        header += struct.pack('<I', sample_rate * channels * bits_per_sample // 8)
-        header += struct.pack('<H', channels * bits_per_sample // 8)
-        header += struct.pack('<H', bits_per_sample)
-        
-        # data chunk
-        header += b'data'
-        header += struct.pack('<I', data_size)
-        
-        yield header
-        
-        # 持续发送音频数据
-        while True:
-            try:
-                audio_data = audio_stream_queue.get(timeout=0.5)
-                yield audio_data.tobytes()
-            except queue.Empty:
-                # 没有数据时发送静音（保持连接活跃）
-                silence = bytes(1024 * channels * (bits_per_sample // 8))
-                yield silence
+        try:
+            if preamble:
+                yield preamble
+            # 持续发送编码后的音频；暂时没有数据时继续等待，不插入静音（避免把时间轴越推越后）
+            while True:
+                chunks = listener.read(timeout=0.5)
+                if chunks:
+                    yield chunks[0] if len(chunks) == 1 else b''.join(chunks)
+        finally:
+            listener.close()
     
-    response = Response(
+    return Response(
         generate_audio_stream(),
-        mimetype='audio/wav',
+        mimetype=http_streams.formats[name].mimetype,
         headers={
             'Cache-Control': 'no-cache, no-store, must-revalidate',
             'Pragma': 'no-cache',
@@ -259,7 +279,57 @@ def audio_stream():
             'Accept-Ranges': 'none',
         }
     )
-    return response
+
+
+@app.route('/stream')
+def audio_stream():
+    """HTTP 音频流端点 - 用于 iOS Safari 后台播放
+    
+    使用 chunked transfer 的原始 PCM 音频流（WAV，约 1.5 Mbit/s）
+    """
+    return _stream_response('wav')
+
+
+@app.route('/stream.<fmt>')
+def audio_stream_compressed(fmt):
+    """压缩 HTTP 音频流: /stream.ogg (Ogg Opus)、/stream.mp3 (MP3)、/stream.wav"""
+    if fmt not in http_streams.formats:
+        return {'error': f'Unknown stream format: {fmt}'}, 404
+    return _stream_response(fmt)
+
+
+@app.route('/hls/live.m3u8')
+def hls_playlist():
+    """HLS 滚动播放列表（内存中的现成 bytes，支持 ETag/304 和 ?_HLS_msn= 阻塞刷新）"""
+    if not hls_stream.available:
+        return {'error': 'HLS requires MP3 encoding (pip install lameenc)'}, 503
+    hls_stream.touch()
+    segmenter = hls_stream.segmenter
+    # 首次请求等第一个分片；带 _HLS_msn 时等到该分片生成
+    msn = request.args.get('_HLS_msn', default=0, type=int)
+    segmenter.wait_for(msn, timeout=segmenter.segment_seconds * 3 + 1)
+    if not segmenter.playlist:
+        return {'error': 'HLS stream not ready'}, 503
+    response = Response(segmenter.playlist, mimetype='application/vnd.apple.mpegurl')
+    response.set_etag(segmenter.playlist_etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+
+@app.route('/hls/<int:seq>.mp3')
+def hls_segment(seq):
+    """HLS 分片（不可变，从 LRU 缓存返回；只续期，由播放列表请求负责激活）"""
+    if not hls_stream.available:
+        return {'error': 'HLS requires MP3 encoding (pip install lameenc)'}, 503
+    if not hls_stream.touch(activate=False):
+        return {'error': 'HLS stream not active'}, 404
+    segment = hls_stream.segmenter.cache.get(seq)
+    if segment is None:
+        return {'error': 'Segment not found'}, 404
+    response = Response(segment.data, mimetype='audio/mpeg')
+    response.set_etag(segment.etag)
+    response.headers['Cache-Control'] = 'public, max-age=60, immutable'
+    return response.make_conditional(request)
 
 
 # Socket.IO 错误处理
@@ -0,0 +1,384 @@
+"""
+一次编码的广播管线
+每个节拍把混音帧按所有“有订阅者”的线路格式各编码一次，打包好的报文放入每个订阅者自己的发送队列：
+增加听众只增加队列入队和 socket 写入，不增加 DSP/编码；慢客户端只影响自己。
+"""
+import base64
+import time
+import numpy as np
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from ..audio.resampler import PolyphaseResampler
+from ..audio.opus import OpusEncoder, OPUS_AVAILABLE, OPUS_SAMPLE_RATE
+from .fanout import FanOut, SocketIOTransport
+from ..utils.metrics import Counter
+from .protocol import (
+    pack_frame, pack_opus_packets, now_ms,
+    FORMAT_PCM16, FORMAT_OPUS, TRANSPORT_BINARY, TRANSPORT_JSON,
+    EVENT_FRAME, EVENT_LEGACY_DOWN
+)
+
+
+@dataclass(frozen=True)
+class WireFormat:
+    """线路格式: 负载编码 + 声道数 + 采样率（+ 压缩参数）"""
+    name: str
+    format_id: int
+    channels: int
+    sample_rate: int
+    bitrate: int = 0          # 压缩格式的目标码率（PCM 为 0）
+    frame_ms: float = 0.0     # 压缩格式的帧长
+
+    @property
+    def nominal_bitrate(self) -> int:
+        """标称码率（bit/s）"""
+        return self.bitrate or self.sample_rate * self.channels * 16
+
+
+class PCM16Encoder:
+    """PCM16 编码器（按需下混为单声道并重采样，跨帧保持重采样状态）"""
+
+    def __init__(self, wire: WireFormat, sample_rate: int, channels: int):
+        self.wire = wire
+        self.channels = channels
+        self.resampler = PolyphaseResampler(sample_rate, wire.sample_rate, wire.channels)
+
+    def encode(self, audio: np.ndarray) -> bytes:
+        frames = audio.reshape(-1, self.channels)
+        if self.wire.channels == 1 and self.channels > 1:
+            frames = frames.mean(axis=1, dtype=np.float32)[:, None].astype(np.int16)
+        if not self.resampler.passthrough:
+            frames = self.resampler.process(frames)
+        return frames.astype('<i2', copy=False).tobytes()
+
+    def reset(self):
+        self.resampler.reset()
+
+
+class OpusWireEncoder:
+    """Opus 编码器（按需重采样到 48kHz；不足一个 Opus 帧时返回空负载）"""
+
+    def __init__(self, wire: WireFormat, sample_rate: int, channels: int):
+        self.resampler = PolyphaseResampler(sample_rate, wire.sample_rate, channels)
+        self.encoder = OpusEncoder(wire.sample_rate, wire.channels, wire.bitrate, wire.frame_ms)
+
+    def encode(self, audio: np.ndarray) -> bytes:
+        frames = audio.reshape(-1, self.encoder.channels)
+        if not self.resampler.passthrough:
+            frames = self.resampler.process(frames)
+        return pack_opus_packets(self.encoder.encode(frames))
+
+    def reset(self):
+        self.resampler.reset()
+        self.encoder.reset()
+
+
+# 编码器工厂: (线路格式, 内部采样率, 内部声道数) → 编码器
+EncoderFactory = Callable[[WireFormat, int, int], object]
+
+
+def default_wire_formats(sample_rate: int = 48000, channels: int = 2,
+                         opus_bitrate: Optional[int] = None,
+                         opus_frame_ms: float = 20.0) -> List[Tuple[WireFormat, EncoderFactory]]:
+    """
+    默认线路格式: 原始 PCM16、下采样单声道 PCM16（移动网络），
+    以及 opus_bitrate 不为 None 且 Opus 可用时的 Opus
+    """
+    formats = [
+        (WireFormat('pcm16', FORMAT_PCM16, channels, sample_rate), PCM16Encoder),
+        (WireFormat('pcm16_mono', FORMAT_PCM16, 1, 24000), PCM16Encoder),
+    ]
+    if opus_bitrate and OPUS_AVAILABLE:
+        formats.insert(0, (WireFormat('opus', FORMAT_OPUS, channels, OPUS_SAMPLE_RATE,
+                                      opus_bitrate, opus_frame_ms), OpusWireEncoder))
+    return formats
+
+
+class Broadcaster:
+    """
+    广播管线
+
+    - subscribe(): 客户端按 (传输方式, 线路格式) 分组
+    - publish(): 对每个有订阅者的线路格式编码一次，每个 (传输方式, 格式) 组合打包成 Socket.IO 报文一次，
+      同一份报文放入组内每个客户端的有界发送队列（FanOut），再按各自 socket 的空闲程度交付
+    - downgrade(): 慢客户端切换到其协商时接受的下一个更低码率格式
+    - publish_batch(): 转发落后时一次取出的多帧，按合并上限拼成较少的报文再发布
+    - add_sink(): 原始 int16 帧的本地消费者（如 /stream HTTP 流），按引用传递
+    """
+
+    SEQ_HISTORY = 1024   # 保留采集时刻的最近报文数（约 10 秒）
+
+    def __init__(self, socketio, sample_rate: int = 48000, channels: int = 2, namespace: str = '/',
+                 opus_bitrate: Optional[int] = None, opus_frame_ms: float = 20.0,
+                 transport=None, queue_frames: int = 25, slow_drop_ratio: float = 0.1,
+                 coalesce_frames: int = 4, coalesce_ms: float = 50.0):
+        """
+        Args:
+            coalesce_frames: 一个报文最多合并的帧数（1 = 不合并）
+            coalesce_ms: 一个报文最多合并的音频时长（毫秒；单帧超过时仍单独发送）
+        """
+        self.socketio = socketio
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.namespace = namespace
+        self.coalesce_frames = max(1, coalesce_frames)
+        self.coalesce_samples = int(coalesce_ms * sample_rate / 1000)   # 每声道样本数
+
+        self.formats: Dict[str, WireFormat] = {}
+        self._factories: Dict[str, EncoderFactory] = {}
+        self._encoders: Dict[str, object] = {}
+        for wire, factory in default_wire_formats(sample_rate, channels, opus_bitrate, opus_frame_ms):
+            self.register_format(wire, factory)
+
+        self.transport = transport or SocketIOTransport(socketio, namespace)
+        self.fanout = FanOut(self.transport, max_queue=queue_frames, slow_drop_ratio=slow_drop_ratio)
+        self.fanout.on_slow = self._on_slow_client
+        # 降级回调: (sid, 新格式名)，用于通知客户端重新配置解码器
+        self.on_downgrade: Optional[Callable[[str, str], None]] = None
+
+        self.subscribers: Dict[str, Tuple[str, str]] = {}     # sid → (传输方式, 格式)
+        self._accepted: Dict[str, List[str]] = {}             # sid → 协商时客户端接受的格式
+        self._members: Dict[Tuple[str, str], Set[str]] = {}
+        self._sinks: List[Callable[[np.ndarray], None]] = []
+
+        self.seq = 0
+        self.frames_published = 0
+        self.encodes: Dict[str, int] = {}          # 格式 → 编码次数
+        self.encode_time: Dict[str, float] = {}    # 格式 → 累计编码耗时（秒）
+        self.packets_sent = 0
+        self.downgrades = 0
+        self.frames_coalesced = 0                  # 被合并进前一帧报文的帧数
+        # 最近报文序号 → 采集时刻（monotonic），用于把客户端回报的序号换算成端到端延迟
+        self._seq_captured = [0.0] * self.SEQ_HISTORY
+
+    def register_format(self, wire: WireFormat, factory: EncoderFactory):
+        """注册线路格式（编码器在首个订阅者出现时创建）"""
+        self.formats[wire.name] = wire
+        self._factories[wire.name] = factory
+
+    @property
+    def format_names(self) -> List[str]:
+        """可协商的格式名（按注册顺序）"""
+        return list(self.formats)
+
+    def add_sink(self, sink: Callable[[np.ndarray], None]):
+        """添加原始帧消费者"""
+        self._sinks.append(sink)
+
+    def subscribe(self, sid: str, transport: str, format_name: str,
+                  accepted: Optional[List[str]] = None):
+        """
+        订阅（已订阅时切换格式，保留发送队列统计）
+
+        Args:
+            accepted: 客户端能解码的格式（用于降级），默认只有 format_name
+
+        Raises:
+            ValueError: 未知格式，或旧版 JSON 传输请求了非默认格式
+        """
+        if format_name not in self.formats:
+            raise ValueError(f"未知的线路格式: {format_name}")
+        if transport == TRANSPORT_JSON and format_name != 'pcm16':
+            raise ValueError("base64 JSON 传输只支持 pcm16")
+        self._accepted[sid] = [name for name in (accepted or [format_name]) if name in self.formats]
+        key = (transport, format_name)
+        if self.subscribers.get(sid) == key:
+            return
+        self._leave(sid)
+
+        self.subscribers[sid] = key
+        self._members.setdefault(key, set()).add(sid)
+        if format_name not in self._encoders:
+            self._encoders[format_name] = self._factories[format_name](
+                self.formats[format_name], self.sample_rate, self.channels
+            )
+        self.fanout.add(sid)
+
+    def unsubscribe(self, sid: str):
+        """取消订阅"""
+        self._leave(sid)
+        self._accepted.pop(sid, None)
+        self.fanout.remove(sid)
+
+    def _leave(self, sid: str):
+        key = self.subscribers.pop(sid, None)
+        if key is None:
+            return
+        members = self._members[key]
+        members.discard(sid)
+        if not members:
+            del self._members[key]
+            # 没有订阅者的格式释放编码器，重新订阅时从干净的状态开始
+            if not any(fmt == key[1] for _, fmt in self._members):
+                self._encoders.pop(key[1], None)
+
+    def downgrade(self, sid: str) -> Optional[str]:
+        """
+        把客户端切换到它接受的格式中码率低于当前格式的最高者
+
+        Returns:
+            新格式名；没有更低码率的格式时返回 None
+        """
+        key = self.subscribers.get(sid)
+        if key is None:
+            return None
+        transport, current = key
+        current_bitrate = self.formats[current].nominal_bitrate
+        lower = [name for name in self._accepted.get(sid, ())
+                 if self.formats[name].nominal_bitrate < current_bitrate]
+        if transport == TRANSPORT_JSON or not lower:
+            return None
+        target = max(lower, key=lambda name: self.formats[name].nominal_bitrate)
+        self.subscribe(sid, transport, target, self._accepted[sid])
+        self.downgrades += 1
+        return target
+
+    def _on_slow_client(self, sid: str) -> bool:
+        target = self.downgrade(sid)
+        if target is None:
+            return False
+        if self.on_downgrade is not None:
+            self.on_downgrade(sid, target)
+        return True
+
+    def publish(self, audio: np.ndarray, captured: Optional[float] = None):
+        """
+        发布一帧混音（int16 交错）
+
+        Args:
+            captured: 帧中最早样本的采集时刻（monotonic），默认为发布时刻
+        """
+        for sink in self._sinks:
+            sink(audio)
+
+        if not self._members:
+            return
+        if captured is None:
+            captured = time.monotonic()
+        self._seq_captured[self.seq % self.SEQ_HISTORY] = captured
+        timestamp = now_ms()
+        payloads: Dict[str, bytes] = {}
+        for (transport, format_name), members in list(self._members.items()):
+            payload = payloads.get(format_name)
+            if payload is None:
+                encoder = self._encoders.get(format_name)
+                if encoder is None:
+                    continue  # 最后一个订阅者刚刚离开
+                start = time.perf_counter()
+                payload = encoder.encode(audio)
+                self.encode_time[format_name] = self.encode_time.get(format_name, 0.0) + time.perf_counter() - start
+                self.encodes[format_name] = self.encodes.get(format_name, 0) + 1
+                payloads[format_name] = payload
+            if not payload:
+                continue  # 压缩格式本节拍还没攒满一帧
+
+            wire = self.formats[format_name]
+            if transport == TRANSPORT_BINARY:
+                event = EVENT_FRAME
+                data = pack_frame(payload, self.seq, wire.sample_rate, wire.channels, wire.format_id, timestamp)
+                nbytes = len(data)
+            else:
+                event = EVENT_LEGACY_DOWN
+                data = {
+                    'audio': base64.b64encode(payload).decode('utf-8'),
+                    'sample_rate': wire.sample_rate,
+                    'channels': wire.channels
+                }
+                nbytes = len(data['audio'])
+            self.fanout.enqueue(members, self.transport.encode(event, data), captured=captured, nbytes=nbytes)
+            self.packets_sent += 1
+
+        self.fanout.flush()
+        for sid in self.fanout.check_slow():
+            self.unsubscribe(sid)
+
+        self.seq = (self.seq + 1) & 0xFFFFFFFF
+        self.frames_published += 1
+
+    def publish_batch(self, frames: List[np.ndarray], captured: Optional[List[float]] = None):
+        """
+        发布一批连续的混音帧
+
+        相邻帧在不超过 coalesce_frames 帧、coalesce_ms 时长的前提下拼接成一帧再发布，
+        每组只编码/打包/入队一次；正常节拍下每批只有一帧，行为与 publish() 相同
+
+        Args:
+            captured: 每帧的采集时刻（合并后的报文取组内第一帧的）
+        """
+        start = 0
+        samples = 0
+        for i, audio in enumerate(frames):
+            frame_samples = audio.size // self.channels
+            if i > start and (i - start >= self.coalesce_frames
+                              or samples + frame_samples > self.coalesce_samples):
+                self._publish_group(frames[start:i], captured[start] if captured else None)
+                start, samples = i, 0
+            samples += frame_samples
+        if start < len(frames):
+            self._publish_group(frames[start:], captured[start] if captured else None)
+
+    def _publish_group(self, group: List[np.ndarray], captured: Optional[float]):
+        if len(group) == 1:
+            self.publish(group[0], captured)
+            return
+        self.frames_coalesced += len(group) - 1
+        self.publish(np.concatenate(group), captured)
+
+    def captured_at(self, seq: int) -> Optional[float]:
+        """报文序号 → 采集时刻（序号太旧或尚未发布时返回 None）"""
+        age = (self.seq - seq) & 0xFFFFFFFF
+        if not 0 < age <= self.SEQ_HISTORY:
+            return None
+        return self._seq_captured[seq % self.SEQ_HISTORY]
+
+    def clear(self):
+        """重置编码器状态"""
+        for encoder in self._encoders.values():
+            encoder.reset()
+
+    def get_client_stats(self) -> Dict[str, dict]:
+        """每客户端统计（格式、队列长度、丢帧、排队延迟、socket 积压）"""
+        stats = self.fanout.get_stats()
+        for sid, client in stats.items():
+            key = self.subscribers.get(sid)
+            if key is not None:
+                client['transport'], client['format'] = key
+        return stats
+
+    def collect_metrics(self) -> list:
+        """广播指标（/metrics 采集器）: 帧/报文计数、每格式编码次数与耗时、每客户端流量"""
+        metrics = [
+            Counter('clubvoice_broadcast_frames_total', '广播的混音帧数（合并后）', value=self.frames_published),
+            Counter('clubvoice_broadcast_packets_total', '打包的下行报文数', value=self.packets_sent),
+            Counter('clubvoice_broadcast_frames_coalesced_total', '被合并进前一帧报文的帧数', value=self.frames_coalesced),
+            Counter('clubvoice_broadcast_downgrades_total', '慢客户端降级次数', value=self.downgrades),
+        ]
+        for name in self.formats:
+            labels = {'format': name}
+            metrics.append(Counter('clubvoice_encodes_total', '线路格式编码次数', labels, self.encodes.get(name, 0)))
+            metrics.append(Counter('clubvoice_encode_seconds_total', '线路格式累计编码耗时', labels,
+                                   self.encode_time.get(name, 0.0)))
+        metrics.extend(self.fanout.collect_metrics())
+        return metrics
+
+    def get_stats(self) -> dict:
+        """获取广播统计（每格式订阅数/编码次数/平均编码耗时）"""
+        formats = {}
+        for name, wire in self.formats.items():
+            subscribers = sum(len(members) for (_, fmt), members in self._members.items() if fmt == name)
+            encodes = self.encodes.get(name, 0)
+            formats[name] = {
+                'bitrate': wire.nominal_bitrate,
+                'subscribers': subscribers,
+                'encodes': encodes,
+                'avg_encode_us': round(self.encode_time.get(name, 0.0) / encodes * 1e6, 1) if encodes else 0.0,
+            }
+        return {
+            'frames': self.frames_published,
+            'packets_sent': self.packets_sent,
+            'frames_coalesced': self.frames_coalesced,
+            'downgrades': self.downgrades,
+            'evicted': self.fanout.evicted,
+            'formats': formats,
+        }
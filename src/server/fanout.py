@@ -0,0 +1,285 @@
+"""
+按客户端扇出
+每个订阅者一个有界发送队列（满时丢最旧），只把少量报文交给 Engine.IO 的 socket 队列；
+链路差的客户端只会在自己的队列里积压/丢包，不会拖慢其他人或广播线程。
+长期跟不上的客户端先降级到更低码率的格式，仍跟不上则断开。
+"""
+import time
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional
+
+from engineio import packet as eio_packet
+from socketio import packet as sio_packet
+
+from ..utils.metrics import Counter, Gauge, Histogram
+
+
+class SocketIOTransport:
+    """
+    Socket.IO 发送接口
+
+    encode() 把一个事件编码为 Engine.IO 报文列表（二进制事件含附件，必须一起发送），
+    send() 逐个交给该客户端的 Engine.IO socket 队列，backlog() 返回 socket 队列中尚未写出的报文数。
+
+    直接交付依赖 python-socketio / python-engineio 的内部接口（_send_eio_packet、
+    manager.eio_sid_from_sid、eio.sockets），构造时逐一探测；缺少任何一个时回退到
+    server.emit()（每次发送重新编码，且拿不到 socket 积压，只靠每客户端队列限流）。
+    """
+
+    def __init__(self, socketio, namespace: str = '/'):
+        self.server = socketio.server
+        self.namespace = namespace
+        self.direct = self._has_internals(self.server)
+        if not self.direct:
+            print("[Broadcast] python-socketio 内部接口不可用，回退到 server.emit()")
+
+    @staticmethod
+    def _has_internals(server) -> bool:
+        """探测直接交付所需的内部接口"""
+        eio = getattr(server, 'eio', None)
+        return (callable(getattr(server, '_send_eio_packet', None))
+                and callable(getattr(server.manager, 'eio_sid_from_sid', None))
+                and isinstance(getattr(eio, 'sockets', None), dict))
+
+    def encode(self, event: str, data) -> list:
+        if not self.direct:
+            return [(event, data)]
+        pkt = self.server.packet_class(sio_packet.EVENT, namespace=self.namespace, data=[event, data])
+        encoded = pkt.encode()
+        if not isinstance(encoded, list):
+            encoded = [encoded]
+        return [eio_packet.Packet(eio_packet.MESSAGE, part) for part in encoded]
+
+    def resolve(self, sid: str) -> Optional[str]:
+        if not self.direct:
+            return sid
+        return self.server.manager.eio_sid_from_sid(sid, self.namespace)
+
+    def send(self, eio_sid: str, packets: list):
+        if not self.direct:
+            for event, data in packets:
+                self.server.emit(event, data, to=eio_sid, namespace=self.namespace)
+            return
+        for pkt in packets:
+            self.server._send_eio_packet(eio_sid, pkt)
+
+    def backlog(self, eio_sid: str) -> int:
+        if not self.direct:
+            return 0
+        socket = self.server.eio.sockets.get(eio_sid)
+        queue = getattr(socket, 'queue', None)
+        return queue.qsize() if queue is not None else 0
+
+    def disconnect(self, sid: str):
+        self.server.disconnect(sid, namespace=self.namespace)
+
+
+class ClientQueue:
+    """一个订阅者的有界发送队列与统计"""
+
+    __slots__ = ('sid', 'eio_sid', 'packets', 'enqueued', 'sent', 'dropped', 'bytes_sent',
+                 'delay_ewma', 'delay_max', 'backlog_max',
+                 'window_enqueued', 'window_dropped', 'strikes', 'downgrades', 'created')
+
+    def __init__(self, sid: str, max_queue: int):
+        self.sid = sid
+        self.eio_sid: Optional[str] = None
+        self.packets = deque(maxlen=max_queue)   # (入队时间, 采集时间, Engine.IO 报文列表, 负载字节数)
+        self.enqueued = 0
+        self.sent = 0
+        self.dropped = 0           # 队列满时丢弃的最旧报文
+        self.bytes_sent = 0        # 已交付的负载字节数
+        self.delay_ewma = 0.0      # 排队延迟（秒，指数平均）
+        self.delay_max = 0.0
+        self.backlog_max = 0
+        self.window_enqueued = 0   # 当前慢客户端判定窗口内的计数
+        self.window_dropped = 0
+        self.strikes = 0           # 连续超标的窗口数
+        self.downgrades = 0
+        self.created = time.monotonic()
+
+    def push(self, item):
+        if len(self.packets) == self.packets.maxlen:
+            self.dropped += 1
+            self.window_dropped += 1
+        self.packets.append(item)
+        self.enqueued += 1
+        self.window_enqueued += 1
+        if len(self.packets) > self.backlog_max:
+            self.backlog_max = len(self.packets)
+
+    def get_stats(self, socket_backlog: int = 0) -> dict:
+        return {
+            'queued': len(self.packets),
+            'socket_backlog': socket_backlog,
+            'enqueued': self.enqueued,
+            'sent': self.sent,
+            'dropped': self.dropped,
+            'bytes_sent': self.bytes_sent,
+            'drop_rate': round(self.dropped / self.enqueued, 4) if self.enqueued else 0.0,
+            'queue_delay_ms': round(self.delay_ewma * 1000, 1),
+            'queue_delay_max_ms': round(self.delay_max * 1000, 1),
+            'backlog_max': self.backlog_max,
+            'downgrades': self.downgrades,
+            'connected_s': round(time.monotonic() - self.created, 1),
+        }
+
+
+class FanOut:
+    """
+    扇出调度
+
+    - enqueue(): 同一份已编码报文按引用放入每个订阅者的队列
+    - flush(): 每个客户端的 Engine.IO socket 队列少于 max_inflight 个报文时才继续交付，
+      其余留在有界队列里（满时丢最旧），因此积压只发生在该客户端自己身上
+    - check_slow(): 每 slow_window 秒检查一次丢包率，连续 slow_strikes 个窗口超过
+      slow_drop_ratio 的客户端交给 on_slow 回调（降级），回调返回 False 时断开
+    """
+
+    def __init__(
+        self,
+        transport,
+        max_queue: int = 25,
+        max_inflight: int = 4,
+        slow_drop_ratio: float = 0.1,
+        slow_window: float = 5.0,
+        slow_strikes: int = 2
+    ):
+        """
+        Args:
+            transport: 发送接口（SocketIOTransport）
+            max_queue: 每客户端队列长度（报文数，默认约 250ms 下行音频）
+            max_inflight: 交给 Engine.IO socket 但尚未写出的最大报文数
+            slow_drop_ratio: 判定为慢客户端的窗口丢包率
+            slow_window: 判定窗口（秒）
+            slow_strikes: 连续超标几个窗口才处理
+        """
+        self.transport = transport
+        self.max_queue = max_queue
+        self.max_inflight = max_inflight
+        self.slow_drop_ratio = slow_drop_ratio
+        self.slow_window = slow_window
+        self.slow_strikes = slow_strikes
+        self.on_slow: Optional[Callable[[str], bool]] = None
+
+        self.clients: Dict[str, ClientQueue] = {}
+        self.evicted = 0
+        self._last_check = time.monotonic()
+        # 采集 → 交给 socket 的服务端总延迟（每次交付记一次）
+        self.capture_to_send = Histogram(
+            'clubvoice_capture_to_send_seconds', '输入设备采集到下行报文交给客户端 socket 的服务端延迟'
+        )
+
+    def add(self, sid: str) -> ClientQueue:
+        client = self.clients.get(sid)
+        if client is None:
+            client = ClientQueue(sid, self.max_queue)
+            self.clients[sid] = client
+        return client
+
+    def remove(self, sid: str):
+        self.clients.pop(sid, None)
+
+    def enqueue(self, sids: Iterable[str], packets: list, now: Optional[float] = None,
+                captured: Optional[float] = None, nbytes: int = 0):
+        """
+        把同一份报文放入多个客户端的队列
+
+        Args:
+            captured: 报文中最早样本的采集时刻（monotonic），默认为入队时刻
+            nbytes: 负载字节数（用于每客户端流量统计）
+        """
+        now = time.monotonic() if now is None else now
+        item = (now, now if captured is None else captured, packets, nbytes)
+        for sid in sids:
+            client = self.clients.get(sid)
+            if client is not None:
+                client.push(item)
+
+    def flush(self, now: Optional[float] = None):
+        """按各客户端 socket 的空闲程度交付队列中的报文"""
+        now = time.monotonic() if now is None else now
+        for client in list(self.clients.values()):
+            if not client.packets:
+                continue
+            if client.eio_sid is None:
+                client.eio_sid = self.transport.resolve(client.sid)
+                if client.eio_sid is None:
+                    continue
+            inflight = self.transport.backlog(client.eio_sid)
+            while client.packets and inflight < self.max_inflight:
+                queued_at, captured, packets, nbytes = client.packets.popleft()
+                try:
+                    self.transport.send(client.eio_sid, packets)
+                except Exception:
+                    # socket 已关闭: 丢弃积压，等待 disconnect 事件清理
+                    client.packets.clear()
+                    break
+                delay = now - queued_at
+                client.delay_ewma += 0.05 * (delay - client.delay_ewma)
+                if delay > client.delay_max:
+                    client.delay_max = delay
+                client.sent += 1
+                client.bytes_sent += nbytes
+                inflight += len(packets)
+                self.capture_to_send.observe(now - captured)
+
+    def check_slow(self, now: Optional[float] = None) -> List[str]:
+        """
+        慢客户端检查（每个窗口最多执行一次）
+
+        Returns:
+            本次被断开的 sid
+        """
+        now = time.monotonic() if now is None else now
+        if now - self._last_check < self.slow_window:
+            return []
+        self._last_check = now
+
+        evicted = []
+        for client in list(self.clients.values()):
+            enqueued, dropped = client.window_enqueued, client.window_dropped
+            client.window_enqueued = client.window_dropped = 0
+            if enqueued and dropped / enqueued > self.slow_drop_ratio:
+                client.strikes += 1
+            else:
+                client.strikes = 0
+                continue
+            if client.strikes < self.slow_strikes:
+                continue
+
+            client.strikes = 0
+            if self.on_slow is not None and self.on_slow(client.sid):
+                client.downgrades += 1
+                client.packets.clear()   # 旧格式的积压不再有意义
+                continue
+            self.remove(client.sid)
+            self.evicted += 1
+            evicted.append(client.sid)
+            try:
+                self.transport.disconnect(client.sid)
+            except Exception:
+                pass
+        return evicted
+
+    def collect_metrics(self) -> list:
+        """每客户端指标（/metrics 采集器）"""
+        metrics = [self.capture_to_send, Counter('clubvoice_clients_evicted_total', '因跟不上被断开的客户端数',
+                                                 value=self.evicted)]
+        for sid, client in list(self.clients.items()):
+            labels = {'client': sid}
+            metrics.append(Counter('clubvoice_client_frames_sent_total', '交付给客户端的下行报文数', labels, client.sent))
+            metrics.append(Counter('clubvoice_client_bytes_sent_total', '交付给客户端的下行负载字节数', labels,
+                                   client.bytes_sent))
+            metrics.append(Counter('clubvoice_client_frames_dropped_total', '客户端发送队列满时丢弃的报文数', labels,
+                                   client.dropped))
+            metrics.append(Gauge('clubvoice_client_queue_depth', '客户端发送队列当前长度', labels, len(client.packets)))
+        return metrics
+
+    def get_stats(self) -> Dict[str, dict]:
+        """每客户端统计"""
+        stats = {}
+        for sid, client in list(self.clients.items()):
+            backlog = self.transport.backlog(client.eio_sid) if client.eio_sid else 0
+            stats[sid] = client.get_stats(backlog)
+        return stats
@@ -0,0 +1,280 @@
+"""
+低延迟 HLS（/hls/live.m3u8）
+复用 HTTP 流的共享 MP3 编码器，把输出按 MP3 帧边界切成短分片（packed audio + ID3 时间戳），
+分片和滚动播放列表都以 bytes 保存在内存里（分片放在有界 LRU 缓存中），
+听众再多也只是返回现成的字节和 ETag/304，不增加编码或拼装开销。
+支持阻塞式播放列表刷新（?_HLS_msn=N），新分片一生成就返回。
+"""
+import math
+import struct
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, List, Optional, Tuple
+
+
+# MP3 帧头: MPEG 版本 → (比特率表 kbps, 采样率表, 每帧样本数)
+_MP3_VERSIONS = {
+    3: ((0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320), (44100, 48000, 32000), 1152),  # MPEG-1
+    2: ((0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160), (22050, 24000, 16000), 576),       # MPEG-2
+    0: ((0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160), (11025, 12000, 8000), 576),        # MPEG-2.5
+}
+
+ID3_TIMESTAMP_OWNER = b'com.apple.streaming.transportStreamTimestamp\x00'
+
+
+def parse_mp3_header(data, pos: int = 0) -> Optional[Tuple[int, int, int]]:
+    """
+    解析 Layer III 帧头
+
+    Returns:
+        (帧长度, 采样率, 每帧样本数)；不是有效帧头时返回 None
+    """
+    if len(data) - pos < 4 or data[pos] != 0xFF or data[pos + 1] & 0xE0 != 0xE0:
+        return None
+    version = (data[pos + 1] >> 3) & 0x03
+    layer = (data[pos + 1] >> 1) & 0x03
+    bitrate_index = data[pos + 2] >> 4
+    rate_index = (data[pos + 2] >> 2) & 0x03
+    padding = (data[pos + 2] >> 1) & 0x01
+    if version not in _MP3_VERSIONS or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    bitrates, rates, samples = _MP3_VERSIONS[version]
+    sample_rate = rates[rate_index]
+    length = samples // 8 * bitrates[bitrate_index] * 1000 // sample_rate + padding
+    return length, sample_rate, samples
+
+
+def _syncsafe(n: int) -> bytes:
+    return bytes([(n >> 21) & 0x7F, (n >> 14) & 0x7F, (n >> 7) & 0x7F, n & 0x7F])
+
+
+def id3_timestamp(pts_90k: int) -> bytes:
+    """HLS packed audio 分片开头的 ID3v2.4 PRIV 时间戳（90kHz，33 位）"""
+    frame_body = ID3_TIMESTAMP_OWNER + struct.pack('>Q', pts_90k & 0x1FFFFFFFF)
+    frame = b'PRIV' + _syncsafe(len(frame_body)) + b'\x00\x00' + frame_body
+    return b'ID3\x04\x00\x00' + _syncsafe(len(frame)) + frame
+
+
+class Segment:
+    """一个已完成的分片（不可变）"""
+
+    __slots__ = ('seq', 'duration', 'data', 'etag')
+
+    def __init__(self, seq: int, duration: float, data: bytes, etag: str):
+        self.seq = seq
+        self.duration = duration
+        self.data = data
+        self.etag = etag
+
+
+class SegmentCache:
+    """有界 LRU 分片缓存"""
+
+    def __init__(self, capacity: int = 24):
+        self.capacity = capacity
+        self._segments: 'OrderedDict[int, Segment]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def put(self, segment: Segment):
+        self._segments[segment.seq] = segment
+        self._segments.move_to_end(segment.seq)
+        while len(self._segments) > self.capacity:
+            self._segments.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, seq: int) -> Optional[Segment]:
+        segment = self._segments.get(seq)
+        if segment is None:
+            self.misses += 1
+            return None
+        self._segments.move_to_end(seq)
+        self.hits += 1
+        return segment
+
+    def clear(self):
+        self._segments.clear()
+
+    def __len__(self) -> int:
+        return len(self._segments)
+
+
+class HlsSegmenter:
+    """
+    MP3 → HLS 分片
+
+    feed() 接收任意切分的 MP3 字节流，按帧边界攒够 segment_seconds 就封一个分片，
+    同时重建播放列表 bytes（只在分片变化时构建一次）
+    """
+
+    def __init__(self, segment_seconds: float = 1.0, window: int = 6, cache_segments: int = 24,
+                 uri_template: str = '{seq}.mp3', event_factory: Callable[[], object] = threading.Event):
+        """
+        Args:
+            segment_seconds: 目标分片时长（秒）
+            window: 播放列表中的分片数
+            cache_segments: LRU 缓存的分片数（至少 window + 2，给刚滑出窗口的请求留余量）
+            uri_template: 播放列表中分片的相对地址
+            event_factory: 阻塞式刷新使用的事件工厂（gevent 模式传入 eio.create_event）
+        """
+        self.segment_seconds = segment_seconds
+        self.window = window
+        self.uri_template = uri_template
+        self.cache = SegmentCache(max(cache_segments, window + 2))
+        self._event_factory = event_factory
+        self._event = event_factory()
+        self.generation = 0            # 每次 reset 递增，ETag 带上它避免跨会话误判 304
+        self.reset()
+
+    def reset(self):
+        """丢弃所有分片（编码器重新开始时调用）"""
+        self.generation += 1
+        self._buffer = bytearray()
+        self._frames: List[bytes] = []
+        self._frame_samples = 0
+        self._sample_rate = 0
+        self._pts_samples = 0          # 当前分片起点（样本）
+        self._recent: List[Segment] = []
+        self.next_seq = 0
+        self.cache.clear()
+        self.playlist = b''
+        self.playlist_etag = ''
+
+    def feed(self, data: bytes):
+        """加入编码器输出"""
+        buffer = self._buffer
+        buffer.extend(data)
+        pos = 0
+        while True:
+            header = parse_mp3_header(buffer, pos)
+            if header is None:
+                if len(buffer) - pos < 4:
+                    break  # 帧头还不完整
+                # 失步: 向后寻找下一个同步字
+                next_sync = buffer.find(b'\xff', pos + 1)
+                pos = len(buffer) if next_sync < 0 else next_sync
+                continue
+            length, sample_rate, samples = header
+            if pos + length > len(buffer):
+                break
+            self._frames.append(bytes(buffer[pos:pos + length]))
+            self._frame_samples += samples
+            self._sample_rate = sample_rate
+            pos += length
+            if self._frame_samples >= self.segment_seconds * sample_rate:
+                self._close_segment()
+        del buffer[:pos]
+
+    def _close_segment(self):
+        rate = self._sample_rate
+        pts = self._pts_samples * 90000 // rate
+        segment = Segment(self.next_seq, self._frame_samples / rate, id3_timestamp(pts) + b''.join(self._frames),
+                          f'seg-{self.generation}-{self.next_seq}')
+        self.cache.put(segment)
+        self._recent = (self._recent + [segment])[-self.window:]
+        self.next_seq += 1
+        self._pts_samples += self._frame_samples
+        self._frames = []
+        self._frame_samples = 0
+        self._build_playlist()
+        event, self._event = self._event, self._event_factory()
+        event.set()
+
+    def _build_playlist(self):
+        recent = self._recent
+        target = max(math.ceil(s.duration) for s in recent)
+        lines = [
+            '#EXTM3U',
+            '#EXT-X-VERSION:3',
+            f'#EXT-X-TARGETDURATION:{target}',
+            f'#EXT-X-MEDIA-SEQUENCE:{recent[0].seq}',
+            '#EXT-X-SERVER-CONTROL:CAN-BLOCK-RELOAD=YES',
+        ]
+        for segment in recent:
+            lines.append(f'#EXTINF:{segment.duration:.3f},')
+            lines.append(self.uri_template.format(seq=segment.seq))
+        self.playlist = ('\n'.join(lines) + '\n').encode('utf-8')
+        self.playlist_etag = f'pl-{self.generation}-{recent[-1].seq}'
+
+    def wait_for(self, seq: int, timeout: float) -> bool:
+        """阻塞式刷新: 等待分片 seq 生成"""
+        deadline = time.monotonic() + timeout
+        while self.next_seq <= seq:
+            event = self._event
+            if self.next_seq > seq:
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not event.wait(remaining):
+                return self.next_seq > seq
+        return True
+
+    def get_stats(self) -> dict:
+        return {
+            'segments': self.next_seq,
+            'cached': len(self.cache),
+            'cache_hits': self.cache.hits,
+            'cache_misses': self.cache.misses,
+            'cache_evictions': self.cache.evictions,
+            'segment_seconds': self.segment_seconds,
+        }
+
+
+class HlsStream:
+    """
+    HLS 生命周期: 首个请求时挂到共享 MP3 编码器上，
+    idle_timeout 秒内没有请求则摘下（停止编码）并清空分片
+    """
+
+    def __init__(self, streams, format_name: str = 'mp3', idle_timeout: float = 30.0, **segmenter_args):
+        self.streams = streams
+        self.format_name = format_name
+        self.idle_timeout = idle_timeout
+        self.segmenter = HlsSegmenter(**segmenter_args)
+        self.active = False
+        self._last_request = 0.0
+        self._lock = threading.Lock()   # 激活/摘下互斥: 并发的首个请求只挂一次消费者
+
+    @property
+    def available(self) -> bool:
+        return self.streams.formats[self.format_name].available
+
+    def touch(self, activate: bool = True) -> bool:
+        """
+        记录一次请求
+
+        Args:
+            activate: 未激活时是否开始切片（播放列表请求激活，分片请求只续期）
+
+        Returns:
+            是否处于激活状态
+
+        Raises:
+            RuntimeError: MP3 编码库不可用（激活时）
+        """
+        with self._lock:
+            if not self.active:
+                if not activate:
+                    return False
+                self.segmenter.reset()
+                self.streams.add_consumer(self.format_name, self._consume)
+                self.active = True
+            self._last_request = time.monotonic()
+            return True
+
+    def _consume(self, chunk: bytes):
+        if time.monotonic() - self._last_request > self.idle_timeout:
+            with self._lock:
+                if not self.active:
+                    return   # 已被摘下
+                # 加锁后复查: 等锁期间可能有请求刚续期
+                if time.monotonic() - self._last_request > self.idle_timeout:
+                    self.streams.remove_consumer(self.format_name, self._consume)
+                    self.active = False
+                    self.segmenter.reset()
+                    return
+        self.segmenter.feed(chunk)
+
+    def get_stats(self) -> dict:
+        return {'active': self.active, **self.segmenter.get_stats()}
@@ -0,0 +1,208 @@
+"""
+HTTP 音频流（/stream、/stream.ogg、/stream.mp3）
+每种格式一个共享编码器和一个 StreamHub: 混音帧每节拍按“有听众”的格式各编码一次，
+编码结果按引用分发给该格式的所有听众，听众数量不增加编码开销。
+新听众先收到格式的前导数据（WAV 文件头 / Ogg 头页），再从直播边缘开始接收。
+"""
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..audio.mp3 import MP3Encoder, MP3_AVAILABLE
+from ..audio.ogg import OggOpusEncoder
+from ..audio.opus import OPUS_AVAILABLE, OPUS_SAMPLE_RATE
+from ..audio.resampler import PolyphaseResampler
+from .stream_hub import StreamHub, StreamListener
+from ..utils.metrics import Counter, Gauge
+
+
+def wav_header(sample_rate: int, channels: int, bits_per_sample: int = 16) -> bytes:
+    """流式 WAV 文件头（长度字段填最大值，播放器按直播流处理）"""
+    data_size = 0xFFFFFFFF - 36
+    block_align = channels * bits_per_sample // 8
+    return (b'RIFF' + struct.pack('<I', data_size + 36) + b'WAVE'
+            + b'fmt ' + struct.pack('<IHHIIHH', 16, 1, channels, sample_rate,
+                                    sample_rate * block_align, block_align, bits_per_sample)
+            + b'data' + struct.pack('<I', data_size))
+
+
+class WavStreamEncoder:
+    """未压缩 PCM16（WAV）"""
+
+    def __init__(self, sample_rate: int, channels: int):
+        self.preamble = wav_header(sample_rate, channels)
+
+    def encode(self, audio: np.ndarray) -> bytes:
+        return audio.astype('<i2', copy=False).tobytes()
+
+
+class MP3StreamEncoder:
+    """MP3（无前导数据，帧自同步）"""
+
+    def __init__(self, sample_rate: int, channels: int, bitrate: int):
+        self.preamble = b''
+        self.encoder = MP3Encoder(sample_rate, channels, bitrate)
+
+    def encode(self, audio: np.ndarray) -> bytes:
+        return self.encoder.encode(audio)
+
+
+class OggOpusStreamEncoder:
+    """Ogg Opus（内部采样率不是 48kHz 时先重采样）"""
+
+    def __init__(self, sample_rate: int, channels: int, bitrate: int, frame_ms: float):
+        self.channels = channels
+        self.resampler = PolyphaseResampler(sample_rate, OPUS_SAMPLE_RATE, channels)
+        self.encoder = OggOpusEncoder(channels, bitrate, frame_ms)
+        self.preamble = self.encoder.preamble
+
+    def encode(self, audio: np.ndarray) -> bytes:
+        frames = audio.reshape(-1, self.channels)
+        if not self.resampler.passthrough:
+            frames = self.resampler.process(frames)
+        return self.encoder.encode(frames)
+
+
+@dataclass(frozen=True)
+class StreamFormat:
+    """HTTP 流格式"""
+    name: str
+    mimetype: str
+    bitrate: int
+    available: bool = True
+
+
+# 编码器工厂: (内部采样率, 内部声道数) → 编码器
+StreamEncoderFactory = Callable[[int, int], object]
+
+
+def default_stream_formats(sample_rate: int = 48000, channels: int = 2,
+                           opus_bitrate: int = 64000, opus_frame_ms: float = 20.0,
+                           mp3_bitrate: int = 128000) -> List[Tuple[StreamFormat, StreamEncoderFactory]]:
+    """默认 HTTP 流格式: WAV（始终可用）、Ogg Opus（需要 opuslib）、MP3（需要 lameenc）"""
+    return [
+        (StreamFormat('wav', 'audio/wav', sample_rate * channels * 16),
+         lambda rate, ch: WavStreamEncoder(rate, ch)),
+        (StreamFormat('ogg', 'audio/ogg', opus_bitrate, OPUS_AVAILABLE),
+         lambda rate, ch: OggOpusStreamEncoder(rate, ch, opus_bitrate, opus_frame_ms)),
+        (StreamFormat('mp3', 'audio/mpeg', mp3_bitrate, MP3_AVAILABLE),
+         lambda rate, ch: MP3StreamEncoder(rate, ch, mp3_bitrate)),
+    ]
+
+
+class HttpStreams:
+    """
+    HTTP 流管线
+
+    - listen(): 注册听众，首个听众出现时创建该格式的编码器
+    - add_consumer(): 本地消费者（HLS 切片器）与听众共享编码器
+    - publish(): 只对有听众或消费者的格式编码（每格式每帧一次），结果发布到该格式的 StreamHub
+    - 没有听众的格式停止编码；重新有听众时丢弃旧编码器，从干净的状态开始
+    """
+
+    def __init__(self, sample_rate: int = 48000, channels: int = 2, capacity_chunks: int = 128,
+                 formats: Optional[List[Tuple[StreamFormat, StreamEncoderFactory]]] = None,
+                 event_factory: Callable[[], object] = threading.Event):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.formats: Dict[str, StreamFormat] = {}
+        self._factories: Dict[str, StreamEncoderFactory] = {}
+        self._encoders: Dict[str, object] = {}
+        self.hubs: Dict[str, StreamHub] = {}
+        self._consumers: Dict[str, List[Callable[[bytes], None]]] = {}
+        for fmt, factory in formats or default_stream_formats(sample_rate, channels):
+            self.formats[fmt.name] = fmt
+            self._factories[fmt.name] = factory
+            self.hubs[fmt.name] = StreamHub(capacity_chunks, event_factory=event_factory)
+            self._consumers[fmt.name] = []
+
+        self.encodes: Dict[str, int] = {}          # 格式 → 编码次数
+        self.encode_time: Dict[str, float] = {}    # 格式 → 累计编码耗时（秒）
+
+    def _ensure_encoder(self, name: str):
+        fmt = self.formats[name]
+        if not fmt.available:
+            raise RuntimeError(f"流格式 {name} 不可用（缺少编码库）")
+        if name not in self._encoders or not self._in_use(name):
+            self._encoders[name] = self._factories[name](self.sample_rate, self.channels)
+        return self._encoders[name]
+
+    def _in_use(self, name: str) -> bool:
+        return bool(self.hubs[name].listener_count or self._consumers[name])
+
+    def listen(self, name: str) -> Tuple[bytes, StreamListener]:
+        """
+        注册听众
+
+        Returns:
+            (前导数据, 听众游标)
+
+        Raises:
+            KeyError: 未知格式
+            RuntimeError: 格式依赖的编码库不可用
+        """
+        encoder = self._ensure_encoder(name)
+        return encoder.preamble, self.hubs[name].listen()
+
+    def add_consumer(self, name: str, consumer: Callable[[bytes], None]):
+        """
+        添加编码结果的本地消费者（如 HLS 切片器），与听众共享同一个编码器
+
+        Raises:
+            RuntimeError: 格式依赖的编码库不可用
+        """
+        self._ensure_encoder(name)
+        self._consumers[name].append(consumer)
+
+    def remove_consumer(self, name: str, consumer: Callable[[bytes], None]):
+        """移除本地消费者"""
+        if consumer in self._consumers[name]:
+            self._consumers[name].remove(consumer)
+
+    def publish(self, audio: np.ndarray):
+        """发布一帧混音（int16 交错）"""
+        for name, hub in self.hubs.items():
+            consumers = self._consumers[name]
+            if not hub.listener_count and not consumers:
+                continue
+            encoder = self._encoders.get(name)
+            if encoder is None:
+                continue
+            start = time.perf_counter()
+            chunk = encoder.encode(audio)
+            self.encode_time[name] = self.encode_time.get(name, 0.0) + time.perf_counter() - start
+            self.encodes[name] = self.encodes.get(name, 0) + 1
+            if chunk:
+                hub.publish(chunk)
+                for consumer in tuple(consumers):
+                    consumer(chunk)
+
+    def collect_metrics(self) -> list:
+        """/metrics 采集器: 每格式听众数、编码次数与耗时"""
+        metrics = []
+        for name, hub in self.hubs.items():
+            labels = {'format': name}
+            metrics.append(Gauge('clubvoice_stream_listeners', 'HTTP 流听众数', labels, hub.listener_count))
+            metrics.append(Counter('clubvoice_stream_encodes_total', 'HTTP 流编码次数', labels, self.encodes.get(name, 0)))
+            metrics.append(Counter('clubvoice_stream_encode_seconds_total', 'HTTP 流累计编码耗时', labels,
+                                   self.encode_time.get(name, 0.0)))
+        return metrics
+
+    def get_stats(self) -> dict:
+        """每格式的听众、编码次数、平均编码耗时"""
+        stats = {}
+        for name, fmt in self.formats.items():
+            encodes = self.encodes.get(name, 0)
+            stats[name] = {
+                'available': fmt.available,
+                'bitrate': fmt.bitrate,
+                'consumers': len(self._consumers[name]),
+                'encodes': encodes,
+                'avg_encode_us': round(self.encode_time.get(name, 0.0) / encodes * 1e6, 1) if encodes else 0.0,
+                **self.hubs[name].get_stats(),
+            }
+        return stats
@@ -0,0 +1,198 @@
+"""
+二进制音频帧协议
+Socket.IO 二进制附件承载: 20 字节小端头 + 负载，取代 base64 JSON（省 33% 带宽和每包的编解码/字符串分配）
+
+帧头:
+    偏移  类型      字段
+    0     uint8     version      协议版本（当前 1）
+    1     uint8     format       负载格式（FORMAT_*）
+    2     uint8     channels     声道数
+    3     uint8     flags        保留
+    4     uint32    seq          序号（每个方向独立递增，回绕）
+    8     uint32    sample_rate  采样率
+    12    float64   timestamp    发送时间（Unix 毫秒）
+    20    ...       payload      PCM16: 交错 int16 小端
+                                 Opus:  若干 [uint16 长度][Opus 包]（一帧可能含 0..n 包）
+
+协商: 客户端在收到 'connected' 后发送 'negotiate' {'transport': 'binary', 'formats': [...]}，
+服务器回 'negotiated'。不发送 'negotiate' 的旧客户端继续使用 base64 JSON。
+"""
+import struct
+import time
+from dataclasses import dataclass
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+
+PROTOCOL_VERSION = 1
+
+# 负载格式
+FORMAT_PCM16 = 1
+FORMAT_OPUS = 2
+
+FORMAT_NAMES = {
+    FORMAT_PCM16: 'pcm16',
+    FORMAT_OPUS: 'opus',
+}
+FORMAT_IDS = {name: format_id for format_id, name in FORMAT_NAMES.items()}
+
+# 传输方式
+TRANSPORT_BINARY = 'binary'
+TRANSPORT_JSON = 'json'    # 旧客户端: base64 JSON
+
+# Socket.IO 事件名
+EVENT_FRAME = 'audio_frame'              # 二进制帧（双向）
+EVENT_LEGACY_DOWN = 'audio_from_clubdeck'  # 旧客户端下行
+EVENT_LEGACY_UP = 'audio_data'             # 旧客户端上行
+
+HEADER = struct.Struct('<BBBBIId')
+HEADER_SIZE = HEADER.size
+PACKET_LENGTH = struct.Struct('<H')
+
+
+@dataclass
+class FrameHeader:
+    """解析后的帧头"""
+    version: int
+    format: int
+    channels: int
+    flags: int
+    seq: int
+    sample_rate: int
+    timestamp: float
+
+
+def now_ms() -> float:
+    """当前 Unix 时间（毫秒），与浏览器 Date.now() 同一时间基准"""
+    return time.time() * 1000.0
+
+
+def pack_frame(payload, seq: int, sample_rate: int, channels: int,
+               format_id: int = FORMAT_PCM16, timestamp: Optional[float] = None) -> bytes:
+    """
+    打包一帧
+
+    Args:
+        payload: bytes 或 int16 数组（PCM16）
+        seq: 序号（自动按 uint32 回绕）
+        timestamp: 发送时间（毫秒），默认当前时间
+    """
+    if isinstance(payload, np.ndarray):
+        payload = payload.astype('<i2', copy=False).tobytes()
+    header = HEADER.pack(PROTOCOL_VERSION, format_id, channels, 0, seq & 0xFFFFFFFF,
+                         sample_rate, now_ms() if timestamp is None else timestamp)
+    return header + payload
+
+
+def unpack_frame(frame: bytes) -> tuple:
+    """
+    解析一帧
+
+    Returns:
+        (FrameHeader, 负载 memoryview)
+
+    Raises:
+        ValueError: 帧过短或版本不支持
+    """
+    if len(frame) < HEADER_SIZE:
+        raise ValueError(f"帧长度 {len(frame)} 小于帧头 {HEADER_SIZE}")
+    header = FrameHeader(*HEADER.unpack_from(frame))
+    if header.version != PROTOCOL_VERSION:
+        raise ValueError(f"不支持的协议版本: {header.version}")
+    return header, memoryview(frame)[HEADER_SIZE:]
+
+
+def decode_pcm16(payload) -> np.ndarray:
+    """PCM16 负载 → int16 数组（零拷贝视图，只读）"""
+    if len(payload) % 2:
+        raise ValueError("PCM16 负载长度必须为偶数")
+    return np.frombuffer(payload, dtype='<i2')
+
+
+def pack_opus_packets(packets: Iterable[bytes]) -> bytes:
+    """多个 Opus 包 → 帧负载（每包前加 uint16 长度）"""
+    return b''.join(PACKET_LENGTH.pack(len(packet)) + packet for packet in packets)
+
+
+def unpack_opus_packets(payload) -> List[memoryview]:
+    """
+    帧负载 → Opus 包列表
+
+    Raises:
+        ValueError: 长度字段越界
+    """
+    payload = memoryview(payload)
+    packets = []
+    pos = 0
+    while pos < len(payload):
+        if pos + PACKET_LENGTH.size > len(payload):
+            raise ValueError("Opus 负载截断")
+        (length,) = PACKET_LENGTH.unpack_from(payload, pos)
+        pos += PACKET_LENGTH.size
+        if pos + length > len(payload):
+            raise ValueError("Opus 包长度越界")
+        packets.append(payload[pos:pos + length])
+        pos += length
+    return packets
+
+
+def _first_common(preferred: Iterable[str], supported: Iterable[str]) -> Optional[str]:
+    supported = list(supported)
+    for name in preferred:
+        if name in supported:
+            return name
+    return None
+
+
+def requested_formats(request, key: str = 'formats') -> Optional[List[str]]:
+    """
+    客户端请求中的格式偏好列表
+
+    Returns:
+        未给出时返回空列表；不是字符串列表（或请求不是字典）时返回 None
+    """
+    if not isinstance(request, dict):
+        return None
+    value = request.get(key)
+    if value is None:
+        return []
+    if isinstance(value, list) and all(isinstance(item, str) for item in value):
+        return value
+    return None
+
+
+def negotiate(request: Optional[dict], supported: Iterable[str] = ('pcm16',),
+              upstream_supported: Iterable[str] = ('pcm16',)) -> dict:
+    """
+    协商传输方式与格式
+
+    Args:
+        request: 客户端 'negotiate' 事件数据
+            {'transport': 'binary', 'formats': [下行偏好...], 'upstream': [上行偏好...]}
+        supported: 服务器可发送的下行格式
+        upstream_supported: 服务器可解码的上行格式
+
+    Returns:
+        {'transport': ..., 'format': ..., 'upstream': ..., 'version': ...}，
+        按客户端给出的优先级选第一个共同格式；
+        客户端不支持二进制、没有共同格式或请求格式不合法（非字典、version 不是整数、
+        formats/upstream 不是字符串列表）时回退到 base64 JSON + pcm16
+    """
+    fallback = {'transport': TRANSPORT_JSON, 'format': 'pcm16', 'upstream': 'pcm16', 'version': PROTOCOL_VERSION}
+    if not isinstance(request, dict):
+        return fallback
+    try:
+        version = int(request.get('version', 1))
+    except (TypeError, ValueError):
+        return fallback
+    formats = requested_formats(request, 'formats')
+    upstream_formats = requested_formats(request, 'upstream')
+    if request.get('transport') != TRANSPORT_BINARY or version < PROTOCOL_VERSION \
+            or formats is None or upstream_formats is None:
+        return fallback
+    name = _first_common(formats or ['pcm16'], supported)
+    if name is None:
+        return fallback
+    upstream = _first_common(upstream_formats or ['pcm16'], upstream_supported) or 'pcm16'
+    return {'transport': TRANSPORT_BINARY, 'format': name, 'upstream': upstream, 'version': PROTOCOL_VERSION}
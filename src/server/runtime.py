@@ -0,0 +1,63 @@
+"""
+网络侧运行时
+音频侧（PortAudio 回调、混音线程、MPV 控制）运行在原生线程里，只做不阻塞的缓冲写入和唤醒；
+网络侧（Socket.IO 处理器、转发循环、HTTP 流）全部运行在 Socket.IO 选定的异步模式里
+（gevent 集线器中的 greenlet，或 threading 模式下的线程）。
+两侧之间唯一的交接点是 Wakeup: 原生线程 notify()，网络侧 wait()，没有 sleep 轮询。
+"""
+import threading
+from typing import Optional
+
+
+def _noop():
+    pass
+
+
+class Wakeup:
+    """
+    原生线程 → 网络侧的线程安全唤醒
+
+    gevent 模式使用集线器的 async 观察者（libev/libuv 的跨线程唤醒，send() 可在任意线程调用），
+    回调在集线器中设置 gevent Event，等待的 greenlet 不会阻塞其他 greenlet；
+    threading 模式直接使用 threading.Event。
+    两次 wait() 之间的多次 notify() 合并为一次唤醒，消费者被唤醒后应取走所有可用数据。
+    """
+
+    def __init__(self, async_mode: str = 'threading'):
+        """
+        Args:
+            async_mode: Socket.IO 的异步模式（'gevent' / 'threading'）；
+                        gevent 模式必须在集线器所在的线程中创建
+        """
+        self.async_mode = async_mode
+        self._watcher = None
+        if async_mode == 'gevent':
+            import gevent
+            import gevent.event
+            self._event = gevent.event.Event()
+            self._watcher = gevent.get_hub().loop.async_()
+            self._watcher.start(self._event.set)
+            self.notify = self._watcher.send
+        else:
+            self._event = threading.Event()
+            self.notify = self._event.set
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待唤醒（网络侧）
+
+        Returns:
+            是否被唤醒（False = 超时）
+        """
+        signaled = self._event.wait(timeout)
+        # 先清除再由调用者取数据: 清除之后到达的 notify 会再次唤醒，不会丢失
+        self._event.clear()
+        return bool(signaled)
+
+    def close(self):
+        """释放 gevent 观察者"""
+        if self._watcher is not None:
+            self.notify = _noop   # 关闭后来自原生线程的 notify 直接忽略
+            self._watcher.stop()
+            self._watcher.close()
+            self._watcher = None
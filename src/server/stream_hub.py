@@ -0,0 +1,140 @@
+"""
+HTTP 流广播中心
+单生产者 / 多听众: 生产者把每块已编码的数据放入共享环（每块 O(1)，与听众数量无关），
+每个 /stream 连接持有自己的读游标；落后太多的听众跳到最新位置，不影响其他人。
+"""
+import itertools
+import threading
+from typing import Callable, Dict, List, Optional
+
+from ..audio.ringbuffer import next_power_of_two
+
+
+class StreamListener:
+    """一个听众的读游标"""
+
+    __slots__ = ('hub', 'id', 'cursor', 'chunks', 'bytes', 'skips', 'skipped')
+
+    def __init__(self, hub: 'StreamHub', listener_id: int, cursor: int):
+        self.hub = hub
+        self.id = listener_id
+        self.cursor = cursor       # 下一个要读的块序号
+        self.chunks = 0            # 已读块数
+        self.bytes = 0
+        self.skips = 0             # 跳到最新位置的次数
+        self.skipped = 0           # 跳过的块数
+
+    @property
+    def lag(self) -> int:
+        """落后的块数"""
+        return self.hub.write_seq - self.cursor
+
+    def read(self, timeout: Optional[float] = None) -> List[bytes]:
+        """
+        读取游标之后的所有块（没有新数据时最多等待 timeout 秒）
+
+        Returns:
+            块列表；超时返回空列表
+        """
+        hub = self.hub
+        if not hub.wait(self.cursor, timeout):
+            return []
+        write_seq = hub.write_seq
+        if write_seq - self.cursor > hub.max_lag:
+            # 落后超过上限: 只保留最新的 resume_chunks 块
+            target = write_seq - hub.resume_chunks
+            self.skips += 1
+            self.skipped += target - self.cursor
+            self.cursor = target
+
+        chunks = []
+        slots, mask = hub.slots, hub.mask
+        seq = self.cursor
+        while seq < write_seq:
+            slot_seq, chunk = slots[seq & mask]
+            if slot_seq != seq:
+                # 读取期间被生产者覆盖: 从下一次调用重新判断落后程度
+                break
+            chunks.append(chunk)
+            self.bytes += len(chunk)
+            seq += 1
+        self.chunks += seq - self.cursor
+        self.cursor = seq
+        return chunks
+
+    def close(self):
+        """注销听众"""
+        self.hub._listeners.pop(self.id, None)
+
+    def get_stats(self) -> dict:
+        return {
+            'lag_chunks': self.lag,
+            'chunks': self.chunks,
+            'bytes': self.bytes,
+            'skips': self.skips,
+            'skipped_chunks': self.skipped,
+        }
+
+
+class StreamHub:
+    """
+    多听众广播环
+
+    - publish(): 生产者写入一块（bytes，按引用保存），换一个新的等待事件并唤醒旧事件上的所有听众
+    - listen(): 新听众从当前写位置开始（直播边缘）
+    - 每个槽保存 (序号, 块)，听众读到序号不符的槽说明已被覆盖
+    """
+
+    def __init__(self, capacity_chunks: int = 128, max_lag: Optional[int] = None, resume_chunks: int = 2,
+                 event_factory: Callable[[], object] = threading.Event):
+        """
+        Args:
+            capacity_chunks: 环容量（块，向上取整为 2 的幂）
+            max_lag: 听众落后超过该块数时跳到最新位置，默认容量的一半
+            resume_chunks: 跳跃后保留的最新块数（避免立即欠载）
+            event_factory: 等待事件的工厂；听众在 gevent greenlet 中等待时传入
+                           Socket.IO 异步模式的事件（eio.create_event），避免阻塞集线器
+        """
+        self.capacity = next_power_of_two(capacity_chunks)
+        self.mask = self.capacity - 1
+        self.max_lag = min(max_lag or self.capacity // 2, self.capacity)
+        self.resume_chunks = max(1, min(resume_chunks, self.max_lag))
+        self.slots = [(-1, b'')] * self.capacity
+        self.write_seq = 0
+        self._event_factory = event_factory
+        self._event = event_factory()
+        self._listeners: Dict[int, StreamListener] = {}
+        self._ids = itertools.count(1)
+
+    def publish(self, chunk: bytes):
+        """写入一块（生产者）"""
+        seq = self.write_seq
+        self.slots[seq & self.mask] = (seq, chunk)
+        self.write_seq = seq + 1
+        event, self._event = self._event, self._event_factory()
+        event.set()
+
+    def wait(self, cursor: int, timeout: Optional[float] = None) -> bool:
+        """等待写位置超过 cursor"""
+        event = self._event   # 先取事件再检查位置，避免错过发布
+        if self.write_seq > cursor:
+            return True
+        return event.wait(timeout) or self.write_seq > cursor
+
+    def listen(self) -> StreamListener:
+        """注册一个从直播边缘开始的听众"""
+        listener = StreamListener(self, next(self._ids), self.write_seq)
+        self._listeners[listener.id] = listener
+        return listener
+
+    @property
+    def listener_count(self) -> int:
+        return len(self._listeners)
+
+    def get_stats(self) -> dict:
+        """获取广播统计（每听众落后块数/跳跃次数）"""
+        return {
+            'capacity_chunks': self.capacity,
+            'chunks_published': self.write_seq,
+            'listeners': {str(lid): listener.get_stats() for lid, listener in list(self._listeners.items())},
+        }
@@ -4,23 +4,33 @@ WebSocket 处理器
 import threading
 import time
 import numpy as np
-from typing import Dict, Set, Optional
+from typing import Dict, List, Set, Optional
 from flask_socketio import SocketIO, emit, join_room, leave_room
 from rich.console import Console
 
 from ..audio.vb_cable_bridge import VBCableBridge
-from ..audio.processor import AudioProcessor
+from ..audio.processor import AudioProcessor, ClientAudioChain
+from ..audio.opus import OpusDecoder, OPUS_AVAILABLE
 from ..config.settings import config
+from ..utils.metrics import Gauge, Histogram, REGISTRY
 from .app import add_audio_to_stream
+from .protocol import (
+    negotiate, requested_formats, unpack_frame, decode_pcm16, unpack_opus_packets,
+    FORMAT_PCM16, FORMAT_OPUS, FORMAT_NAMES, TRANSPORT_JSON, EVENT_FRAME
+)
+from .broadcast import Broadcaster
+from .runtime import Wakeup
 
 
 console = Console()
 
-
 # 全局连接数变量（用于 /status 端点）
 _global_connection_count = 0
 _global_mic_volume = 0.0  # 全局麦克风音量（用于状态行显示）
 _global_ducking_info = (False, 0)  # (is_ducking, amplitude) 用于状态行显示
+_global_bridge: Optional[VBCableBridge] = None  # 当前桥接器（用于 /status 音频统计）
+_global_broadcaster: Optional[Broadcaster] = None  # 当前广播管线（用于 /status 广播统计）
+_global_handler: Optional['WebSocketHandler'] = None  # 当前处理器（用于 /metrics 延迟直方图）
 
 
 def get_connection_count() -> int:
@@ -41,20 +51,131 @@ def get_ducking_info() -> tuple:
     return _global_ducking_info
 
 
+def get_audio_stats() -> dict:
+    """获取音频缓冲与时钟漂移统计"""
+    bridge = _global_bridge
+    if bridge is None:
+        return {}
+    stats = {
+        'buffers': bridge.get_buffer_stats(),
+        'drift': bridge.get_drift_stats(),
+    }
+    if _global_broadcaster is not None:
+        stats['broadcast'] = _global_broadcaster.get_stats()
+        stats['clients'] = _global_broadcaster.get_client_stats()
+    handler = _global_handler
+    if handler is not None:
+        stats['latency'] = {h.name: h.summary() for h in get_latency_histograms()}
+        for sid, latency in list(handler.client_latency.items()):
+            if sid in stats.get('clients', {}):
+                stats['clients'][sid]['latency'] = latency
+    return stats
+
+
+def get_latency_histograms() -> List[Histogram]:
+    """按管线顺序返回各阶段延迟直方图（用于 /metrics）"""
+    histograms = []
+    if _global_bridge is not None:
+        histograms.append(_global_bridge.latency_capture_to_mix)
+    handler = _global_handler
+    if handler is not None:
+        histograms.append(handler.latency_mix_to_forward)
+        histograms.append(handler.broadcaster.fanout.capture_to_send)
+        histograms.extend([handler.latency_client_rtt, handler.latency_client_playout, handler.latency_end_to_end])
+    return histograms
+
+
+def get_latency_ms() -> Optional[float]:
+    """状态行显示的延迟（毫秒）: 有客户端回报时为端到端中位数，否则为服务端采集→发送中位数"""
+    handler = _global_handler
+    if handler is None:
+        return None
+    for histogram in (handler.latency_end_to_end, handler.broadcaster.fanout.capture_to_send):
+        value = histogram.percentile(50)
+        if value is not None:
+            return value * 1000
+    return None
+
+
+def get_wire_formats() -> dict:
+    """获取可协商的下行线路格式 {格式名: {sample_rate, channels, bitrate}}"""
+    broadcaster = _global_broadcaster
+    if broadcaster is None:
+        return {}
+    return {
+        name: {
+            'sample_rate': wire.sample_rate,
+            'channels': wire.channels,
+            'bitrate': wire.nominal_bitrate,
+        }
+        for name, wire in broadcaster.formats.items()
+    }
+
+
 class WebSocketHandler:
     """WebSocket 处理器"""
     
     def __init__(self, socketio: SocketIO, bridge: VBCableBridge):
+        global _global_bridge, _global_broadcaster, _global_handler
         self.socketio = socketio
         self.bridge = bridge
+        _global_bridge = bridge
         self.processor = AudioProcessor(bridge.browser_sample_rate, bridge.browser_channels)
         
         # 连接管理
         self.connected_clients: Set[str] = set()
+        # 每个客户端独立的麦克风处理链（滤波器/噪声门状态），按 request.sid 索引
+        self.client_chains: Dict[str, ClientAudioChain] = {}
         
-        # 音频转发线程
+        # 下行广播: 每帧按各协商格式只编码一次（未协商的旧客户端为 base64 JSON）
+        # HTTP 音频流（用于 iOS 后台播放）作为原始帧消费者接入
+        # Opus 可用且启用时加入协商（按客户端偏好选择），否则只提供 PCM16
+        self.opus_enabled = config.audio.opus_enabled and OPUS_AVAILABLE
+        if config.audio.opus_enabled and not OPUS_AVAILABLE:
+            console.print("[yellow]! Opus 不可用（需要 opuslib + libopus），仅提供 PCM16[/yellow]")
+        self.broadcaster = Broadcaster(
+            socketio, bridge.browser_sample_rate, bridge.browser_channels,
+            opus_bitrate=config.audio.bitrate if self.opus_enabled else None,
+            opus_frame_ms=config.audio.opus_frame_ms,
+            queue_frames=config.server.client_queue_frames,
+            slow_drop_ratio=config.server.slow_client_drop_ratio,
+            coalesce_frames=config.server.coalesce_max_frames,
+            coalesce_ms=config.server.coalesce_max_ms
+        )
+        # 跟不上的客户端被降级时通知其切换解码器；无法降级的由广播管线断开
+        self.broadcaster.on_downgrade = self._notify_downgrade
+        # 每个客户端最近一次协商结果（降级时沿用上行格式）
+        self.client_negotiations: Dict[str, dict] = {}
+        self.upstream_formats = ['opus', 'pcm16'] if self.opus_enabled else ['pcm16']
+        # 上行 Opus 客户端的解码器（保持解码状态），按 request.sid 索引
+        self.client_decoders: Dict[str, OpusDecoder] = {}
+        self.broadcaster.add_sink(add_audio_to_stream)
+        _global_broadcaster = self.broadcaster
+        
+        # 音频转发任务: 混音线程（原生线程）入队后通过 Wakeup 唤醒网络侧
         self.running = False
-        self.forward_thread: Optional[threading.Thread] = None
+        self.forward_task = None
+        self.wakeup = Wakeup(socketio.async_mode)
+        bridge.on_mixed = self.wakeup.notify
+        
+        # 延迟观测（采集 → 混音在 bridge，排队 → 发送在 fanout）:
+        # 混音入队 → 转发循环取出；客户端回报的往返时间与播放缓冲；推算的端到端延迟
+        self.latency_mix_to_forward = Histogram(
+            'clubvoice_mix_to_forward_seconds', '混音帧入队到转发循环取出的延迟'
+        )
+        self.latency_client_rtt = Histogram(
+            'clubvoice_client_rtt_seconds', '客户端测得的 Socket.IO 往返时间'
+        )
+        self.latency_client_playout = Histogram(
+            'clubvoice_client_playout_seconds', '客户端收到帧到开始播放的延迟（播放缓冲 + 输出设备）'
+        )
+        self.latency_end_to_end = Histogram(
+            'clubvoice_end_to_end_seconds', '输入设备采集到浏览器播放的估算延迟'
+        )
+        self.client_latency: Dict[str, dict] = {}   # sid → 最近一次回报换算的延迟
+        _global_handler = self
+        # /metrics: 音频侧 + 广播 + 本处理器的指标，请求时采集
+        REGISTRY.add_collector('audio', self.collect_metrics)
         
         # 服务端 Ducking (闪避) - 麦克风说话时降低接收音量
         self.ducking_enabled = config.audio.browser_ducking_enabled  # 从配置读取
@@ -84,6 +205,8 @@ class WebSocketHandler:
                 from flask import request
                 client_id = request.sid
                 self.connected_clients.add(client_id)
+                self.client_chains[client_id] = self._create_chain(client_id)
+                self.broadcaster.subscribe(client_id, TRANSPORT_JSON, 'pcm16')
                 _global_connection_count = len(self.connected_clients)
                 # 连接日志已集成到音量显示行（👤客户端数）
                 # 发送连接确认和当前配置
@@ -96,6 +219,19 @@ class WebSocketHandler:
                 import traceback
                 traceback.print_exc()
         
+        @self.socketio.on('negotiate')
+        def handle_negotiate(data=None):
+            """协商音频传输方式（二进制帧 / base64 JSON）"""
+            from flask import request
+            result = negotiate(data, self.broadcaster.format_names, self.upstream_formats)
+            # 请求不合法时 negotiate 已回退到 JSON，这里同样只接受字符串列表
+            accepted = requested_formats(data) or [result['format']]
+            self.broadcaster.subscribe(request.sid, result['transport'], result['format'], accepted)
+            if result['upstream'] != 'opus':
+                self.client_decoders.pop(request.sid, None)
+            self.client_negotiations[request.sid] = result
+            emit('negotiated', self._describe_negotiation(result))
+        
         @self.socketio.on('get_config')
         def handle_get_config():
             """返回当前服务器配置"""
@@ -110,6 +246,12 @@ class WebSocketHandler:
                 from flask import request
                 client_id = request.sid
                 self.connected_clients.discard(client_id)
+                self.client_chains.pop(client_id, None)
+                self.client_decoders.pop(client_id, None)
+                self.client_negotiations.pop(client_id, None)
+                self.client_latency.pop(client_id, None)
+                self.broadcaster.unsubscribe(client_id)
+                self.bridge.remove_browser_client(client_id)
                 _global_connection_count = len(self.connected_clients)
                 # 断开日志已集成到音量显示行（👤客户端数）
             except Exception as e:
@@ -117,44 +259,43 @@ class WebSocketHandler:
         
         @self.socketio.on('audio_data')
         def handle_audio_data(data):
-            """接收浏览器音频并转发到 Clubdeck"""
-            global _global_mic_volume, _global_ducking_info
-            
-            # 半双工模式下忽略浏览器麦克风
-            if config.audio.duplex_mode == 'half':
-                console.print(f"[dim red]Half-duplex mode, ignoring browser audio[/dim red]")
-                return
-            
+            """接收浏览器音频（旧客户端 base64 JSON）并转发到 Clubdeck"""
             try:
+                from flask import request
                 audio_base64 = data.get('audio')
                 if audio_base64:
-                    # 解码音频
-                    audio_array = self.processor.base64_to_numpy(audio_base64)
-                    max_amplitude = np.max(np.abs(audio_array))
-                    
-                    # 计算音量百分比（RMS）
-                    rms = np.sqrt(np.mean((audio_array.astype(np.float32) / 32768.0) ** 2))
-                    mic_volume = min(100.0, rms * 100.0 * 10.0)
-                    
-                    # 更新全局麦克风音量（供状态行显示）
-                    _global_mic_volume = mic_volume
-                    
-                    # 检测是否在说话（用于 ducking）
-                    if self.ducking_enabled:
-                        with self._ducking_lock:
-                            if max_amplitude > self.ducking_threshold:
-                                self.is_speaking = True
-                                self.speaking_decay = self.speaking_decay_max
-                                # 更新全局 ducking 状态（供状态行显示）
-                                _global_ducking_info = (True, max_amplitude)
-                    
-                    # 音频处理（降噪、滤波）
-                    audio_array = self.processor.process_audio(audio_array)
-                    # 发送到 VB-Cable (Clubdeck)
-                    self.bridge.send_to_clubdeck(audio_array)
+                    self._receive_browser_audio(request.sid, self.processor.base64_to_numpy(audio_base64))
             except Exception as e:
                 console.print(f"[red]Audio data processing error: {e}[/red]")
         
+        @self.socketio.on(EVENT_FRAME)
+        def handle_audio_frame(frame):
+            """接收浏览器音频（二进制帧）并转发到 Clubdeck"""
+            try:
+                from flask import request
+                header, payload = unpack_frame(frame)
+                if header.format == FORMAT_PCM16:
+                    audio_array = decode_pcm16(payload)
+                elif header.format == FORMAT_OPUS and self.opus_enabled:
+                    audio_array = self._decode_opus(request.sid, payload)
+                else:
+                    raise ValueError(f"不支持的上行格式: {FORMAT_NAMES.get(header.format, header.format)}")
+                if len(audio_array):
+                    self._receive_browser_audio(request.sid, audio_array)
+            except Exception as e:
+                console.print(f"[red]Audio frame processing error: {e}[/red]")
+        
+        @self.socketio.on('latency_ping')
+        def handle_latency_ping(data=None):
+            """客户端测量往返时间（通过 ack 立即返回）"""
+            return True
+        
+        @self.socketio.on('latency_report')
+        def handle_latency_report(data):
+            """客户端回报: 刚收到的帧序号、播放延迟、最近测得的往返时间"""
+            from flask import request
+            self._record_client_latency(request.sid, data)
+        
         @self.socketio.on('join_room')
         def handle_join_room(data):
             room = data.get('room', 'default')
@@ -167,64 +308,182 @@ class WebSocketHandler:
             leave_room(room)
             emit('room_left', {'room': room})
     
+    def _describe_negotiation(self, result: dict) -> dict:
+        """协商结果 + 所选线路格式的参数（客户端据此配置解码器/编码器）"""
+        reply = dict(result)
+        wire = self.broadcaster.formats[result['format']]
+        reply.update(sample_rate=wire.sample_rate, channels=wire.channels)
+        if wire.bitrate:
+            reply.update(bitrate=wire.bitrate, frame_ms=wire.frame_ms)
+        if result['upstream'] == 'opus':
+            reply.update(upstream_bitrate=config.audio.bitrate, upstream_frame_ms=config.audio.opus_frame_ms)
+        return reply
+    
+    def collect_metrics(self) -> list:
+        """/metrics 采集器: 连接数、Ducking、延迟直方图、广播与音频侧指标"""
+        metrics = [
+            Gauge('clubvoice_connections', '当前 Socket.IO 连接数', value=len(self.connected_clients)),
+            Gauge('clubvoice_browser_ducking_volume', '浏览器下行 Ducking 当前音量系数', value=self.current_volume),
+            self.latency_mix_to_forward,
+            self.latency_client_rtt,
+            self.latency_client_playout,
+            self.latency_end_to_end,
+        ]
+        metrics.extend(self.broadcaster.collect_metrics())
+        metrics.extend(self.bridge.collect_metrics())
+        return metrics
+    
+    def _record_client_latency(self, client_id: str, data) -> Optional[float]:
+        """
+        客户端回报换算为端到端延迟
+
+        回报在收到帧 seq 时立即发出，到达服务端时已过去单程返回时间（约 rtt/2）:
+        端到端 ≈ (现在 - 帧的采集时刻) - rtt/2 + 客户端播放延迟
+
+        Returns:
+            端到端延迟（秒）；帧序号已过期或回报无效时返回 None
+        """
+        try:
+            seq = int(data['seq'])
+            playout = max(0.0, float(data.get('playout_ms') or 0) / 1000)
+            rtt = max(0.0, float(data.get('rtt_ms') or 0) / 1000)
+        except (KeyError, TypeError, ValueError):
+            return None
+        if rtt:
+            self.latency_client_rtt.observe(rtt)
+        self.latency_client_playout.observe(playout)
+        captured = self.broadcaster.captured_at(seq)
+        if captured is None:
+            return None
+        end_to_end = time.monotonic() - captured - rtt / 2 + playout
+        self.latency_end_to_end.observe(end_to_end)
+        self.client_latency[client_id] = {
+            'end_to_end_ms': round(end_to_end * 1000, 1),
+            'rtt_ms': round(rtt * 1000, 1),
+            'playout_ms': round(playout * 1000, 1),
+        }
+        return end_to_end
+    
+    def _notify_downgrade(self, client_id: str, format_name: str):
+        """慢客户端已被切换到更低码率的格式: 重新发送 'negotiated'"""
+        result = dict(self.client_negotiations.get(client_id) or negotiate(None), format=format_name)
+        self.client_negotiations[client_id] = result
+        reply = self._describe_negotiation(result)
+        reply['reason'] = 'slow'
+        self.socketio.emit('negotiated', reply, to=client_id)
+        console.print(f"[yellow]! 客户端 {client_id[:8]} 跟不上，降级到 {format_name}[/yellow]")
+    
+    def _decode_opus(self, client_id: str, payload) -> np.ndarray:
+        """解码一帧上行 Opus（可含多包），输出桥接器内部格式的 int16 交错数组"""
+        decoder = self.client_decoders.get(client_id)
+        if decoder is None:
+            decoder = OpusDecoder(self.bridge.browser_sample_rate, self.bridge.browser_channels)
+            self.client_decoders[client_id] = decoder
+        packets = unpack_opus_packets(payload)
+        if len(packets) == 1:
+            return decoder.decode(packets[0])
+        return np.concatenate([decoder.decode(packet) for packet in packets] or [np.zeros(0, dtype=np.int16)])
+    
+    def _receive_browser_audio(self, client_id: str, audio_array: np.ndarray):
+        """处理一包浏览器麦克风音频（int16 交错）: 音量/闪避检测 → 处理链 → Clubdeck"""
+        global _global_mic_volume, _global_ducking_info
+        
+        # 半双工模式下忽略浏览器麦克风
+        if config.audio.duplex_mode == 'half':
+            console.print(f"[dim red]Half-duplex mode, ignoring browser audio[/dim red]")
+            return
+        
+        max_amplitude = np.max(np.abs(audio_array))
+        
+        # 计算音量百分比（RMS）
+        rms = np.sqrt(np.mean((audio_array.astype(np.float32) / 32768.0) ** 2))
+        mic_volume = min(100.0, rms * 100.0 * 10.0)
+        
+        # 更新全局麦克风音量（供状态行显示）
+        _global_mic_volume = mic_volume
+        
+        # 检测是否在说话（用于 ducking）
+        if self.ducking_enabled:
+            with self._ducking_lock:
+                if max_amplitude > self.ducking_threshold:
+                    self.is_speaking = True
+                    self.speaking_decay = self.speaking_decay_max
+                    # 更新全局 ducking 状态（供状态行显示）
+                    _global_ducking_info = (True, max_amplitude)
+        
+        # 音频处理（降噪、滤波）- 使用该客户端自己的处理链
+        chain = self.client_chains.get(client_id)
+        if chain is None:
+            chain = self._create_chain(client_id)
+            self.client_chains[client_id] = chain
+        audio_array = chain.process(audio_array)
+        # 发送到 VB-Cable (Clubdeck)，按客户端分别缓冲后混音
+        self.bridge.send_to_clubdeck(audio_array, client_id=client_id)
+    
+    def _create_chain(self, client_id: str) -> ClientAudioChain:
+        """为客户端创建麦克风处理链"""
+        return ClientAudioChain(
+            client_id,
+            sample_rate=self.bridge.browser_sample_rate,
+            channels=self.bridge.browser_channels
+        )
+    
     def _forward_clubdeck_audio(self):
-        """转发 Clubdeck 音频到所有浏览器客户端"""
+        """
+        转发 Clubdeck 音频到所有浏览器客户端（运行在 Socket.IO 的异步模式中）
+
+        混音线程每入队一帧就 notify，本循环被唤醒后取走所有可用帧，逐帧处理后成批发布
+        （落后时多帧按合并上限拼成较少的报文）；没有 sleep 轮询，超时只用于检查 running
+        """
         while self.running:
+            self.wakeup.wait(0.5)
+            frames = self.bridge.drain_mixed()
+            if not frames:
+                continue
+            now = time.monotonic()
+            for frame in frames:
+                self.latency_mix_to_forward.observe(now - frame.mixed)
             try:
-                # 从 VB-Cable 获取 Clubdeck 音频
-                audio_data = self.bridge.receive_from_clubdeck(timeout=0.05)
-                
-                if audio_data is not None:
-                    # 音频处理（降噪、滤波）- 只处理单声道
-                    if audio_data.ndim == 1:
-                        audio_data = self.processor.process_audio(audio_data)
-                    
-                    # 应用 Ducking (闪避) - 说话时降低音量（平滑过渡）
-                    if self.ducking_enabled:
-                        with self._ducking_lock:
-                            global _global_ducking_info
-                            if self.speaking_decay > 0:
-                                self.speaking_decay -= 1
-                                self.target_volume = self.ducking_volume
-                            else:
-                                self.is_speaking = False
-                                self.target_volume = 1.0
-                                # 清除 ducking 状态
-                                _global_ducking_info = (False, 0)
-                            
-                            # 平滑过渡到目标音量
-                            if self.current_volume < self.target_volume:
-                                self.current_volume = min(
-                                    self.current_volume + self.volume_smooth_speed,
-                                    self.target_volume
-                                )
-                            elif self.current_volume > self.target_volume:
-                                self.current_volume = max(
-                                    self.current_volume - self.volume_smooth_speed,
-                                    self.target_volume
-                                )
-                            
-                            # 应用当前音量
-                            if self.current_volume < 1.0:
-                                audio_data = (audio_data.astype(np.float32) * self.current_volume).astype(np.int16)
-                    
-                    # 同时推送到 HTTP 音频流（用于 iOS 后台播放）
-                    add_audio_to_stream(audio_data)
-                    
-                    if len(self.connected_clients) > 0:
-                        # 编码为 base64
-                        audio_base64 = self.processor.numpy_to_base64(audio_data)
-                        
-                        # 广播到所有客户端
-                        self.socketio.emit('audio_from_clubdeck', {
-                            'audio': audio_base64,
-                            'sample_rate': self.bridge.browser_sample_rate,
-                            'channels': self.bridge.browser_channels
-                        })
+                self.broadcaster.publish_batch([self._process_frame(frame.audio) for frame in frames],
+                                               [frame.captured for frame in frames])
             except Exception as e:
                 console.print(f"[red]Audio forwarding error: {e}[/red]")
-            
-            time.sleep(0.01)
+
+    def _process_frame(self, audio_data: np.ndarray) -> np.ndarray:
+        """处理一帧混音（降噪、Ducking）"""
+        # 音频处理（降噪、滤波）- 只处理单声道
+        if audio_data.ndim == 1:
+            audio_data = self.processor.process_audio(audio_data)
+        
+        # 应用 Ducking (闪避) - 说话时降低音量（平滑过渡）
+        if self.ducking_enabled:
+            with self._ducking_lock:
+                global _global_ducking_info
+                if self.speaking_decay > 0:
+                    self.speaking_decay -= 1
+                    self.target_volume = self.ducking_volume
+                else:
+                    self.is_speaking = False
+                    self.target_volume = 1.0
+                    # 清除 ducking 状态
+                    _global_ducking_info = (False, 0)
+                
+                # 平滑过渡到目标音量
+                if self.current_volume < self.target_volume:
+                    self.current_volume = min(
+                        self.current_volume + self.volume_smooth_speed,
+                        self.target_volume
+                    )
+                elif self.current_volume > self.target_volume:
+                    self.current_volume = max(
+                        self.current_volume - self.volume_smooth_speed,
+                        self.target_volume
+                    )
+                
+                # 应用当前音量
+                if self.current_volume < 1.0:
+                    audio_data = (audio_data.astype(np.float32) * self.current_volume).astype(np.int16)
+        return audio_data
     
     def start(self):
         """启动处理器"""
@@ -233,9 +492,8 @@ class WebSocketHandler:
         
         self.running = True
         
-        # 启动 Clubdeck 音频转发线程
-        self.forward_thread = threading.Thread(target=self._forward_clubdeck_audio, daemon=True)
-        self.forward_thread.start()
+        # 启动 Clubdeck 音频转发任务（gevent 模式下是 greenlet，由混音线程的 notify 唤醒）
+        self.forward_task = self.socketio.start_background_task(self._forward_clubdeck_audio)
         
         # 显示 Browser Ducking 配置
         if self.ducking_enabled:
@@ -249,12 +507,20 @@ class WebSocketHandler:
         """停止处理器"""
         self.running = False
         
-        if self.forward_thread:
-            self.forward_thread.join(timeout=2)
-            self.forward_thread = None
+        if self.forward_task:
+            self.wakeup.notify()
+            self.forward_task.join(timeout=2)
+            self.forward_task = None
         
         # 清理所有客户端连接
         self.connected_clients.clear()
+        self.client_chains.clear()
+        self.client_decoders.clear()
+        self.client_negotiations.clear()
+        self.client_latency.clear()
+        for client_id in list(self.broadcaster.subscribers):
+            self.broadcaster.unsubscribe(client_id)
+        self.broadcaster.clear()
         
         # 重置状态
         self.is_speaking = False
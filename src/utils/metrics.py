@@ -0,0 +1,252 @@
+"""
+指标注册表与 Prometheus 文本格式输出
+
+热路径（PortAudio 回调、混音线程、转发循环）上只做无锁的计数:
+- Counter: 每个写线程一个单元格（threading.local），只有该线程写它，读者求和；多个回调线程同时 inc 也不会丢计数，
+  线程退出时单元格并入基数，短命线程不会让单元格越积越多
+- Histogram: 固定桶计数，单写者（每个直方图只在一个线程/greenlet 中 observe）
+- Gauge: 单次赋值
+已经在各模块 get_stats() 里维护的计数（环形缓冲溢出/欠载、混音节拍、客户端队列）不在热路径上重复计数，
+由采集器（collector）在 /metrics 请求时读取并转换为指标。
+"""
+import bisect
+import threading
+import weakref
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+# 默认延迟桶（秒）: 1ms ~ 5s
+LATENCY_BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.03, 0.05, 0.075, 0.1,
+                   0.15, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0, 5.0)
+
+# 回调/命令耗时桶（秒）: 20µs ~ 50ms
+DURATION_BUCKETS = (0.00002, 0.00005, 0.0001, 0.0002, 0.0005, 0.001, 0.002,
+                    0.005, 0.01, 0.02, 0.05)
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    parts = []
+    for key, value in labels.items():
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{key}="{value}"')
+    return '{' + ','.join(parts) + '}'
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _CellOwner:
+    """挂在写线程的 threading.local 上，线程退出时随之释放，触发 _retire_cell"""
+
+    __slots__ = ('__weakref__',)
+
+
+def _retire_cell(lock: threading.Lock, cells: Dict[int, list], base: list, cell: list):
+    """写线程退出: 把它的单元格并入基数（不引用 Counter 本身，计数器可以先于线程被回收）"""
+    with lock:
+        base[0] += cell[0]
+        del cells[id(cell)]
+
+
+class Counter:
+    """单调递增计数器（inc 无锁，每个写线程一个单元格，线程退出时并入基数）"""
+
+    __slots__ = ('name', 'help', 'labels', '_local', '_cells', '_base', '_lock')
+
+    type = 'counter'
+
+    def __init__(self, name: str, help: str, labels: Optional[Dict[str, str]] = None, value: float = 0):
+        """
+        Args:
+            value: 初始值（采集器把已有的统计计数转换为指标时使用）
+        """
+        self.name = name
+        self.help = help
+        self.labels = labels or {}
+        self._local = threading.local()
+        self._cells: Dict[int, list] = {}   # 存活写线程的单元格
+        self._base = [value]                # 初始值 + 已退出线程的计数
+        self._lock = threading.Lock()       # 只在单元格增删和读取时使用
+
+    def inc(self, amount: float = 1):
+        try:
+            cell = self._local.cell
+        except AttributeError:
+            cell = self._new_cell()
+        cell[0] += amount
+
+    def _new_cell(self) -> list:
+        """当前线程首次写入: 创建单元格并在线程退出时并入基数"""
+        cell = [0]
+        owner = _CellOwner()
+        with self._lock:
+            self._cells[id(cell)] = cell
+        weakref.finalize(owner, _retire_cell, self._lock, self._cells, self._base, cell)
+        self._local.cell = cell
+        self._local.owner = owner
+        return cell
+
+    @property
+    def value(self) -> float:
+        with self._lock:
+            return self._base[0] + sum(cell[0] for cell in self._cells.values())
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        return [(self.name, self.labels, self.value)]
+
+
+class Gauge:
+    """瞬时值"""
+
+    __slots__ = ('name', 'help', 'labels', 'value')
+
+    type = 'gauge'
+
+    def __init__(self, name: str, help: str, labels: Optional[Dict[str, str]] = None, value: float = 0):
+        self.name = name
+        self.help = help
+        self.labels = labels or {}
+        self.value = value
+
+    def set(self, value: float):
+        self.value = value
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        return [(self.name, self.labels, self.value)]
+
+
+class Histogram:
+    """固定桶直方图（Prometheus histogram 语义，桶上界包含；单写者）"""
+
+    __slots__ = ('name', 'help', 'labels', 'buckets', 'counts', 'count', 'sum', 'last', 'min', 'max')
+
+    type = 'histogram'
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float] = LATENCY_BUCKETS,
+                 labels: Optional[Dict[str, str]] = None):
+        self.name = name
+        self.help = help
+        self.labels = labels or {}
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)   # 最后一个是 +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.last = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.last = value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """按桶线性插值估算百分位数（插值区间收窄到观测到的最小/最大值；没有样本时返回 None）"""
+        count = self.count
+        if not count:
+            return None
+        rank = count * pct / 100
+        seen = 0
+        lower = 0.0
+        for i, bucket_count in enumerate(self.counts):
+            upper = self.buckets[i] if i < len(self.buckets) else self.max
+            if bucket_count and seen + bucket_count >= rank:
+                low, high = max(lower, self.min), min(upper, self.max)
+                return low + (high - low) * (rank - seen) / bucket_count
+            seen += bucket_count
+            lower = upper
+        return self.max
+
+    def summary(self) -> dict:
+        """毫秒摘要（/status 使用）"""
+        def ms(value):
+            return None if value is None else round(value * 1000, 1)
+        return {
+            'count': self.count,
+            'avg_ms': ms(self.sum / self.count) if self.count else None,
+            'p50_ms': ms(self.percentile(50)),
+            'p95_ms': ms(self.percentile(95)),
+            'p99_ms': ms(self.percentile(99)),
+            'last_ms': ms(self.last) if self.count else None,
+        }
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        samples = []
+        cumulative = 0
+        for bucket, bucket_count in zip(self.buckets, self.counts):
+            cumulative += bucket_count
+            samples.append((f'{self.name}_bucket', {**self.labels, 'le': f'{bucket:g}'}, cumulative))
+        samples.append((f'{self.name}_bucket', {**self.labels, 'le': '+Inf'}, self.count))
+        samples.append((f'{self.name}_sum', self.labels, self.sum))
+        samples.append((f'{self.name}_count', self.labels, self.count))
+        return samples
+
+
+def render_prometheus(metrics: Iterable) -> str:
+    """
+    指标 → Prometheus 文本格式（text/plain; version=0.0.4）
+
+    同名指标（不同标签）合并为一个指标族，HELP/TYPE 只输出一次
+    """
+    families: Dict[str, list] = {}
+    for metric in metrics:
+        families.setdefault(metric.name, []).append(metric)
+    lines = []
+    for name, members in families.items():
+        lines.append(f'# HELP {name} {members[0].help}')
+        lines.append(f'# TYPE {name} {members[0].type}')
+        for metric in members:
+            for sample_name, labels, value in metric.samples():
+                lines.append(f'{sample_name}{_format_labels(labels)} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsRegistry:
+    """
+    指标注册表
+
+    - register(): 长期存在的指标对象（同名同标签的后注册者替换前者，组件重建时沿用最新实例）
+    - add_collector(): 请求时调用的采集器，返回当前状态转换成的指标
+    """
+
+    def __init__(self):
+        self._metrics: Dict[tuple, object] = {}
+        self._collectors: Dict[str, Callable[[], Iterable]] = {}
+
+    def register(self, metric):
+        self._metrics[(metric.name, tuple(sorted(metric.labels.items())))] = metric
+        return metric
+
+    def add_collector(self, key: str, collector: Callable[[], Iterable]):
+        """添加采集器（同 key 的替换）"""
+        self._collectors[key] = collector
+
+    def remove_collector(self, key: str):
+        self._collectors.pop(key, None)
+
+    def collect(self) -> list:
+        metrics = list(self._metrics.values())
+        for collector in list(self._collectors.values()):
+            try:
+                metrics.extend(collector())
+            except Exception:
+                # 单个采集器出错（组件正在停止等）不影响其他指标
+                continue
+        return metrics
+
+    def render(self) -> str:
+        return render_prometheus(self.collect())
+
+
+# 进程内默认注册表（/metrics）
+REGISTRY = MetricsRegistry()
@@ -3,6 +3,88 @@
  * 浏览器端音频采集与播放
  */
 
+// === 二进制音频帧（与 src/server/protocol.py 一致）===
+// 20 字节小端头: version u8, format u8, channels u8, flags u8, seq u32, sample_rate u32, timestamp f64(ms)
+// Opus 负载: 若干 [u16 长度][Opus 包]
+const FRAME_VERSION = 1;
+const FRAME_FORMAT_PCM16 = 1;
+const FRAME_FORMAT_OPUS = 2;
+const FRAME_HEADER_SIZE = 20;
+
+function writeFrameHeader(buffer, format, seq, sampleRate, channels) {
+    const view = new DataView(buffer);
+    view.setUint8(0, FRAME_VERSION);
+    view.setUint8(1, format);
+    view.setUint8(2, channels);
+    view.setUint8(3, 0);
+    view.setUint32(4, seq >>> 0, true);
+    view.setUint32(8, sampleRate, true);
+    view.setFloat64(12, Date.now(), true);
+    return view;
+}
+
+function packAudioFrame(int16Data, seq, sampleRate, channels) {
+    const buffer = new ArrayBuffer(FRAME_HEADER_SIZE + int16Data.byteLength);
+    writeFrameHeader(buffer, FRAME_FORMAT_PCM16, seq, sampleRate, channels);
+    new Int16Array(buffer, FRAME_HEADER_SIZE).set(int16Data);
+    return buffer;
+}
+
+function packOpusFrame(packet, seq, sampleRate, channels) {
+    const buffer = new ArrayBuffer(FRAME_HEADER_SIZE + 2 + packet.byteLength);
+    const view = writeFrameHeader(buffer, FRAME_FORMAT_OPUS, seq, sampleRate, channels);
+    view.setUint16(FRAME_HEADER_SIZE, packet.byteLength, true);
+    new Uint8Array(buffer, FRAME_HEADER_SIZE + 2).set(packet);
+    return buffer;
+}
+
+function splitOpusPackets(payload) {
+    const view = new DataView(payload.buffer, payload.byteOffset, payload.byteLength);
+    const packets = [];
+    let pos = 0;
+    while (pos + 2 <= payload.byteLength) {
+        const length = view.getUint16(pos, true);
+        pos += 2;
+        packets.push(payload.subarray(pos, pos + length));
+        pos += length;
+    }
+    return packets;
+}
+
+// 检测 WebCodecs Opus 编解码支持（不支持时协商回退 PCM16）
+async function detectOpusSupport(sampleRate, channels) {
+    const config = { codec: 'opus', sampleRate, numberOfChannels: channels };
+    const check = async (codec) => {
+        try {
+            return typeof codec !== 'undefined' && (await codec.isConfigSupported(config)).supported;
+        } catch (e) {
+            return false;
+        }
+    };
+    return {
+        decode: await check(window.AudioDecoder),
+        encode: await check(window.AudioEncoder)
+    };
+}
+
+function parseAudioFrame(frame) {
+    const view = new DataView(frame);
+    if (frame.byteLength < FRAME_HEADER_SIZE || view.getUint8(0) !== FRAME_VERSION) {
+        throw new Error('无效的音频帧');
+    }
+    return {
+        format: view.getUint8(1),
+        channels: view.getUint8(2),
+        seq: view.getUint32(4, true),
+        sampleRate: view.getUint32(8, true),
+        timestamp: view.getFloat64(12, true),
+        payload: new Uint8Array(frame, FRAME_HEADER_SIZE),
+        pcm: view.getUint8(1) === FRAME_FORMAT_PCM16
+            ? new Int16Array(frame, FRAME_HEADER_SIZE, (frame.byteLength - FRAME_HEADER_SIZE) >> 1)
+            : null
+    };
+}
+
 class VoiceClient {
     constructor() {
         // Socket.IO
@@ -28,6 +110,22 @@ class VoiceClient {
         this.channels = 2;  // 立体声
         this.bufferSize = 2048;  // 减小缓冲区降低延迟
         
+        // 二进制音频帧（与服务器协商，旧服务器回退 base64 JSON）
+        this.binaryFrames = false;
+        this.frameSeq = 0;
+        // 下行格式偏好（按优先级）: 'pcm16' = 48kHz 立体声, 'pcm16_mono' = 24kHz 单声道（移动网络）
+        // 可以在控制台输入 client.preferredFormats = ['pcm16_mono'] 后重连
+        this.preferredFormats = ['pcm16'];
+        
+        // Opus（WebCodecs，浏览器支持且服务器启用时自动协商）
+        this.opusEnabled = true;
+        this.upstreamFormat = 'pcm16';
+        this.upstreamOpus = null;      // 协商结果: { bitrate, frameMs }
+        this.opusDecoder = null;
+        this.opusDecodeTime = 0;       // 解码时间戳（微秒）
+        this.opusEncoder = null;
+        this.opusEncodeTime = 0;       // 编码时间戳（微秒）
+        
         // 噪声门限
         this.noiseGate = 0.01;  // 低于此值静音
         this.noiseGateEnabled = true;
@@ -53,6 +151,12 @@ class VoiceClient {
         this.nextPlayTime = 0;
         this.playbackLatency = 0.05; // 50ms 播放缓冲
 
+        // 延迟回报: 每 latencyReportInterval 毫秒把刚收到的帧序号、播放延迟和往返时间报给服务器
+        this.latencyReportInterval = 2000;
+        this.lastLatencyReport = 0;
+        this.playoutMs = 0;   // 最近一帧从收到到开始播放的延迟（播放缓冲 + 输出设备）
+        this.rttMs = 0;       // 最近一次 Socket.IO 往返时间
+
         // UI 元素
         this.statusDot = document.getElementById('statusDot');
         this.statusText = document.getElementById('statusText');
@@ -88,6 +192,9 @@ class VoiceClient {
             this.updateConnectionStatus(true);
             console.log('客户端 ID:', this.clientId);
             
+            // 协商二进制音频帧（旧服务器不响应，继续使用 base64 JSON）
+            this.negotiate();
+            
             // 获取服务器配置的双工模式
             if (data.duplex_mode) {
                 this.duplexMode = data.duplex_mode;
@@ -105,12 +212,55 @@ class VoiceClient {
 
         this.socket.on('disconnect', () => {
             this.isConnected = false;
+            this.binaryFrames = false;
+            this.closeOpus();
             this.updateConnectionStatus(false);
             console.log('与服务器断开连接');
         });
 
+        this.socket.on('negotiated', (data) => {
+            this.binaryFrames = data.transport === 'binary';
+            if (this.opusDecoder) {
+                try { this.opusDecoder.close(); } catch (e) {}
+                this.opusDecoder = null;
+            }
+            if (data.format === 'opus') {
+                this.openOpusDecoder(data.sample_rate, data.channels);
+            }
+            this.upstreamFormat = data.upstream || 'pcm16';
+            this.upstreamOpus = this.upstreamFormat === 'opus'
+                ? { bitrate: data.upstream_bitrate, frameMs: data.upstream_frame_ms }
+                : null;
+            console.log('音频传输:', data.transport, data.format, '上行:', this.upstreamFormat);
+            if (data.reason === 'slow') {
+                console.warn('网络跟不上，服务器已降级到', data.format);
+            }
+        });
+
+        this.socket.on('audio_frame', (frame) => {
+            try {
+                const { format, channels, seq, sampleRate, payload, pcm } = parseAudioFrame(frame);
+                if (format === FRAME_FORMAT_OPUS) {
+                    this.decodeOpus(payload);
+                } else {
+                    this.handleIncomingAudio(pcm, channels, sampleRate);
+                }
+                this.maybeReportLatency(seq);
+            } catch (error) {
+                console.error('解析音频帧失败:', error);
+            }
+        });
+
         this.socket.on('audio_from_clubdeck', (data) => {
-            this.handleIncomingAudio(data);
+            try {
+                this.handleIncomingAudio(
+                    this.base64ToInt16Array(data.audio),
+                    data.channels || this.channels,
+                    data.sample_rate || this.sampleRate
+                );
+            } catch (error) {
+                console.error('处理接收音频失败:', error);
+            }
         });
 
         this.socket.on('connect_error', (error) => {
@@ -119,6 +269,126 @@ class VoiceClient {
         });
     }
 
+    // 收到帧后立即回报（服务器据此换算端到端延迟），同时发起下一次往返测量
+    maybeReportLatency(seq) {
+        const now = performance.now();
+        if (now - this.lastLatencyReport < this.latencyReportInterval) return;
+        this.lastLatencyReport = now;
+        this.socket.emit('latency_report', { seq, playout_ms: this.playoutMs, rtt_ms: this.rttMs });
+        this.socket.emit('latency_ping', () => {
+            this.rttMs = performance.now() - now;
+        });
+    }
+
+    async negotiate() {
+        const formats = [...this.preferredFormats];
+        const upstream = ['pcm16'];
+        if (this.opusEnabled) {
+            const support = await detectOpusSupport(this.sampleRate, this.channels);
+            if (support.decode && !formats.includes('opus')) formats.unshift('opus');
+            if (support.encode) upstream.unshift('opus');
+        }
+        this.socket.emit('negotiate', {
+            transport: 'binary',
+            formats,
+            upstream,
+            version: FRAME_VERSION
+        });
+    }
+
+    // === Opus (WebCodecs) ===
+
+    openOpusDecoder(sampleRate, channels) {
+        this.opusDecodeTime = 0;
+        this.opusDecoder = new AudioDecoder({
+            output: (audioData) => {
+                const left = new Float32Array(audioData.numberOfFrames);
+                audioData.copyTo(left, { planeIndex: 0, format: 'f32-planar' });
+                let right = left;
+                if (audioData.numberOfChannels > 1) {
+                    right = new Float32Array(audioData.numberOfFrames);
+                    audioData.copyTo(right, { planeIndex: 1, format: 'f32-planar' });
+                }
+                const rate = audioData.sampleRate;
+                audioData.close();
+                this.handleDecodedAudio(left, right, rate);
+            },
+            error: (error) => console.error('Opus 解码失败:', error)
+        });
+        this.opusDecoder.configure({ codec: 'opus', sampleRate, numberOfChannels: channels });
+    }
+
+    decodeOpus(payload) {
+        if (!this.opusDecoder || this.opusDecoder.state !== 'configured') return;
+        for (const packet of splitOpusPackets(payload)) {
+            this.opusDecoder.decode(new EncodedAudioChunk({
+                type: 'key',
+                timestamp: this.opusDecodeTime,
+                data: packet
+            }));
+            // 时间戳只用于排序，按包递增即可
+            this.opusDecodeTime += 1000;
+        }
+    }
+
+    async openOpusEncoder() {
+        const config = {
+            codec: 'opus',
+            sampleRate: this.audioContext.sampleRate,
+            numberOfChannels: this.channels,
+            bitrate: this.upstreamOpus.bitrate,
+            opus: { frameDuration: this.upstreamOpus.frameMs * 1000 }
+        };
+        try {
+            if (!(await AudioEncoder.isConfigSupported(config)).supported) return false;
+        } catch (e) {
+            return false;
+        }
+        this.opusEncodeTime = 0;
+        this.opusEncoder = new AudioEncoder({
+            output: (chunk) => {
+                if (!this.binaryFrames) return;
+                const packet = new Uint8Array(chunk.byteLength);
+                chunk.copyTo(packet);
+                this.socket.emit('audio_frame', packOpusFrame(packet, this.frameSeq++, 48000, this.channels));
+            },
+            error: (error) => {
+                console.error('Opus 编码失败，回退 PCM16:', error);
+                this.opusEncoder = null;
+            }
+        });
+        this.opusEncoder.configure(config);
+        return true;
+    }
+
+    encodeOpus(leftChannel, rightChannel) {
+        const frames = leftChannel.length;
+        const planar = new Float32Array(frames * this.channels);
+        planar.set(leftChannel, 0);
+        if (this.channels > 1) planar.set(rightChannel, frames);
+        const audioData = new AudioData({
+            format: 'f32-planar',
+            sampleRate: this.audioContext.sampleRate,
+            numberOfFrames: frames,
+            numberOfChannels: this.channels,
+            timestamp: this.opusEncodeTime,
+            data: planar
+        });
+        this.opusEncodeTime += Math.round(frames / this.audioContext.sampleRate * 1e6);
+        this.opusEncoder.encode(audioData);
+        audioData.close();
+    }
+
+    closeOpus() {
+        for (const codec of [this.opusDecoder, this.opusEncoder]) {
+            if (codec && codec.state !== 'closed') {
+                try { codec.close(); } catch (e) {}
+            }
+        }
+        this.opusDecoder = null;
+        this.opusEncoder = null;
+    }
+
     updateConnectionStatus(connected) {
         if (connected) {
             this.statusDot.classList.add('connected');
@@ -219,6 +489,11 @@ class VoiceClient {
                 await this.audioContext.resume();
             }
 
+            // 上行 Opus 编码器（浏览器不支持当前采样率时回退 PCM16）
+            if (this.binaryFrames && this.upstreamOpus && !this.opusEncoder) {
+                await this.openOpusEncoder();
+            }
+
             // 创建媒体流源
             this.mediaStreamSource = this.audioContext.createMediaStreamSource(this.mediaStream);
 
@@ -248,14 +523,23 @@ class VoiceClient {
                     this.setSpeaking(true);
                 }
 
+                if (this.binaryFrames && this.opusEncoder) {
+                    this.encodeOpus(leftChannel, rightChannel);
+                    return;
+                }
+
                 // 交织立体声数据并转换为 Int16
                 const int16Data = this.float32StereoToInt16(leftChannel, rightChannel);
-                const base64Data = this.arrayBufferToBase64(int16Data.buffer);
 
-                this.socket.emit('audio_data', {
-                    audio: base64Data,
-                    channels: this.channels
-                });
+                if (this.binaryFrames) {
+                    const frame = packAudioFrame(int16Data, this.frameSeq++, this.sampleRate, this.channels);
+                    this.socket.emit('audio_frame', frame);
+                } else {
+                    this.socket.emit('audio_data', {
+                        audio: this.arrayBufferToBase64(int16Data.buffer),
+                        channels: this.channels
+                    });
+                }
             };
 
             // 连接节点
@@ -273,6 +557,11 @@ class VoiceClient {
     }
 
     stopMic() {
+        if (this.opusEncoder) {
+            try { this.opusEncoder.close(); } catch (e) {}
+            this.opusEncoder = null;
+        }
+
         if (this.scriptProcessor) {
             this.scriptProcessor.disconnect();
             this.scriptProcessor = null;
@@ -342,41 +631,41 @@ class VoiceClient {
         }
     }
 
-    handleIncomingAudio(data) {
+    handleIncomingAudio(int16Data, channels, sampleRate) {
+        try {
+            // 立体声数据分离
+            const { left, right } = this.int16StereoToFloat32(int16Data, channels);
+            this.handleDecodedAudio(left, right, sampleRate);
+        } catch (error) {
+            console.error('处理接收音频失败:', error);
+        }
+    }
+
+    handleDecodedAudio(left, right, sampleRate) {
         // 如果音频未就绪，只更新音量指示器但不播放
         if (!this.audioReady) {
-            try {
-                const int16Data = this.base64ToInt16Array(data.audio);
-                const channels = data.channels || this.channels;
-                const { left } = this.int16StereoToFloat32(int16Data, channels);
-                const volume = this.calculateVolume(left);
-                this.updateSpeakerVolume(volume);
-            } catch (e) {}
+            this.updateSpeakerVolume(this.calculateVolume(left));
             return;
         }
 
         try {
-            // 解码 base64 立体声数据
-            const int16Data = this.base64ToInt16Array(data.audio);
-            const channels = data.channels || this.channels;
-            const { left, right } = this.int16StereoToFloat32(int16Data, channels);
-
             // 更新音量指示器
             const volume = this.calculateVolume(left);
             this.updateSpeakerVolume(volume);
 
             // 播放立体声音频
-            this.playAudioStereo(left, right);
+            this.playAudioStereo(left, right, sampleRate);
 
         } catch (error) {
             console.error('处理接收音频失败:', error);
         }
     }
 
-    playAudioStereo(leftData, rightData) {
+    playAudioStereo(leftData, rightData, sampleRate = this.audioContext.sampleRate) {
         if (!this.audioContext) return;
 
-        const buffer = this.audioContext.createBuffer(2, leftData.length, this.audioContext.sampleRate);
+        // 按帧自身的采样率创建缓冲，由 Web Audio 重采样到上下文采样率
+        const buffer = this.audioContext.createBuffer(2, leftData.length, sampleRate);
         buffer.getChannelData(0).set(leftData);
         buffer.getChannelData(1).set(rightData);
 
@@ -400,6 +689,8 @@ class VoiceClient {
         }
         
         source.start(this.nextPlayTime);
+        const outputLatency = this.audioContext.outputLatency || this.audioContext.baseLatency || 0;
+        this.playoutMs = (this.nextPlayTime - currentTime + outputLatency) * 1000;
         this.nextPlayTime += bufferDuration;
     }
 
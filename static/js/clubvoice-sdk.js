@@ -13,10 +13,27 @@ class ClubVoiceSDK {
         this.nextPlayTime = 0;
         this.playbackLatency = 0.05; // 50ms 播放延迟
         
+        // 延迟回报（服务器据此统计端到端延迟，见 /metrics）
+        this.latencyReportInterval = 2000;
+        this.lastLatencyReport = 0;
+        this.playoutMs = 0;
+        this.rttMs = 0;
+        
         // 音频参数
         this.sampleRate = 48000;
         this.channels = 2;
         
+        // 音频传输（与服务器协商: 'binary' 二进制帧 / 'json' 旧版 base64）
+        this.transport = 'json';
+        // 下行格式偏好（按优先级），在 init() 之前设置:
+        // 'pcm16' = 48kHz 立体声, 'pcm16_mono' = 24kHz 单声道（移动网络）
+        this.preferredFormats = ['pcm16'];
+        this.format = 'pcm16';
+        // 浏览器支持 WebCodecs Opus 时优先协商 Opus（移动网络约 64kbps，PCM16 为 1.5Mbps）
+        this.opusEnabled = true;
+        this.opusDecoder = null;
+        this.opusDecodeTime = 0;
+        
         // 统计信息
         this.stats = {
             packetsReceived: 0,
@@ -58,6 +75,8 @@ class ClubVoiceSDK {
             
             this.socket.on('connected', (data) => {
                 console.log(`[ClubVoice SDK] 客户端ID: ${data.client_id}`);
+                // 协商二进制音频帧（旧服务器不响应，继续使用 base64 JSON）
+                this.negotiate();
                 if (this.onConnected) {
                     this.onConnected(data);
                 }
@@ -67,13 +86,55 @@ class ClubVoiceSDK {
                 console.log('[ClubVoice SDK] 连接断开');
                 this.isConnected = false;
                 this.isListening = false;
+                this.transport = 'json';
+                this.closeOpusDecoder();
                 if (this.onDisconnected) {
                     this.onDisconnected();
                 }
             });
             
+            this.socket.on('negotiated', (data) => {
+                this.transport = data.transport;
+                this.format = data.format;
+                this.closeOpusDecoder();
+                if (data.format === 'opus') {
+                    this.openOpusDecoder(data.sample_rate, data.channels);
+                }
+                console.log(`[ClubVoice SDK] 音频传输: ${data.transport} (${data.format})`);
+            });
+            
+            this.socket.on('audio_frame', (frame) => {
+                if (!this.isListening || !this.audioContext) {
+                    return;
+                }
+                try {
+                    const { format, channels, seq, sampleRate, payload, pcm } = this.parseFrame(frame);
+                    if (format === ClubVoiceSDK.FRAME_FORMAT_OPUS) {
+                        this.decodeOpus(payload, frame.byteLength);
+                    } else {
+                        this.handleIncomingAudio(pcm, channels, sampleRate, frame.byteLength);
+                    }
+                    this.maybeReportLatency(seq);
+                } catch (error) {
+                    console.error('[ClubVoice SDK] 音频帧解析错误:', error);
+                }
+            });
+            
             this.socket.on('audio_from_clubdeck', (data) => {
-                this.handleIncomingAudio(data);
+                if (!this.isListening || !this.audioContext) {
+                    return;
+                }
+                try {
+                    const int16Data = this.base64ToInt16Array(data.audio);
+                    this.handleIncomingAudio(
+                        int16Data,
+                        data.channels || this.channels,
+                        data.sample_rate || this.sampleRate,
+                        data.audio.length
+                    );
+                } catch (error) {
+                    console.error('[ClubVoice SDK] 音频处理错误:', error);
+                }
             });
             
             this.socket.on('connect_error', (error) => {
@@ -184,6 +245,8 @@ class ClubVoiceSDK {
             connected: this.isConnected,
             listening: this.isListening,
             serverUrl: this.serverUrl,
+            transport: this.transport,
+            format: this.format,
             stats: { ...this.stats }
         };
     }
@@ -198,6 +261,8 @@ class ClubVoiceSDK {
             this.socket.disconnect();
         }
         
+        this.closeOpusDecoder();
+        
         if (this.audioContext && this.audioContext.state !== 'closed') {
             this.audioContext.close();
         }
@@ -208,6 +273,81 @@ class ClubVoiceSDK {
 
     // === 内部方法 ===
 
+    async negotiate() {
+        const formats = [...this.preferredFormats];
+        if (this.opusEnabled && !formats.includes('opus') && await this.opusDecodeSupported()) {
+            formats.unshift('opus');
+        }
+        this.socket.emit('negotiate', {
+            transport: 'binary',
+            formats,
+            version: ClubVoiceSDK.FRAME_VERSION
+        });
+    }
+
+    async opusDecodeSupported() {
+        if (typeof window.AudioDecoder === 'undefined') {
+            return false;
+        }
+        try {
+            const result = await AudioDecoder.isConfigSupported({
+                codec: 'opus',
+                sampleRate: this.sampleRate,
+                numberOfChannels: this.channels
+            });
+            return result.supported;
+        } catch (e) {
+            return false;
+        }
+    }
+
+    openOpusDecoder(sampleRate, channels) {
+        this.opusDecodeTime = 0;
+        this.opusDecoder = new AudioDecoder({
+            output: (audioData) => {
+                const left = new Float32Array(audioData.numberOfFrames);
+                audioData.copyTo(left, { planeIndex: 0, format: 'f32-planar' });
+                let right = left;
+                if (audioData.numberOfChannels > 1) {
+                    right = new Float32Array(audioData.numberOfFrames);
+                    audioData.copyTo(right, { planeIndex: 1, format: 'f32-planar' });
+                }
+                const rate = audioData.sampleRate;
+                const channels = audioData.numberOfChannels;
+                audioData.close();
+                if (this.isListening && this.audioContext) {
+                    this.playDecoded(left, right, rate, channels);
+                }
+            },
+            error: (error) => console.error('[ClubVoice SDK] Opus 解码错误:', error)
+        });
+        this.opusDecoder.configure({ codec: 'opus', sampleRate, numberOfChannels: channels });
+    }
+
+    decodeOpus(payload, wireBytes) {
+        if (!this.opusDecoder || this.opusDecoder.state !== 'configured') {
+            return;
+        }
+        for (const packet of this.splitOpusPackets(payload)) {
+            this.opusDecoder.decode(new EncodedAudioChunk({
+                type: 'key',
+                timestamp: this.opusDecodeTime,
+                data: packet
+            }));
+            // 时间戳只用于排序，按包递增即可
+            this.opusDecodeTime += 1000;
+        }
+        this.stats.packetsReceived++;
+        this.stats.bytesReceived += wireBytes;
+    }
+
+    closeOpusDecoder() {
+        if (this.opusDecoder && this.opusDecoder.state !== 'closed') {
+            try { this.opusDecoder.close(); } catch (e) {}
+        }
+        this.opusDecoder = null;
+    }
+
     async initAudioContext() {
         if (!this.audioContext) {
             this.audioContext = new (window.AudioContext || window.webkitAudioContext)({
@@ -228,42 +368,40 @@ class ClubVoiceSDK {
         }
     }
 
-    handleIncomingAudio(data) {
-        if (!this.isListening || !this.audioContext) {
-            return;
-        }
-        
+    handleIncomingAudio(int16Data, channels, sampleRate, wireBytes) {
         try {
-            // 解码音频数据
-            const int16Data = this.base64ToInt16Array(data.audio);
-            const channels = data.channels || this.channels;
             const { left, right } = this.int16StereoToFloat32(int16Data, channels);
             
-            // 播放音频
-            this.playAudioStereo(left, right);
-            
             // 更新统计
             this.stats.packetsReceived++;
-            this.stats.bytesReceived += data.audio.length;
+            this.stats.bytesReceived += wireBytes;
             
-            // 触发回调
-            if (this.onAudioReceived) {
-                this.onAudioReceived({
-                    channels,
-                    samples: int16Data.length / channels,
-                    volume: this.calculateVolume(left)
-                });
-            }
+            this.playDecoded(left, right, sampleRate, channels);
         } catch (error) {
             console.error('[ClubVoice SDK] 音频处理错误:', error);
         }
     }
 
-    playAudioStereo(leftData, rightData) {
+    playDecoded(left, right, sampleRate, channels) {
+        // 播放音频
+        this.playAudioStereo(left, right, sampleRate);
+        
+        // 触发回调
+        if (this.onAudioReceived) {
+            this.onAudioReceived({
+                channels,
+                samples: left.length,
+                volume: this.calculateVolume(left)
+            });
+        }
+    }
+
+    playAudioStereo(leftData, rightData, sampleRate = this.audioContext.sampleRate) {
+        // 按帧自身的采样率创建缓冲，由 Web Audio 重采样到上下文采样率
         const buffer = this.audioContext.createBuffer(
             2, 
             leftData.length, 
-            this.audioContext.sampleRate
+            sampleRate
         );
         
         buffer.getChannelData(0).set(leftData);
@@ -280,10 +418,63 @@ class ClubVoiceSDK {
         }
         
         source.start(this.nextPlayTime);
+        const outputLatency = this.audioContext.outputLatency || this.audioContext.baseLatency || 0;
+        this.playoutMs = (this.nextPlayTime - currentTime + outputLatency) * 1000;
         this.nextPlayTime += buffer.duration;
     }
 
+    /**
+     * 收到帧后立即回报帧序号、播放延迟和往返时间，并发起下一次往返测量
+     */
+    maybeReportLatency(seq) {
+        const now = performance.now();
+        if (now - this.lastLatencyReport < this.latencyReportInterval) return;
+        this.lastLatencyReport = now;
+        this.socket.emit('latency_report', { seq, playout_ms: this.playoutMs, rtt_ms: this.rttMs });
+        this.socket.emit('latency_ping', () => {
+            this.rttMs = performance.now() - now;
+        });
+    }
+
     // 工具函数
+    /**
+     * 解析二进制音频帧（格式见 src/server/protocol.py）
+     * 20 字节小端头: version u8, format u8, channels u8, flags u8, seq u32, sample_rate u32, timestamp f64(ms)
+     */
+    parseFrame(frame) {
+        const view = new DataView(frame);
+        if (frame.byteLength < ClubVoiceSDK.FRAME_HEADER_SIZE || view.getUint8(0) !== ClubVoiceSDK.FRAME_VERSION) {
+            throw new Error('无效的音频帧');
+        }
+        return {
+            format: view.getUint8(1),
+            channels: view.getUint8(2),
+            seq: view.getUint32(4, true),
+            sampleRate: view.getUint32(8, true),
+            timestamp: view.getFloat64(12, true),
+            payload: new Uint8Array(frame, ClubVoiceSDK.FRAME_HEADER_SIZE),
+            pcm: view.getUint8(1) === ClubVoiceSDK.FRAME_FORMAT_PCM16
+                ? new Int16Array(frame, ClubVoiceSDK.FRAME_HEADER_SIZE, (frame.byteLength - ClubVoiceSDK.FRAME_HEADER_SIZE) >> 1)
+                : null
+        };
+    }
+
+    /**
+     * 拆分 Opus 负载: 若干 [u16 长度][Opus 包]
+     */
+    splitOpusPackets(payload) {
+        const view = new DataView(payload.buffer, payload.byteOffset, payload.byteLength);
+        const packets = [];
+        let pos = 0;
+        while (pos + 2 <= payload.byteLength) {
+            const length = view.getUint16(pos, true);
+            pos += 2;
+            packets.push(payload.subarray(pos, pos + length));
+            pos += length;
+        }
+        return packets;
+    }
+
     base64ToInt16Array(base64) {
         const binary = atob(base64);
         const bytes = new Uint8Array(binary.length);
@@ -333,6 +524,12 @@ class ClubVoiceSDK {
     }
 }
 
+// 二进制音频帧常量
+ClubVoiceSDK.FRAME_VERSION = 1;
+ClubVoiceSDK.FRAME_HEADER_SIZE = 20;
+ClubVoiceSDK.FRAME_FORMAT_PCM16 = 1;
+ClubVoiceSDK.FRAME_FORMAT_OPUS = 2;
+
 // 导出到全局
 window.ClubVoiceSDK = ClubVoiceSDK;
 
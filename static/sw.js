@@ -3,7 +3,7 @@
  * 提供离线支持和后台音频保持
  */
 
-const CACHE_NAME = 'clubvoice-v1.0.0';
+const CACHE_NAME = 'clubvoice-v1.3.0';
 const RUNTIME_CACHE = 'clubvoice-runtime';
 
 // 需要缓存的静态资源
@@ -0,0 +1,202 @@
+"""
+测试虚拟设备后端（确定性时钟、漂移与 xrun 注入）以及在虚拟设备上无声卡运行整条管线
+"""
+import io
+import sys
+import tempfile
+import time
+import wave
+from contextlib import redirect_stdout
+from pathlib import Path
+
+import numpy as np
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.config.settings import config, AppConfig, AudioConfig
+from src.audio.backend import (
+    VirtualBackend, VirtualDevice, VirtualClock, SineSource, FileSource, CaptureSink, create_backend, set_backend
+)
+from src.audio.vb_cable_bridge import VBCableBridge
+from src.audio.audio_capture import SharedAudioCapture
+
+
+def test_manual_clock_runs_blocks_in_order():
+    """手动时钟: 按虚拟时间先后执行各流的块，漂移的设备块间隔相应缩短"""
+    backend = VirtualBackend()
+    backend.add_device(VirtualDevice('in', max_input_channels=2, source=SineSource(1000.0, 0.5)))
+    backend.add_device(VirtualDevice('fast', max_input_channels=1, drift_ppm=2000.0))
+    calls = []
+
+    def make_callback(name):
+        def callback(indata, frames, time_info, status):
+            calls.append((name, time_info.currentTime, indata.copy()))
+        return callback
+
+    normal = backend.InputStream(device=0, samplerate=48000, channels=2, dtype='int16',
+                                 blocksize=480, callback=make_callback('in'))
+    fast = backend.InputStream(device='fast', samplerate=48000, blocksize=480, callback=make_callback('fast'))
+    normal.start()
+    fast.start()
+    assert backend.advance(5.005) == len(calls)
+    normal.close()
+    fast.close()
+
+    times = [t for _, t, _ in calls]
+    assert times == sorted(times)
+    assert sum(1 for name, _, _ in calls if name == 'in') == 500
+    assert fast.position - normal.position == 480, "快 2000ppm 的设备 5 秒内多一个块"
+
+    # 正弦与块大小无关: 逐块拼接等于一次算出的整段
+    audio = np.concatenate([block for name, _, block in calls if name == 'in'])
+    t = np.arange(len(audio)) / 48000
+    expected = np.rint(0.5 * np.sin(2 * np.pi * 1000.0 * t) * 32767)
+    assert np.abs(audio[:, 0] - expected).max() <= 1 and np.array_equal(audio[:, 0], audio[:, 1])
+    print(f"✓ 手动时钟执行 {len(calls)} 个块")
+
+
+def test_xrun_injection_and_capture():
+    """每 N 块注入 xrun: 输入块丢失并在下一次回调报告溢出；输出块播放静音并报告欠载"""
+    sink = CaptureSink()
+    backend = VirtualBackend()
+    backend.add_device(VirtualDevice('mic', max_input_channels=1, xrun_every=5))
+    backend.add_device(VirtualDevice('speaker', max_output_channels=2, sink=sink, xrun_every=4))
+    input_flags, output_flags = [], []
+
+    def on_input(indata, frames, time_info, status):
+        input_flags.append(status.input_overflow)
+
+    def on_output(outdata, frames, time_info, status):
+        output_flags.append(status.output_underflow)
+        outdata[:] = 1000
+
+    with backend.InputStream(device=0, blocksize=256, dtype='int16', callback=on_input), \
+            backend.OutputStream(device=1, blocksize=256, dtype='int16', callback=on_output) as output:
+        backend.advance((256 * 20 + 1) / 48000)
+    assert len(input_flags) == 16 and input_flags[4] and sum(input_flags) == 3
+    assert len(output_flags) == 15 and output_flags[3] and sum(output_flags) == 4
+    assert output.xruns == 5 and not output.active
+
+    audio = sink.audio()
+    assert len(audio) == 20 * 256
+    silent_blocks = [i for i in range(20) if not audio[i * 256:(i + 1) * 256].any()]
+    assert silent_blocks == [3, 7, 11, 15, 19]
+    print("✓ xrun 注入与输出捕获")
+
+
+def test_file_source_and_device_list(tmp_path=None):
+    """WAV 文件源（采样率不同时重采样），设备 ID 不连续时设备列表补占位"""
+    path = Path(tmp_path or Path(__file__).parent) / '_virtual_source.wav'
+    tone = (np.sin(2 * np.pi * 500 * np.arange(4410) / 44100) * 10000).astype(np.int16)
+    with wave.open(str(path), 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(44100)
+        wav.writeframes(tone.tobytes())
+    try:
+        source = FileSource(path, loop=False)
+    finally:
+        path.unlink()
+
+    backend = VirtualBackend({35: VirtualDevice('CABLE-B', max_input_channels=2, source=source)})
+    devices = backend.query_devices()
+    assert len(devices) == 36 and devices[35]['name'] == 'CABLE-B' and devices[0]['max_input_channels'] == 0
+    assert backend.query_devices(35)['default_samplerate'] == 48000.0
+
+    blocks = []
+    with backend.InputStream(device=35, blocksize=1200, callback=lambda i, f, t, s: blocks.append(i.copy())):
+        backend.advance(0.2)
+    audio = np.concatenate(blocks)
+    assert abs(np.count_nonzero(audio[:, 0]) - 4800) < 100, "100ms 的音频重采样到 48kHz 约 4800 帧，之后静音"
+    assert abs(np.abs(audio[:4000, 0]).max() - 10000 / 32768) < 0.01
+    print("✓ WAV 文件源与设备列表")
+
+
+def test_bridge_and_capture_run_headless():
+    """在虚拟设备上以 4 倍速运行 VBCableBridge 与 SharedAudioCapture"""
+    enabled = config.audio.mpv_ducking_enabled
+    config.audio.mpv_ducking_enabled = False
+    cable_a = CaptureSink()
+    backend = VirtualBackend({
+        0: VirtualDevice('mpv', max_input_channels=2, source=SineSource(440.0, 0.2)),
+        1: VirtualDevice('clubdeck', max_input_channels=1, default_samplerate=44100,
+                         source=SineSource(220.0, 0.1), drift_ppm=200.0),
+        2: VirtualDevice('cable_a', max_output_channels=2, sink=cable_a),
+    }, VirtualClock(speed=4.0))
+    try:
+        with redirect_stdout(io.StringIO()):
+            bridge = VBCableBridge(0, clubdeck_input_device_id=1, clubdeck_sample_rate=44100, clubdeck_channels=1,
+                                   browser_output_device_id=2, backend=backend)
+            bridge.start()
+            time.sleep(0.3)
+            frames = bridge.drain_mixed()
+            bridge.stop()
+    finally:
+        config.audio.mpv_ducking_enabled = enabled
+
+    assert backend.clock.time > 0.8
+    assert frames and np.abs(np.concatenate([f.audio for f in frames])).max() > 1000
+    # CABLE-A = 浏览器麦克风（无客户端）+ MPV × 0.3
+    played = cable_a.audio()
+    assert played is not None and 0.04 < np.abs(played).max() / 32768 < 0.08
+
+    capture = SharedAudioCapture(0, chunk_size=960, backend=backend)
+    with redirect_stdout(io.StringIO()):
+        capture.add_connection('a')
+        time.sleep(0.1)
+        frame = capture.get_frame('a')
+        capture.cleanup()
+    assert frame is not None and frame.shape == (960, 2) and np.abs(frame).max() > 1000
+    print(f"✓ 虚拟设备运行管线: {len(frames)} 个混音帧，CABLE-A 捕获 {len(played)} 帧")
+
+
+def test_create_backend():
+    """按名称创建后端，sounddevice 后端延迟导入"""
+    backend = create_backend('sounddevice')
+    assert backend._sd is None
+    virtual = create_backend('virtual', config.audio)
+    assert set(virtual.devices) >= {config.audio.mpv_input_device_id, config.audio.browser_output_device_id}
+    try:
+        create_backend('alsa')
+        assert False, "未知后端应报错"
+    except ValueError:
+        pass
+    print("✓ 后端创建")
+
+
+def test_config_mix_graph_reaches_bridge():
+    """启动路径: config.ini 的 [Mix Sources] / [Mix Buses] 经 Bootstrap 的 AudioConfig 传到 create_bridge"""
+    from src.bootstrap import Bootstrap
+    from src.main import create_bridge
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'config.ini'
+        path.write_text(
+            "[Mix Sources]\nroom2 = 40, 44100, 1\n\n"
+            "[Mix Buses]\nbrowser = mpv + clubdeck + room2*0.5 -> browser\n",
+            encoding='utf-8'
+        )
+        with redirect_stdout(io.StringIO()):
+            app_config = AppConfig().load_from_file(path)
+    audio_config = AudioConfig(mpv_input_device_id=0, clubdeck_input_device_id=1, browser_output_device_id=2,
+                               **Bootstrap._shared_audio_fields(app_config))
+    previous = set_backend(VirtualBackend.from_config(audio_config))
+    try:
+        with redirect_stdout(io.StringIO()):
+            bridge = create_bridge(audio_config)
+    finally:
+        set_backend(previous)
+    assert 'room2' in bridge.sources and bridge.sources['room2'].sample_rate == 44100
+    assert bridge.browser_graph.get_gain('browser', 'room2') == 0.5, "配置的母线应进入混音图"
+    print(f"✓ 配置的混音图到达桥接器: 输入源 {sorted(bridge.sources)}")
+
+
+if __name__ == '__main__':
+    test_manual_clock_runs_blocks_in_order()
+    test_xrun_injection_and_capture()
+    test_file_source_and_device_list()
+    test_bridge_and_capture_run_headless()
+    test_create_backend()
+    test_config_mix_graph_reaches_bridge()
+    print("\n✅ 虚拟设备后端测试全部通过")
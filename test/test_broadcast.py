@@ -0,0 +1,141 @@
+"""
+测试一次编码的广播管线
+"""
+import numpy as np
+import sys
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.server.broadcast import Broadcaster
+from src.server.protocol import unpack_frame, decode_pcm16, TRANSPORT_BINARY, TRANSPORT_JSON
+
+
+class RecordingTransport:
+    """记录编码和发送的传输替身（socket 总是空闲）"""
+
+    def __init__(self):
+        self.emitted = []       # 每次 encode 一条: (event, data)
+        self.sent = {}          # sid → 收到的报文
+
+    def encode(self, event, data):
+        self.emitted.append((event, data))
+        return [(event, data)]
+
+    def resolve(self, sid):
+        return sid
+
+    def send(self, sid, packets):
+        self.sent.setdefault(sid, []).extend(packets)
+
+    def backlog(self, sid):
+        return 0
+
+    def disconnect(self, sid):
+        pass
+
+
+def _broadcaster(transport=None):
+    return Broadcaster(None, transport=transport or RecordingTransport())
+
+
+def _frame(frames: int = 512) -> np.ndarray:
+    return (np.arange(frames * 2) % 1000).astype(np.int16)
+
+
+def test_encode_once_per_format():
+    """测试每种格式每帧只编码一次，与订阅者数量无关"""
+    transport = RecordingTransport()
+    broadcaster = _broadcaster(transport)
+    for i in range(50):
+        broadcaster.subscribe(f'bin{i}', TRANSPORT_BINARY, 'pcm16')
+        broadcaster.subscribe(f'json{i}', TRANSPORT_JSON, 'pcm16')
+
+    for _ in range(3):
+        broadcaster.publish(_frame())
+
+    assert broadcaster.encodes == {'pcm16': 3}
+    assert len(transport.emitted) == 6, "每帧每个 (传输方式, 格式) 只打包一次"
+    assert len(transport.sent) == 100 and all(len(p) == 3 for p in transport.sent.values())
+    header, payload = unpack_frame(transport.emitted[0][1])
+    assert header.seq == 0 and np.array_equal(decode_pcm16(payload), _frame())
+    print(f"✓ 100 个订阅者、3 帧只编码 {broadcaster.encodes['pcm16']} 次")
+
+
+def test_mono_downsampled_format():
+    """测试下采样单声道格式"""
+    transport = RecordingTransport()
+    broadcaster = _broadcaster(transport)
+    broadcaster.subscribe('a', TRANSPORT_BINARY, 'pcm16_mono')
+    for _ in range(20):
+        broadcaster.publish(_frame())
+
+    frames = [unpack_frame(data) for _, data in transport.emitted]
+    assert all(h.channels == 1 and h.sample_rate == 24000 for h, _ in frames)
+    total = sum(len(p) for _, p in frames) // 2
+    assert abs(total - 20 * 256) <= 32, "48k→24k 帧数应减半（允许滤波器延迟）"
+    print(f"✓ 单声道 24kHz: {total} 帧")
+
+
+def test_unsubscribe_stops_encoding():
+    """测试没有订阅者的格式不再编码，原始帧消费者始终收到"""
+    broadcaster = _broadcaster()
+    received = []
+    broadcaster.add_sink(received.append)
+    broadcaster.subscribe('a', TRANSPORT_BINARY, 'pcm16')
+    broadcaster.publish(_frame())
+    broadcaster.unsubscribe('a')
+    broadcaster.publish(_frame())
+
+    assert broadcaster.encodes == {'pcm16': 1}
+    assert len(received) == 2
+    assert broadcaster.get_stats()['formats']['pcm16']['subscribers'] == 0
+    print("✓ 取消订阅后停止编码")
+
+
+def test_json_only_supports_pcm16():
+    """测试旧版 JSON 传输只能订阅 pcm16"""
+    broadcaster = _broadcaster()
+    try:
+        broadcaster.subscribe('a', TRANSPORT_JSON, 'pcm16_mono')
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("应该报错")
+    print("✓ JSON 传输格式限制")
+
+
+def test_publish_batch_coalesces():
+    """测试落后时多帧按合并上限拼成较少的报文"""
+    transport = RecordingTransport()
+    broadcaster = Broadcaster(None, transport=transport, coalesce_frames=4, coalesce_ms=50.0)
+    broadcaster.subscribe('a', TRANSPORT_BINARY, 'pcm16')
+
+    broadcaster.publish_batch([_frame()])
+    assert len(transport.emitted) == 1 and broadcaster.frames_coalesced == 0
+
+    # 6 帧 × 10.7ms: 帧数上限 4 → 4 + 2
+    batch = [np.full(1024, i, dtype=np.int16) for i in range(6)]
+    broadcaster.publish_batch(batch)
+    payloads = [decode_pcm16(unpack_frame(data)[1]) for _, data in transport.emitted[1:]]
+    assert [len(p) for p in payloads] == [4 * 1024, 2 * 1024]
+    assert np.array_equal(np.concatenate(payloads), np.concatenate(batch)), "合并后样本顺序不变"
+    assert broadcaster.frames_coalesced == 4
+    assert broadcaster.encodes['pcm16'] == 3
+
+    # 时长上限 25ms: 每个报文最多两帧
+    short = Broadcaster(None, transport=RecordingTransport(), coalesce_frames=8, coalesce_ms=25.0)
+    short.subscribe('a', TRANSPORT_BINARY, 'pcm16')
+    short.publish_batch(batch)
+    assert short.packets_sent == 3
+    print(f"✓ 6 帧合并为 2 个报文（时长上限 25ms 时 3 个）")
+
+
+if __name__ == '__main__':
+    test_encode_once_per_format()
+    test_mono_downsampled_format()
+    test_unsubscribe_stops_encoding()
+    test_json_only_supports_pcm16()
+    test_publish_batch_coalesces()
+    print("\n✅ 所有广播测试通过")
@@ -0,0 +1,90 @@
+"""
+测试浏览器麦克风多路混音器
+"""
+import numpy as np
+import sys
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.audio.mixer import BrowserMixer, JitterBuffer
+
+
+def test_two_talkers_are_summed():
+    """测试两个说话者按样本对齐相加，而不是时间上串行"""
+    mixer = BrowserMixer(channels=2, sample_rate=48000, prebuffer_seconds=0)
+    a = np.full((2048, 2), 1000, dtype=np.int16)
+    b = np.full((2048, 2), 2000, dtype=np.int16)
+    mixer.push('a', a)
+    mixer.push('b', b)
+    
+    for _ in range(4):
+        block = mixer.limit(mixer.mix(512))
+        assert np.all(block == 3000), "两路音频应同时混合"
+    
+    assert mixer.active_talkers == 2
+    block = mixer.limit(mixer.mix(512))
+    assert np.all(block == 0), "数据读完后应输出静音"
+    print("✓ 多路说话者同步混音")
+
+
+def test_client_gain_and_remove():
+    """测试客户端增益与移除"""
+    mixer = BrowserMixer(channels=2, prebuffer_seconds=0)
+    mixer.set_gain('a', 0.5)
+    mixer.push('a', np.full(1024, 4000, dtype=np.int16))
+    block = mixer.limit(mixer.mix(256))
+    assert np.all(block == 2000), "应用客户端增益"
+    
+    mixer.remove('a')
+    assert mixer.get_stats()['clients'] == 0
+    assert mixer.get_gain('a') == 1.0
+    print("✓ 客户端增益与移除")
+
+
+def test_soft_limiter():
+    """测试软限幅：多人大声说话时不硬削波且单调"""
+    mixer = BrowserMixer(channels=1, prebuffer_seconds=0, limiter_threshold=0.8)
+    ramp = np.linspace(-30000, 30000, 512).astype(np.int16)
+    for client in ('a', 'b', 'c'):
+        mixer.push(client, ramp)
+    out = mixer.limit(mixer.mix(512)).reshape(-1)
+    
+    assert out.max() <= 32767 and out.min() >= -32768
+    assert np.all(np.diff(out.astype(np.int32)) >= 0), "限幅曲线应单调"
+    # 和为 30000 附近（超过拐点）应被压缩
+    idx = np.argmin(np.abs(ramp.astype(np.int32) * 3 - 30000))
+    assert 26214 < out[idx] < 30000, "超过拐点的部分应平滑压缩"
+    assert mixer.limited_blocks == 1
+    print("✓ 软限幅")
+
+
+def test_jitter_buffer_prebuffer_and_overrun():
+    """测试抖动缓冲的预缓冲与溢出计数"""
+    jb = JitterBuffer(capacity_frames=1024, channels=2, prebuffer_frames=300)
+    out = np.zeros((1000, 2), dtype=np.float32)
+    scratch = np.zeros_like(out)
+    
+    jb.write(np.ones((200, 2), dtype=np.int16))
+    assert jb.mix_into(out, 100, 1.0, scratch) == 0, "未达到预缓冲量不应输出"
+    
+    jb.write(np.ones((900, 2), dtype=np.int16))
+    assert jb.fill == 1024
+    assert jb.overruns == 76
+    
+    assert jb.mix_into(out, 600, 1.0, scratch) == 600
+    # 环绕写入
+    jb.write(np.full((500, 2), 7, dtype=np.int16))
+    out.fill(0)
+    assert jb.mix_into(out, 900, 1.0, scratch) == 900
+    assert np.all(out[:424] == 1) and np.all(out[424:900] == 7)
+    print("✓ 抖动缓冲预缓冲/溢出/环绕")
+
+
+if __name__ == '__main__':
+    test_two_talkers_are_summed()
+    test_client_gain_and_remove()
+    test_soft_limiter()
+    test_jitter_buffer_prebuffer_and_overrun()
+    print("\n✅ 所有混音器测试通过")
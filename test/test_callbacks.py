@@ -0,0 +1,174 @@
+"""
+测试设备回调的实时安全性（无控制台输出、无数组分配）与混音线程中的格式转换
+"""
+import io
+import sys
+import tracemalloc
+from contextlib import redirect_stdout
+from pathlib import Path
+
+import numpy as np
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.config.settings import config, MixBusConfig, default_mix_buses
+from src.audio.vb_cable_bridge import VBCableBridge
+
+
+BLOCK = 2048   # 一块 2048 帧立体声 int16 = 8 KiB，任何一次整块拷贝/转换都会明显超出下面的上限
+MAX_CALLBACK_BYTES = 2048
+
+
+class Flags:
+    """模拟 sounddevice.CallbackFlags"""
+
+    def __init__(self, **flags):
+        self.__dict__.update(flags)
+
+    def __bool__(self):
+        return any(self.__dict__.values())
+
+
+def make_bridge(**kwargs) -> VBCableBridge:
+    """不带 MPV 闪避的桥接器（不连接 MPV 管道）"""
+    enabled = config.audio.mpv_ducking_enabled
+    config.audio.mpv_ducking_enabled = False
+    try:
+        with redirect_stdout(io.StringIO()):
+            return VBCableBridge(1, clubdeck_input_device_id=2, browser_output_device_id=3,
+                                 chunk_size=BLOCK, **kwargs)
+    finally:
+        config.audio.mpv_ducking_enabled = enabled
+
+
+def peak_allocations(call, iterations: int, between=None) -> int:
+    """每次调用期间的峰值新增内存（字节），取所有调用中的最大值"""
+    worst = 0
+    tracemalloc.start()
+    try:
+        for _ in range(iterations):
+            if between is not None:
+                between()
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            call()
+            worst = max(worst, tracemalloc.get_traced_memory()[1] - base)
+    finally:
+        tracemalloc.stop()
+    return worst
+
+
+def test_input_callback_no_allocations():
+    """输入回调只拷贝进采集环: 每次调用不分配块大小的数组，状态标志只计数不打印"""
+    bridge = make_bridge()
+    callback = bridge._make_input_callback('mpv')
+    ring = bridge.capture_rings['mpv']
+    indata = np.ones((BLOCK, 2), dtype=np.int16)
+    status = Flags(input_overflow=True)
+    for _ in range(3):
+        callback(indata, BLOCK, None, status)
+    ring.skip(ring.fill)
+
+    output = io.StringIO()
+    with redirect_stdout(output):
+        worst = peak_allocations(lambda: callback(indata, BLOCK, None, status), 200,
+                                 between=lambda: ring.skip(ring.fill))
+    assert worst < MAX_CALLBACK_BYTES, f"输入回调分配了 {worst} 字节"
+    assert output.getvalue() == ''
+    counts = {flag: counter.value for flag, counter in bridge.stream_metrics['input_mpv'].flags}
+    assert counts['input_overflow'] == 203
+    assert bridge.get_xrun_count() == 203
+    print(f"✓ 输入回调峰值新增 {worst} 字节（块 {indata.nbytes} 字节）")
+
+
+def test_output_callback_no_allocations():
+    """输出回调只从输出环拷出: 有数据与欠载两种情况都不分配"""
+    bridge = make_bridge()
+    outdata = np.empty((BLOCK, 2), dtype=np.int16)
+    status = Flags(output_underflow=True)
+
+    def refill():
+        while bridge._output_ring.fill < BLOCK:
+            bridge._render_output(BLOCK)
+
+    refill()
+    bridge._output_callback(outdata, BLOCK, None, status)
+    output = io.StringIO()
+    with redirect_stdout(output):
+        worst = peak_allocations(lambda: bridge._output_callback(outdata, BLOCK, None, status), 100,
+                                 between=refill)
+        bridge._output_ring.clear()
+        worst_underrun = peak_allocations(lambda: bridge._output_callback(outdata, BLOCK, None, status), 50)
+    assert worst < MAX_CALLBACK_BYTES, f"输出回调分配了 {worst} 字节"
+    assert worst_underrun < MAX_CALLBACK_BYTES, f"欠载时输出回调分配了 {worst_underrun} 字节"
+    assert output.getvalue() == ''
+    assert not outdata.any(), "欠载时补静音"
+    assert bridge._output_ring.underruns == 50 * BLOCK
+    assert bridge._output_demand.is_set(), "读走数据后唤醒渲染线程"
+    print(f"✓ 输出回调峰值新增 {worst} / {worst_underrun}（欠载）字节")
+
+
+def test_sink_callback_no_allocations():
+    """额外输出设备回调: 正常取数与欠载（淡出补齐 / 静音）都不分配"""
+    bridge = make_bridge(mix_buses=default_mix_buses() + [MixBusConfig('room2_mic', '7', {'mpv': 1.0})])
+    sink = bridge.device_sinks[0]
+    callback = bridge._make_sink_callback(sink)
+    outdata = np.empty((BLOCK, 2), dtype=np.int16)
+    audio = np.full((BLOCK, 2), 1000, dtype=np.int16)
+
+    def refill():
+        while sink.buffer.ring.fill < BLOCK:
+            sink.buffer.push(audio)
+
+    def half_block():
+        sink.buffer.ring.clear()
+        sink.buffer.buffering = False
+        sink.buffer.push(audio[:BLOCK // 2])
+
+    refill()
+    callback(outdata, BLOCK, None, None)
+    worst = peak_allocations(lambda: callback(outdata, BLOCK, None, None), 100, between=refill)
+    worst_fade = peak_allocations(lambda: callback(outdata, BLOCK, None, None), 50, between=half_block)
+    half_block()
+    callback(outdata, BLOCK, None, None)
+    tail = outdata[BLOCK // 2 + 64:, 0].astype(np.int32)
+    assert tail[0] > 0 and tail[-1] == 0 and (np.diff(tail) <= 0).all(), "欠载部分从最后一帧淡出到静音"
+    sink.buffer.ring.clear()
+    worst_silence = peak_allocations(lambda: callback(outdata, BLOCK, None, None), 50)
+    assert worst < MAX_CALLBACK_BYTES, f"输出设备回调分配了 {worst} 字节"
+    assert worst_fade < MAX_CALLBACK_BYTES, f"欠载淡出时分配了 {worst_fade} 字节"
+    assert worst_silence < MAX_CALLBACK_BYTES, f"欠载补静音时分配了 {worst_silence} 字节"
+    assert not outdata.any(), "读空后补静音"
+    assert sink.buffer.underruns >= 100
+    print(f"✓ 输出设备回调峰值新增 {worst} / {worst_fade}（淡出）/ {worst_silence}（静音）字节")
+
+
+def test_worker_converts_captured_audio():
+    """混音线程取出采集环: 单声道 44.1kHz → 立体声 48kHz，分发到调度器与输出域缓冲"""
+    bridge = make_bridge(mpv_channels=1, mpv_sample_rate=44100)
+    callback = bridge._make_input_callback('mpv')
+    indata = np.full((BLOCK, 1), 1000, dtype=np.int16)
+    for _ in range(4):
+        callback(indata, BLOCK, None, None)
+    assert bridge.capture_rings['mpv'].fill == 4 * BLOCK
+    assert bridge.mixer_scheduler.sources['mpv'].ring.fill == 0, "回调中不做转换"
+
+    bridge._ingest_captured()
+    assert bridge.capture_rings['mpv'].fill == 0
+    ring = bridge.mixer_scheduler.sources['mpv'].ring
+    expected = 4 * BLOCK * 48000 / 44100
+    assert abs(ring.fill - expected) < 64, f"重采样后 {ring.fill} 帧，期望约 {expected:.0f}"
+    head, _ = ring.peek()
+    steady = head[100:ring.fill - 100]
+    assert np.array_equal(steady[:, 0], steady[:, 1]) and abs(int(steady[:, 0].mean()) - 1000) < 5
+    assert bridge.output_sources['mpv'].ring.fill > 0
+    print(f"✓ 混音线程转换 {4 * BLOCK} 帧 → {ring.fill} 帧立体声")
+
+
+if __name__ == '__main__':
+    test_input_callback_no_allocations()
+    test_output_callback_no_allocations()
+    test_sink_callback_no_allocations()
+    test_worker_converts_captured_audio()
+    print("\n✅ 回调实时安全测试全部通过")
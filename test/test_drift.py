@@ -0,0 +1,71 @@
+"""
+测试时钟漂移补偿
+"""
+import numpy as np
+import sys
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.audio.drift import DriftCompensator, VariableRateResampler
+from src.audio.ringbuffer import RingBuffer
+
+
+def test_unity_ratio_is_continuous():
+    """测试比率为 1 时输出与输入一致"""
+    resampler = VariableRateResampler(channels=2)
+    source = (np.arange(4000, dtype=np.int16) % 1000).reshape(-1, 2)
+
+    out = np.concatenate([resampler.process(source[i:i + 300], 1.0) for i in range(0, len(source), 300)])
+    assert len(out) == len(source)
+    assert np.array_equal(out, source), "分块处理不应在块边界产生跳变"
+    print("✓ 比率为 1 时无损")
+
+
+def test_ratio_changes_length():
+    """测试输出帧数跟随比率"""
+    resampler = VariableRateResampler(channels=1)
+    chunk = np.zeros(1000, dtype=np.int16)
+    total = sum(len(resampler.process(chunk, 1.001)) for _ in range(100))
+    assert abs(total - 100100) <= 1, f"100000 帧按 1.001 应输出约 100100 帧, 实际 {total}"
+    print(f"✓ 比率 1.001 输出 {total} 帧")
+
+
+def test_compensates_simulated_drift():
+    """模拟生产端比消费端快 300 ppm，缓冲应稳定在目标附近"""
+    drift_ppm = 300.0
+    chunk = 480
+    target = 960
+
+    ring = RingBuffer(48000, channels=1)
+    resampler = VariableRateResampler(channels=1)
+    compensator = DriftCompensator('test', 48000, target)
+
+    produced = 0.0
+    fills = []
+    for step in range(20000):
+        # 生产端按略快的时钟产生数据
+        produced += chunk * (1 + drift_ppm * 1e-6)
+        frames = int(produced)
+        produced -= frames
+        ratio = compensator.update(ring.fill)
+        ring.write(resampler.process(np.zeros(frames, dtype=np.int16), ratio))
+        # 消费端按标称时钟取数据
+        if step > 2:
+            ring.read(chunk)
+        fills.append(ring.fill)
+
+    stats = compensator.get_stats()
+    settled = np.array(fills[-2000:])
+    assert abs(stats['drift_ppm'] - drift_ppm) < 50, f"漂移估计 {stats['drift_ppm']} ppm"
+    assert abs(settled.mean() - target) < target * 0.2, f"缓冲应稳定在目标附近, 实际 {settled.mean():.0f}"
+    assert ring.overruns == 0
+    print(f"✓ 漂移估计 {stats['drift_ppm']} ppm, 缓冲 {settled.mean():.0f} 帧")
+
+
+if __name__ == '__main__':
+    test_unity_ratio_is_continuous()
+    test_ratio_changes_length()
+    test_compensates_simulated_drift()
+    print("\n✅ 所有漂移补偿测试通过")
@@ -0,0 +1,148 @@
+"""
+测试按客户端扇出（有界队列、慢客户端降级/断开）
+"""
+import numpy as np
+import sys
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.server.broadcast import Broadcaster
+from src.server.fanout import FanOut, SocketIOTransport
+from src.server.protocol import unpack_frame, TRANSPORT_BINARY, TRANSPORT_JSON
+
+
+class StallingTransport:
+    """可让指定客户端的 socket 停止写出的传输替身"""
+
+    def __init__(self):
+        self.sent = {}             # sid → 收到的报文
+        self.stalled = set()       # 这些客户端的 socket 队列只进不出
+        self.disconnected = []
+
+    def encode(self, event, data):
+        return [(event, data)]
+
+    def resolve(self, sid):
+        return sid
+
+    def send(self, sid, packets):
+        self.sent.setdefault(sid, []).extend(packets)
+
+    def backlog(self, sid):
+        return len(self.sent.get(sid, ())) if sid in self.stalled else 0
+
+    def disconnect(self, sid):
+        self.disconnected.append(sid)
+
+
+def _frame(frames: int = 512) -> np.ndarray:
+    return (np.arange(frames * 2) % 1000).astype(np.int16)
+
+
+def test_drop_oldest():
+    """测试队列满时丢弃最旧的报文，交付最新的"""
+    transport = StallingTransport()
+    fanout = FanOut(transport, max_queue=3, max_inflight=1)
+    fanout.add('a')
+    transport.stalled.add('a')
+    for i in range(10):
+        fanout.enqueue(['a'], [i], now=float(i))
+        fanout.flush(now=float(i))
+
+    client = fanout.clients['a']
+    assert transport.sent['a'] == [0], "socket 积压时不再交付"
+    assert [item[2] for item in client.packets] == [[7], [8], [9]]
+    assert client.dropped == 6 and client.enqueued == 10
+
+    transport.stalled.clear()
+    for _ in range(3):
+        fanout.flush(now=10.0)   # 每次最多交付 max_inflight 个
+    assert transport.sent['a'] == [0, 7, 8, 9]
+    assert fanout.get_stats()['a']['queue_delay_max_ms'] == 3000.0
+    print(f"✓ 丢最旧: 丢弃 {client.dropped} 个, 交付 {transport.sent['a']}")
+
+
+def test_slow_client_isolated():
+    """测试慢客户端不影响其他客户端"""
+    transport = StallingTransport()
+    broadcaster = Broadcaster(None, transport=transport, queue_frames=5)
+    for sid in ('fast', 'slow'):
+        broadcaster.subscribe(sid, TRANSPORT_BINARY, 'pcm16')
+    transport.stalled.add('slow')
+    for _ in range(50):
+        broadcaster.publish(_frame())
+
+    assert len(transport.sent['fast']) == 50
+    seqs = [unpack_frame(data)[0].seq for _, data in transport.sent['fast']]
+    assert seqs == list(range(50))
+    stats = broadcaster.get_client_stats()
+    assert stats['fast']['dropped'] == 0
+    assert stats['slow']['queued'] == 5 and stats['slow']['socket_backlog'] == 4
+    assert stats['slow']['format'] == 'pcm16'
+    print(f"✓ 慢客户端丢弃 {stats['slow']['dropped']} 帧，快客户端收到全部 50 帧")
+
+
+def test_slow_client_downgraded_then_evicted():
+    """测试长期跟不上的客户端先降级到更低码率，再断开"""
+    transport = StallingTransport()
+    broadcaster = Broadcaster(None, transport=transport, queue_frames=5)
+    broadcaster.fanout.slow_window = 0.0
+    downgraded = []
+    broadcaster.on_downgrade = lambda sid, fmt: downgraded.append((sid, fmt))
+    broadcaster.subscribe('slow', TRANSPORT_BINARY, 'pcm16', ['pcm16', 'pcm16_mono'])
+    broadcaster.subscribe('legacy', TRANSPORT_JSON, 'pcm16')
+    transport.stalled.update({'slow', 'legacy'})
+
+    for _ in range(20):
+        broadcaster.publish(_frame())
+        if downgraded:
+            break
+    assert downgraded == [('slow', 'pcm16_mono')]
+    assert broadcaster.subscribers['slow'] == (TRANSPORT_BINARY, 'pcm16_mono')
+    assert 'legacy' not in broadcaster.subscribers, "旧版 JSON 客户端无法降级，直接断开"
+
+    for _ in range(20):
+        broadcaster.publish(_frame())
+    assert transport.disconnected == ['legacy', 'slow']
+    assert not broadcaster.subscribers
+    stats = broadcaster.get_stats()
+    assert stats['downgrades'] == 1 and stats['evicted'] == 2
+    print("✓ 慢客户端: 降级 → 断开")
+
+
+def test_real_socketio_server():
+    """在真实 socketio.Server 上: 内部接口可探测到，直接交付与 emit 回退都能把二进制帧送到客户端"""
+    import socketio
+    from flask import Flask
+    from flask_socketio import SocketIO
+
+    assert SocketIOTransport._has_internals(socketio.Server()), "当前 python-socketio 版本缺少直接交付所需的内部接口"
+
+    payload = bytes(range(256)) * 4
+    for direct in (True, False):
+        app = Flask(__name__)
+        sio = SocketIO(app, async_mode='threading')
+        client = sio.test_client(app)
+        sid = sio.server.manager.sid_from_eio_sid(client.eio_sid, '/')
+        transport = SocketIOTransport(sio)
+        assert transport.direct
+        transport.direct = direct
+        fanout = FanOut(transport)
+        fanout.add(sid)
+        fanout.enqueue([sid], transport.encode('audio_frame', payload), nbytes=len(payload))
+        fanout.flush()
+        received = client.get_received()
+        assert [(r['name'], r['args'][0]) for r in received] == [('audio_frame', payload)], f"direct={direct}"
+        assert fanout.clients[sid].sent == 1 and transport.backlog(transport.resolve(sid)) == 0
+        client.disconnect()
+    print("✓ 真实 socketio.Server 上直接交付 / emit 回退")
+
+
+if __name__ == '__main__':
+    test_drop_oldest()
+    test_slow_client_isolated()
+    test_slow_client_downgraded_then_evicted()
+    test_real_socketio_server()
+    print("\n✅ 所有扇出测试通过")
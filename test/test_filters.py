@@ -0,0 +1,141 @@
+"""
+测试流式 IIR 滤波器
+"""
+import numpy as np
+import sys
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.audio.filters import IIRFilter
+from src.audio.processor import AudioProcessor, ClientAudioChain
+
+
+def reference_lfilter(b, a, x):
+    """逐样本直接型参考实现"""
+    b = np.asarray(b, dtype=np.float64) / a[0]
+    a = np.asarray(a, dtype=np.float64) / a[0]
+    y = np.zeros(len(x))
+    for n in range(len(x)):
+        acc = 0.0
+        for k in range(len(b)):
+            if n - k >= 0:
+                acc += b[k] * x[n - k]
+        for k in range(1, len(a)):
+            if n - k >= 0:
+                acc -= a[k] * y[n - k]
+        y[n] = acc
+    return y
+
+
+def test_matches_reference():
+    """测试分块结果与逐样本参考实现一致"""
+    rng = np.random.default_rng(1)
+    x = rng.standard_normal((700, 2)) * 1000
+    
+    for flt in [
+        IIRFilter.highpass_first_order(100.0, 48000, channels=2),
+        IIRFilter.highpass_biquad(100.0, 48000, channels=2),
+        IIRFilter.lowpass_biquad(4000.0, 48000, channels=2),
+    ]:
+        expected = np.stack([reference_lfilter(flt.b, flt.a, x[:, ch]) for ch in range(2)], axis=1)
+        result = flt.process(x)
+        error = np.max(np.abs(result - expected))
+        print(f"  order={flt.order}: 最大误差 {error:.2e}")
+        assert error < 1e-6, "分块滤波结果应与参考实现一致"
+    print("✓ 分块滤波与参考实现一致")
+
+
+def test_state_carried_across_calls():
+    """测试跨包保持状态（无包边界跳变）"""
+    rng = np.random.default_rng(2)
+    stream = rng.standard_normal(4096 * 3) * 3000
+    
+    whole = IIRFilter.highpass_biquad(100.0, 48000, channels=2).process(stream)
+    
+    flt = IIRFilter.highpass_biquad(100.0, 48000, channels=2)
+    # 不规则的包长度（含不完整块）
+    pieces = [flt.process(p) for p in np.split(stream, [1000, 1002, 4096, 9000])]
+    chunked = np.concatenate(pieces)
+    
+    assert np.max(np.abs(whole - chunked)) < 1e-6, "分包处理应与整段处理一致"
+    print("✓ 状态跨调用保持")
+
+
+def test_interleaved_channels_independent():
+    """测试交错立体声按声道独立滤波"""
+    frames = 2048
+    left = np.ones(frames) * 10000      # 直流 -> 高通后趋近 0
+    right = np.zeros(frames)
+    interleaved = np.empty(frames * 2)
+    interleaved[0::2] = left
+    interleaved[1::2] = right
+    
+    out = IIRFilter.highpass_first_order(100.0, 48000, channels=2).process(interleaved)
+    
+    assert np.all(out[1::2] == 0), "右声道不应受左声道影响"
+    assert abs(out[-2]) < 100, "左声道直流分量应被滤除"
+    print("✓ 交错立体声按声道独立处理")
+
+
+def test_processor_highpass():
+    """测试 AudioProcessor.highpass_filter 使用流式引擎"""
+    processor = AudioProcessor(sample_rate=48000, channels=2)
+    packet = (np.random.default_rng(3).standard_normal(4096) * 3000).astype(np.int16)
+    
+    out = processor.highpass_filter(packet, cutoff=100.0)
+    assert out.dtype == np.int16
+    assert out.shape == packet.shape
+    
+    processor.reset_filters()
+    again = processor.highpass_filter(packet, cutoff=100.0)
+    assert np.array_equal(out, again), "重置后结果应可复现"
+    print("✓ AudioProcessor 高通滤波正常")
+
+
+def test_client_chains_isolated():
+    """测试每个客户端的处理链互不干扰"""
+    rng = np.random.default_rng(4)
+    speech_a = (rng.standard_normal(4096 * 4) * 4000).astype(np.int16)
+    speech_b = (rng.standard_normal(4096 * 4) * 2000).astype(np.int16)
+    
+    # 单独处理 A 的参考结果
+    solo = ClientAudioChain('a', channels=2)
+    expected = [solo.process(p) for p in np.split(speech_a, 4)]
+    
+    # A、B 的包交错到达
+    chain_a = ClientAudioChain('a', channels=2)
+    chain_b = ClientAudioChain('b', channels=2)
+    interleaved = []
+    for pa, pb in zip(np.split(speech_a, 4), np.split(speech_b, 4)):
+        interleaved.append(chain_a.process(pa))
+        chain_b.process(pb)
+    
+    for exp, got in zip(expected, interleaved):
+        assert np.array_equal(exp, got), "其他客户端的包不应影响本客户端的状态"
+    
+    assert not hasattr(chain_a, '__dict__'), "处理链应使用 __slots__"
+    print("✓ 客户端处理链状态隔离")
+
+
+def test_client_chain_gate():
+    """测试噪声门衰减静音包"""
+    chain = ClientAudioChain('c', channels=2)
+    quiet = (np.random.default_rng(5).standard_normal(4096) * 20).astype(np.int16)
+    for _ in range(3):
+        out = chain.process(quiet)
+    assert chain.gate_gain == chain.gate_floor
+    assert np.abs(out).max() <= np.abs(quiet).max() * 0.2, "静音包应被衰减"
+    assert chain.noise_floor > 0, "静音包应更新底噪估计"
+    print("✓ 噪声门正常")
+
+
+if __name__ == '__main__':
+    test_matches_reference()
+    test_state_carried_across_calls()
+    test_interleaved_channels_independent()
+    test_processor_highpass()
+    test_client_chains_isolated()
+    test_client_chain_gate()
+    print("\n✅ 所有滤波器测试通过")
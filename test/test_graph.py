@@ -0,0 +1,136 @@
+"""
+测试矩阵混音图与混音配置解析
+"""
+import numpy as np
+import sys
+import tempfile
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.audio.graph import MixGraph
+from src.config.settings import (
+    AppConfig, MixBusConfig, MixSourceConfig, parse_mix_bus, parse_mix_source, SINK_CABLE_A
+)
+
+
+def _block(value: int, frames: int = 256) -> np.ndarray:
+    return np.full((frames, 2), value, dtype=np.int16)
+
+
+def test_matrix_mix():
+    """测试一次矩阵乘法算出所有母线"""
+    graph = MixGraph(['browser_mic', 'mpv', 'clubdeck'])
+    graph.add_bus('browser', {'mpv': 1.0, 'clubdeck': 1.0})
+    graph.add_bus('clubdeck_mic', {'browser_mic': 1.0, 'mpv': 0.3})
+
+    graph.load('browser_mic', _block(1000))
+    graph.load('mpv', _block(2000))
+    graph.load('clubdeck', _block(-500))
+    buses = graph.mix(256)
+
+    assert buses.shape == (2, 256, 2)
+    assert np.allclose(buses[0], 1500)
+    assert np.allclose(buses[1], 1600)
+    print("✓ 矩阵混音")
+
+
+def test_set_gain():
+    """测试运行时调整增益"""
+    graph = MixGraph(['a', 'b'])
+    graph.add_bus('out', {'a': 1.0})
+    graph.load('a', _block(100))
+    graph.load('b', _block(200))
+    assert np.allclose(graph.mix(256)[0], 100)
+
+    graph.set_gain('out', 'b', 0.5)
+    assert graph.get_gain('out', 'b') == 0.5
+    assert np.allclose(graph.mix(256)[0], 200)
+    assert graph.get_stats() == {'out': {'a': 1.0, 'b': 0.5}}
+    print("✓ 增益调整")
+
+
+def test_large_block_grows_buffers():
+    """测试超出预分配大小的块"""
+    graph = MixGraph(['a'], max_block_frames=128)
+    graph.add_bus('out', {'a': 2.0})
+    graph.load('a', _block(10, 1000))
+    assert np.allclose(graph.mix(1000)[0], 20)
+    print("✓ 大块扩容")
+
+
+def test_invalid_bus():
+    """测试母线引用未知输入源或重名时报错"""
+    graph = MixGraph(['a'])
+    graph.add_bus('out', {'a': 1.0})
+    for name, gains in (('bad', {'missing': 1.0}), ('out', {'a': 1.0})):
+        try:
+            graph.add_bus(name, gains)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f"{name} 应该报错")
+    print("✓ 非法母线报错")
+
+
+def test_parse_config():
+    """测试 [Mix Sources] / [Mix Buses] 配置解析"""
+    bus = parse_mix_bus('clubdeck_mic', 'browser_mic + mpv*0.3 + room2 -> cable_a')
+    assert bus.sink == SINK_CABLE_A
+    assert bus.gains == {'browser_mic': 1.0, 'mpv': 0.3, 'room2': 1.0}
+
+    source = parse_mix_source('room2', '40, 44100')
+    assert (source.device_id, source.sample_rate, source.channels) == (40, 44100, 2)
+
+    try:
+        parse_mix_bus('bad', 'mpv + clubdeck')
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("缺少输出目标应该报错")
+    print("✓ 配置解析")
+
+
+def test_bad_mix_entry_skipped():
+    """测试格式错误的混音条目只跳过该行，后续配置节照常加载"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'config.ini'
+        path.write_text(
+            "[Mix Sources]\nroom2 = 40\nfoo = garbage\n\n"
+            "[Mix Buses]\nbroken = mpv + clubdeck\nbrowser = mpv + room2*0.5 -> browser\n\n"
+            "[cors]\nenabled = false\n\n"
+            "[mpv]\ndefault_pipe = /tmp/mpv.sock\n",
+            encoding='utf-8'
+        )
+        loaded = AppConfig().load_from_file(path)
+    assert [s.name for s in loaded.audio.mix_sources] == ['room2']
+    assert [b.name for b in loaded.audio.mix_buses] == ['browser']
+    assert loaded.cors.enabled is False
+    assert loaded.mpv.pipe_path == '/tmp/mpv.sock'
+    print("✓ 错误混音条目被跳过")
+
+
+def test_mix_config_round_trip():
+    """测试 save_to_file 写回混音图，重新加载后一致"""
+    original = AppConfig()
+    original.audio.mix_sources = [MixSourceConfig('room2', 40, 44100, 1)]
+    original.audio.mix_buses = [MixBusConfig('browser', 'browser', {'mpv': 1.0, 'room2': 0.5})]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'config.ini'
+        original.save_to_file(path)
+        loaded = AppConfig().load_from_file(path)
+    assert loaded.audio.mix_sources == original.audio.mix_sources
+    assert loaded.audio.mix_buses == original.audio.mix_buses
+    print("✓ 混音图保存/加载往返一致")
+
+
+if __name__ == '__main__':
+    test_matrix_mix()
+    test_set_gain()
+    test_large_block_grows_buffers()
+    test_invalid_bus()
+    test_parse_config()
+    test_bad_mix_entry_skipped()
+    test_mix_config_round_trip()
+    print("\n✅ 所有混音图测试通过")
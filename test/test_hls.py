@@ -0,0 +1,151 @@
+"""
+测试 HLS 切片器（MP3 帧边界切片、滚动播放列表、LRU 分片缓存）
+"""
+import sys
+import threading
+import time
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.server.hls import HlsSegmenter, HlsStream, SegmentCache, Segment, parse_mp3_header, ID3_TIMESTAMP_OWNER
+
+
+# MPEG-1 Layer III, 128 kbps, 48 kHz, 无填充: 384 字节/帧, 1152 样本/帧 (24ms)
+FRAME = b'\xff\xfb\x94\x00' + bytes(380)
+
+
+def test_parse_mp3_header():
+    """测试 MP3 帧头解析"""
+    assert parse_mp3_header(FRAME) == (384, 48000, 1152)
+    assert parse_mp3_header(b'\xff\xfb\x96\x00') == (385, 48000, 1152), "填充位"
+    assert parse_mp3_header(b'ID3\x04') is None
+    print("✓ MP3 帧头")
+
+
+def test_segments_cut_on_frame_boundaries():
+    """测试按帧边界切片，任意切分的输入也能重新对齐"""
+    segmenter = HlsSegmenter(segment_seconds=0.1, window=3)
+    stream = b'junk' + FRAME * 22
+    for i in range(0, len(stream), 1000):
+        segmenter.feed(stream[i:i + 1000])
+
+    assert segmenter.next_seq == 4, "22 帧 / 每片 5 帧 → 4 个完整分片"
+    segment = segmenter.cache.get(0)
+    assert segment.data.startswith(b'ID3') and ID3_TIMESTAMP_OWNER in segment.data
+    assert segment.data.endswith(FRAME * 5)
+    assert abs(segment.duration - 0.12) < 1e-9
+
+    playlist = segmenter.playlist.decode()
+    assert '#EXT-X-MEDIA-SEQUENCE:1' in playlist
+    assert [line for line in playlist.splitlines() if line.endswith('.mp3')] == ['1.mp3', '2.mp3', '3.mp3']
+    assert segmenter.playlist_etag.endswith('-3')
+    print(f"✓ 4 个分片, 播放列表窗口 3")
+
+
+def test_segment_cache_lru():
+    """测试 LRU: 最近访问的分片保留，最久未用的被淘汰"""
+    cache = SegmentCache(capacity=2)
+    cache.put(Segment(0, 1.0, b'a', 'e0'))
+    cache.put(Segment(1, 1.0, b'b', 'e1'))
+    assert cache.get(0) is not None
+    cache.put(Segment(2, 1.0, b'c', 'e2'))
+    assert cache.get(1) is None and cache.get(0) is not None and cache.get(2) is not None
+    assert cache.evictions == 1 and cache.hits == 3 and cache.misses == 1
+    print("✓ LRU 淘汰")
+
+
+def test_blocking_reload_and_reset():
+    """测试阻塞刷新在新分片生成时返回；重置后 ETag 不与旧会话重复"""
+    segmenter = HlsSegmenter(segment_seconds=0.1)
+    assert not segmenter.wait_for(0, timeout=0.01)
+    result = []
+    thread = threading.Thread(target=lambda: result.append(segmenter.wait_for(0, timeout=2.0)))
+    thread.start()
+    segmenter.feed(FRAME * 5)
+    thread.join(timeout=3.0)
+    assert result == [True]
+
+    etag = segmenter.playlist_etag
+    segmenter.reset()
+    segmenter.feed(FRAME * 5)
+    assert segmenter.next_seq == 1 and segmenter.playlist_etag != etag
+    print("✓ 阻塞刷新 / 重置")
+
+
+class FakeFormat:
+    def __init__(self, available: bool):
+        self.available = available
+
+
+class FakeStreams:
+    """只记录消费者的 HTTP 流（add_consumer 故意放慢，放大并发激活的竞争窗口）"""
+
+    def __init__(self, available: bool = True):
+        self.formats = {'mp3': FakeFormat(available)}
+        self.consumers = []
+
+    def add_consumer(self, name, consumer):
+        if not self.formats[name].available:
+            raise RuntimeError("流格式 mp3 不可用（缺少编码库）")
+        time.sleep(0.01)
+        self.consumers.append(consumer)
+
+    def remove_consumer(self, name, consumer):
+        if consumer in self.consumers:
+            self.consumers.remove(consumer)
+
+
+def test_concurrent_first_requests_activate_once():
+    """测试并发的首个请求只挂一次消费者；分片请求不激活；空闲后摘下"""
+    streams = FakeStreams()
+    hls = HlsStream(streams, idle_timeout=0.05, segment_seconds=0.1)
+    assert not hls.touch(activate=False) and not streams.consumers, "分片请求不应激活 HLS"
+
+    barrier = threading.Barrier(8)
+
+    def first_request():
+        barrier.wait()
+        hls.touch()
+
+    threads = [threading.Thread(target=first_request) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert hls.active and len(streams.consumers) == 1, "并发激活只能注册一个消费者"
+
+    time.sleep(0.06)
+    streams.consumers[0](FRAME)
+    assert not hls.active and not streams.consumers, "空闲超时后应摘下消费者"
+    print("✓ 并发激活只注册一次")
+
+
+def test_routes_do_not_activate_from_segment():
+    """测试分片路由: 缺少编码库返回 503，未激活返回 404 且不开始编码"""
+    import src.server.app as app_module
+    original = app_module.hls_stream
+    client = app_module.app.test_client()
+    try:
+        app_module.hls_stream = HlsStream(FakeStreams(available=False))
+        assert client.get('/hls/0.mp3').status_code == 503
+        assert client.get('/hls/live.m3u8').status_code == 503
+
+        streams = FakeStreams()
+        app_module.hls_stream = HlsStream(streams)
+        assert client.get('/hls/0.mp3').status_code == 404
+        assert not app_module.hls_stream.active and not streams.consumers
+    finally:
+        app_module.hls_stream = original
+    print("✓ 分片路由不激活 HLS")
+
+
+if __name__ == '__main__':
+    test_parse_mp3_header()
+    test_segments_cut_on_frame_boundaries()
+    test_segment_cache_lru()
+    test_blocking_reload_and_reset()
+    test_concurrent_first_requests_activate_once()
+    test_routes_do_not_activate_from_segment()
+    print("\n✅ 所有 HLS 测试通过")
@@ -0,0 +1,68 @@
+"""
+测试 HTTP 流管线（每格式一个共享编码器）
+"""
+import numpy as np
+import sys
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.server.http_stream import HttpStreams, default_stream_formats, wav_header
+from src.audio.mp3 import MP3_AVAILABLE
+
+
+def _frame(frames: int = 512) -> np.ndarray:
+    return (np.sin(np.arange(frames * 2) / 10) * 8000).astype(np.int16)
+
+
+def test_encode_once_per_format():
+    """测试多个听众共享一个编码器，所有听众收到相同数据"""
+    streams = HttpStreams(48000, 2)
+    listeners = [streams.listen('wav') for _ in range(20)]
+    for _ in range(5):
+        streams.publish(_frame())
+
+    assert streams.encodes == {'wav': 5}, "没有听众的格式不编码"
+    expected = _frame().tobytes()
+    for preamble, listener in listeners:
+        assert preamble == wav_header(48000, 2)
+        assert listener.read(timeout=0) == [expected] * 5
+    print("✓ 20 个 WAV 听众、5 帧只编码 5 次")
+
+
+def test_unavailable_format_rejected():
+    """测试缺少编码库的格式拒绝听众"""
+    streams = HttpStreams(48000, 2)
+    for name, fmt in streams.formats.items():
+        if fmt.available:
+            continue
+        try:
+            streams.listen(name)
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError("应该报错")
+    print(f"✓ 可用格式: {[n for n, f in streams.formats.items() if f.available]}")
+
+
+def test_mp3_stream():
+    """测试 MP3 流（需要 lameenc，未安装时跳过）"""
+    if not MP3_AVAILABLE:
+        print("- 跳过: lameenc 不可用")
+        return
+    streams = HttpStreams(48000, 2, formats=default_stream_formats(mp3_bitrate=64000))
+    _, listener = streams.listen('mp3')
+    for _ in range(94):   # 约 1 秒
+        streams.publish(_frame())
+    data = b''.join(listener.read(timeout=0))
+    assert data[0] == 0xFF and data[1] & 0xE0 == 0xE0, "MP3 帧同步字"
+    assert 4000 < len(data) < 12000, f"64 kbps 约 8KB/s，实际 {len(data)}"
+    print(f"✓ MP3 1 秒 {len(data)} 字节")
+
+
+if __name__ == '__main__':
+    test_encode_once_per_format()
+    test_unavailable_format_rejected()
+    test_mp3_stream()
+    print("\n✅ 所有 HTTP 流测试通过")
@@ -0,0 +1,93 @@
+"""
+测试指标注册表（无锁计数器、指标族输出、采集器）
+"""
+import sys
+import threading
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.utils.metrics import Counter, Gauge, Histogram, MetricsRegistry, render_prometheus
+from src.audio.vb_cable_bridge import StreamMetrics
+
+
+def test_counter_concurrent_threads():
+    """多个线程同时 inc 不丢计数（每线程一个单元格）"""
+    counter = Counter('test_total', 'test')
+    threads = [threading.Thread(target=lambda: [counter.inc() for _ in range(20000)]) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert counter.value == 8 * 20000
+    print(f"✓ 8 线程并发计数: {counter.value}")
+
+
+def test_counter_cells_folded_on_thread_exit():
+    """短命线程退出后单元格并入基数，单元格不随线程数增长，计数不丢"""
+    counter = Counter('test_total', 'test', value=5)
+    for _ in range(50):
+        thread = threading.Thread(target=lambda: [counter.inc() for _ in range(10)])
+        thread.start()
+        thread.join()
+    counter.inc(2)
+    assert counter.value == 5 + 50 * 10 + 2
+    assert len(counter._cells) == 1, "只剩当前线程的单元格"
+    print(f"✓ 50 个短命线程后单元格数 {len(counter._cells)}，计数 {counter.value}")
+
+
+def test_families_render_once():
+    """同名不同标签的指标合并为一个族，HELP/TYPE 只输出一次"""
+    metrics = [
+        Counter('clubvoice_drops_total', '丢弃', {'queue': 'a'}, 3),
+        Counter('clubvoice_drops_total', '丢弃', {'queue': 'b"x'}, 1),
+        Gauge('clubvoice_depth', '深度', value=2.5),
+        Histogram('clubvoice_cb_seconds', '回调', (0.001,), labels={'stream': 'in'}),
+    ]
+    text = render_prometheus(metrics)
+    assert text.count('# TYPE clubvoice_drops_total counter') == 1
+    assert 'clubvoice_drops_total{queue="a"} 3' in text
+    assert 'clubvoice_drops_total{queue="b\\"x"} 1' in text
+    assert 'clubvoice_depth 2.5' in text
+    assert 'clubvoice_cb_seconds_bucket{stream="in",le="+Inf"} 0' in text
+    print("✓ 指标族输出")
+
+
+def test_registry_collectors():
+    """采集器按 key 替换，单个采集器出错不影响其他指标"""
+    registry = MetricsRegistry()
+    registry.register(Counter('a_total', 'a'))
+    registry.add_collector('x', lambda: [Gauge('x', 'old')])
+    registry.add_collector('x', lambda: [Gauge('x', 'new', value=1)])
+    registry.add_collector('broken', lambda: 1 / 0)
+    text = registry.render()
+    assert '# HELP x new' in text and 'x 1' in text and 'a_total 0' in text
+    registry.remove_collector('x')
+    assert '# HELP x' not in registry.render()
+    print("✓ 注册表采集器")
+
+
+def test_callback_status_flags():
+    """回调状态标志按标志分别计数"""
+    class Flags:
+        input_overflow = True
+        input_underflow = False
+
+    metrics = StreamMetrics('input_mpv')
+    metrics.record_status(Flags())
+    metrics.record_status(Flags())
+    counts = {flag: counter.value for flag, counter in metrics.flags}
+    assert counts['input_overflow'] == 2 and counts['input_underflow'] == 0
+    text = render_prometheus(metrics.metrics())
+    assert 'clubvoice_callback_status_total{stream="input_mpv",flag="input_overflow"} 2' in text
+    print("✓ 回调状态标志计数")
+
+
+if __name__ == '__main__':
+    test_counter_concurrent_threads()
+    test_counter_cells_folded_on_thread_exit()
+    test_families_render_once()
+    test_registry_collectors()
+    test_callback_status_flags()
+    print("\n✅ 指标测试全部通过")
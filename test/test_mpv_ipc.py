@@ -0,0 +1,304 @@
+"""
+测试 MPV 持久 IPC 连接（请求/回复按 id 匹配、事件订阅、断线重连）与 MPV 控制器，
+对端为一个最小的 mpv JSON IPC 服务器（Unix socket）
+"""
+import json
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.audio.mpv_ipc import MPVIPCClient, MPVError
+from src.audio.mpv_controller import MPVController, MPVConfig
+from src.utils.metrics import Counter, Histogram, DURATION_BUCKETS
+
+
+UNIX_SOCKETS = hasattr(socket, 'AF_UNIX')
+
+
+class FakeMPV:
+    """
+    最小 mpv JSON IPC 服务器: get/set/observe_property，set 时向观察者推送 property-change；
+    另有 mpv 没有的 ["wait", 秒] 命令（延迟回复，用于制造乱序回复）。可主动推事件、停止后在同一路径重启。
+    """
+
+    def __init__(self, path: str, volume: float = 100.0):
+        self.path = path
+        self.properties = {'volume': volume}
+        self.connections = 0
+        self.commands = []
+        self._clients = []
+        self._observers = []          # (连接, 观察 id, 属性名)
+        self._lock = threading.Lock()
+        self._listener = None
+        self._running = False
+
+    def start(self):
+        self._listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._listener.bind(self.path)
+        self._listener.listen(4)
+        self._running = True
+        threading.Thread(target=self._accept, args=(self._listener,), daemon=True).start()
+
+    def stop(self):
+        """模拟 MPV 退出: 关闭监听与所有连接"""
+        with self._lock:
+            if not self._running:
+                return
+            self._running = False
+            clients, self._clients, self._observers = self._clients, [], []
+        self._listener.close()
+        for conn in clients:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            conn.close()
+        os.unlink(self.path)
+
+    def emit(self, event: str, **fields):
+        with self._lock:
+            clients = list(self._clients)
+        for conn in clients:
+            self._send(conn, {'event': event, **fields})
+
+    def _accept(self, listener):
+        while True:
+            try:
+                conn, _ = listener.accept()
+            except OSError:
+                return
+            with self._lock:
+                if not self._running:   # 停止时恰好接受的连接
+                    conn.close()
+                    return
+                self._clients.append(conn)
+                self.connections += 1
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        buffer = b''
+        while True:
+            try:
+                chunk = conn.recv(4096)
+            except OSError:
+                return
+            if not chunk:
+                return
+            buffer += chunk
+            *lines, buffer = buffer.split(b'\n')
+            for line in lines:
+                self._handle(conn, json.loads(line))
+
+    def _send(self, conn, message: dict):
+        try:
+            with self._lock:
+                conn.sendall(json.dumps(message).encode('utf-8') + b'\n')
+        except OSError:
+            pass
+
+    def _reply(self, conn, request_id, error='success', data=None):
+        message = {'request_id': request_id, 'error': error}
+        if data is not None:
+            message['data'] = data
+        self._send(conn, message)
+
+    def _handle(self, conn, message: dict):
+        command = message['command']
+        request_id = message.get('request_id', 0)
+        self.commands.append(command)
+        name = command[0]
+        if name == 'get_property':
+            if command[1] in self.properties:
+                self._reply(conn, request_id, data=self.properties[command[1]])
+            else:
+                self._reply(conn, request_id, 'property unavailable')
+        elif name == 'set_property':
+            self.properties[command[1]] = command[2]
+            self._reply(conn, request_id)
+            with self._lock:
+                observers = [(c, i) for c, i, prop in self._observers if prop == command[1]]
+            for observer_conn, observer_id in observers:
+                self._send(observer_conn, {'event': 'property-change', 'id': observer_id,
+                                           'name': command[1], 'data': command[2]})
+        elif name == 'observe_property':
+            with self._lock:
+                self._observers.append((conn, command[1], command[2]))
+            self._reply(conn, request_id)
+            self._send(conn, {'event': 'property-change', 'id': command[1], 'name': command[2],
+                              'data': self.properties.get(command[2])})
+        elif name == 'wait':
+            threading.Timer(command[1], self._reply, args=(conn, request_id), kwargs={'data': command[1]}).start()
+        else:
+            self._reply(conn, request_id, 'invalid parameter')
+
+
+def wait_until(predicate, timeout: float = 2.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+def make_server(volume: float = 100.0) -> FakeMPV:
+    directory = tempfile.mkdtemp(prefix='mpv-ipc-')
+    server = FakeMPV(os.path.join(directory, 'mpv.sock'), volume)
+    server.start()
+    return server
+
+
+def cleanup(server: FakeMPV):
+    shutil.rmtree(os.path.dirname(server.path), ignore_errors=True)
+
+
+def test_request_response_and_events():
+    """一条连接上: 请求按 request_id 匹配回复（含乱序），错误回复抛 MPVError，属性观察与事件回调"""
+    if not UNIX_SOCKETS:
+        print("⚠ 当前平台不支持 Unix socket，跳过")
+        return
+    server = make_server(volume=80.0)
+    latency = Histogram('test_ipc_seconds', 'test', DURATION_BUCKETS)
+    errors = Counter('test_ipc_errors_total', 'test')
+    client = MPVIPCClient(server.path, timeout=1.0, latency=latency, errors=errors)
+    volumes, events = [], []
+    client.observe_property('volume', volumes.append)
+    client.on_event('file-loaded', events.append)
+    try:
+        client.start()
+        assert client.wait_connected(2.0)
+        assert client.get_property('volume') == 80.0
+        client.set_property('volume', 42)
+        assert server.properties['volume'] == 42
+
+        # 慢请求先发、快请求后发: 各自拿到自己的回复
+        slow = client.command_async('wait', 0.2)
+        fast = client.command_async('get_property', 'volume')
+        assert fast.wait(1.0) == 42 and not slow.done
+        assert slow.wait(1.0) == 0.2
+
+        try:
+            client.get_property('no-such-property')
+            assert False, "错误回复应抛出 MPVError"
+        except MPVError as e:
+            assert 'property unavailable' in str(e)
+
+        server.emit('file-loaded')
+        assert wait_until(lambda: events and volumes[-1:] == [42])
+        assert volumes == [80.0, 42]
+        assert server.connections == 1
+        assert latency.count == len(server.commands) and errors.value == 1
+    finally:
+        client.close()
+        server.stop()
+        cleanup(server)
+    print(f"✓ 请求/回复匹配与事件订阅（往返 p50 {latency.percentile(50) * 1000:.2f}ms）")
+
+
+def test_reconnect_with_backoff():
+    """MPV 退出: 等待中的请求失败、新请求立即失败；MPV 重启后自动重连并重新观察属性"""
+    if not UNIX_SOCKETS:
+        print("⚠ 当前平台不支持 Unix socket，跳过")
+        return
+    server = make_server()
+    client = MPVIPCClient(server.path, timeout=1.0, reconnect_min_delay=0.02, reconnect_max_delay=0.1)
+    volumes = []
+    client.observe_property('volume', volumes.append)
+    try:
+        client.start()
+        assert client.wait_connected(2.0)
+        pending = client.command_async('wait', 5.0)
+        server.stop()
+        try:
+            pending.wait(1.0)
+            assert False, "断线时等待中的请求应失败"
+        except ConnectionError:
+            pass
+        assert wait_until(lambda: not client.connected)
+        start = time.perf_counter()
+        try:
+            client.set_property('volume', 10)
+            assert False, "未连接时应立即失败"
+        except ConnectionError:
+            pass
+        assert time.perf_counter() - start < 0.05, "未连接时不阻塞调用者"
+
+        time.sleep(0.3)   # 退避若干轮
+        server.properties['volume'] = 65.0
+        server.start()
+        assert client.wait_connected(2.0), "MPV 重启后应自动重连"
+        assert client.set_property('volume', 30) is None
+        assert wait_until(lambda: volumes[-2:] == [65.0, 30]), "重连后重新观察属性"
+        assert client.disconnects == 1 and client.connects == 2
+    finally:
+        client.close()
+        server.stop()
+        cleanup(server)
+    print(f"✓ 断线重连（{client.connects} 次连接）")
+
+
+def test_controller_uses_one_connection():
+    """控制器: 闪避过渡的多次音量设置复用同一连接；MPV 重启后重新应用闪避音量"""
+    if not UNIX_SOCKETS:
+        print("⚠ 当前平台不支持 Unix socket，跳过")
+        return
+    server = make_server(volume=100.0)
+    config = MPVConfig(enabled=True, pipe_path=server.path, normal_volume=100, ducking_volume=15,
+                       transition_time=0.1, ipc_timeout=1.0, reconnect_max_delay=0.1)
+    controller = MPVController(config)
+    try:
+        controller.set_ducking(True)
+        assert wait_until(lambda: server.properties['volume'] == 15 and not controller.transition_active)
+        sets = [c for c in server.commands if c[0] == 'set_property']
+        assert len(sets) >= 5 and server.connections == 1, "每步音量都走同一条连接"
+        assert controller.current_volume == 15
+        assert wait_until(lambda: controller.reported_volume == 15)
+
+        server.stop()
+        server.properties['volume'] = 100.0   # MPV 重启后音量回到默认
+        server.start()
+        assert wait_until(lambda: server.properties['volume'] == 15, timeout=3.0), "重连后重新应用闪避音量"
+
+        controller.set_ducking(False)
+        assert wait_until(lambda: server.properties['volume'] == 100 and not controller.transition_active)
+        assert controller.ipc_errors.value == 0
+        assert controller.ipc_latency.count == len(server.commands)
+    finally:
+        controller.stop()
+        server.stop()
+        cleanup(server)
+    print(f"✓ 控制器复用一条连接完成 {len(sets)} 步过渡")
+
+
+def test_controller_without_mpv():
+    """MPV 未运行: 设置音量立即失败并计数，不阻塞、不在当前目录创建文件"""
+    cwd_before = set(os.listdir('.'))
+    path = r'\\.\pipe\clubvoice-test-missing' if sys.platform == 'win32' else \
+        os.path.join(tempfile.gettempdir(), 'clubvoice-missing-mpv.sock')
+    controller = MPVController(MPVConfig(enabled=True, pipe_path=path, ipc_timeout=0.05))
+    try:
+        start = time.perf_counter()
+        assert not controller.set_volume(50)
+        assert time.perf_counter() - start < 0.05
+        assert controller.ipc_errors.value >= 1 and controller.current_volume == 100
+        assert not controller.ipc.connected
+    finally:
+        controller.stop()
+    assert set(os.listdir('.')) == cwd_before
+    print("✓ MPV 未运行时快速失败")
+
+
+if __name__ == '__main__':
+    test_request_response_and_events()
+    test_reconnect_with_backoff()
+    test_controller_uses_one_connection()
+    test_controller_without_mpv()
+    print("\n✅ MPV IPC 测试全部通过")
@@ -0,0 +1,78 @@
+"""
+测试 Ogg 分页与 Ogg Opus 封装
+"""
+import struct
+import sys
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.audio.ogg import (
+    ogg_crc, OggPageWriter, OggOpusMuxer, PAGE_HEADER, FLAG_BOS, OPUS_PRE_SKIP
+)
+
+
+def _parse_pages(data: bytes) -> list:
+    """解析 Ogg 页 → [(flags, granule, seq, [packets])]，并校验 CRC"""
+    pages = []
+    pos = 0
+    while pos < len(data):
+        magic, version, flags, granule, serial, seq, crc, count = PAGE_HEADER.unpack_from(data, pos)
+        assert magic == b'OggS' and version == 0
+        lacing = data[pos + PAGE_HEADER.size:pos + PAGE_HEADER.size + count]
+        body_start = pos + PAGE_HEADER.size + count
+        end = body_start + sum(lacing)
+        page = bytearray(data[pos:end])
+        struct.pack_into('<I', page, 22, 0)
+        assert ogg_crc(page) == crc, "CRC 不符"
+        packets, current = [], b''
+        offset = body_start
+        for value in lacing:
+            current += data[offset:offset + value]
+            offset += value
+            if value < 255:
+                packets.append(current)
+                current = b''
+        pages.append((flags, granule, seq, packets))
+        pos = end
+    return pages
+
+
+def test_crc_check_value():
+    """测试 Ogg CRC32 标准校验值"""
+    assert ogg_crc(b'123456789') == 0x89A1897F
+    print("✓ CRC32 校验值")
+
+
+def test_page_lacing():
+    """测试包长度为 255 的倍数时的分段"""
+    writer = OggPageWriter(serial=1)
+    packets = [b'a' * 255, b'b' * 10, b'']
+    pages = _parse_pages(writer.page(packets, granule=960))
+    assert pages == [(0, 960, 0, packets)]
+    print("✓ 分段表")
+
+
+def test_opus_muxer_pages():
+    """测试 Ogg Opus 头页和音频页的 granule"""
+    muxer = OggOpusMuxer(channels=2, frame_ms=20.0, page_ms=100.0, serial=7)
+    header_pages = _parse_pages(muxer.preamble)
+    assert header_pages[0][0] == FLAG_BOS
+    head = header_pages[0][3][0]
+    assert head[:8] == b'OpusHead' and head[9] == 2
+    assert struct.unpack_from('<H', head, 10)[0] == OPUS_PRE_SKIP
+    assert header_pages[1][3][0][:8] == b'OpusTags'
+
+    output = b''.join(muxer.add(bytes([i]) * 40) for i in range(12))
+    pages = _parse_pages(output)
+    assert [(granule, seq, len(packets)) for _, granule, seq, packets in pages] == [(4800, 2, 5), (9600, 3, 5)]
+    assert muxer.flush() and muxer.granule == 12 * 960
+    print(f"✓ 每页 5 个 20ms 包, granule {[p[1] for p in pages]}")
+
+
+if __name__ == '__main__':
+    test_crc_check_value()
+    test_page_lacing()
+    test_opus_muxer_pages()
+    print("\n✅ 所有 Ogg 测试通过")
@@ -0,0 +1,117 @@
+"""
+测试二进制音频帧协议
+"""
+import numpy as np
+import sys
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.server.protocol import (
+    pack_frame, unpack_frame, decode_pcm16, negotiate, requested_formats,
+    pack_opus_packets, unpack_opus_packets,
+    HEADER_SIZE, FORMAT_PCM16, TRANSPORT_BINARY, TRANSPORT_JSON
+)
+
+
+def test_roundtrip():
+    """测试打包/解析往返"""
+    audio = (np.arange(1024) - 512).astype(np.int16)
+    frame = pack_frame(audio, seq=7, sample_rate=48000, channels=2, timestamp=1234.5)
+    assert len(frame) == HEADER_SIZE + audio.nbytes
+
+    header, payload = unpack_frame(frame)
+    assert (header.seq, header.sample_rate, header.channels, header.format) == (7, 48000, 2, FORMAT_PCM16)
+    assert header.timestamp == 1234.5
+    assert np.array_equal(decode_pcm16(payload), audio)
+    print(f"✓ 往返一致 (帧头 {HEADER_SIZE} 字节)")
+
+
+def test_seq_wraps():
+    """测试序号按 uint32 回绕"""
+    header, _ = unpack_frame(pack_frame(b'', 2 ** 32 + 3, 48000, 2))
+    assert header.seq == 3
+    print("✓ 序号回绕")
+
+
+def test_invalid_frames():
+    """测试过短帧、错误版本和奇数长度负载"""
+    frame = bytearray(pack_frame(b'\x00\x00', 0, 48000, 2))
+    for bad in (bytes(frame[:HEADER_SIZE - 1]), bytes([9]) + bytes(frame[1:])):
+        try:
+            unpack_frame(bad)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("应该报错")
+    try:
+        decode_pcm16(b'\x00\x00\x00')
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("奇数长度负载应该报错")
+    print("✓ 非法帧报错")
+
+
+def test_negotiate():
+    """测试协商与旧客户端回退"""
+    assert negotiate({'transport': 'binary', 'formats': ['pcm16']})['transport'] == TRANSPORT_BINARY
+    assert negotiate(None)['transport'] == TRANSPORT_JSON
+    assert negotiate({'transport': 'binary', 'formats': ['flac']})['transport'] == TRANSPORT_JSON
+
+    # 按客户端偏好选择；服务器不支持 Opus 时回退
+    request = {'transport': 'binary', 'formats': ['opus', 'pcm16'], 'upstream': ['opus', 'pcm16']}
+    result = negotiate(request, ['opus', 'pcm16'], ['opus', 'pcm16'])
+    assert (result['format'], result['upstream']) == ('opus', 'opus')
+    result = negotiate(request, ['pcm16'], ['pcm16'])
+    assert (result['format'], result['upstream']) == ('pcm16', 'pcm16')
+    print("✓ 协商")
+
+
+def test_negotiate_malformed():
+    """测试格式不合法的协商请求回退到 JSON + pcm16，不抛异常"""
+    fallback = negotiate(None)
+    for request in (
+        {'transport': 'binary', 'version': 'x'},
+        {'transport': 'binary', 'version': [2]},
+        ['binary'],
+        'binary',
+        {'transport': 'binary', 'formats': 5},
+        {'transport': 'binary', 'formats': 'pcm16'},
+        {'transport': 'binary', 'formats': ['pcm16', 3]},
+        {'transport': 'binary', 'formats': ['pcm16'], 'upstream': {'opus': 1}},
+    ):
+        assert negotiate(request, ['opus', 'pcm16'], ['opus', 'pcm16']) == fallback, request
+
+    # 订阅时的格式偏好同样只接受字符串列表
+    assert requested_formats({'formats': ['opus', 'pcm16']}) == ['opus', 'pcm16']
+    assert requested_formats({}) == []
+    assert requested_formats({'formats': 'pcm16'}) is None
+    assert requested_formats(['pcm16']) is None
+    print("✓ 不合法的协商请求回退")
+
+
+def test_opus_packet_container():
+    """测试 Opus 负载的多包封装"""
+    packets = [b'\x01' * 3, b'', b'\x02' * 300]
+    payload = pack_opus_packets(packets)
+    assert [bytes(p) for p in unpack_opus_packets(payload)] == packets
+    assert unpack_opus_packets(b'') == []
+    try:
+        unpack_opus_packets(payload[:-1])
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("截断的负载应该报错")
+    print("✓ Opus 多包封装")
+
+
+if __name__ == '__main__':
+    test_roundtrip()
+    test_seq_wraps()
+    test_invalid_frames()
+    test_negotiate()
+    test_negotiate_malformed()
+    test_opus_packet_container()
+    print("\n✅ 所有协议测试通过")
@@ -0,0 +1,78 @@
+"""
+测试流式多相重采样器
+"""
+import numpy as np
+import sys
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.audio.resampler import PolyphaseResampler
+
+
+RATE_PAIRS = [(44100, 48000), (48000, 44100), (16000, 48000), (48000, 16000)]
+
+
+def _tone(frames: int, rate: int, freq: float = 1000.0) -> np.ndarray:
+    mono = (np.sin(2 * np.pi * freq * np.arange(frames) / rate) * 10000).astype(np.int16)
+    return np.column_stack([mono, -mono])
+
+
+def test_chunked_matches_whole():
+    """测试任意分块处理与整段处理结果完全一致"""
+    rng = np.random.default_rng(1)
+    for from_rate, to_rate in RATE_PAIRS:
+        signal = _tone(from_rate // 2, from_rate)
+        whole = PolyphaseResampler(from_rate, to_rate, 2).process(signal)
+
+        resampler = PolyphaseResampler(from_rate, to_rate, 2)
+        parts, pos = [], 0
+        while pos < len(signal):
+            size = int(rng.integers(1, 700))
+            parts.append(resampler.process(signal[pos:pos + size]))
+            pos += size
+        assert np.array_equal(np.concatenate(parts), whole), f"{from_rate}→{to_rate} 分块结果不一致"
+    print("✓ 分块与整段一致")
+
+
+def test_tone_quality():
+    """测试正弦信号重采样后与理想信号的误差"""
+    for from_rate, to_rate in RATE_PAIRS:
+        out = PolyphaseResampler(from_rate, to_rate, 2).process(_tone(from_rate, from_rate))
+        ideal = _tone(len(out), to_rate).astype(np.float64)
+        err = out[200:-200] - ideal[200:-200]
+        # 同采样率时误差为 0，下限避免除零
+        snr = 10 * np.log10(np.mean(ideal[200:-200] ** 2) / max(np.mean(err ** 2), 1e-20))
+        assert snr > 70, f"{from_rate}→{to_rate} SNR {snr:.1f} dB"
+        assert np.array_equal(out[:, 0], -out[:, 1]), "声道应独立处理"
+        print(f"✓ {from_rate}→{to_rate} SNR {snr:.1f} dB")
+
+
+def test_input_frames_needed_is_exact():
+    """测试按 input_frames_needed 取数总能得到恰好 frames 帧（输出回调的拉取模式）"""
+    for from_rate, to_rate in RATE_PAIRS:
+        resampler = PolyphaseResampler(from_rate, to_rate, 2)
+        for _ in range(100):
+            needed = resampler.input_frames_needed(480)
+            out = resampler.process(np.zeros((needed, 2), dtype=np.int16), max_frames=480)
+            assert len(out) == 480
+    print("✓ 拉取模式帧数精确")
+
+
+def test_same_rate_passthrough():
+    """测试采样率相同时直通"""
+    resampler = PolyphaseResampler(48000, 48000, 2)
+    data = _tone(512, 48000)
+    assert resampler.passthrough
+    assert np.array_equal(resampler.process(data), data)
+    assert resampler.input_frames_needed(512) == 512
+    print("✓ 同采样率直通")
+
+
+if __name__ == '__main__':
+    test_chunked_matches_whole()
+    test_tone_quality()
+    test_input_frames_needed_is_exact()
+    test_same_rate_passthrough()
+    print("\n✅ 所有重采样测试通过")
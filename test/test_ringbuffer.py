@@ -0,0 +1,185 @@
+"""
+测试 SPSC 环形缓冲区
+"""
+import numpy as np
+import sys
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import threading
+import time
+
+from src.audio.ringbuffer import RingBuffer, DROP_OLDEST, BLOCK, next_power_of_two
+
+
+def test_write_read_wraparound():
+    """测试环绕读写保持数据顺序"""
+    ring = RingBuffer(capacity_frames=1000, channels=2)
+    source = np.arange(6000, dtype=np.int16).reshape(-1, 2)
+    
+    received = []
+    for start in range(0, 3000, 700):
+        ring.write(source[start:start + 700])
+        received.append(ring.read(min(700, ring.fill)).copy())
+    
+    result = np.concatenate(received)
+    assert np.array_equal(result, source[:len(result)]), "环绕读写后数据应保持顺序"
+    assert ring.overruns == 0 and ring.underruns == 0
+    print("✓ 环绕读写")
+
+
+def test_full_is_not_empty():
+    """测试写满后不会被误判为空（旧实现的问题）"""
+    ring = RingBuffer(capacity_frames=512, channels=1)
+    ring.write(np.ones(512, dtype=np.int16))
+    assert ring.fill == 512 and ring.free == 0
+    
+    written = ring.write(np.ones(100, dtype=np.int16))
+    assert written == 0 and ring.overruns == 100, "满时应丢弃新数据并计数"
+    
+    out = ring.read(512)
+    assert np.all(out == 1), "写满的数据应完整读出"
+    print("✓ 满/空区分与溢出计数")
+
+
+def test_underrun_zero_fill():
+    """测试欠载时补静音并计数"""
+    ring = RingBuffer(capacity_frames=256, channels=2)
+    ring.write(np.full((100, 2), 5, dtype=np.int16))
+    
+    scratch = np.full((300, 2), 9, dtype=np.int16)
+    out = ring.read(200, out=scratch)
+    assert out.base is scratch or out is scratch[:200]
+    assert np.all(out[:100] == 5) and np.all(out[100:] == 0)
+    assert ring.underruns == 100
+    print("✓ 欠载补静音")
+
+
+def test_power_of_two_capacity():
+    """测试容量向上取整为 2 的幂"""
+    assert next_power_of_two(1) == 1
+    assert next_power_of_two(1000) == 1024
+    assert next_power_of_two(1024) == 1024
+    assert RingBuffer(24000, channels=2).capacity == 32768
+    print("✓ 2 的幂容量")
+
+
+def test_drop_oldest_keeps_latest():
+    """测试 DROP_OLDEST 策略保留最新数据"""
+    ring = RingBuffer(capacity_frames=256, channels=1, policy=DROP_OLDEST)
+    source = np.arange(1000, dtype=np.int16)
+    ring.write(source[:600])
+    ring.write(source[600:])
+    
+    assert ring.fill == 256
+    assert ring.overruns == 1000 - 256
+    out = ring.read(256).reshape(-1)
+    assert np.array_equal(out, source[-256:]), "应保留最新的 capacity 帧"
+    print("✓ DROP_OLDEST 保留最新数据")
+
+
+def test_peek_is_zero_copy():
+    """测试 peek 返回环内存储视图且不消费"""
+    ring = RingBuffer(capacity_frames=8, channels=1)
+    ring.write(np.arange(6, dtype=np.int16))
+    ring.advance(4)
+    ring.write(np.arange(6, 12, dtype=np.int16))   # 环绕
+    
+    head, tail = ring.peek()
+    assert np.shares_memory(head, ring.buffer) and np.shares_memory(tail, ring.buffer)
+    assert np.array_equal(np.concatenate([head, tail]).reshape(-1), np.arange(4, 12))
+    assert ring.fill == 8, "peek 不应消费数据"
+    
+    assert ring.advance(3) == 3
+    head, tail = ring.peek(2)
+    assert len(head) + len(tail) == 2 and head[0, 0] == 7
+    print("✓ peek 零拷贝")
+
+
+def test_block_policy_waits_for_consumer():
+    """测试 BLOCK 策略等待消费者腾出空间"""
+    ring = RingBuffer(capacity_frames=64, channels=1, policy=BLOCK)
+    ring.write(np.ones(64, dtype=np.int16))
+    
+    def consume():
+        time.sleep(0.05)
+        ring.read(32)
+    
+    consumer = threading.Thread(target=consume)
+    consumer.start()
+    written = ring.write(np.full(32, 2, dtype=np.int16), timeout=2.0)
+    consumer.join()
+    
+    assert written == 32 and ring.overruns == 0, "空间腾出后应完整写入"
+    
+    # 超时后按丢弃新数据处理
+    assert ring.write(np.ones(10, dtype=np.int16), timeout=0.01) == 0
+    assert ring.overruns == 10
+    print("✓ BLOCK 策略")
+
+
+def test_wait_for_data():
+    """测试消费者等待数据"""
+    ring = RingBuffer(capacity_frames=64, channels=1)
+    assert not ring.wait_for_data(timeout=0.01)
+    
+    producer = threading.Timer(0.02, lambda: ring.write(np.ones(16, dtype=np.int16)))
+    producer.start()
+    assert ring.wait_for_data(16, timeout=2.0)
+    producer.join()
+    print("✓ 等待数据")
+
+
+def test_drop_oldest_concurrent_overrun():
+    """压力测试: 生产者线程持续覆盖时，读端拿到的每一块都是连续、未被撕裂的数据"""
+    ring = RingBuffer(capacity_frames=1024, channels=2, dtype=np.int64, policy=DROP_OLDEST)
+    block = 768
+    stop = threading.Event()
+
+    def producer():
+        counter = 0
+        frames = np.empty((block, 2), dtype=np.int64)
+        while not stop.is_set():
+            frames[:, 0] = np.arange(counter, counter + block)
+            frames[:, 1] = frames[:, 0]
+            ring.write(frames)
+            counter += block
+
+    thread = threading.Thread(target=producer, daemon=True)
+    thread.start()
+    out = np.empty((1000, 2), dtype=np.int64)
+    reads = frames_read = 0
+    last = -1
+    deadline = time.monotonic() + 1.0
+    try:
+        while time.monotonic() < deadline:
+            count = ring.read_into(out)
+            if count == 0:
+                continue
+            got = out[:count, 0]
+            assert np.array_equal(out[:count, 1], got), "同一帧的两个声道应一致"
+            assert np.array_equal(got, np.arange(got[0], got[0] + count)), "读出的帧应连续（未被撕裂）"
+            assert got[0] > last, "读位置只能前进"
+            last = got[-1]
+            reads += 1
+            frames_read += count
+    finally:
+        stop.set()
+        thread.join(1.0)
+    assert reads > 0 and ring.overruns > 0, "压力测试应真正发生覆盖"
+    print(f"✓ 并发覆盖下读取无撕裂（{reads} 次读取，{frames_read} 帧，覆盖 {ring.overruns} 帧）")
+
+
+if __name__ == '__main__':
+    test_write_read_wraparound()
+    test_full_is_not_empty()
+    test_underrun_zero_fill()
+    test_power_of_two_capacity()
+    test_drop_oldest_keeps_latest()
+    test_peek_is_zero_copy()
+    test_block_policy_waits_for_consumer()
+    test_wait_for_data()
+    test_drop_oldest_concurrent_overrun()
+    print("\n✅ 所有环形缓冲测试通过")
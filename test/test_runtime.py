@@ -0,0 +1,139 @@
+"""
+测试网络侧运行时（Wakeup）与事件驱动的转发
+"""
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.server.runtime import Wakeup
+from src.server.stream_hub import StreamHub
+from src.server.hls import HlsSegmenter
+
+
+def test_threading_wakeup_from_native_thread():
+    """threading 模式: 原生线程 notify 唤醒等待者"""
+    wakeup = Wakeup('threading')
+    assert not wakeup.wait(0.01)
+
+    timer = threading.Timer(0.02, wakeup.notify)
+    start = time.perf_counter()
+    timer.start()
+    assert wakeup.wait(1.0)
+    assert time.perf_counter() - start < 0.5
+    print("✓ threading 模式跨线程唤醒")
+
+
+def test_notifies_coalesce():
+    """两次 wait 之间的多次 notify 合并为一次唤醒"""
+    wakeup = Wakeup('threading')
+    for _ in range(5):
+        wakeup.notify()
+    assert wakeup.wait(0)
+    assert not wakeup.wait(0)
+    print("✓ 多次 notify 合并")
+
+
+def test_gevent_wakeup_does_not_block_hub():
+    """gevent 模式: 等待中的 greenlet 不阻塞其他 greenlet，原生线程的 notify 能唤醒它"""
+    import gevent
+
+    wakeup = Wakeup('gevent')
+    ticks = []
+
+    def ticker():
+        for _ in range(5):
+            ticks.append(time.perf_counter())
+            gevent.sleep(0.005)
+
+    def waiter():
+        return wakeup.wait(2.0)
+
+    waiting = gevent.spawn(waiter)
+    other = gevent.spawn(ticker)
+    threading.Timer(0.1, wakeup.notify).start()
+    start = time.perf_counter()
+    assert waiting.get(timeout=3)
+    other.join()
+    assert len(ticks) == 5 and ticks[-1] - start < 0.1   # 等待期间其他 greenlet 照常运行
+    wakeup.close()
+    wakeup.notify()   # 关闭后 notify 被忽略
+    print("✓ gevent 模式跨线程唤醒且不阻塞集线器")
+
+
+def test_event_factory():
+    """StreamHub / HlsSegmenter 使用注入的事件工厂"""
+    created = []
+
+    def factory():
+        event = threading.Event()
+        created.append(event)
+        return event
+
+    hub = StreamHub(capacity_chunks=8, event_factory=factory)
+    hub.publish(b'x')
+    assert len(created) == 2 and created[0].is_set()
+
+    segmenter = HlsSegmenter(event_factory=factory)
+    assert len(created) == 3
+    print("✓ 事件工厂注入")
+
+
+def test_forward_loop_wakes_on_mixed():
+    """转发循环: bridge 入队后 on_mixed 唤醒，一次取走所有帧"""
+    import queue
+
+    class Bridge:
+        def __init__(self):
+            self.mixed_queue = queue.Queue(maxsize=200)
+            self.on_mixed = None
+
+        def push(self, audio):
+            self.mixed_queue.put_nowait(audio)
+            self.on_mixed()
+
+        def drain_mixed(self):
+            frames = []
+            while True:
+                try:
+                    frames.append(self.mixed_queue.get_nowait())
+                except queue.Empty:
+                    return frames
+
+    bridge = Bridge()
+    wakeup = Wakeup('threading')
+    bridge.on_mixed = wakeup.notify
+    received = []
+    running = [True]
+
+    def loop():
+        while running[0]:
+            wakeup.wait(0.5)
+            received.extend(bridge.drain_mixed())
+
+    consumer = threading.Thread(target=loop)
+    consumer.start()
+    for i in range(3):
+        bridge.push(np.full(4, i, dtype=np.int16))
+    deadline = time.monotonic() + 1.0
+    while len(received) < 3 and time.monotonic() < deadline:
+        time.sleep(0.005)
+    running[0] = False
+    wakeup.notify()
+    consumer.join(timeout=1.0)
+    assert [int(f[0]) for f in received] == [0, 1, 2]
+    print("✓ 转发循环由 on_mixed 唤醒")
+
+
+if __name__ == '__main__':
+    test_threading_wakeup_from_native_thread()
+    test_notifies_coalesce()
+    test_gevent_wakeup_does_not_block_hub()
+    test_event_factory()
+    test_forward_loop_wakes_on_mixed()
+    print("\n✅ 运行时测试全部通过")
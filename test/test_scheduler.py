@@ -0,0 +1,90 @@
+"""
+测试主时钟混音调度器
+"""
+import numpy as np
+import sys
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.audio.scheduler import MixerScheduler, CONCEAL_SILENCE
+
+
+def _block(value: int, frames: int = 512) -> np.ndarray:
+    return np.full((frames, 2), value, dtype=np.int16)
+
+
+def test_stalled_source_does_not_drop_master():
+    """测试从属输入停顿时主时钟数据照常输出"""
+    scheduler = MixerScheduler(channels=2, block_frames=512)
+    scheduler.add_source('mpv', master=True)
+    scheduler.add_source('clubdeck', prebuffer_frames=0, drift_compensation=False, concealment=CONCEAL_SILENCE)
+
+    for i in range(5):
+        scheduler.push('mpv', _block(i + 1))
+        blocks = scheduler.tick(timeout=0.1)
+        assert blocks is not None
+        assert np.all(blocks['mpv'] == i + 1), "主时钟的每一块都应输出"
+        assert np.all(blocks['clubdeck'] == 0)
+
+    stats = scheduler.get_stats()
+    assert stats['sources']['mpv']['underruns'] == 0
+    assert stats['sources']['clubdeck']['underruns'] == 5
+    print(f"✓ 从属输入停顿时主时钟不丢数据 (clubdeck 欠载 {stats['sources']['clubdeck']['underruns']} 次)")
+
+
+def test_follower_aligned_to_master_frames():
+    """测试从属输入按主时钟的帧数取出"""
+    scheduler = MixerScheduler(channels=2, block_frames=512)
+    scheduler.add_source('mpv')
+    scheduler.add_source('clubdeck', prebuffer_frames=0, drift_compensation=False)
+
+    scheduler.push('clubdeck', _block(7, 1000))
+    scheduler.push('mpv', _block(1, 300))
+    blocks = scheduler.tick(timeout=0.1)
+    assert len(blocks['mpv']) == 300 and len(blocks['clubdeck']) == 300
+    assert np.all(blocks['clubdeck'] == 7)
+    assert scheduler.sources['clubdeck'].ring.fill == 700
+    print("✓ 从属输入按主时钟帧数对齐")
+
+
+def test_fade_concealment():
+    """测试欠载时从最后一帧淡出而不是直接跳到静音"""
+    scheduler = MixerScheduler(channels=2, block_frames=512)
+    scheduler.add_source('mpv')
+    scheduler.add_source('clubdeck', prebuffer_frames=0, drift_compensation=False)
+
+    scheduler.push('clubdeck', _block(10000, 256))
+    scheduler.push('mpv', _block(0, 512))
+    block = scheduler.tick(timeout=0.1)['clubdeck']
+    assert np.all(block[:256] == 10000)
+    tail = block[256:, 0].astype(np.int32)
+    assert tail[0] > 9000 and tail[-1] == 0, "应从最后一帧线性淡出到 0"
+    assert np.all(np.diff(tail) <= 0)
+    print("✓ 淡出补齐")
+
+
+def test_master_stall_falls_back_to_wall_clock():
+    """测试主时钟停顿时由系统时钟补出节拍，从属输入继续输出"""
+    scheduler = MixerScheduler(channels=2, block_frames=512, stall_timeout=0.02)
+    scheduler.add_source('mpv')
+    scheduler.add_source('clubdeck', prebuffer_frames=0, drift_compensation=False)
+
+    scheduler.push('clubdeck', _block(5, 4800))
+    blocks = scheduler.tick()
+    assert blocks is not None, "主时钟停顿超时后应补出节拍"
+    frames = len(blocks['clubdeck'])
+    assert frames >= 0.02 * 48000 * 0.9
+    assert np.all(blocks['clubdeck'] == 5)
+    assert scheduler.get_stats()['stalled_ticks'] == 1
+    assert scheduler.sources['mpv'].underruns == 1
+    print(f"✓ 主时钟停顿时补出 {frames} 帧")
+
+
+if __name__ == '__main__':
+    test_stalled_source_does_not_drop_master()
+    test_follower_aligned_to_master_frames()
+    test_fade_concealment()
+    test_master_stall_falls_back_to_wall_clock()
+    print("\n✅ 所有调度器测试通过")
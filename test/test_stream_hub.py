@@ -0,0 +1,81 @@
+"""
+测试 HTTP 流广播中心（多听众独立游标）
+"""
+import sys
+import threading
+from pathlib import Path
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.server.stream_hub import StreamHub
+
+
+def test_every_listener_gets_every_chunk():
+    """测试每个听众都收到全部数据（而不是轮流分走）"""
+    hub = StreamHub(capacity_chunks=32)
+    listeners = [hub.listen() for _ in range(3)]
+    for i in range(10):
+        hub.publish(bytes([i]))
+
+    for listener in listeners:
+        assert listener.read(timeout=0) == [bytes([i]) for i in range(10)]
+        assert listener.read(timeout=0) == []
+    print(f"✓ {len(listeners)} 个听众各收到 10 块")
+
+
+def test_lagging_listener_skips_ahead():
+    """测试落后的听众跳到最新位置，不影响其他听众"""
+    hub = StreamHub(capacity_chunks=16, max_lag=8, resume_chunks=2)
+    fast, slow = hub.listen(), hub.listen()
+    received = []
+    for i in range(40):
+        hub.publish(bytes([i]))
+        received.extend(fast.read(timeout=0))
+
+    assert received == [bytes([i]) for i in range(40)]
+    assert slow.lag == 40
+    assert slow.read(timeout=0) == [bytes([38]), bytes([39])]
+    assert slow.skips == 1 and slow.skipped == 38
+    print(f"✓ 落后 40 块的听众跳过 {slow.skipped} 块")
+
+
+def test_listener_joins_at_live_edge():
+    """测试新听众从最新位置开始，关闭后注销"""
+    hub = StreamHub(capacity_chunks=16)
+    hub.publish(b'old')
+    listener = hub.listen()
+    assert listener.read(timeout=0) == []
+    hub.publish(b'new')
+    assert listener.read(timeout=0) == [b'new']
+    assert hub.listener_count == 1
+    listener.close()
+    assert hub.listener_count == 0
+    print("✓ 新听众从直播边缘开始")
+
+
+def test_read_wakes_on_publish():
+    """测试等待中的听众在发布时被唤醒"""
+    hub = StreamHub(capacity_chunks=16)
+    listeners = [hub.listen() for _ in range(4)]
+    results = [None] * len(listeners)
+
+    def reader(index):
+        results[index] = listeners[index].read(timeout=2.0)
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(len(listeners))]
+    for thread in threads:
+        thread.start()
+    hub.publish(b'x')
+    for thread in threads:
+        thread.join(timeout=3.0)
+    assert results == [[b'x']] * len(listeners)
+    print("✓ 发布唤醒所有等待的听众")
+
+
+if __name__ == '__main__':
+    test_every_listener_gets_every_chunk()
+    test_lagging_listener_skips_ahead()
+    test_listener_joins_at_live_edge()
+    test_read_wakes_on_publish()
+    print("\n✅ 所有流广播测试通过")
@@ -0,0 +1,474 @@
+#!/usr/bin/env python
+"""
+Socket.IO 压测工具 - 模拟大量浏览器收听者/说话者，给出单实例的容量曲线
+
+- 在子进程中启动一个使用虚拟设备后端（config [audio] backend = virtual 的同款设备）的服务器，
+  MPV / Clubdeck 输入为实时节拍的正弦，所有混音与广播代码与线上一致
+- 客户端分散在多个工作进程中（每个客户端一个 python-socketio 客户端，仅 websocket 传输）:
+  收听者接收 audio_from_clubdeck（旧 base64 JSON）或协商后的 audio_frame（二进制帧），
+  说话者在收听的同时按浏览器节拍（2048 帧 @ 48kHz ≈ 42.7ms）发送麦克风包
+- 按阶梯逐级增加客户端数，每级先稳定 settle 秒，再统计 duration 秒:
+  每客户端到达抖动（RFC 3550 到达间隔抖动，以及到达间隔与音频时长之差的 p99）、
+  丢失（收到的音频时长相对统计窗口的缺口；二进制帧另计序号缺口）、
+  服务器进程 CPU / RSS（/proc，仅 Linux）与压测进程自身的 CPU
+- 丢失、抖动 p99 在阈值内且没有客户端掉线的最高一级即为容量
+
+需要安装: pip install "python-socketio[client]"
+
+使用方法:
+    python tools/load_test.py
+    python tools/load_test.py --steps 10,50,100,200,400 --talker-ratio 0.1 --duration 10
+    python tools/load_test.py --binary --json capacity.json
+    python tools/load_test.py --url http://127.0.0.1:5000 --server-pid 1234   # 压测已运行的服务器
+"""
+import argparse
+import base64
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+try:
+    import socketio
+    import websocket   # websocket-client: socketio.Client 的 websocket 传输
+    SOCKETIO_CLIENT_AVAILABLE = True
+except ImportError:
+    SOCKETIO_CLIENT_AVAILABLE = False
+
+# 添加项目根目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.server.protocol import (
+    EVENT_FRAME, EVENT_LEGACY_DOWN, EVENT_LEGACY_UP, FORMAT_PCM16, PROTOCOL_VERSION,
+    pack_frame, unpack_frame
+)
+
+
+MIC_FRAMES = 2048          # 与 static/js/client.js 的 ScriptProcessor bufferSize 一致
+MIC_RATE = 48000
+MIC_CHANNELS = 2
+DEFAULT_STEPS = '10,25,50,100,200,400'
+
+
+# ----------------------------------------------------------------------
+# 服务器（子进程）
+# ----------------------------------------------------------------------
+
+def serve(port: int):
+    """在虚拟设备上运行完整服务器（不打开声卡、不连接 MPV 管道，接受浏览器麦克风）"""
+    from src.config.settings import config
+    from src.audio.backend import BACKEND_VIRTUAL, VirtualBackend, set_backend
+
+    config.audio.backend = BACKEND_VIRTUAL
+    config.audio.virtual_speed = 1.0
+    config.audio.duplex_mode = 'full'
+    config.audio.mpv_ducking_enabled = False
+    # 随机端口不在 [cors] allowed_origins 中（Socket.IO 按 Origin 拒绝 websocket），须在导入 app 前加入
+    config.cors.allowed_origins.append(f'http://127.0.0.1:{port}')
+    set_backend(VirtualBackend.from_config(config.audio))
+
+    from src.main import create_bridge
+    from src.server.app import create_app
+    from src.server.websocket_handler import WebSocketHandler
+
+    bridge = create_bridge(config.audio)
+    app, sio = create_app()
+    handler = WebSocketHandler(sio, bridge)
+    bridge.start()
+    handler.start()
+    try:
+        sio.run(app, host='127.0.0.1', port=port, use_reloader=False, log_output=False,
+                allow_unsafe_werkzeug=True)
+    finally:
+        handler.stop()
+        bridge.stop()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port: int, process: subprocess.Popen, timeout: float = 30.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            return False
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def proc_cpu_seconds(pid: int):
+    """进程累计 CPU 时间（用户 + 系统，秒），读取失败时返回 None"""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+    except OSError:
+        return None
+    # ')' 之后第 12、13 个字段为 utime、stime（时钟滴答）
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+def proc_rss_mb(pid: int):
+    """进程常驻内存（MB），读取失败时返回 None"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+# ----------------------------------------------------------------------
+# 客户端（工作进程）
+# ----------------------------------------------------------------------
+
+class ArrivalStats:
+    """
+    一个客户端的下行到达统计
+
+    抖动按 RFC 3550: D = 到达间隔 - 上一包的音频时长，J += (|D| - J) / 16；
+    同时保留每个 |D| 以求 p99。reset() 开始新的统计窗口，但保留上一包的到达时刻，窗口首包也能算间隔。
+    """
+
+    __slots__ = ('last_arrival', 'last_duration', 'last_seq', 'jitter', 'deviations',
+                 'packets', 'media_seconds', 'seq_gaps')
+
+    def __init__(self):
+        self.last_arrival = None
+        self.last_duration = 0.0
+        self.last_seq = None
+        self.reset()
+
+    def reset(self):
+        self.jitter = 0.0
+        self.deviations = []
+        self.packets = 0
+        self.media_seconds = 0.0
+        self.seq_gaps = 0
+
+    def record(self, now: float, duration: float, seq=None):
+        if self.last_arrival is not None:
+            deviation = abs(now - self.last_arrival - self.last_duration)
+            self.jitter += (deviation - self.jitter) / 16
+            self.deviations.append(deviation)
+        if seq is not None and self.last_seq is not None:
+            gap = (seq - self.last_seq - 1) & 0xFFFFFFFF
+            if gap < 0x80000000:
+                self.seq_gaps += gap
+            self.last_seq = seq
+        elif seq is not None:
+            self.last_seq = seq
+        self.last_arrival = now
+        self.last_duration = duration
+        self.packets += 1
+        self.media_seconds += duration
+
+
+class LoadClient:
+    """一个模拟浏览器: 收听（旧 JSON 或二进制帧），说话者另按节拍发送麦克风包"""
+
+    def __init__(self, url: str, binary: bool, talker: bool):
+        self.url = url
+        self.binary = binary
+        self.talker = talker
+        self.stats = ArrivalStats()
+        self.disconnected = False
+        self.mic_seq = 0
+        self.sio = socketio.Client(reconnection=False)
+        self.sio.on('connected', self._on_connected)
+        self.sio.on('disconnect', self._on_disconnect)
+        self.sio.on(EVENT_LEGACY_DOWN, self._on_legacy_audio)
+        self.sio.on(EVENT_FRAME, self._on_frame)
+
+    def connect(self):
+        self.sio.connect(self.url, transports=['websocket'], wait_timeout=10)
+
+    def close(self):
+        try:
+            self.sio.disconnect()
+        except Exception:
+            pass
+
+    def _on_connected(self, data=None):
+        if self.binary:
+            self.sio.emit('negotiate', {'transport': 'binary', 'formats': ['pcm16'],
+                                        'upstream': ['pcm16'], 'version': PROTOCOL_VERSION})
+
+    def _on_disconnect(self, reason=None):
+        self.disconnected = True
+
+    def _on_legacy_audio(self, data):
+        now = time.monotonic()
+        encoded = data['audio']
+        nbytes = len(encoded) * 3 // 4 - encoded[-2:].count('=')
+        self.stats.record(now, nbytes / 2 / data['channels'] / data['sample_rate'])
+
+    def _on_frame(self, frame):
+        now = time.monotonic()
+        header, payload = unpack_frame(frame)
+        if header.format != FORMAT_PCM16:
+            return
+        self.stats.record(now, len(payload) / 2 / header.channels / header.sample_rate, header.seq)
+
+    def send_mic(self, audio: np.ndarray, encoded: str):
+        """发送一个麦克风包（与 client.js 相同的事件与格式）"""
+        if self.binary:
+            self.sio.emit(EVENT_FRAME, pack_frame(audio, self.mic_seq, MIC_RATE, MIC_CHANNELS, FORMAT_PCM16))
+            self.mic_seq = (self.mic_seq + 1) & 0xFFFFFFFF
+        else:
+            self.sio.emit(EVENT_LEGACY_UP, {'audio': encoded, 'channels': MIC_CHANNELS})
+
+
+def mic_packet() -> tuple:
+    """一个麦克风包: 高于服务端噪声门限的 300Hz 音（int16 交错, base64）"""
+    t = np.arange(MIC_FRAMES) / MIC_RATE
+    mono = (4000 * np.sin(2 * np.pi * 300 * t)).astype(np.int16)
+    audio = np.repeat(mono, MIC_CHANNELS)
+    return audio, base64.b64encode(audio.tobytes()).decode('ascii')
+
+
+def talk(clients: list, stop: threading.Event):
+    """一个线程按浏览器节拍驱动本进程所有说话者，各说话者的发送时刻在一个周期内错开"""
+    if not clients:
+        return
+    audio, encoded = mic_packet()
+    period = MIC_FRAMES / MIC_RATE
+    start = time.monotonic()
+    n = 0
+    while not stop.is_set():
+        for i, client in enumerate(clients):
+            due = start + n * period + period * i / len(clients)
+            delay = due - time.monotonic()
+            if delay > 0 and stop.wait(delay):
+                return
+            if not client.disconnected:
+                try:
+                    client.send_mic(audio, encoded)
+                except Exception:
+                    client.disconnected = True
+        n += 1
+
+
+def percentile(values: list, pct: float):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def worker(url: str, listeners: int, talkers: int, binary: bool, settle: float, duration: float,
+           ready, go, results):
+    """
+    工作进程: 建立 listeners + talkers 个连接 → 报告就绪 → 收到开始信号后稳定 settle 秒、
+    统计 duration 秒 → 返回每个客户端的统计
+    """
+    clients = [LoadClient(url, binary, talker=i < talkers) for i in range(listeners + talkers)]
+    connected = []
+    for client in clients:
+        try:
+            client.connect()
+            connected.append(client)
+        except Exception:
+            pass
+    ready.put(len(connected))
+    go.wait()
+
+    stop = threading.Event()
+    sender = threading.Thread(target=talk, args=([c for c in connected if c.talker], stop), daemon=True)
+    sender.start()
+    time.sleep(settle)
+    for client in connected:
+        client.stats.reset()
+    cpu_start = sum(os.times()[:2])
+    window_start = time.monotonic()
+    time.sleep(duration)
+    window = time.monotonic() - window_start
+    cpu = sum(os.times()[:2]) - cpu_start
+    stop.set()
+
+    summaries = []
+    for client in connected:
+        stats = client.stats
+        summaries.append({
+            'talker': client.talker,
+            'disconnected': client.disconnected,
+            'packets': stats.packets,
+            'jitter_ms': stats.jitter * 1000,
+            'deviation_p99_ms': (percentile(stats.deviations, 99) or 0.0) * 1000,
+            'deviations_ms': [d * 1000 for d in stats.deviations],
+            'loss_pct': max(0.0, 1.0 - stats.media_seconds / window) * 100,
+            'seq_gaps': stats.seq_gaps,
+        })
+    sender.join(timeout=1.0)
+    for client in connected:
+        client.close()
+    results.put({'clients': summaries, 'failed': len(clients) - len(connected), 'cpu_seconds': cpu,
+                 'window': window})
+
+
+# ----------------------------------------------------------------------
+# 阶梯
+# ----------------------------------------------------------------------
+
+def run_step(url: str, clients: int, talkers: int, args, server_pid) -> dict:
+    """一级: 按工作进程平均分配客户端，同步开始，汇总统计"""
+    ctx = multiprocessing.get_context('spawn')
+    ready, results, go = ctx.Queue(), ctx.Queue(), ctx.Event()
+    procs = min(args.procs, clients)
+    workers = []
+    for i in range(procs):
+        total = clients // procs + (i < clients % procs)
+        speaking = talkers // procs + (i < talkers % procs)
+        p = ctx.Process(target=worker, args=(url, total - speaking, speaking, args.binary, args.settle,
+                                             args.duration, ready, go, results), daemon=True)
+        p.start()
+        workers.append(p)
+    connected = sum(ready.get(timeout=args.connect_timeout) for _ in workers)
+
+    go.set()
+    time.sleep(args.settle)
+    cpu_start = proc_cpu_seconds(server_pid) if server_pid else None
+    wall_start = time.monotonic()
+    time.sleep(args.duration)
+    cpu_end = proc_cpu_seconds(server_pid) if server_pid else None
+    wall = time.monotonic() - wall_start
+    rss = proc_rss_mb(server_pid) if server_pid else None
+
+    reports = [results.get(timeout=args.duration + args.settle + 30) for _ in workers]
+    for p in workers:
+        p.join(timeout=10)
+
+    summaries = [summary for report in reports for summary in report['clients']]
+    deviations = [d for summary in summaries for d in summary.pop('deviations_ms')]
+    losses = [summary['loss_pct'] for summary in summaries]
+    step = {
+        'clients': clients,
+        'talkers': talkers,
+        'connected': connected,
+        'disconnected': sum(summary['disconnected'] for summary in summaries),
+        'jitter_ms_p50': percentile([summary['jitter_ms'] for summary in summaries], 50),
+        'jitter_ms_max': max((summary['jitter_ms'] for summary in summaries), default=None),
+        'deviation_ms_p99': percentile(deviations, 99),
+        'loss_pct_mean': sum(losses) / len(losses) if losses else None,
+        'loss_pct_max': max(losses, default=None),
+        'seq_gaps': sum(summary['seq_gaps'] for summary in summaries),
+        'server_cpu_pct': (cpu_end - cpu_start) / wall * 100 if cpu_start is not None and cpu_end is not None else None,
+        'server_rss_mb': rss,
+        'loadgen_cpu_pct': sum(report['cpu_seconds'] for report in reports) / wall * 100,
+    }
+    step['ok'] = (
+        connected == clients and not step['disconnected']
+        and step['loss_pct_mean'] is not None and step['loss_pct_mean'] <= args.max_loss
+        and step['deviation_ms_p99'] is not None and step['deviation_ms_p99'] <= args.max_jitter
+    )
+    return step
+
+
+def fmt(value, spec: str) -> str:
+    return '-' if value is None else format(value, spec)
+
+
+def print_step(step: dict):
+    print(f"{step['clients']:>6}{step['talkers']:>6}{step['connected']:>7}{step['disconnected']:>6}"
+          f"{fmt(step['jitter_ms_p50'], '.2f'):>10}{fmt(step['deviation_ms_p99'], '.1f'):>10}"
+          f"{fmt(step['loss_pct_mean'], '.2f'):>9}{fmt(step['loss_pct_max'], '.2f'):>9}"
+          f"{fmt(step['server_cpu_pct'], '.0f'):>8}{fmt(step['server_rss_mb'], '.0f'):>8}"
+          f"{fmt(step['loadgen_cpu_pct'], '.0f'):>8}   {'OK' if step['ok'] else '降级'}", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ClubVoice Socket.IO 压测')
+    parser.add_argument('--steps', default=DEFAULT_STEPS, help=f'每级客户端数（逗号分隔，默认 {DEFAULT_STEPS}）')
+    parser.add_argument('--talker-ratio', type=float, default=0.1, help='其中说话者的比例（默认 0.1）')
+    parser.add_argument('--binary', action='store_true', help='协商二进制帧（默认旧 base64 JSON）')
+    parser.add_argument('--duration', type=float, default=10.0, help='每级统计时长（秒）')
+    parser.add_argument('--settle', type=float, default=3.0, help='每级开始统计前的稳定时间（秒）')
+    parser.add_argument('--procs', type=int, default=max(1, (os.cpu_count() or 2) // 2), help='客户端工作进程数')
+    parser.add_argument('--connect-timeout', type=float, default=120.0, help='一级内所有客户端建立连接的超时（秒）')
+    parser.add_argument('--max-loss', type=float, default=1.0, help='判定为降级的平均丢失比例（%%）')
+    parser.add_argument('--max-jitter', type=float, default=30.0, help='判定为降级的到达偏差 p99（毫秒）')
+    parser.add_argument('--keep-going', action='store_true', help='降级后继续跑后面的级')
+    parser.add_argument('--url', help='压测已运行的服务器（默认在子进程中启动虚拟设备服务器）')
+    parser.add_argument('--server-pid', type=int, help='配合 --url: 统计该进程的 CPU / RSS')
+    parser.add_argument('--json', metavar='PATH', help='结果写入 JSON 文件')
+    args = parser.parse_args()
+
+    if not SOCKETIO_CLIENT_AVAILABLE:
+        print("错误: 需要安装 Socket.IO 客户端")
+        print('运行: pip install "python-socketio[client]"')
+        sys.exit(1)
+
+    steps = [int(n) for n in args.steps.split(',') if n.strip()]
+    server = None
+    log = None
+    if args.url:
+        url, server_pid = args.url, args.server_pid
+    else:
+        port = free_port()
+        log = tempfile.NamedTemporaryFile('w+b', prefix='clubvoice-load-', suffix='.log', delete=False)
+        server = subprocess.Popen([sys.executable, str(Path(__file__).resolve()), '--serve', str(port)],
+                                  stdout=log, stderr=subprocess.STDOUT, cwd=str(Path(__file__).parent.parent))
+        if not wait_for_port(port, server):
+            server.kill()
+            print(f"错误: 服务器未能启动，日志见 {log.name}")
+            sys.exit(1)
+        url, server_pid = f'http://127.0.0.1:{port}', server.pid
+
+    print(f"{url}  {'二进制帧' if args.binary else '旧 base64 JSON'}, 说话者比例 {args.talker_ratio:.0%}, "
+          f"每级稳定 {args.settle:.0f}s + 统计 {args.duration:.0f}s, {args.procs} 个工作进程")
+    print("-" * 98)
+    print(f"{'客户端':>6}{'说话':>6}{'已连接':>7}{'掉线':>6}{'抖动p50':>10}{'偏差p99':>10}"
+          f"{'丢失%':>9}{'最大%':>9}{'服务CPU':>8}{'RSS MB':>8}{'压测CPU':>8}   状态")
+    results = []
+    try:
+        for clients in steps:
+            talkers = min(clients, int(round(clients * args.talker_ratio)))
+            step = run_step(url, clients, talkers, args, server_pid)
+            results.append(step)
+            print_step(step)
+            if not step['ok'] and not args.keep_going:
+                break
+    finally:
+        if server is not None:
+            server.terminate()
+            try:
+                server.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+            log.close()
+            os.unlink(log.name)
+    print("-" * 98)
+
+    capacity = max((step['clients'] for step in results if step['ok']), default=0)
+    print(f"容量: {capacity} 个客户端（平均丢失 ≤ {args.max_loss}%，到达偏差 p99 ≤ {args.max_jitter}ms，无掉线）")
+    if args.json:
+        Path(args.json).write_text(json.dumps({
+            'url': url, 'binary': args.binary, 'talker_ratio': args.talker_ratio,
+            'duration': args.duration, 'settle': args.settle, 'procs': args.procs,
+            'max_loss_pct': args.max_loss, 'max_jitter_ms': args.max_jitter,
+            'capacity': capacity, 'steps': results,
+        }, indent=2, ensure_ascii=False), encoding='utf-8')
+        print(f"结果已写入 {args.json}")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 3 and sys.argv[1] == '--serve':
+        serve(int(sys.argv[2]))
+    else:
+        main()